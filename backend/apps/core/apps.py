@@ -8,5 +8,13 @@ class CoreConfig(AppConfig):
     def ready(self):
         """Registruoti sinchronizacijos signals kai Django apps yra paruošti"""
         from apps.core.signals import register_sync_signals
+        from apps.core.pdf_cache import register_pdf_cache_signals
+        from apps.core.numbering import register_number_parts_signals
+        from apps.settings.cache import register_settings_cache_signals, register_version_signals
+        from apps.core.models import StatusTransitionRule
         register_sync_signals()
-
+        register_pdf_cache_signals()
+        register_number_parts_signals()
+        register_settings_cache_signals()
+        # StatusService taisyklių cache - versijos žymė bendra visiems worker'iams
+        register_version_signals(StatusTransitionRule)
@@ -0,0 +1,40 @@
+"""
+Masinių pakeitimų signal'as.
+
+QuerySet.update(), bulk_update() ir bulk_create() nesiunčia post_save. Masiniai keliai
+(PaymentService.mark_many_as_paid, užsakymų mokėjimų suvestinė, statusų taisyklių paketas)
+po įrašymo kviečia send_bulk_changed(), o moduliai, reaguojantys į post_save, prisijungia ir prie
+bulk_changed su tuo pačiu sender'iu:
+- replica outbox (apps.core.signals),
+- PDF cache (apps.core.pdf_cache),
+- dashboard snapshot (apps.dashboard.signals),
+- užsakymų mokėjimų suvestinė ir vežėjų apmokėjimo būsena (apps.invoices.signals).
+
+Receiver'io argumentai: sender - modelis, instances - pakeisti / sukurti objektai,
+fields - pakeistų laukų aibė (None - nežinoma, pvz. sukurti objektai).
+bulk_create MySQL'e objektams pk nepriskiria - receiver'iai tokius objektus praleidžia
+arba naudoja jų FK laukus.
+"""
+
+from typing import Iterable, Optional
+
+from django.dispatch import Signal
+
+bulk_changed = Signal()
+
+
+def send_bulk_changed(model, instances: Iterable = (), pks: Iterable = (), fields: Optional[Iterable[str]] = None):
+    """Pranešti apie masinį pakeitimą; pks - kai objektai neįkelti (pvz. UPDATE pagal pk sąrašą)"""
+    instances = list(instances) + [model(pk=pk) for pk in pks]
+    if not instances:
+        return
+    bulk_changed.send(
+        sender=model,
+        instances=instances,
+        fields=frozenset(fields) if fields is not None else None,
+    )
+
+
+def instance_pks(instances) -> list:
+    """Objektų pk be pasikartojimų (objektai be pk praleidžiami)"""
+    return list(dict.fromkeys(instance.pk for instance in instances if instance.pk is not None))
@@ -6,6 +6,7 @@ Rašo duomenis į abi DB: lokalią (default) ir nuotolinę (replica).
 from django.db import connections, transaction
 from django.conf import settings
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -145,65 +146,149 @@ def sync_to_replica(model_instance):
         return False
 
 
-def bulk_sync_to_replica(model_class, queryset):
+def bulk_sync_to_replica(model_class, queryset, chunk_size=None, progress_callback=None):
     """
     Masinė sinchronizacija į nuotolinę DB.
+    Queryset skaitomas srautu (iterator()), o kiekvienas chunk'as įrašomas viena kelių eilučių
+    upsert užklausa; ManyToMany tarpinės lentelės sinchronizuojamos visam chunk'ui iš karto.
+
+    Args:
+        model_class: Modelio klasė
+        queryset: Sinchronizuojami objektai (skaitomi iš default DB)
+        chunk_size: Eilučių skaičius vienoje upsert užklausoje (numatytai REPLICA_OUTBOX_CHUNK_SIZE)
+        progress_callback: Kviečiama po kiekvieno chunk'o su (synced_count, elapsed_seconds)
+
+    Returns:
+        Sinchronizuotų įrašų skaičius
     """
     if 'replica' not in settings.DATABASES:
         logger.warning("Replica database not configured, skipping bulk sync")
         return 0
 
+    chunk_size = chunk_size or getattr(settings, 'REPLICA_OUTBOX_CHUNK_SIZE', 500)
+    sync_count = 0
+    started = time.monotonic()
+
+    def flush(chunk):
+        written = upsert_instances(model_class, chunk, using='replica', chunk_size=chunk_size)
+        sync_m2m_to_replica(model_class, [instance.pk for instance in chunk], chunk_size=chunk_size)
+        return written
+
     try:
-        sync_count = 0
-        
-        # Naudojame bulk_create su update_on_conflict (MySQL/MariaDB)
-        instances = list(queryset.using('default').all())
-        
-        if not instances:
-            return 0
-        
-        # Sukurkime arba atnaujinkime visus objektus replica DB
-        pk_field = model_class._meta.pk
-        for instance in instances:
-            pk_value = instance.pk
-            if pk_value is None:
-                continue
-            
-            defaults = {}
-            for field in model_class._meta.fields:
-                if field.primary_key:
-                    continue
-                
-                field_value = getattr(instance, field.name, None)
-                
-                # Apdoroti ForeignKey laukus
-                if hasattr(field, 'remote_field') and field.remote_field:
-                    if field_value is not None:
-                        defaults[field.name + '_id'] = field_value.pk if hasattr(field_value, 'pk') else field_value
-                else:
-                    defaults[field.name] = field_value
-            
-            lookup = {pk_field.name: pk_value}
-            model_class.objects.using('replica').update_or_create(
-                **lookup,
-                defaults=defaults
-            )
-            
-            # Apdoroti ManyToMany laukus
-            try:
-                replica_instance = model_class.objects.using('replica').get(**lookup)
-                for field in model_class._meta.many_to_many:
-                    m2m_values = getattr(instance, field.name).all()
-                    getattr(replica_instance, field.name).set(m2m_values)
-            except Exception as e:
-                logger.warning(f"Could not sync M2M for {model_class.__name__} (pk={pk_value}): {str(e)}")
-            
-            sync_count += 1
-        
-        logger.info(f"Bulk synced {sync_count} {model_class.__name__} instances to replica")
+        chunk = []
+        for instance in queryset.using('default').order_by('pk').iterator(chunk_size=chunk_size):
+            chunk.append(instance)
+            if len(chunk) >= chunk_size:
+                sync_count += flush(chunk)
+                chunk = []
+                if progress_callback:
+                    progress_callback(sync_count, time.monotonic() - started)
+        if chunk:
+            sync_count += flush(chunk)
+            if progress_callback:
+                progress_callback(sync_count, time.monotonic() - started)
+
+        logger.info(
+            f"Bulk synced {sync_count} {model_class.__name__} instances to replica "
+            f"in {time.monotonic() - started:.1f}s"
+        )
         return sync_count
-        
+
     except Exception as e:
-        logger.error(f"Error in bulk sync to replica: {str(e)}", exc_info=True)
+        logger.error(
+            f"Error in bulk sync to replica ({model_class.__name__}, synced {sync_count} before error): {str(e)}",
+            exc_info=True
+        )
+        return sync_count
+
+
+def _build_upsert_sql(connection, table, columns, pk_column, row_count):
+    """
+    Sugeneruoti kelių eilučių upsert SQL.
+    MySQL: INSERT ... ON DUPLICATE KEY UPDATE, kitoms DB: INSERT ... ON CONFLICT (pk) DO UPDATE.
+    """
+    qn = connection.ops.quote_name
+    columns_sql = ', '.join(qn(column) for column in columns)
+    row_sql = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    values_sql = ', '.join([row_sql] * row_count)
+    update_columns = [column for column in columns if column != pk_column]
+
+    sql = f'INSERT INTO {qn(table)} ({columns_sql}) VALUES {values_sql}'
+    if connection.vendor == 'mysql':
+        if update_columns:
+            update_sql = ', '.join(f'{qn(column)} = VALUES({qn(column)})' for column in update_columns)
+        else:
+            update_sql = f'{qn(pk_column)} = {qn(pk_column)}'
+        return f'{sql} ON DUPLICATE KEY UPDATE {update_sql}'
+
+    if update_columns:
+        update_sql = ', '.join(f'{qn(column)} = excluded.{qn(column)}' for column in update_columns)
+        return f'{sql} ON CONFLICT ({qn(pk_column)}) DO UPDATE SET {update_sql}'
+    return f'{sql} ON CONFLICT ({qn(pk_column)}) DO NOTHING'
+
+
+def upsert_instances(model_class, instances, using='replica', chunk_size=500):
+    """
+    Įrašyti objektus į nurodytą DB keliomis kelių eilučių upsert užklausomis.
+    Reikšmės imamos tiesiai iš objektų (auto_now laukai neperrašomi), signal'ai nesiunčiami.
+
+    Returns:
+        Įrašytų eilučių skaičius
+    """
+    instances = [instance for instance in instances if instance.pk is not None]
+    if not instances:
         return 0
 
+    connection = connections[using]
+    fields = list(model_class._meta.local_concrete_fields)
+    columns = [field.column for field in fields]
+    pk_column = model_class._meta.pk.column
+    table = model_class._meta.db_table
+
+    written = 0
+    with transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            for start in range(0, len(instances), chunk_size):
+                chunk = instances[start:start + chunk_size]
+                params = []
+                for instance in chunk:
+                    for field in fields:
+                        params.append(
+                            field.get_db_prep_save(field.value_from_object(instance), connection=connection)
+                        )
+                cursor.execute(
+                    _build_upsert_sql(connection, table, columns, pk_column, len(chunk)),
+                    params
+                )
+                written += len(chunk)
+    return written
+
+
+def sync_m2m_to_replica(model_class, pks, using='replica', chunk_size=500):
+    """
+    Sinchronizuoti ManyToMany tarpines lenteles nurodytiems objektams:
+    replica eilutės ištrinamos ir įrašomos iš naujo iš lokalios DB (be signal'ų).
+    """
+    pks = list(pks)
+    if not pks or not model_class._meta.many_to_many:
+        return
+
+    connection = connections[using]
+    qn = connection.ops.quote_name
+    for field in model_class._meta.many_to_many:
+        through = field.remote_field.through
+        source_field = through._meta.get_field(field.m2m_field_name())
+        rows = list(
+            through.objects.using('default').filter(**{f'{source_field.attname}__in': pks})
+        )
+        with transaction.atomic(using=using):
+            with connection.cursor() as cursor:
+                for start in range(0, len(pks), chunk_size):
+                    chunk = pks[start:start + chunk_size]
+                    placeholders = ', '.join(['%s'] * len(chunk))
+                    cursor.execute(
+                        f'DELETE FROM {qn(through._meta.db_table)} '
+                        f'WHERE {qn(source_field.column)} IN ({placeholders})',
+                        chunk
+                    )
+            upsert_instances(through, rows, using=using, chunk_size=chunk_size)
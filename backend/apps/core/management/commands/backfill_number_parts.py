@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from apps.core.numbering import backfill_number_parts
+from apps.invoices.models import SalesInvoice
+from apps.orders.models import Order, OrderCarrier, OrderCost
+
+# pavadinimas -> (modelis, numerio laukas)
+NUMBERED_MODELS = {
+    'orders': (Order, 'order_number'),
+    'carriers': (OrderCarrier, 'expedition_number'),
+    'costs': (OrderCost, 'expedition_number'),
+    'invoices': (SalesInvoice, 'invoice_number'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Užpildo išskaidytus numerius (number_prefix / number_suffix) tarpų paieškai (ir pakeitus prefiksus nustatymuose)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only', action='append', choices=sorted(NUMBERED_MODELS),
+            help='Tik nurodyti įrašų tipai (galima kartoti)'
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Įrašų skaičius vienam paketui')
+
+    def handle(self, *args, **options):
+        chunk_size = max(1, options['chunk_size'])
+        for name in options['only'] or NUMBERED_MODELS:
+            model, number_field = NUMBERED_MODELS[name]
+            updated = backfill_number_parts(model, number_field, chunk_size=chunk_size)
+            self.stdout.write(f'{name}: atnaujinta {updated}')
+
+        self.stdout.write(self.style.SUCCESS('Numeriai išskaidyti'))
@@ -0,0 +1,93 @@
+"""
+Management komanda PDF generavimo greičio palyginimui:
+- cold: kiekvienam PDF paleidžiama nauja Chromium naršyklė (senas elgesys)
+- pooled: naudojamas procesui bendras ChromiumPool (šiltos naršyklės)
+- weasyprint: (pasirinktinai) WeasyPrint fallback
+"""
+
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.shortcuts import render
+from django.test import RequestFactory
+
+from apps.core.pdf_renderer import (
+    get_chromium_pool, render_pdf_chromium_cold, render_pdf_weasyprint, PoolUnavailable
+)
+
+
+def _percentile(values, percent):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _sample_html(rows=150):
+    body_rows = ''.join(
+        f'<tr><td>{i}</td><td>Krovinys {i}</td><td>{i * 12.5:.2f} EUR</td></tr>' for i in range(rows)
+    )
+    return (
+        '<html><head><style>body{font-family:Arial;font-size:11px}'
+        'table{width:100%;border-collapse:collapse}td{border:1px solid #ccc;padding:4px}</style></head>'
+        f'<body><h1>Sąskaita BENCH-001</h1><table>{body_rows}</table></body></html>'
+    )
+
+
+class Command(BaseCommand):
+    help = 'Palyginti PDF generavimo laiką (p50/p95): nauja naršyklė kiekvienam PDF vs ChromiumPool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20, help='Generavimų skaičius kiekvienam būdui')
+        parser.add_argument('--invoice-id', type=int, help='Naudoti tikros pardavimo sąskaitos HTML')
+        parser.add_argument('--weasyprint', action='store_true', help='Įtraukti WeasyPrint matavimą')
+
+    def _invoice_html(self, invoice_id):
+        from apps.invoices.models import SalesInvoice
+        from apps.invoices.views import SalesInvoiceViewSet
+
+        invoice = SalesInvoice.objects.get(pk=invoice_id)
+        request = RequestFactory().get('/')
+        context = SalesInvoiceViewSet()._prepare_invoice_context(invoice, request, lang='lt')
+        return render(request, 'invoices/sales_invoice.html', context).content.decode('utf-8')
+
+    def _measure(self, label, func, iterations):
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            try:
+                func()
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'  {label}: klaida - {e}'))
+                return None
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f'  {label:<10} p50={_percentile(timings, 50):8.1f} ms  '
+            f'p95={_percentile(timings, 95):8.1f} ms  '
+            f'vid.={statistics.mean(timings):8.1f} ms  (n={len(timings)})'
+        )
+        return timings
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        html = self._invoice_html(options['invoice_id']) if options.get('invoice_id') else _sample_html()
+        base_url = 'http://localhost/'
+        self.stdout.write(f'PDF generavimo palyginimas ({iterations} kartų, HTML {len(html)} simbolių)')
+
+        self._measure('cold', lambda: render_pdf_chromium_cold(html, base_url), iterations)
+
+        pool = get_chromium_pool()
+        if pool is None:
+            self.stdout.write(self.style.WARNING('  pooled: ChromiumPool išjungtas (PDF_BROWSER_POOL_ENABLED=False)'))
+        else:
+            try:
+                pool.render(html, base_url)  # apšildymas
+                self._measure('pooled', lambda: pool.render(html, base_url), iterations)
+            except PoolUnavailable as e:
+                self.stdout.write(self.style.ERROR(f'  pooled: pool nepasiekiamas - {e}'))
+            self.stdout.write(f'  pool: {pool.stats()}')
+
+        if options.get('weasyprint'):
+            self._measure('weasyprint', lambda: render_pdf_weasyprint(html, base_url), iterations)
@@ -0,0 +1,77 @@
+"""
+Management komanda replica outbox apdorojimui: nuolatinis procesas (systemd / supervisor) su --loop,
+ne web workeriuose, arba rankinis susikaupusių pakeitimų perkėlimas į nuotolinę DB.
+
+Pavyzdžiai:
+    python manage.py drain_replica_outbox
+    python manage.py drain_replica_outbox --reset-failed
+    python manage.py drain_replica_outbox --loop --interval 2
+"""
+
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from apps.core.models import ReplicaSyncOutbox
+from apps.core.replica_outbox import drain_until_empty, run_drainer_loop
+
+
+class Command(BaseCommand):
+    help = 'Perkelti ReplicaSyncOutbox pakeitimus į nuotolinę DB (replica)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Veikti nuolat: eilė tikrinama kas --interval sekundžių (kitaip - vienas apdorojimas)',
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=None,
+            help='Eilės tikrinimo intervalas sek. su --loop (numatytai REPLICA_OUTBOX_POLL_SECONDS)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Kiek outbox įrašų apdoroti vienu paketu',
+        )
+        parser.add_argument(
+            '--reset-failed',
+            action='store_true',
+            help='Atstatyti bandymų skaičių įrašams, kurie viršijo bandymų limitą',
+        )
+
+    def handle(self, *args, **options):
+        if options.get('reset_failed'):
+            reset = ReplicaSyncOutbox.objects.filter(attempts__gt=0).update(attempts=0, last_error='', next_attempt_at=None)
+            self.stdout.write(f'Atstatyta {reset} įrašų')
+
+        if options.get('loop'):
+            self._run_loop(options.get('interval'), options.get('batch_size'))
+            return
+
+        pending = ReplicaSyncOutbox.objects.count()
+        self.stdout.write(f'Eilėje: {pending} įrašų')
+        result = drain_until_empty(batch_size=options.get('batch_size'))
+
+        style = self.style.ERROR if result['status'] == 'error' else self.style.SUCCESS
+        self.stdout.write(style(
+            f"✓ Apdorota {result['rows']} įrašų ({result['batches']} paketų): "
+            f"{result['saved']} įrašyta, {result['deleted']} ištrinta, {result['failed']} nepavyko"
+        ))
+
+    def _run_loop(self, interval, batch_size):
+        if interval is not None and interval <= 0:
+            raise CommandError('Intervalas turi būti teigiamas (--interval)')
+        stop_event = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write('Gautas sustabdymo signalas – baigiama...')
+            stop_event.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        self.stdout.write('Replica outbox procesas paleistas (Ctrl+C sustabdyti)...')
+        run_drainer_loop(stop_event=stop_event, batch_size=batch_size, poll_seconds=interval)
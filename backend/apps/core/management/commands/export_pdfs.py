@@ -0,0 +1,113 @@
+"""
+Management komanda masiniam PDF eksportui (pvz. mėnesio pabaigos spausdinimui).
+
+Pavyzdžiai:
+    python manage.py export_pdfs invoices --ids 10,11,12 --output /tmp/saskaitos.zip
+    python manage.py export_pdfs invoices --filter issue_date__month=5 --filter issue_date__year=2025 --output /tmp/geguze.pdf
+    python manage.py export_pdfs orders --filter status=finished --output /tmp/uzsakymai.zip
+"""
+
+import time
+from urllib.parse import urlparse
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+
+from apps.core.pdf_batch import get_worker_count, merge_pdfs, stream_zip
+
+
+class Command(BaseCommand):
+    help = 'Eksportuoti daug sąskaitų arba užsakymų sutarčių PDF (ZIP arba vienas PDF) procesų pool\'e'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=['invoices', 'orders'], help='Pardavimo sąskaitos arba užsakymai')
+        parser.add_argument('--ids', help='ID sąrašas, atskirtas kableliais')
+        parser.add_argument(
+            '--filter', action='append', default=[], metavar='LAUKAS=REIKŠMĖ',
+            help='ORM filtras (galima kartoti), pvz. issue_date__year=2025'
+        )
+        parser.add_argument('--output', required=True, help='Failas .zip arba .pdf (sujungtas)')
+        parser.add_argument('--lang', default='lt', choices=['lt', 'en', 'ru'])
+        parser.add_argument('--user', help='Vartotojo vardas (sąskaitoje rodomas išrašęs asmuo)')
+        parser.add_argument('--base-url', help='Absoliutus adresas nuorodoms (numatytasis FRONTEND_BASE_URL)')
+
+    def _build_request(self, options):
+        base_url = options['base_url'] or getattr(settings, 'FRONTEND_BASE_URL', '') or 'http://localhost'
+        parsed = urlparse(base_url)
+        request = RequestFactory().get(
+            '/', HTTP_HOST=parsed.netloc or 'localhost', secure=parsed.scheme == 'https'
+        )
+        if options['user']:
+            try:
+                request.user = get_user_model().objects.get(username=options['user'])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Vartotojas {options['user']} nerastas")
+        else:
+            request.user = AnonymousUser()
+        return request
+
+    def _queryset(self, model, options):
+        queryset = model.objects.all()
+        if options['ids']:
+            try:
+                ids = [int(value) for value in options['ids'].split(',') if value.strip()]
+            except ValueError:
+                raise CommandError('--ids turi būti skaičiai, atskirti kableliais')
+            queryset = queryset.filter(id__in=ids)
+        for item in options['filter']:
+            if '=' not in item:
+                raise CommandError(f'Neteisingas filtras: {item} (reikia LAUKAS=REIKŠMĖ)')
+            field, value = item.split('=', 1)
+            queryset = queryset.filter(**{field: value})
+        return queryset
+
+    def handle(self, *args, **options):
+        output = options['output']
+        if not output.endswith(('.zip', '.pdf')):
+            raise CommandError('--output turi baigtis .zip arba .pdf')
+
+        request = self._build_request(options)
+        if options['kind'] == 'invoices':
+            from apps.invoices.models import SalesInvoice
+            from apps.invoices.views import SalesInvoiceViewSet
+
+            queryset = self._queryset(SalesInvoice, options).order_by('invoice_number', 'id')
+            documents = list(queryset.iterator(chunk_size=50))
+            jobs = SalesInvoiceViewSet()._iter_invoice_pdf_jobs(documents, request, lang=options['lang'])
+        else:
+            from apps.orders.models import Order
+            from apps.orders.views import OrderViewSet
+
+            queryset = self._queryset(Order, options).order_by('order_number', 'id')
+            documents = list(queryset.only('id', 'order_number'))
+            jobs = OrderViewSet()._iter_order_pdf_jobs(documents, request, lang=options['lang'])
+
+        if not documents:
+            self.stdout.write(self.style.WARNING('Nerasta dokumentų'))
+            return
+
+        self.stdout.write(f"Dokumentų: {len(documents)}, procesų: {get_worker_count()}")
+        started = time.perf_counter()
+        errors = []
+
+        if output.endswith('.pdf'):
+            pdf_bytes, errors = merge_pdfs(jobs)
+            if pdf_bytes is None:
+                raise CommandError(f"Nesugeneruotas nė vienas PDF: {'; '.join(errors[:5])}")
+            with open(output, 'wb') as f:
+                f.write(pdf_bytes)
+        else:
+            with open(output, 'wb') as f:
+                for chunk in stream_zip(jobs):
+                    f.write(chunk)
+
+        elapsed = time.perf_counter() - started
+        for error in errors:
+            self.stdout.write(self.style.WARNING(f'  {error}'))
+        self.stdout.write(self.style.SUCCESS(
+            f"Išsaugota: {output} ({len(documents)} dok., {elapsed:.1f}s, "
+            f"{elapsed / len(documents) * 100:.1f}s / 100 dok.)"
+        ))
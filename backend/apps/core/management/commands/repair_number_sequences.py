@@ -0,0 +1,58 @@
+"""
+Numeracijos sekų taisymas pagal esamus numerius (pilnas numerių skenavimas).
+
+Įprastai sekos palaikomos automatiškai (užrakintas padidinimas + signal'ai rankiniams numeriams),
+todėl komanda reikalinga tik po importo, tiesioginio DB redagavimo ar replica atkūrimo.
+
+Pavyzdžiai:
+    python manage.py repair_number_sequences
+    python manage.py repair_number_sequences --invoices --prefix LOG --prefix PVM
+    python manage.py repair_number_sequences --expeditions
+"""
+
+from django.core.management.base import BaseCommand
+
+from apps.invoices.models import InvoicePrefixSequence
+from apps.invoices.utils import synchronize_invoice_sequence
+from apps.orders.models import ExpeditionNumberSequence
+from apps.orders.utils import EXPEDITION_SEQUENCE_FIELDS, synchronize_expedition_sequence
+
+
+class Command(BaseCommand):
+    help = 'Perskaičiuoti sąskaitų (pagal prefiksą) ir ekspedicijų numeracijos sekas pagal didžiausius esamus numerius'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invoices', action='store_true', help='Tik sąskaitų sekos')
+        parser.add_argument('--expeditions', action='store_true', help='Tik ekspedicijų sekos')
+        parser.add_argument(
+            '--prefix', action='append', default=[],
+            help='Sąskaitų prefiksas (galima kartoti; numatytasis - nustatymų prefiksas ir visos esamos sekos)'
+        )
+
+    def handle(self, *args, **options):
+        do_all = not options['invoices'] and not options['expeditions']
+
+        if do_all or options['invoices']:
+            from apps.settings.models import InvoiceSettings
+
+            prefixes = options['prefix'] or [InvoiceSettings.load().invoice_prefix_sales or 'LOG']
+            if not options['prefix']:
+                prefixes += list(InvoicePrefixSequence.objects.values_list('prefix', flat=True))
+            seen = set()
+            for prefix in prefixes:
+                if prefix.upper() in seen:
+                    continue
+                seen.add(prefix.upper())
+                before = InvoicePrefixSequence.objects.filter(prefix=prefix.upper()).values_list(
+                    'last_number', flat=True
+                ).first()
+                after = synchronize_invoice_sequence(prefix)
+                self.stdout.write(f'Sąskaitos {prefix.upper()}: {before} -> {after}')
+
+        if do_all or options['expeditions']:
+            for expedition_type, field in EXPEDITION_SEQUENCE_FIELDS.items():
+                before = ExpeditionNumberSequence.objects.filter(pk=1).values_list(field, flat=True).first()
+                after = synchronize_expedition_sequence(expedition_type)
+                self.stdout.write(f'Ekspedicijos ({expedition_type}): {before} -> {after}')
+
+        self.stdout.write(self.style.SUCCESS('Sekos sutvarkytos'))
@@ -6,15 +6,16 @@ Naudojama pradiniam duomenų kopijavimui arba atkūrimui po nesėkmės.
 from django.core.management.base import BaseCommand
 from django.db import connections
 from apps.core.db_sync import bulk_sync_to_replica
-from apps.orders.models import Order, OrderCarrier, CargoItem, OtherCost
-from apps.invoices.models import SalesInvoice, PurchaseInvoice, SalesInvoiceItem, PurchaseInvoiceItem
+from apps.orders.models import Order, OrderCarrier, CargoItem, OrderCost
+from apps.invoices.models import SalesInvoice, PurchaseInvoice, InvoiceNumberSequence, InvoicePrefixSequence
 from apps.partners.models import Partner, Contact
 from apps.settings.models import (
     CompanyInfo, UserSettings, InvoiceSettings, OrderSettings,
-    PVMRate, InvoiceNumberSequence
+    PVMRate
 )
 from django.contrib.auth import get_user_model
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 User = get_user_model()
@@ -27,17 +28,16 @@ SYNC_MODELS = [
     ('Order', Order),
     ('OrderCarrier', OrderCarrier),
     ('CargoItem', CargoItem),
-    ('OtherCost', OtherCost),
+    ('OrderCost', OrderCost),
     ('SalesInvoice', SalesInvoice),
-    ('SalesInvoiceItem', SalesInvoiceItem),
     ('PurchaseInvoice', PurchaseInvoice),
-    ('PurchaseInvoiceItem', PurchaseInvoiceItem),
     ('CompanyInfo', CompanyInfo),
     ('UserSettings', UserSettings),
     ('InvoiceSettings', InvoiceSettings),
     ('OrderSettings', OrderSettings),
     ('PVMRate', PVMRate),
     ('InvoiceNumberSequence', InvoiceNumberSequence),
+    ('InvoicePrefixSequence', InvoicePrefixSequence),
 ]
 
 
@@ -60,11 +60,18 @@ class Command(BaseCommand):
             action='store_true',
             help='Tik testuoti prisijungimą, nesiųsti duomenų',
         )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=None,
+            help='Eilučių skaičius vienoje upsert užklausoje (numatytai REPLICA_OUTBOX_CHUNK_SIZE)',
+        )
 
     def handle(self, *args, **options):
         model_name = options.get('model')
         clear_first = options.get('clear', False)
         test_only = options.get('test', False)
+        chunk_size = options.get('chunk_size')
 
         # Patikrinti prisijungimą
         self.stdout.write('Patikrinama DB prisijungimai...')
@@ -102,6 +109,7 @@ class Command(BaseCommand):
 
         # Sinchronizuoti visus modelius
         total_synced = 0
+        total_started = time.monotonic()
         
         for model_label, model_class in SYNC_MODELS:
             if model_name and model_label.lower() != model_name.lower():
@@ -118,17 +126,34 @@ class Command(BaseCommand):
                     self.stdout.write(f'  - Nėra duomenų ({model_label})')
                     continue
                 
-                # Sinchronizuoti
-                synced = bulk_sync_to_replica(model_class, queryset)
+                # Sinchronizuoti chunk'ais, rodant progresą
+                def report_progress(synced_so_far, elapsed, count=count):
+                    rate = synced_so_far / elapsed if elapsed else 0
+                    self.stdout.write(
+                        f'  ... {synced_so_far}/{count} ({synced_so_far * 100 // count}%), {rate:.0f} įr./s'
+                    )
+
+                started = time.monotonic()
+                synced = bulk_sync_to_replica(
+                    model_class, queryset, chunk_size=chunk_size, progress_callback=report_progress
+                )
+                elapsed = time.monotonic() - started
                 total_synced += synced
                 
-                self.stdout.write(self.style.SUCCESS(f'  ✓ Sinchronizuota: {synced} įrašų ({model_label})'))
+                rate = synced / elapsed if elapsed else 0
+                style = self.style.SUCCESS if synced == count else self.style.WARNING
+                self.stdout.write(style(
+                    f'  ✓ Sinchronizuota: {synced}/{count} įrašų ({model_label}) per {elapsed:.1f} s, {rate:.0f} įr./s'
+                ))
                 
             except Exception as e:
                 self.stdout.write(self.style.ERROR(f'  ✗ Klaida sinchronizuojant {model_label}: {str(e)}'))
                 logger.error(f"Error syncing {model_label}: {str(e)}", exc_info=True)
 
-        self.stdout.write(self.style.SUCCESS(f'\n✓ Sinchronizacija baigta! Iš viso: {total_synced} įrašų'))
+        total_elapsed = time.monotonic() - total_started
+        self.stdout.write(self.style.SUCCESS(
+            f'\n✓ Sinchronizacija baigta! Iš viso: {total_synced} įrašų per {total_elapsed:.1f} s'
+        ))
 
 
 
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_alter_activitylog_action_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReplicaSyncOutbox',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_label', models.CharField(help_text='Modelio label, pvz. orders.Order', max_length=100, verbose_name='Modelis')),
+                ('object_pk', models.CharField(max_length=64, verbose_name='Objekto ID')),
+                ('operation', models.CharField(choices=[('save', 'Išsaugoti'), ('delete', 'Ištrinti')], default='save', max_length=10, verbose_name='Operacija')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Bandymų skaičius')),
+                ('last_error', models.TextField(blank=True, verbose_name='Paskutinė klaida')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Sukurta')),
+            ],
+            options={
+                'verbose_name': 'Replica sinchronizacijos įrašas',
+                'verbose_name_plural': 'Replica sinchronizacijos eilė',
+                'db_table': 'replica_sync_outbox',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['attempts', 'id'], name='replica_syn_attempt_090d2c_idx'), models.Index(fields=['model_label', 'object_pk'], name='replica_syn_model_l_2f3422_idx')],
+            },
+        ),
+    ]
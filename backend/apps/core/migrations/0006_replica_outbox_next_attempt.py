@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_replicasyncoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='replicasyncoutbox',
+            name='next_attempt_at',
+            field=models.DateTimeField(blank=True, help_text='Po klaidos įrašas atidedamas, kad neužblokuotų eilės', null=True, verbose_name='Kitas bandymas'),
+        ),
+    ]
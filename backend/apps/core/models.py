@@ -196,3 +196,62 @@ class StatusTransitionRule(models.Model):
     
     def __str__(self) -> str:
         return f"{self.get_entity_type_display()} - {self.current_status} → {', '.join(self.allowed_next_statuses)}"
+
+
+class ReplicaSyncOutbox(models.Model):
+    """
+    Replica sinchronizacijos eilė (outbox).
+    Įrašas sukuriamas toje pačioje transakcijoje kaip ir lokalus pakeitimas,
+    o foninis procesas (apps.core.replica_outbox) vėliau perkelia pakeitimus į replica DB.
+    """
+    
+    class Operation(models.TextChoices):
+        SAVE = 'save', _('Išsaugoti')
+        DELETE = 'delete', _('Ištrinti')
+    
+    model_label = models.CharField(
+        max_length=100,
+        verbose_name=_('Modelis'),
+        help_text=_('Modelio label, pvz. orders.Order')
+    )
+    object_pk = models.CharField(
+        max_length=64,
+        verbose_name=_('Objekto ID')
+    )
+    operation = models.CharField(
+        max_length=10,
+        choices=Operation.choices,
+        default=Operation.SAVE,
+        verbose_name=_('Operacija')
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('Bandymų skaičius')
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name=_('Paskutinė klaida')
+    )
+    next_attempt_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_('Kitas bandymas'),
+        help_text=_('Po klaidos įrašas atidedamas, kad neužblokuotų eilės')
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_('Sukurta')
+    )
+    
+    class Meta:
+        db_table = 'replica_sync_outbox'
+        verbose_name = _('Replica sinchronizacijos įrašas')
+        verbose_name_plural = _('Replica sinchronizacijos eilė')
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['attempts', 'id']),
+            models.Index(fields=['model_label', 'object_pk']),
+        ]
+    
+    def __str__(self) -> str:
+        return f"{self.operation} {self.model_label} #{self.object_pk}"
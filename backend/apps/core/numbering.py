@@ -0,0 +1,287 @@
+"""
+Dokumentų numerių (užsakymų, ekspedicijų, išlaidų, sąskaitų) skaidymas į prefiksą ir skaitinę dalį.
+
+Tarpų paieška anksčiau kiekvieną kartą (dashboard, "siūlyti tarpą") nuskaitydavo visus numerius,
+parsindavo juos Python'e ir rikiuodavo. Dabar modelis laiko išskaidytą numerį:
+- number_prefix - nustatymuose sukonfigūruotas prefiksas, jei numeris juo prasideda ('E25' + '000012'),
+  kitaip - tekstas prieš paskutinius skaitmenis; be skirtuko, didžiosiomis ('LOG-0012' -> 'LOG'),
+- number_suffix - skaitinė dalis po prefikso ('LOG-0012' -> 12),
+abu nustatomi save() metu, indeksas (number_prefix, number_suffix).
+Prefiksai imami iš modelio number_prefixes() (OrderSettings, ekspedicijų ir sąskaitų nustatymai)
+ir laikomi proceso atmintyje, kol nepasikeičia NUMBER_PREFIX_SOURCES modelių versijos žymės.
+Esamo įrašo save() numerį perskaido tik jam pasikeitus (update_fields arba post_init reikšmė),
+todėl save(update_fields=['payment_status']) nei prefiksų, nei nustatymų neskaito.
+
+Tarpai randami viena SQL užklausa: LEAD(number_suffix) per prefikso eilutes, imamos tik eilutės,
+po kurių kitas numeris didesnis daugiau nei 1 (indekso tvarka, grąžinama tik max_gaps eilučių).
+Esamiems įrašams - manage.py backfill_number_parts (ir pakeitus prefiksą nustatymuose).
+Masiniai keitimai (update(), bulk_create(), bulk_update()) perskaičiuojami NumberPartsQuerySet.
+"""
+
+import logging
+import re
+from typing import Iterable, Optional, Tuple
+
+from django.db import DatabaseError, models
+from django.db.models import F, Max
+from django.db.models.functions import Lead
+from django.db.models.expressions import Window
+
+NUMBER_PREFIX_MAX_LENGTH = 32
+# Skirtukai tarp prefikso ir skaitmenų (LOG-0012, E/00012, 2025-001)
+NUMBER_SEPARATORS = ' -/_.#'
+# PositiveBigIntegerField riba - ilgesni skaitmenų blokai nelaikomi numeriu
+_MAX_SUFFIX_DIGITS = 18
+_NUMBER_RE = re.compile(r'^(.*?)(\d+)$', re.S)
+# post_init metu numerio laukas buvo atidėtas (only() / defer()) - pradinė reikšmė nežinoma
+_UNKNOWN = object()
+
+logger = logging.getLogger(__name__)
+
+# model_label -> (NUMBER_PREFIX_SOURCES versijų žymės, prefiksai)
+_prefixes_cache = {}
+
+
+def normalize_number_prefix(prefix) -> str:
+    """Prefiksas palyginimui: be tarpų ir skirtukų gale, didžiosiomis raidėmis"""
+    return str(prefix or '').strip().rstrip(NUMBER_SEPARATORS).strip().upper()[:NUMBER_PREFIX_MAX_LENGTH]
+
+
+def _numeric_part(digits: str) -> Optional[int]:
+    if not digits.isascii() or not digits.isdigit() or len(digits.lstrip('0')) > _MAX_SUFFIX_DIGITS:
+        return None
+    return int(digits)
+
+
+def split_document_number(number, prefixes: Iterable[str] = ()) -> Tuple[str, Optional[int]]:
+    """
+    Numeris -> (prefiksas, skaitinė dalis). None - jei numeris nesibaigia skaitmenimis.
+
+    Pirmiausia tikrinami sukonfigūruoti prefiksai (ilgiausias pirmas): jei numeris prasideda prefiksu,
+    o po jo (ir skirtuko) - tik skaitmenys, skaidoma pagal jį ('E25000012' su 'E25' -> ('E25', 12)).
+    Kitaip skaitinė dalis - visi skaitmenys numerio gale ('E25000012' -> ('E', 25000012)).
+    """
+    value = str(number or '').strip()
+    for prefix in sorted({str(prefix).strip() for prefix in prefixes if prefix and str(prefix).strip()},
+                         key=len, reverse=True):
+        if value[:len(prefix)].upper() != prefix.upper():
+            continue
+        suffix = _numeric_part(value[len(prefix):].lstrip(NUMBER_SEPARATORS))
+        if suffix is not None:
+            return normalize_number_prefix(prefix), suffix
+
+    match = _NUMBER_RE.match(value)
+    if not match:
+        return normalize_number_prefix(value), None
+    return normalize_number_prefix(match.group(1)), _numeric_part(match.group(2))
+
+
+def _load_number_prefixes(model) -> list:
+    getter = getattr(model, 'number_prefixes', None)
+    return [prefix for prefix in getter() if prefix] if getter else []
+
+
+def _prefix_sources_stamp(model):
+    from django.apps import apps
+    from apps.settings.cache import get_version_stamp
+
+    return tuple(get_version_stamp(apps.get_model(label)) for label in model.NUMBER_PREFIX_SOURCES)
+
+
+def configured_number_prefixes(model) -> list:
+    """
+    Modelio numerių prefiksai iš nustatymų (model.number_prefixes(); nėra - tuščias sąrašas).
+    Jei modelis nurodo NUMBER_PREFIX_SOURCES, sąrašas perkraunamas tik pasikeitus jų versijos žymėms.
+    """
+    from apps.settings.cache import is_settings_cache_enabled
+
+    if not getattr(model, 'NUMBER_PREFIX_SOURCES', None) or not is_settings_cache_enabled():
+        return _load_number_prefixes(model)
+    label = model._meta.label_lower
+    try:
+        stamp = _prefix_sources_stamp(model)
+    except DatabaseError as e:
+        logger.warning(f"Number prefix cache unavailable, loading {label} prefixes from DB: {e}")
+        return _load_number_prefixes(model)
+
+    cached = _prefixes_cache.get(label)
+    if cached is not None and cached[0] == stamp:
+        return list(cached[1])
+    prefixes = _load_number_prefixes(model)
+    _prefixes_cache[label] = (stamp, tuple(prefixes))
+    return prefixes
+
+
+def remember_number(sender, instance, **kwargs):
+    """post_init: įsiminti numerį, kad save() žinotų, ar jį reikia perskaidyti"""
+    instance._initial_document_number = instance.__dict__.get(sender.NUMBER_FIELD, _UNKNOWN)
+
+
+def register_number_parts_signals():
+    """Registruoti remember_number visiems modeliams su NUMBER_FIELD"""
+    from django.apps import apps
+    from django.db.models.signals import post_init
+
+    for model in apps.get_models():
+        if getattr(model, 'NUMBER_FIELD', None):
+            post_init.connect(
+                remember_number, sender=model, dispatch_uid=f'number_parts_{model._meta.label_lower}', weak=False
+            )
+
+
+def _number_changed(instance, number_field: str, update_fields) -> bool:
+    if instance._state.adding:
+        return True
+    if update_fields is not None:
+        return number_field in update_fields
+    if number_field not in instance.__dict__:
+        # Atidėtas ir nepaliestas laukas - numeris nekeistas
+        return False
+    initial = getattr(instance, '_initial_document_number', _UNKNOWN)
+    return initial is _UNKNOWN or instance.__dict__[number_field] != initial
+
+
+def set_number_parts(instance, number_field: str, save_kwargs: dict = None, prefixes: Iterable[str] = None) -> None:
+    """
+    Nustatyti instance.number_prefix / number_suffix pagal numerio lauką (kviečiama save() pradžioje).
+    Jei save() kviečiamas su update_fields ir jame yra numerio laukas - pridedami ir išskaidyti laukai.
+    Iš save() (save_kwargs nurodytas) esamam įrašui numeris perskaidomas tik jam pasikeitus.
+    """
+    update_fields = save_kwargs.get('update_fields') if save_kwargs is not None else None
+    if save_kwargs is not None and not _number_changed(instance, number_field, update_fields):
+        return
+    if prefixes is None:
+        prefixes = configured_number_prefixes(type(instance))
+    number = getattr(instance, number_field)
+    instance.number_prefix, instance.number_suffix = split_document_number(number, prefixes)
+    instance._initial_document_number = number
+    if update_fields is not None and number_field in update_fields:
+        save_kwargs['update_fields'] = set(update_fields) | {'number_prefix', 'number_suffix'}
+
+
+def backfill_number_parts(model, number_field: str, chunk_size: int = 1000, prefixes: Iterable[str] = None) -> int:
+    """
+    Užpildyti / perskaičiuoti number_prefix / number_suffix esamiems įrašams.
+
+    Returns:
+        Atnaujintų įrašų skaičius
+    """
+    prefixes = configured_number_prefixes(model) if prefixes is None else list(prefixes)
+    changed = []
+    updated = 0
+    rows = model.objects.order_by('pk').values_list('pk', number_field, 'number_prefix', 'number_suffix')
+    for pk, number, prefix, suffix in rows.iterator(chunk_size=chunk_size):
+        parts = split_document_number(number, prefixes)
+        if parts != (prefix, suffix):
+            changed.append(model(pk=pk, number_prefix=parts[0], number_suffix=parts[1]))
+        if len(changed) >= chunk_size:
+            model.objects.bulk_update(changed, ['number_prefix', 'number_suffix'])
+            updated += len(changed)
+            changed = []
+    if changed:
+        model.objects.bulk_update(changed, ['number_prefix', 'number_suffix'])
+        updated += len(changed)
+    return updated
+
+
+class NumberPartsQuerySet(models.QuerySet):
+    """
+    QuerySet modeliams su number_prefix / number_suffix (model.NUMBER_FIELD - numerio laukas):
+    update(), bulk_create() ir bulk_update() nekviečia save(), todėl išskaidyti laukai nustatomi čia.
+    """
+
+    def _number_field(self) -> str:
+        return self.model.NUMBER_FIELD
+
+    def update(self, **kwargs):
+        number_field = self._number_field()
+        if number_field not in kwargs or 'number_prefix' in kwargs:
+            return super().update(**kwargs)
+        value = kwargs[number_field]
+        if hasattr(value, 'resolve_expression'):
+            # Numeris iš išraiškos (F(), Concat...) - reikšmė žinoma tik DB, perskaičiuojama po UPDATE
+            pks = list(self.values_list('pk', flat=True))
+            updated = super().update(**kwargs)
+            backfill_number_parts_for(self.model, pks)
+            return updated
+        kwargs['number_prefix'], kwargs['number_suffix'] = split_document_number(
+            value, configured_number_prefixes(self.model)
+        )
+        return super().update(**kwargs)
+
+    update.alters_data = True
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        prefixes = configured_number_prefixes(self.model)
+        for obj in objs:
+            set_number_parts(obj, self._number_field(), prefixes=prefixes)
+        return super().bulk_create(objs, *args, **kwargs)
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        number_field = self._number_field()
+        if number_field in fields:
+            objs = list(objs)
+            prefixes = configured_number_prefixes(self.model)
+            for obj in objs:
+                set_number_parts(obj, number_field, prefixes=prefixes)
+            fields = list(fields) + [field for field in ('number_prefix', 'number_suffix') if field not in fields]
+        return super().bulk_update(objs, fields, *args, **kwargs)
+
+
+def backfill_number_parts_for(model, pks: Iterable[int]) -> int:
+    """Perskaičiuoti išskaidytus numerius nurodytiems įrašams"""
+    number_field = model.NUMBER_FIELD
+    prefixes = configured_number_prefixes(model)
+    changed = []
+    for pk, number in model._base_manager.filter(pk__in=list(pks)).values_list('pk', number_field):
+        prefix, suffix = split_document_number(number, prefixes)
+        changed.append(model(pk=pk, number_prefix=prefix, number_suffix=suffix))
+    if changed:
+        model._base_manager.bulk_update(changed, ['number_prefix', 'number_suffix'], batch_size=500)
+    return len(changed)
+
+
+def find_number_gaps(queryset, prefix: str, max_gaps: int = 5, expand_small: bool = False) -> list:
+    """
+    Tarpai numeracijoje: [(start_gap, end_gap), ...] didėjimo tvarka.
+
+    Args:
+        queryset: Įrašai su number_prefix / number_suffix (pvz. tik tam tikro tipo ekspedicijos)
+        prefix: Numerio prefiksas (normalizuojamas kaip ir saugant)
+        max_gaps: Maksimalus tarpų skaičius
+        expand_small: Mažus tarpus (iki 11 numerių) grąžinti po vieną numerį (start == end)
+    """
+    if max_gaps <= 0:
+        return []
+
+    rows = (
+        queryset.filter(number_prefix=normalize_number_prefix(prefix), number_suffix__isnull=False)
+        .annotate(next_suffix=Window(Lead('number_suffix'), order_by=F('number_suffix').asc()))
+        .filter(next_suffix__gt=F('number_suffix') + 1)
+        .order_by('number_suffix')
+        .values_list('number_suffix', 'next_suffix')[:max_gaps]
+    )
+
+    gaps = []
+    for current, next_num in rows:
+        gap_start = current + 1
+        gap_end = next_num - 1
+        if expand_small and gap_end - gap_start <= 10:
+            for gap_num in range(gap_start, gap_end + 1):
+                gaps.append((gap_num, gap_num))
+                if len(gaps) >= max_gaps:
+                    break
+        else:
+            gaps.append((gap_start, gap_end))
+        if len(gaps) >= max_gaps:
+            break
+    return gaps[:max_gaps]
+
+
+def max_number_suffix(queryset, prefix: str) -> int:
+    """Didžiausia prefikso skaitinė dalis (0, jei numerių nėra) - indekso (prefix, suffix) paieška"""
+    result = queryset.filter(number_prefix=normalize_number_prefix(prefix)).aggregate(
+        max_suffix=Max('number_suffix')
+    )['max_suffix']
+    return result or 0
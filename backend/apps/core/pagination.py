@@ -0,0 +1,218 @@
+"""
+Puslapiavimas su pasirenkamu keyset (cursor) režimu.
+
+PageNumberPagination kiekvienam puslapiui vykdo COUNT(*) per visą filtruotą JOIN ir LIMIT/OFFSET -
+kuo toliau puslapis, tuo lėčiau (DB turi praskaityti visas ankstesnes eilutes).
+
+Keyset režimas (?pagination=cursor arba ?cursor=...):
+- puslapis pradedamas nuo paskutinės matytos eilutės rikiavimo reikšmių (WHERE (f1, ..., id) < (...)),
+  todėl kiekvienas puslapis - indekso intervalo skenavimas, nepriklausomai nuo gylio,
+- rikiavimas imamas iš queryset (OrderingFilter / viewset.ordering), pabaigoje visada pridedamas pk,
+- COUNT nevykdomas; ?with_count=1 - ribotas skaičiavimas (iki count_limit eilučių, count_is_exact),
+- atsakymas: {next, previous, results[, count, count_is_exact]}.
+
+Be parametrų elgesys nesikeičia (page / page_size / count).
+"""
+
+import base64
+import datetime
+import decimal
+import json
+import uuid
+from collections import OrderedDict
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+TRUE_VALUES = ('1', 'true', 'yes')
+
+
+def _encode_value(value):
+    # DjangoJSONEncoder nukerpa mikrosekundes - keyset reikšmė turi būti tiksli
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    return value
+
+
+class OptionalCursorPagination(PageNumberPagination):
+    """PageNumberPagination + keyset režimas pagal užklausos parametrą (žr. modulio aprašymą)"""
+    mode_query_param = 'pagination'
+    cursor_query_param = 'cursor'
+    count_query_param = 'with_count'
+    count_limit = 10000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self._is_cursor_mode(request)
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+        return self._paginate_keyset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if not getattr(self, 'cursor_mode', False):
+            return super().get_paginated_response(data)
+        payload = OrderedDict()
+        if self.count is not None:
+            payload['count'] = self.count
+            payload['count_is_exact'] = self.count_is_exact
+        payload['next'] = self.get_next_link()
+        payload['previous'] = self.get_previous_link()
+        payload['results'] = data
+        return Response(payload)
+
+    def get_next_link(self):
+        if not getattr(self, 'cursor_mode', False):
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        return self._cursor_link(self.page_rows[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not getattr(self, 'cursor_mode', False):
+            return super().get_previous_link()
+        if not self.has_previous:
+            return None
+        return self._cursor_link(self.page_rows[0], reverse=True)
+
+    def _is_cursor_mode(self, request):
+        params = request.query_params
+        return params.get(self.mode_query_param) == 'cursor' or bool(params.get(self.cursor_query_param))
+
+    # --- keyset ---
+
+    def _paginate_keyset(self, queryset, request, view):
+        self.request = request
+        self.display_page_controls = False
+        page_size = self.get_page_size(request)
+        if not page_size:
+            page_size = self.page_size or 20
+
+        self.ordering = self._get_keyset_ordering(queryset, view)
+        position, reverse = self._decode_cursor(request.query_params.get(self.cursor_query_param))
+
+        self.count = self.count_is_exact = None
+        if request.query_params.get(self.count_query_param, '').lower() in TRUE_VALUES:
+            # Ribotas COUNT: SELECT COUNT(*) FROM (SELECT ... LIMIT n+1)
+            count = queryset.order_by()[:self.count_limit + 1].count()
+            self.count = min(count, self.count_limit)
+            self.count_is_exact = count <= self.count_limit
+
+        if position is not None:
+            queryset = queryset.filter(self._keyset_q(position, reverse))
+        queryset = queryset.order_by(*self._order_by(reverse))
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.page_rows = rows
+        return rows
+
+    def _get_keyset_ordering(self, queryset, view):
+        """[(model_field, descending), ...] + pk (unikalumui). Leidžiami tik paties modelio laukai."""
+        query = queryset.query
+        ordering = list(query.order_by)
+        if not ordering and query.default_ordering:
+            ordering = list(query.get_meta().ordering)
+        if not ordering:
+            ordering = list(getattr(view, 'ordering', None) or [])
+
+        meta = queryset.model._meta
+        pk_name = meta.pk.name
+        keys = []
+        for item in ordering:
+            if not isinstance(item, str) or '__' in item or item.lstrip('-') == '?':
+                raise ValidationError({self.cursor_query_param: f'Keyset puslapiavimas nepalaiko rikiavimo: {item}'})
+            descending = item.startswith('-')
+            name = item.lstrip('-')
+            if name == 'pk':
+                name = pk_name
+            try:
+                field = meta.get_field(name)
+            except FieldDoesNotExist:
+                raise ValidationError({self.cursor_query_param: f'Keyset puslapiavimas nepalaiko rikiavimo: {item}'})
+            if not field.concrete or field.many_to_many or field.one_to_many:
+                raise ValidationError({self.cursor_query_param: f'Keyset puslapiavimas nepalaiko rikiavimo: {item}'})
+            if any(key[0].name == field.name for key in keys):
+                continue
+            keys.append((field, descending))
+            if field.primary_key or (field.unique and not field.null):
+                # Unikalus ne-NULL laukas jau vienareikšmiškai nustato eilę
+                return keys
+        # pk tos pačios krypties kaip pirmas laukas - (laukas, id) indeksas skenuojamas viena kryptimi
+        keys.append((meta.pk, keys[0][1] if keys else True))
+        return keys
+
+    def _order_by(self, reverse):
+        order_by = []
+        for field, descending in self.ordering:
+            # NULL reikšmės rikiavimo pabaigoje (pirmyn), todėl einant atgal - pradžioje
+            nulls = {}
+            if field.null:
+                nulls = {'nulls_first': True} if reverse else {'nulls_last': True}
+            expression = F(field.attname)
+            order_by.append(expression.desc(**nulls) if descending != reverse else expression.asc(**nulls))
+        return order_by
+
+    def _keyset_q(self, position, reverse):
+        """
+        Eilutės po (reverse=False) arba prieš (reverse=True) poziciją:
+        OR per i: (f1 = v1 AND ... AND f(i-1) = v(i-1) AND f(i) už v(i)). NULL - rikiavimo pabaigoje.
+        """
+        condition = Q()
+        equal = Q()
+        for (field, descending), value in zip(self.ordering, position):
+            name = field.attname
+            if value is None:
+                # NULL pozicija: pirmyn - tik kiti NULL, atgal - visi ne-NULL
+                strict = None if not reverse else Q(**{f'{name}__isnull': False})
+                tie = Q(**{f'{name}__isnull': True})
+            else:
+                lookup = 'lt' if descending != reverse else 'gt'
+                strict = Q(**{f'{name}__{lookup}': value})
+                if field.null and not reverse:
+                    strict |= Q(**{f'{name}__isnull': True})
+                tie = Q(**{name: value})
+            if strict is not None:
+                condition |= equal & strict
+            equal &= tie
+        if not condition:
+            # Pozicija be tęsinio (pvz. visi laukai NULL ir pk) - tuščias rezultatas
+            return Q(pk__in=[])
+        return condition
+
+    def _cursor_link(self, row, reverse):
+        position = [_encode_value(getattr(row, field.attname)) for field, _ in self.ordering]
+        payload = json.dumps({'p': position, 'r': int(reverse)}, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def _decode_cursor(self, cursor):
+        if not cursor:
+            return None, False
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')).decode('utf-8'))
+            values = payload['p']
+            if len(values) != len(self.ordering):
+                raise ValueError('rikiavimas pasikeitė')
+            position = [
+                None if value is None else field.to_python(value)
+                for (field, _), value in zip(self.ordering, values)
+            ]
+            return position, bool(payload.get('r'))
+        except Exception as e:  # bet kokia iškraipyta reikšmė (base64, JSON, to_python)
+            raise NotFound(f'Neteisingas cursor: {e}')
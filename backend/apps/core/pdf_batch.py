@@ -0,0 +1,276 @@
+"""
+Masinis PDF eksportas (sąskaitos, užsakymų sutartys).
+
+HTML ruošiamas pagrindiniame procese (reikia DB ir request - _prepare_invoice_context /
+_prepare_order_context), o PDF generuojami atskirų procesų pool'e (CPU darbas, GIL netrukdo).
+Kiekvienas darbuotojas naudoja bendrą PDF cache, todėl jau generuoti dokumentai grąžinami iškart.
+
+Rezultatas:
+- ZIP - srautu, kiekvienas PDF įrašomas vos tik sugeneruotas,
+- vienas sujungtas PDF - pradinių dokumentų tvarka.
+
+Pool'as yra kiekviename web procese, todėl jo dydis ribojamas PDF_BATCH_WORKERS (numatytai 2).
+Jei pool'as nulūžta (BrokenProcessPool - pvz. darbuotoją nutraukė OOM), likę dokumentai
+generuojami nuosekliai šiame procese - ZIP nenutrūksta ir dokumentai nepraleidžiami.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import zipfile
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Iterable, Iterator, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PdfJob = namedtuple('PdfJob', 'index filename html base_url tag engine media_type')
+PdfResult = namedtuple('PdfResult', 'index filename pdf_bytes error')
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_pid: Optional[int] = None
+_executor_lock = threading.Lock()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _cpu_count() -> int:
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except AttributeError:  # pragma: no cover - ne Linux
+        return max(1, os.cpu_count() or 1)
+
+
+def get_worker_count() -> int:
+    configured = _setting('PDF_BATCH_WORKERS', 2)
+    if configured:
+        return max(1, min(configured, _cpu_count()))
+    return _cpu_count()
+
+
+def _init_worker():
+    """Darbuotojo proceso paruošimas: be foninių gijų, po vieną Chromium naršyklę procese"""
+    os.environ['DISABLE_MAIL_SYNC_SCHEDULER'] = '1'
+    os.environ['PDF_BROWSER_POOL_SIZE'] = '1'
+    import django
+    django.setup()
+
+
+def _render_job(job: PdfJob) -> PdfResult:
+    from apps.core.pdf_cache import get_or_render_pdf
+
+    try:
+        pdf_bytes = get_or_render_pdf(
+            job.html, job.base_url, tag=job.tag, engine=job.engine, media_type=job.media_type
+        )
+        return PdfResult(job.index, job.filename, pdf_bytes, None)
+    except Exception as e:
+        return PdfResult(job.index, job.filename, None, f"{type(e).__name__}: {e}")
+
+
+def get_batch_executor() -> ProcessPoolExecutor:
+    """Procesui bendras pool'as (spawn - be užrakintų gijų ir DB jungčių kopijų po fork'o)"""
+    global _executor, _executor_pid
+
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ProcessPoolExecutor(
+                max_workers=get_worker_count(),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+            )
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is not None and _executor_pid == os.getpid():
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def render_jobs(jobs: Iterable[PdfJob]) -> Iterator[PdfResult]:
+    """
+    Generuoti PDF lygiagrečiai ir grąžinti rezultatus baigimo tvarka.
+
+    jobs gali turėti ir PdfResult (pvz. nepavyko paruošti HTML) - jie grąžinami kaip yra.
+
+    Darbai imami iš jobs generatoriaus tingiai (ne daugiau kaip 2x darbuotojų skaičius vienu metu),
+    todėl HTML ruošimas pagrindiniame procese vyksta kartu su PDF generavimu.
+
+    Nulūžus pool'ui, nebaigti ir likę darbai generuojami nuosekliai (_render_job šiame procese).
+    """
+    executor = get_batch_executor()
+    max_in_flight = get_worker_count() * 2
+    jobs = iter(jobs)
+    pending = {}
+    exhausted = False
+
+    try:
+        while True:
+            if executor is None:
+                for job in jobs:
+                    yield job if isinstance(job, PdfResult) else _render_job(job)
+                return
+
+            while not exhausted and len(pending) < max_in_flight:
+                job = next(jobs, None)
+                if job is None:
+                    exhausted = True
+                    break
+                if isinstance(job, PdfResult):
+                    yield job
+                    continue
+                pending[executor.submit(_render_job, job)] = job
+            if not pending:
+                return
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            broken = []
+            for future in done:
+                job = pending.pop(future)
+                try:
+                    yield future.result()
+                except BrokenProcessPool:
+                    broken.append(job)
+                except Exception as e:
+                    yield PdfResult(job.index, job.filename, None, f"{type(e).__name__}: {e}")
+
+            if broken:
+                unfinished = sorted(broken + list(pending.values()), key=lambda item: item.index)
+                logger.error(
+                    f"Batch PDF: process pool broke, rendering {len(unfinished)} unfinished "
+                    f"and remaining documents serially"
+                )
+                pending = {}
+                _reset_executor()
+                executor = None
+                for job in unfinished:
+                    yield _render_job(job)
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+class _ZipStream:
+    """Tik rašomas failo objektas zipfile'ui - įrašyti baitai atiduodami srautu"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def pop(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _unique_name(filename: str, used: set) -> str:
+    name, ext = os.path.splitext(filename)
+    candidate = filename
+    counter = 2
+    while candidate in used:
+        candidate = f'{name}_{counter}{ext}'
+        counter += 1
+    used.add(candidate)
+    return candidate
+
+
+def stream_zip(jobs: Iterable[PdfJob]) -> Iterator[bytes]:
+    """ZIP srautas: kiekvienas PDF įrašomas, kai tik sugeneruojamas. Klaidos - _klaidos.txt faile."""
+    stream = _ZipStream()
+    used_names = set()
+    errors = []
+    # PDF jau suspausti - ZIP_STORED netaiso dydžio, bet taupo CPU
+    with zipfile.ZipFile(stream, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for result in render_jobs(jobs):
+            if result.error:
+                errors.append(f'{result.filename}: {result.error}')
+                logger.warning(f"Batch PDF: {result.filename} failed: {result.error}")
+                continue
+            archive.writestr(_unique_name(result.filename, used_names), result.pdf_bytes)
+            yield stream.pop()
+        if errors:
+            archive.writestr('_klaidos.txt', '\n'.join(errors))
+    yield stream.pop()
+
+
+def merge_pdfs(jobs: Iterable[PdfJob]):
+    """
+    Sujungti visus PDF į vieną (pradinių dokumentų tvarka).
+
+    Returns:
+        (pdf_bytes, errors) - pdf_bytes None, jei nesugeneruotas nė vienas PDF;
+        errors: sąrašas 'failas: klaida'
+    """
+    from PyPDF2 import PdfWriter
+
+    results = {}
+    errors = []
+    for result in render_jobs(jobs):
+        if result.error:
+            errors.append(f'{result.filename}: {result.error}')
+            logger.warning(f"Batch PDF: {result.filename} failed: {result.error}")
+            continue
+        results[result.index] = result.pdf_bytes
+
+    if not results:
+        return None, errors
+
+    writer = PdfWriter()
+    for index in sorted(results):
+        writer.append(BytesIO(results[index]))
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue(), errors
+
+
+def iter_by_ids(queryset, ids, chunk_size: int = 50):
+    """
+    Objektai iš anksto nustatytų ID tvarka, užkraunami dalimis (in_bulk).
+    ID sąrašas fiksuojamas prieš StreamingHttpResponse - srauto metu nelaikomas atviras DB kursorius.
+    """
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        objects = queryset.in_bulk(chunk)
+        for object_id in chunk:
+            if object_id in objects:
+                yield objects[object_id]
+
+
+def batch_pdf_response(jobs: Iterable[PdfJob], output_format: str, filename: str):
+    """HTTP atsakymas: ZIP srautas arba vienas sujungtas PDF"""
+    from django.http import HttpResponse, StreamingHttpResponse
+
+    if output_format == 'pdf':
+        pdf_bytes, errors = merge_pdfs(jobs)
+        if pdf_bytes is None:
+            return HttpResponse(f"Klaida generuojant PDF: {'; '.join(errors[:5]) or 'nėra dokumentų'}", status=500)
+        response = HttpResponse(pdf_bytes, content_type='application/pdf')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.pdf"'
+        response['X-Batch-Errors'] = str(len(errors))
+        return response
+
+    response = StreamingHttpResponse(stream_zip(jobs), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.zip"'
+    return response
@@ -0,0 +1,322 @@
+"""
+Turiniu adresuojamas PDF cache (užsakymai, vežėjų sutartys, sąskaitos).
+
+Raktas = sha256(sugeneruotas HTML + renderer versija + base_url), todėl:
+- pakartotinis atsisiuntimas ar peržiūra -> atsisiuntimas -> el. laiškas nebegeneruoja PDF iš naujo,
+- pasikeitus duomenims pasikeičia HTML, taigi ir raktas - pasenęs PDF niekada negrąžinamas.
+
+Failai saugomi MEDIA_ROOT/pdf_cache/<objektas>/<raktas>.pdf. Senesni objekto failai
+pašalinami per post_save/post_delete ir bulk_changed (apps.core.bulk_changes) signal'us, o bendras dydis ribojamas LRU principu
+(failo mtime atnaujinamas kiekvieno pataikymo metu).
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+from django.db.models.signals import post_save, post_delete
+
+from apps.core.pdf_renderer import render_html_to_pdf, render_html_to_pdf_with_renderer
+
+logger = logging.getLogger(__name__)
+
+# Padidinti, kai pasikeičia PDF generavimo logika (CSS, pool nustatymai ir pan.)
+PDF_CACHE_VERSION = '1'
+
+_renderer_version: Optional[str] = None
+_evict_lock = threading.Lock()
+_writes_since_evict = 0
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def is_pdf_cache_enabled() -> bool:
+    return _setting('PDF_CACHE_ENABLED', True)
+
+
+def get_cache_root() -> Path:
+    return Path(_setting('PDF_CACHE_DIR', None) or os.path.join(settings.MEDIA_ROOT, 'pdf_cache'))
+
+
+def _package_version(name: str) -> str:
+    try:
+        from importlib.metadata import version
+        return version(name)
+    except Exception:
+        return '-'
+
+
+def get_renderer_version() -> str:
+    """Renderer versija - įeina į cache raktą, kad atnaujinus bibliotekas PDF būtų sugeneruoti iš naujo"""
+    global _renderer_version
+    if _renderer_version is None:
+        _renderer_version = '|'.join([
+            f'v{PDF_CACHE_VERSION}',
+            f"playwright={_package_version('playwright')}",
+            f"weasyprint={_package_version('weasyprint')}",
+            f"xhtml2pdf={_package_version('xhtml2pdf')}",
+        ])
+    return _renderer_version
+
+
+def cache_tag(model_name: str, pk) -> str:
+    return f'{model_name}_{pk}'
+
+
+def cache_key(html_string: str, base_url: Optional[str], engine: str, media_type: str) -> str:
+    digest = hashlib.sha256()
+    for part in (get_renderer_version(), engine, media_type, base_url or ''):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    digest.update(html_string.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _read_cached(path: Path) -> Optional[bytes]:
+    try:
+        with open(path, 'rb') as f:
+            pdf_bytes = f.read()
+    except (FileNotFoundError, OSError):
+        return None
+    if not pdf_bytes.startswith(b'%PDF'):
+        return None
+    try:
+        # LRU - pataikymas atnaujina mtime
+        os.utime(path, None)
+    except OSError:
+        pass
+    return pdf_bytes
+
+
+def _write_cached(path: Path, pdf_bytes: bytes):
+    """Atominis įrašymas (tmp failas + os.replace), kad lygiagretūs workeriai nematytų pusinio failo"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(pdf_bytes)
+    os.replace(tmp_path, path)
+
+
+def evict_to_size(max_bytes: Optional[int] = None) -> dict:
+    """
+    Pašalinti seniausiai naudotus failus, kol bendras cache dydis <= 90% max_bytes.
+
+    Returns:
+        Dict su 'files', 'bytes', 'removed', 'removed_bytes'
+    """
+    max_bytes = max_bytes if max_bytes is not None else _setting('PDF_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+    root = get_cache_root()
+    entries = []
+    total = 0
+    if root.exists():
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                if not filename.endswith('.pdf'):
+                    continue
+                file_path = os.path.join(dirpath, filename)
+                try:
+                    stat = os.stat(file_path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, file_path))
+                total += stat.st_size
+
+    result = {'files': len(entries), 'bytes': total, 'removed': 0, 'removed_bytes': 0}
+    if total <= max_bytes:
+        return result
+
+    target = int(max_bytes * 0.9)
+    entries.sort()
+    for _, size, file_path in entries:
+        if total <= target:
+            break
+        try:
+            os.remove(file_path)
+        except OSError:
+            continue
+        total -= size
+        result['removed'] += 1
+        result['removed_bytes'] += size
+        parent = os.path.dirname(file_path)
+        try:
+            os.rmdir(parent)
+        except OSError:
+            pass
+
+    result['bytes'] = total
+    result['files'] -= result['removed']
+    logger.info(
+        f"PDF cache: evicted {result['removed']} files ({result['removed_bytes'] // 1024} KB), "
+        f"{total // 1024} KB left"
+    )
+    return result
+
+
+def _maybe_evict():
+    """Dydžio patikra ne po kiekvieno įrašymo - pilnas katalogo perėjimas kas PDF_CACHE_EVICT_EVERY įrašų"""
+    global _writes_since_evict
+    with _evict_lock:
+        _writes_since_evict += 1
+        if _writes_since_evict < _setting('PDF_CACHE_EVICT_EVERY', 20):
+            return
+        _writes_since_evict = 0
+    try:
+        evict_to_size()
+    except Exception as e:
+        logger.warning(f"PDF cache eviction failed: {e}")
+
+
+def get_or_render_pdf(
+    html_string: str,
+    base_url: Optional[str],
+    tag: str,
+    engine: str = 'chromium',
+    media_type: str = 'screen',
+) -> bytes:
+    """
+    Grąžinti PDF iš cache arba sugeneruoti ir išsaugoti.
+
+    Chromium PDF, sugeneruotas fallback'u (pool užimtas ar perkraunamas), nesaugomas -
+    kitas užklausimas turi gauti tą patį rezultatą kaip ir įprastai.
+
+    Raises:
+        PdfRenderError: jei nė vienas generavimo būdas nepavyko
+    """
+    if not is_pdf_cache_enabled():
+        return render_html_to_pdf(html_string, base_url, engine=engine, media_type=media_type)
+
+    path = get_cache_root() / tag / f'{cache_key(html_string, base_url, engine, media_type)}.pdf'
+    pdf_bytes = _read_cached(path)
+    if pdf_bytes is not None:
+        logger.debug(f"PDF cache hit: {tag}")
+        return pdf_bytes
+
+    pdf_bytes, renderer = render_html_to_pdf_with_renderer(
+        html_string, base_url, engine=engine, media_type=media_type
+    )
+    if engine != 'chromium' or renderer == 'chromium':
+        try:
+            _write_cached(path, pdf_bytes)
+            _maybe_evict()
+        except OSError as e:
+            logger.warning(f"PDF cache write failed ({tag}): {e}")
+    return pdf_bytes
+
+
+def invalidate(*tags: str):
+    """Pašalinti visus objekto PDF (visų kalbų ir renderer versijų)"""
+    root = get_cache_root()
+    for tag in tags:
+        shutil.rmtree(root / tag, ignore_errors=True)
+
+
+def clear_cache():
+    shutil.rmtree(get_cache_root(), ignore_errors=True)
+
+
+def _order_tags(order_pks) -> list:
+    from apps.invoices.models import SalesInvoice
+    from apps.orders.models import OrderCarrier
+
+    order_pks = list(order_pks)
+    tags = [cache_tag('order', pk) for pk in order_pks]
+    tags += [
+        cache_tag('ordercarrier', pk)
+        for pk in OrderCarrier.objects.filter(order_id__in=order_pks).values_list('pk', flat=True)
+    ]
+    invoice_pks = set(SalesInvoice.objects.filter(related_order_id__in=order_pks).values_list('pk', flat=True))
+    invoice_pks.update(
+        SalesInvoice.objects.filter(invoice_orders__order_id__in=order_pks).values_list('pk', flat=True)
+    )
+    tags += [cache_tag('salesinvoice', pk) for pk in invoice_pks]
+    return tags
+
+
+def _order_carrier_tags(carriers) -> list:
+    # Užsakymo sutartyje rodomi ir vežėjai
+    tags = []
+    for pk, order_id in carriers:
+        tags += [cache_tag('ordercarrier', pk), cache_tag('order', order_id)]
+    return tags
+
+
+def _invalidate_order(sender, instance, **kwargs):
+    invalidate(*_order_tags([instance.pk]))
+
+
+def _invalidate_order_carrier(sender, instance, **kwargs):
+    invalidate(*_order_carrier_tags([(instance.pk, instance.order_id)]))
+
+
+def _invalidate_sales_invoice(sender, instance, **kwargs):
+    invalidate(cache_tag('salesinvoice', instance.pk))
+
+
+def _invalidate_orders_bulk(sender, pks, **kwargs):
+    invalidate(*_order_tags(pks))
+
+
+def _invalidate_order_carriers_bulk(sender, pks, **kwargs):
+    # Masiniame pakeitime order_id gali būti neįkeltas
+    invalidate(*_order_carrier_tags(sender.objects.filter(pk__in=pks).values_list('pk', 'order_id')))
+
+
+def _invalidate_sales_invoices_bulk(sender, pks, **kwargs):
+    invalidate(*[cache_tag('salesinvoice', pk) for pk in pks])
+
+
+def _safe(handler):
+    def wrapper(sender, instance, **kwargs):
+        if kwargs.get('raw') or not is_pdf_cache_enabled():
+            return
+        try:
+            handler(sender, instance, **kwargs)
+        except Exception as e:
+            logger.warning(f"PDF cache invalidation failed for {sender.__name__} {instance.pk}: {e}")
+    return wrapper
+
+
+def _safe_bulk(handler):
+    def wrapper(sender, instances, **kwargs):
+        from apps.core.bulk_changes import instance_pks
+
+        pks = instance_pks(instances)
+        if not pks or not is_pdf_cache_enabled():
+            return
+        try:
+            handler(sender, pks, **kwargs)
+        except Exception as e:
+            logger.warning(f"PDF cache bulk invalidation failed for {sender.__name__} ({len(pks)}): {e}")
+    return wrapper
+
+
+_invalidate_order_safe = _safe(_invalidate_order)
+_invalidate_order_carrier_safe = _safe(_invalidate_order_carrier)
+_invalidate_sales_invoice_safe = _safe(_invalidate_sales_invoice)
+_invalidate_orders_bulk_safe = _safe_bulk(_invalidate_orders_bulk)
+_invalidate_order_carriers_bulk_safe = _safe_bulk(_invalidate_order_carriers_bulk)
+_invalidate_sales_invoices_bulk_safe = _safe_bulk(_invalidate_sales_invoices_bulk)
+
+
+def register_pdf_cache_signals():
+    """Registruoti PDF cache invalidavimo signal'us"""
+    from apps.core.bulk_changes import bulk_changed
+    from apps.orders.models import Order, OrderCarrier
+    from apps.invoices.models import SalesInvoice
+
+    for model, handler, bulk_handler in (
+        (Order, _invalidate_order_safe, _invalidate_orders_bulk_safe),
+        (OrderCarrier, _invalidate_order_carrier_safe, _invalidate_order_carriers_bulk_safe),
+        (SalesInvoice, _invalidate_sales_invoice_safe, _invalidate_sales_invoices_bulk_safe),
+    ):
+        uid = f'pdf_cache_{model._meta.label_lower}'
+        post_save.connect(handler, sender=model, dispatch_uid=f'{uid}_save', weak=False)
+        post_delete.connect(handler, sender=model, dispatch_uid=f'{uid}_delete', weak=False)
+        bulk_changed.connect(bulk_handler, sender=model, dispatch_uid=f'{uid}_bulk', weak=False)
@@ -0,0 +1,486 @@
+"""
+HTML -> PDF generavimas.
+
+Playwright (Chromium) naršyklės laikomos "šiltos" procese: ChromiumPool turi ribotą skaičių
+worker thread'ų, kurių kiekvienas valdo savo Playwright instanciją, naršyklę ir kontekstus.
+Užklausos tik pateikia HTML ir laukia rezultato - naršyklė nebepaleidžiama kiekvienam PDF.
+
+Naršyklė perkraunama po PDF_BROWSER_MAX_RENDERS generavimų, kai jos procesų RSS viršija
+PDF_BROWSER_MAX_RSS_MB arba kai nepavyksta sveikatos patikra. Jei pool'as išnaudotas
+(visi worker'iai užimti ilgiau nei PDF_BROWSER_ACQUIRE_TIMEOUT) arba nesveikas -
+naudojamas WeasyPrint, o jam nepavykus - xhtml2pdf.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from io import BytesIO
+from typing import Optional
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PDF_MARGIN = {'top': '0', 'right': '0', 'bottom': '0', 'left': '0'}
+WEASYPRINT_PAGE_CSS = """
+    @page {
+        size: A4;
+        margin: 0;
+    }
+"""
+
+
+class PdfRenderError(Exception):
+    """Raised when none of the PDF renderers could produce a document."""
+
+
+class PoolUnavailable(Exception):
+    """Raised when the Chromium pool is disabled, unhealthy or exhausted."""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _read_rss_mb(pid: int) -> float:
+    """Proceso RSS (MB) iš /proc (tik Linux). Grąžina 0, jei nepavyksta nuskaityti."""
+    try:
+        with open(f'/proc/{pid}/status') as status_file:
+            for line in status_file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0.0
+
+
+class _RenderJob:
+    __slots__ = ('html', 'base_url', 'done', 'result', 'error', 'elapsed')
+
+    def __init__(self, html: str, base_url: Optional[str]):
+        self.html = html
+        self.base_url = base_url
+        self.done = threading.Event()
+        self.result: Optional[bytes] = None
+        self.error: Optional[BaseException] = None
+        self.elapsed = 0.0
+
+
+class _BrowserWorker(threading.Thread):
+    """
+    Vienas pool'o worker'is. Playwright sync API nėra thread-safe, todėl visi naršyklės
+    objektai kuriami ir naudojami tik šiame thread'e.
+    """
+
+    HEALTH_CHECK_INTERVAL = 60
+    RSS_CHECK_EVERY = 20
+    MAX_CONTEXTS = 4
+
+    def __init__(self, pool: 'ChromiumPool', index: int):
+        super().__init__(name=f'pdf-chromium-{index}', daemon=True)
+        self.pool = pool
+        self.index = index
+        self.healthy = False
+        self.last_error = ''
+        self.renders = 0
+        self.total_renders = 0
+        self.recycles = 0
+        self._playwright_cm = None
+        self._playwright = None
+        self._browser = None
+        self._contexts = {}
+        self.started = threading.Event()
+
+    # --- naršyklės gyvavimo ciklas ---
+
+    def _start_browser(self):
+        from playwright.sync_api import sync_playwright
+
+        self._playwright_cm = sync_playwright()
+        self._playwright = self._playwright_cm.start()
+        self._browser = self._playwright.chromium.launch()
+        self._contexts = {}
+        self.renders = 0
+        self.healthy = True
+        self.last_error = ''
+
+    def _stop_browser(self):
+        for context in self._contexts.values():
+            try:
+                context.close()
+            except Exception:
+                pass
+        self._contexts = {}
+        for closer in (
+            lambda: self._browser and self._browser.close(),
+            lambda: self._playwright_cm and self._playwright_cm.__exit__(None, None, None),
+        ):
+            try:
+                closer()
+            except Exception:
+                logger.debug('Nepavyko švariai uždaryti Chromium', exc_info=True)
+        self._browser = None
+        self._playwright = None
+        self._playwright_cm = None
+        self.healthy = False
+
+    def _recycle(self, reason: str):
+        logger.info(f'PDF Chromium worker {self.index}: perkraunama naršyklė ({reason})')
+        self.recycles += 1
+        self._stop_browser()
+        self._ensure_browser()
+
+    def _ensure_browser(self) -> bool:
+        if self._browser is not None and self.healthy:
+            return True
+        try:
+            self._start_browser()
+            return True
+        except ImportError:
+            self.last_error = 'Playwright neįdiegtas'
+            self.pool._disable(self.last_error)
+        except Exception as e:
+            if str(e) != self.last_error:
+                logger.warning(f'PDF Chromium worker {self.index}: nepavyko paleisti naršyklės: {e}')
+            self.last_error = str(e)
+        self._stop_browser()
+        return False
+
+    def _browser_rss_mb(self) -> float:
+        """Visų naršyklės procesų RSS (per CDP SystemInfo.getProcessInfo + /proc)"""
+        try:
+            cdp = self._browser.new_browser_cdp_session()
+            try:
+                info = cdp.send('SystemInfo.getProcessInfo')
+            finally:
+                cdp.detach()
+        except Exception:
+            return 0.0
+        return sum(_read_rss_mb(process.get('id')) for process in info.get('processInfo', []))
+
+    def _health_check(self) -> bool:
+        try:
+            if self._browser is None or not self._browser.is_connected():
+                return False
+            page = self._get_context(None).new_page()
+            page.close()
+            return True
+        except Exception as e:
+            self.last_error = str(e)
+            return False
+
+    # --- generavimas ---
+
+    def _get_context(self, base_url: Optional[str]):
+        context = self._contexts.get(base_url)
+        if context is None:
+            if len(self._contexts) >= self.MAX_CONTEXTS:
+                oldest_key = next(iter(self._contexts))
+                self._contexts.pop(oldest_key).close()
+            context = self._browser.new_context(base_url=base_url) if base_url else self._browser.new_context()
+            self._contexts[base_url] = context
+        return context
+
+    def _render(self, job: _RenderJob) -> bytes:
+        page = self._get_context(job.base_url).new_page()
+        try:
+            page.set_content(job.html)
+            page.emulate_media(media='screen')  # kad būtų kaip peržiūroje, ne print
+            return page.pdf(format='A4', margin=PDF_MARGIN, print_background=True)
+        finally:
+            try:
+                page.close()
+            except Exception:
+                pass
+
+    def _after_render(self):
+        self.renders += 1
+        self.total_renders += 1
+        max_renders = _setting('PDF_BROWSER_MAX_RENDERS', 200)
+        if max_renders and self.renders >= max_renders:
+            self._recycle(f'{self.renders} generavimų')
+            return
+        max_rss_mb = _setting('PDF_BROWSER_MAX_RSS_MB', 1024)
+        if max_rss_mb and self.renders % self.RSS_CHECK_EVERY == 0:
+            rss_mb = self._browser_rss_mb()
+            if rss_mb > max_rss_mb:
+                self._recycle(f'RSS {rss_mb:.0f} MB > {max_rss_mb} MB')
+
+    def run(self):
+        self._ensure_browser()
+        self.started.set()
+        while not self.pool._stopping.is_set():
+            try:
+                job = self.pool._jobs.get(timeout=self.HEALTH_CHECK_INTERVAL)
+            except queue.Empty:
+                if self.pool._disabled_reason:
+                    break
+                # Neveiklumo metu - sveikatos patikra arba pakartotinis paleidimas
+                if self._browser is None:
+                    self._ensure_browser()
+                elif not self._health_check():
+                    self._recycle('nepavyko sveikatos patikra')
+                continue
+
+            if job is None:
+                break
+
+            started = time.monotonic()
+            try:
+                if not self._ensure_browser():
+                    raise PoolUnavailable(self.last_error or 'Chromium nepasiekiamas')
+                try:
+                    job.result = self._render(job)
+                except Exception as e:
+                    # Galbūt naršyklė nulūžo - perkrauti ir bandyti dar kartą vieną kartą
+                    logger.warning(f'PDF Chromium worker {self.index}: generavimo klaida ({e}), bandoma iš naujo')
+                    self._recycle('generavimo klaida')
+                    if not self.healthy:
+                        raise
+                    job.result = self._render(job)
+                self._after_render()
+            except BaseException as e:
+                job.error = e
+                self.last_error = str(e)
+            finally:
+                job.elapsed = time.monotonic() - started
+                job.done.set()
+                self.pool._slots.release()
+
+        self._stop_browser()
+        if not any(worker.is_alive() for worker in self.pool._workers if worker is not self):
+            self.pool._fail_pending(self.pool._disabled_reason or 'Chromium pool sustabdytas')
+
+
+class ChromiumPool:
+    """Procesui bendras, riboto dydžio Chromium naršyklių pool'as."""
+
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self.pid = os.getpid()
+        self._jobs: 'queue.Queue[Optional[_RenderJob]]' = queue.Queue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._stopping = threading.Event()
+        self._disabled_reason = ''
+        self._workers = [_BrowserWorker(self, index) for index in range(self.size)]
+        for worker in self._workers:
+            worker.start()
+
+    def _disable(self, reason: str):
+        self._disabled_reason = reason
+        self._fail_pending(reason)
+
+    def _fail_pending(self, reason: str):
+        """Eilėje laukiančius darbus užbaigti iškart (PoolUnavailable), o ne po PDF_BROWSER_RENDER_TIMEOUT"""
+        while True:
+            try:
+                job = self._jobs.get_nowait()
+            except queue.Empty:
+                return
+            if job is None:
+                continue
+            job.error = PoolUnavailable(reason)
+            job.done.set()
+            self._slots.release()
+
+    def is_healthy(self) -> bool:
+        if self._disabled_reason or self._stopping.is_set():
+            return False
+        return any(worker.is_alive() and worker.healthy for worker in self._workers)
+
+    def _wait_for_startup(self, timeout: float):
+        """Ką tik sukurtas pool'as - palaukti, kol bent vienas worker'is paleis naršyklę"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.is_healthy() or all(worker.started.is_set() for worker in self._workers):
+                return
+            time.sleep(0.05)
+
+    def render(self, html: str, base_url: Optional[str] = None) -> bytes:
+        """Sugeneruoti PDF šilta naršykle. PoolUnavailable - jei pool'as nesveikas ar išnaudotas."""
+        acquire_timeout = _setting('PDF_BROWSER_ACQUIRE_TIMEOUT', 5)
+        if not all(worker.started.is_set() for worker in self._workers):
+            self._wait_for_startup(acquire_timeout)
+        if not self.is_healthy():
+            raise PoolUnavailable(self._disabled_reason or 'Chromium pool nesveikas')
+        if not self._slots.acquire(timeout=acquire_timeout):
+            raise PoolUnavailable('Chromium pool išnaudotas')
+
+        job = _RenderJob(html, base_url)
+        self._jobs.put(job)
+        deadline = time.monotonic() + _setting('PDF_BROWSER_RENDER_TIMEOUT', 60)
+        while not job.done.wait(timeout=min(0.5, max(0.0, deadline - time.monotonic()))):
+            if time.monotonic() >= deadline:
+                raise PoolUnavailable('Chromium generavimas viršijo laiko limitą')
+            if self._stopping.is_set() or not any(worker.is_alive() for worker in self._workers):
+                # Nėra kas paimtų darbo iš eilės
+                self._fail_pending(self._disabled_reason or 'Chromium pool sustabdytas')
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def stats(self) -> dict:
+        return {
+            'size': self.size,
+            'healthy': self.is_healthy(),
+            'disabled_reason': self._disabled_reason,
+            'workers': [
+                {
+                    'index': worker.index,
+                    'alive': worker.is_alive(),
+                    'healthy': worker.healthy,
+                    'renders_since_recycle': worker.renders,
+                    'total_renders': worker.total_renders,
+                    'recycles': worker.recycles,
+                    'last_error': worker.last_error,
+                }
+                for worker in self._workers
+            ],
+        }
+
+    def shutdown(self, timeout: float = 5):
+        self._stopping.set()
+        self._fail_pending('Chromium pool sustabdytas')
+        for _ in self._workers:
+            self._jobs.put(None)
+        for worker in self._workers:
+            worker.join(timeout=timeout)
+
+
+_pool: Optional[ChromiumPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_chromium_pool() -> Optional[ChromiumPool]:
+    """Grąžina procesui bendrą pool'ą (sukuriamas tingiai, po fork'o - iš naujo)."""
+    global _pool
+
+    if not _setting('PDF_BROWSER_POOL_ENABLED', True):
+        return None
+    if _pool is not None and _pool.pid == os.getpid():
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = ChromiumPool(_setting('PDF_BROWSER_POOL_SIZE', 2))
+        return _pool
+
+
+@atexit.register
+def shutdown_chromium_pool():
+    global _pool
+    if _pool is not None and _pool.pid == os.getpid():
+        _pool.shutdown()
+    _pool = None
+
+
+def render_pdf_chromium_cold(html_string: str, base_url: Optional[str] = None) -> bytes:
+    """Sugeneruoti PDF paleidžiant naują naršyklę (be pool'o) - naudojama palyginimui."""
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        browser = p.chromium.launch()
+        try:
+            context = browser.new_context(base_url=base_url) if base_url else browser.new_context()
+            page = context.new_page()
+            page.set_content(html_string)
+            page.emulate_media(media='screen')
+            pdf_bytes = page.pdf(format='A4', margin=PDF_MARGIN, print_background=True)
+            context.close()
+        finally:
+            browser.close()
+    return pdf_bytes
+
+
+def render_pdf_weasyprint(html_string: str, base_url: Optional[str] = None, media_type: str = 'screen') -> bytes:
+    """WeasyPrint - sąskaitoms media_type='screen', kad PDF atrodytų kaip HTML peržiūroje"""
+    from weasyprint import HTML, CSS
+
+    html_doc = HTML(string=html_string, base_url=base_url, media_type=media_type)
+    return html_doc.write_pdf(stylesheets=[CSS(string=WEASYPRINT_PAGE_CSS)])
+
+
+def render_pdf_xhtml2pdf(html_string: str, base_url: Optional[str] = None) -> bytes:
+    """xhtml2pdf - paskutinis fallback"""
+    from urllib.parse import urljoin
+    from xhtml2pdf import pisa
+
+    def link_callback(uri, rel):
+        if uri.startswith('data:'):
+            return uri
+        if uri.startswith('/'):
+            if uri.startswith(settings.MEDIA_URL):
+                file_path = uri.replace(settings.MEDIA_URL, '')
+                full_path = os.path.join(settings.MEDIA_ROOT, file_path)
+                if os.path.exists(full_path):
+                    return f"file://{full_path}"
+            return urljoin((base_url or '').rstrip('/'), uri)
+        return uri
+
+    result = BytesIO()
+    pdf = pisa.pisaDocument(
+        BytesIO(html_string.encode('UTF-8')),
+        result,
+        encoding='UTF-8',
+        link_callback=link_callback,
+        show_error_as_pdf=False
+    )
+    if pdf.err:
+        raise PdfRenderError(str(pdf.err) or 'Nežinoma PDF generavimo klaida')
+    pdf_bytes = result.getvalue()
+    if not pdf_bytes or not pdf_bytes.startswith(b'%PDF'):
+        raise PdfRenderError('Generuotas failas nėra PDF formatas')
+    return pdf_bytes
+
+
+def render_html_to_pdf_with_renderer(
+    html_string: str,
+    base_url: Optional[str] = None,
+    engine: str = 'chromium',
+    media_type: str = 'screen',
+):
+    """
+    Sugeneruoti PDF ir grąžinti (pdf_bytes, renderer).
+
+    engine='chromium': Chromium pool -> WeasyPrint -> xhtml2pdf (sąskaitos)
+    engine='weasyprint': WeasyPrint -> xhtml2pdf (užsakymų ir vežėjų sutartys)
+
+    Raises:
+        PdfRenderError: jei nė vienas būdas nepavyko
+    """
+    if engine == 'chromium':
+        pool = get_chromium_pool()
+        if pool is not None:
+            try:
+                return pool.render(html_string, base_url), 'chromium'
+            except PoolUnavailable as e:
+                logger.info(f"Chromium pool nepasiekiamas ({e}), naudojamas WeasyPrint")
+            except Exception as e:
+                logger.warning(f"Playwright (Chromium) PDF nepavyko: {e}, naudojamas WeasyPrint")
+
+    try:
+        return render_pdf_weasyprint(html_string, base_url, media_type=media_type), 'weasyprint'
+    except (ImportError, OSError) as e:
+        logger.warning(f"WeasyPrint nepasiekiamas: {e}, naudojamas xhtml2pdf fallback")
+    except Exception as e:
+        logger.error(f"WeasyPrint klaida: {e}, naudojamas xhtml2pdf fallback")
+
+    try:
+        return render_pdf_xhtml2pdf(html_string, base_url), 'xhtml2pdf'
+    except PdfRenderError:
+        raise
+    except Exception as e:
+        raise PdfRenderError(str(e)) from e
+
+
+def render_html_to_pdf(
+    html_string: str,
+    base_url: Optional[str] = None,
+    engine: str = 'chromium',
+    media_type: str = 'screen',
+) -> bytes:
+    """Sugeneruoti PDF (žr. render_html_to_pdf_with_renderer)"""
+    pdf_bytes, _ = render_html_to_pdf_with_renderer(html_string, base_url, engine=engine, media_type=media_type)
+    return pdf_bytes
@@ -0,0 +1,352 @@
+"""
+Replica sinchronizacijos outbox.
+
+post_save/post_delete signal'ai tik įrašo eilutę į ReplicaSyncOutbox (lokali DB, ta pati transakcija),
+o atskiras procesas (manage.py drain_replica_outbox --loop, ne web workeriuose) periodiškai:
+- paima paketą neapdorotų įrašų,
+- sujungia pasikartojančius (modelis, pk) įrašus (paskutinė operacija laimi),
+- perkelia pakeitimus į replica DB kelių eilučių upsert užklausomis.
+
+Lėta ar nepasiekiama replica DB nebeprailgina užklausų atsakymo laiko.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import Q
+from django.utils import timezone
+from django.db.utils import InterfaceError, OperationalError, ProgrammingError
+
+from apps.core.db_sync import upsert_instances, sync_m2m_to_replica
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_lock_dir = os.environ.get('REPLICA_OUTBOX_LOCK_DIR', '/var/www/tms/logs')
+try:
+    os.makedirs(_lock_dir, exist_ok=True)
+except (PermissionError, OSError):
+    import getpass
+    _lock_dir = os.path.join('/tmp', f'logitrack_{getpass.getuser()}')
+    os.makedirs(_lock_dir, exist_ok=True)
+_LOCK_FILE_PATH = os.path.join(_lock_dir, 'replica_outbox.lock')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def is_replica_sync_enabled() -> bool:
+    """Replica sinchronizacija vykdoma tik production (DEBUG=False) ir kai replica DB sukonfigūruota"""
+    return not settings.DEBUG and 'replica' in settings.DATABASES
+
+
+def enqueue(model_class, pk, operation='save'):
+    """Įrašyti pakeitimą į outbox (lokali DB, ta pati transakcija kaip ir pakeitimas)"""
+    from apps.core.models import ReplicaSyncOutbox
+
+    if pk is None:
+        return
+    ReplicaSyncOutbox.objects.using('default').create(
+        model_label=model_class._meta.label,
+        object_pk=str(pk),
+        operation=operation,
+    )
+
+
+def enqueue_many(model_class, pks, operation='save', batch_size=500):
+    """enqueue() daugeliui įrašų vienu bulk_create (pvz. po bulk_update, kuris nesiunčia post_save)"""
+    from apps.core.models import ReplicaSyncOutbox
+
+    rows = [
+        ReplicaSyncOutbox(model_label=model_class._meta.label, object_pk=str(pk), operation=operation)
+        for pk in pks if pk is not None
+    ]
+    if rows:
+        ReplicaSyncOutbox.objects.using('default').bulk_create(rows, batch_size=batch_size)
+
+
+def _flush_saves(model_class, save_pks, chunk_size) -> int:
+    """Perkelti vieno modelio išsaugotus objektus į replica DB. Grąžina upsert'intų skaičių."""
+    pk_field = model_class._meta.pk
+    save_pks = [pk_field.to_python(pk) for pk in save_pks]
+    instances = list(model_class.objects.using('default').filter(pk__in=save_pks))
+    saved = upsert_instances(model_class, instances, using='replica', chunk_size=chunk_size)
+    sync_m2m_to_replica(model_class, [instance.pk for instance in instances], chunk_size=chunk_size)
+    return saved
+
+
+def _flush_deletes(model_class, delete_pks) -> int:
+    pk_field = model_class._meta.pk
+    delete_pks = [pk_field.to_python(pk) for pk in delete_pks]
+    # ORM delete - replica DB kaskadai tvarkomi taip pat kaip lokaliai
+    deleted, _ = model_class.objects.using('replica').filter(pk__in=delete_pks).delete()
+    return deleted
+
+
+def _sort_by_dependencies(model_classes):
+    """
+    Modeliai FK priklausomybių tvarka: tėviniai (į kuriuos rodo ForeignKey / OneToOne) - pirmi.
+    Ciklo atveju (pvz. Partner.contact_person <-> Contact.partner) pirmas imamas modelis su mažiausiai
+    neįvykdytų priklausomybių, o likusieji toliau rikiuojami.
+    """
+    pending = list(model_classes)
+    included = set(pending)
+    dependencies = {
+        model: {
+            field.related_model._meta.concrete_model
+            for field in model._meta.concrete_fields
+            if field.is_relation and field.related_model is not None
+            and field.related_model._meta.concrete_model in included
+            and field.related_model._meta.concrete_model is not model
+        }
+        for model in pending
+    }
+    ordered = []
+    while pending:
+        ready = [model for model in pending if not (dependencies[model] - set(ordered))]
+        if not ready:
+            ready = [min(pending, key=lambda model: len(dependencies[model] - set(ordered)))]
+        ordered.extend(ready)
+        pending = [model for model in pending if model not in ready]
+    return ordered
+
+
+def _retry_delay(attempts: int) -> int:
+    base = _setting('REPLICA_OUTBOX_RETRY_BASE_SECONDS', 10)
+    return min(base * 2 ** max(0, attempts - 1), _setting('REPLICA_OUTBOX_MAX_BACKOFF_SECONDS', 300))
+
+
+def _mark_failed(row_ids, error, label):
+    """Nepavykę įrašai: bandymų skaičius +1, atidedami (kiti modeliai eilėje apdorojami toliau)"""
+    from apps.core.models import ReplicaSyncOutbox
+
+    now = timezone.now()
+    max_attempts = _setting('REPLICA_OUTBOX_MAX_ATTEMPTS', 20)
+    queryset = ReplicaSyncOutbox.objects.using('default').filter(id__in=row_ids)
+    for attempts, ids in _group_by_attempts(queryset):
+        queryset.filter(id__in=ids).update(
+            attempts=attempts + 1,
+            last_error=f"{type(error).__name__}: {error}"[:2000],
+            next_attempt_at=now + timedelta(seconds=_retry_delay(attempts + 1)),
+        )
+        if attempts + 1 >= max_attempts:
+            # Dead-letter: įrašas lieka lentelėje (drain_replica_outbox --reset-failed), bet nebeimamas
+            logger.error(f"Replica outbox: {len(ids)} rows of {label} reached {max_attempts} attempts, giving up")
+
+
+def _group_by_attempts(queryset):
+    groups = {}
+    for row_id, attempts in queryset.values_list('id', 'attempts'):
+        groups.setdefault(attempts, []).append(row_id)
+    return groups.items()
+
+
+def drain_outbox(batch_size: Optional[int] = None) -> dict:
+    """
+    Apdoroti vieną outbox paketą.
+
+    Išsaugojimai perkeliami FK priklausomybių tvarka (tėviniai modeliai pirmi), ištrynimai - atvirkščia.
+    Nepavykęs modelis atidedamas (next_attempt_at) ir neblokuoja kitų įrašų; po
+    REPLICA_OUTBOX_MAX_ATTEMPTS bandymų įrašas nebeimamas (dead-letter).
+
+    Returns:
+        Dict su 'status' ('ok', 'empty', 'error'), 'rows', 'saved', 'deleted', 'failed'
+    """
+    from apps.core.models import ReplicaSyncOutbox
+
+    batch_size = batch_size or _setting('REPLICA_OUTBOX_BATCH_SIZE', 500)
+    chunk_size = _setting('REPLICA_OUTBOX_CHUNK_SIZE', 500)
+    max_attempts = _setting('REPLICA_OUTBOX_MAX_ATTEMPTS', 20)
+
+    rows = list(
+        ReplicaSyncOutbox.objects.using('default')
+        .filter(attempts__lt=max_attempts)
+        .filter(Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=timezone.now()))
+        .order_by('id')
+        .values('id', 'model_label', 'object_pk', 'operation')[:batch_size]
+    )
+    result = {'status': 'empty', 'rows': len(rows), 'saved': 0, 'deleted': 0, 'failed': 0}
+    if not rows:
+        return result
+
+    # Sujungti pasikartojančius (modelis, pk) įrašus - paskutinė operacija laimi
+    operations_by_label = OrderedDict()
+    ids_by_label = {}
+    for row in rows:
+        label = row['model_label']
+        operations_by_label.setdefault(label, {})[row['object_pk']] = row['operation']
+        ids_by_label.setdefault(label, []).append(row['id'])
+
+    models_by_label = {}
+    for label in operations_by_label:
+        try:
+            models_by_label[label] = apps.get_model(label)
+        except LookupError:
+            row_ids = ids_by_label[label]
+            logger.warning(f"Replica outbox: unknown model {label}, dropping {len(row_ids)} rows")
+            ReplicaSyncOutbox.objects.using('default').filter(id__in=row_ids).delete()
+
+    label_by_model = {model_class: label for label, model_class in models_by_label.items()}
+    ordered_labels = [label_by_model[model_class] for model_class in _sort_by_dependencies(models_by_label.values())]
+
+    result['status'] = 'ok'
+    failed_labels = set()
+    unreachable = False
+    flushed = {label: [0, 0] for label in ordered_labels}
+    phases = (
+        (ReplicaSyncOutbox.Operation.SAVE, ordered_labels),
+        (ReplicaSyncOutbox.Operation.DELETE, list(reversed(ordered_labels))),
+    )
+    for operation, labels in phases:
+        for label in labels:
+            if label in failed_labels:
+                continue
+            pks = [pk for pk, op in operations_by_label[label].items() if op == operation]
+            if not pks:
+                continue
+            model_class = models_by_label[label]
+            try:
+                if operation == ReplicaSyncOutbox.Operation.SAVE:
+                    flushed[label][0] = _flush_saves(model_class, pks, chunk_size)
+                else:
+                    flushed[label][1] = _flush_deletes(model_class, pks)
+            except Exception as e:
+                failed_labels.add(label)
+                result['failed'] += len(ids_by_label[label])
+                _mark_failed(ids_by_label[label], e, label)
+                logger.error(f"Replica outbox: error syncing {label} ({len(operations_by_label[label])} objects): {e}")
+                if isinstance(e, (OperationalError, InterfaceError)):
+                    # Replica nepasiekiama - nebandyti likusių modelių šiame pakete
+                    try:
+                        connections['replica'].close()
+                    except Exception:
+                        pass
+                    result['status'] = 'error'
+                    unreachable = True
+                    break
+        if unreachable:
+            break
+
+    if unreachable:
+        return result
+
+    for label in ordered_labels:
+        if label in failed_labels:
+            continue
+        row_ids = ids_by_label[label]
+        ReplicaSyncOutbox.objects.using('default').filter(id__in=row_ids).delete()
+        saved, deleted = flushed[label]
+        result['saved'] += saved
+        result['deleted'] += deleted
+        logger.debug(
+            f"Replica outbox: {label} - {saved} upserted, {deleted} deleted "
+            f"({len(row_ids)} outbox rows coalesced to {len(operations_by_label[label])})"
+        )
+
+    return result
+
+
+def drain_until_empty(batch_size: Optional[int] = None, max_batches: Optional[int] = None) -> dict:
+    """Apdoroti outbox paketais, kol eilė tuščia, įvyksta klaida arba pasiekiamas max_batches."""
+    totals = {'status': 'empty', 'batches': 0, 'rows': 0, 'saved': 0, 'deleted': 0, 'failed': 0}
+    while max_batches is None or totals['batches'] < max_batches:
+        result = drain_outbox(batch_size=batch_size)
+        if result['status'] == 'empty':
+            break
+        totals['batches'] += 1
+        for key in ('rows', 'saved', 'deleted', 'failed'):
+            totals[key] += result[key]
+        totals['status'] = result['status']
+        if result['status'] == 'error' or result['failed'] == result['rows']:
+            # Visi paketo įrašai nepavyko - nekartoti iškart, laukti kito ciklo
+            break
+    return totals
+
+
+def _acquire_drainer_lock():
+    if fcntl is None:
+        logger.warning(
+            'fcntl biblioteka neprieinama – replica outbox procesas veiks be procesų užrakto. '
+            'Užtikrinkite, kad dirba tik vienas workeris arba naudokite drain_replica_outbox komandą.'
+        )
+        return None
+    lock_file = open(_LOCK_FILE_PATH, 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return lock_file
+    except OSError:
+        lock_file.close()
+        return None
+
+
+def run_drainer_loop(
+    stop_event: Optional[threading.Event] = None,
+    batch_size: Optional[int] = None,
+    poll_seconds: Optional[int] = None,
+):
+    """
+    Nuolat apdoroti outbox. Jei replica nepasiekiama - laukiama vis ilgiau (exponential backoff),
+    įrašai lieka eilėje ir bus perkelti, kai replica vėl pasiekiama.
+    """
+    lock_file = _acquire_drainer_lock()
+    if lock_file is None and fcntl is not None:
+        logger.info('Replica outbox procesas jau veikia kitame procese – šis procesas praleidžiamas.')
+        return
+
+    poll_seconds = poll_seconds or _setting('REPLICA_OUTBOX_POLL_SECONDS', 2)
+    max_backoff = _setting('REPLICA_OUTBOX_MAX_BACKOFF_SECONDS', 300)
+    backoff = 0
+    logger.info('Startuoja replica outbox procesas.')
+
+    try:
+        while stop_event is None or not stop_event.is_set():
+            try:
+                close_old_connections()
+                result = drain_until_empty(batch_size=batch_size)
+                if result['status'] == 'error' or (result['rows'] and result['failed'] == result['rows']):
+                    backoff = min(max(backoff * 2, poll_seconds), max_backoff)
+                    logger.warning(f"Replica outbox: sync failed, retrying in {backoff}s")
+                else:
+                    backoff = 0
+                    if result['rows']:
+                        logger.info(
+                            f"Replica outbox: {result['rows']} rows -> "
+                            f"{result['saved']} upserted, {result['deleted']} deleted"
+                        )
+            except (OperationalError, ProgrammingError):
+                logger.debug('Replica outbox lentelė dar nepasiekiama – laukiam 60 s.')
+                backoff = 60
+            except Exception:
+                logger.exception('Netikėta klaida replica outbox procese.')
+                backoff = min(max(backoff * 2, poll_seconds), max_backoff)
+            finally:
+                close_old_connections()
+
+            sleep_seconds = backoff or poll_seconds
+            if stop_event is not None:
+                stop_event.wait(sleep_seconds)
+            else:
+                time.sleep(sleep_seconds)
+    except KeyboardInterrupt:
+        logger.info('Replica outbox procesas gavo nutraukimo signalą.')
+    finally:
+        if lock_file is not None and fcntl is not None:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+            except OSError:
+                pass
+            lock_file.close()
+        logger.info('Replica outbox procesas sustabdytas.')
@@ -5,6 +5,37 @@ from rest_framework import serializers
 from .models import ActivityLog, StatusTransitionRule
 
 
+def parse_fields_param(value, allowed_fields):
+    """
+    ?fields=id,order_number,carriers -> laukų sąrašas (tik leidžiami, pradinė tvarka).
+    Grąžina None, jei parametro nėra arba nė vienas laukas neatpažintas.
+    """
+    if not value:
+        return None
+    allowed_fields = set(allowed_fields)
+    fields = []
+    for name in value.split(','):
+        name = name.strip()
+        if name in allowed_fields and name not in fields:
+            fields.append(name)
+    return fields or None
+
+
+class SparseFieldsMixin:
+    """
+    Sparse fieldset - grąžinti tik context['fields'] nurodytus laukus.
+    Laukų sąrašą nustato viewset'as (žr. parse_fields_param), todėl nested naudojimas nepaveikiamas.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        requested = (self.context or {}).get('fields')
+        if requested:
+            for field_name in set(fields) - set(requested):
+                fields.pop(field_name)
+        return fields
+
+
 class ActivityLogSerializer(serializers.ModelSerializer):
     """Veiksmų istorijos serializer"""
     
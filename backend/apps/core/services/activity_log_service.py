@@ -219,6 +219,43 @@ class ActivityLogService:
             request=request
         )
     
+    @staticmethod
+    def log_order_status_changes(changes, reason='', user=None):
+        """
+        Registruoti daug užsakymų statusų pakeitimų vienu INSERT (pvz. planuojami perėjimai pagal taisykles).
+
+        Args:
+            changes: objektai su order_id, order_number, from_status, to_status, rule_id
+            reason: priežastis aprašyme
+        """
+        from apps.orders.models import Order
+
+        content_type = ContentType.objects.get_for_model(Order)
+        user_name = (user.get_full_name() or user.username) if user else ''
+        logs = [
+            ActivityLog(
+                action_type=ActivityLog.ActionType.ORDER_STATUS_CHANGED,
+                description=(
+                    f'Užsakymo #{change.order_number or change.order_id} būsena pakeista: '
+                    f'{change.from_status} → {change.to_status}' + (f' ({reason})' if reason else '')
+                ),
+                content_type=content_type,
+                object_id=change.order_id,
+                metadata={
+                    'order_number': change.order_number,
+                    'old_status': change.from_status,
+                    'new_status': change.to_status,
+                    'rule_id': change.rule_id,
+                },
+                user=user,
+                user_name=user_name,
+            )
+            for change in changes
+        ]
+        created = ActivityLog.objects.bulk_create(logs, batch_size=500)
+        logger.info(f'Activity logged: {ActivityLog.ActionType.ORDER_STATUS_CHANGED} x{len(created)}')
+        return created
+    
     @staticmethod
     def log_sales_invoice_created(invoice, user=None, request=None):
         """Registruoti pardavimo sąskaitos sukūrimą"""
@@ -15,7 +15,8 @@ logger = logging.getLogger(__name__)
 class StatusService:
     """Centralizuotas statusų valdymo servisas"""
     
-    # Cache'as taisyklių (atnaujinamas kai reikia)
+    # Cache'as taisyklių: (versijos žymė, taisyklės). Žymė - settings_versions lentelėje (apps.settings.cache),
+    # keičiama StatusTransitionRule post_save / post_delete, todėl pakeitimą mato visi worker'iai
     _rules_cache = None
     _cache_timestamp = None
     
@@ -46,22 +47,47 @@ class StatusService:
         """
         Gauti statusų perėjimų taisykles (su cache'u).
         
+        Kiekvienas kvietimas tik palygina versijos žymę (HTTP užklausoje žymės nuskaitomos vieną kartą,
+        už užklausų ribų - ne dažniau nei kas SETTINGS_CACHE_TTL s.); taisyklės perkraunamos jai pasikeitus.
+        
         Returns:
             Dict su formatu: (entity_type, current_status) -> [allowed_next_statuses]
         """
-        # Jei cache'as nėra arba pasenęs, užkrauti iš DB
-        if StatusService._rules_cache is None:
-            StatusService._rules_cache = StatusService._load_rules_from_db()
-            from django.utils import timezone
-            StatusService._cache_timestamp = timezone.now()
+        from django.db import DatabaseError
+        from django.utils import timezone
+        from apps.core.models import StatusTransitionRule
+        from apps.settings.cache import get_version_stamp, is_settings_cache_enabled
+        
+        if not is_settings_cache_enabled():
+            return StatusService._load_rules_from_db()
+        try:
+            stamp = get_version_stamp(StatusTransitionRule)
+        except DatabaseError as e:
+            logger.warning(f"Status rules cache unavailable, loading rules from DB: {e}")
+            return StatusService._load_rules_from_db()
+        
+        cached = StatusService._rules_cache
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
         
-        return StatusService._rules_cache
+        # Žymė nuskaityta prieš taisykles - lygiagretus pakeitimas bus pastebėtas kitu kvietimu
+        rules = StatusService._load_rules_from_db()
+        StatusService._rules_cache = (stamp, rules)
+        StatusService._cache_timestamp = timezone.now()
+        return rules
     
     @staticmethod
     def clear_cache():
-        """Išvalyti taisyklių cache'ą (naudojama kai taisyklės atnaujinamos)"""
+        """
+        Išvalyti taisyklių cache'ą šiame procese ir pakeisti versijos žymę (kiti worker'iai perkraus
+        taisykles nuo kitos užklausos). Išsaugant / ištrinant taisyklę tai daro signal'as.
+        """
+        from apps.core.models import StatusTransitionRule
+        from apps.settings.cache import bump_version
+        
         StatusService._rules_cache = None
         StatusService._cache_timestamp = None
+        bump_version(StatusTransitionRule)
     
     @staticmethod
     def get_allowed_transitions(entity_type: str, current_status: str) -> List[str]:
@@ -1,18 +1,19 @@
 """
 Django signals for automatic database synchronization.
-Automatically syncs data to replica database when models are saved/deleted.
+Saves/deletes of synced models are recorded in the ReplicaSyncOutbox (same transaction as the change);
+apps.core.replica_outbox drains the outbox to the replica database in the background.
 """
 
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
-from apps.core.db_sync import sync_to_replica
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from apps.core.bulk_changes import bulk_changed, instance_pks
+from apps.core.replica_outbox import enqueue, enqueue_many, is_replica_sync_enabled
 import logging
 
 logger = logging.getLogger(__name__)
 
 # Import visi modeliai, kuriuos reikia sinchronizuoti
 from apps.orders.models import Order, OrderCarrier, CargoItem
-from apps.invoices.models import SalesInvoice, PurchaseInvoice, InvoiceNumberSequence
+from apps.invoices.models import SalesInvoice, PurchaseInvoice, InvoiceNumberSequence, InvoicePrefixSequence
 from apps.partners.models import Partner, Contact
 from apps.settings.models import (
     CompanyInfo, UserSettings, InvoiceSettings, OrderSettings,
@@ -32,11 +33,16 @@ SYNC_MODELS = [
     Partner, Contact,
     # Settings
     CompanyInfo, UserSettings, InvoiceSettings, OrderSettings,
-    PVMRate, InvoiceNumberSequence,
+    PVMRate, InvoiceNumberSequence, InvoicePrefixSequence,
     # Auth
     User,
 ]
 
+# Tarpinės M2M lentelės su savo modeliu (pvz. SalesInvoiceOrder) -> (savininko modelis, savininko FK attname)
+_THROUGH_OWNERS = {}
+# Automatinės tarpinės lentelės -> (savininko FK attname, susijusio objekto FK attname)
+_THROUGH_FIELDS = {}
+
 
 def register_sync_signals():
     """Registruoti sinchronizacijos signals visiems modeliams"""
@@ -51,45 +57,99 @@ def register_sync_signals():
             sender=model,
             weak=False
         )
+        bulk_changed.connect(
+            sync_model_bulk_changed,
+            sender=model,
+            weak=False
+        )
+        for field in model._meta.many_to_many:
+            through = field.remote_field.through
+            if through._meta.auto_created:
+                _THROUGH_FIELDS[through] = (
+                    through._meta.get_field(field.m2m_field_name()).attname,
+                    through._meta.get_field(field.m2m_reverse_field_name()).attname,
+                )
+                m2m_changed.connect(sync_model_m2m_changed, sender=through, weak=False)
+            else:
+                # Aiškus tarpinis modelis keičiamas per savo save()/delete(), ne per m2m_changed
+                owner_field = through._meta.get_field(field.m2m_field_name())
+                _THROUGH_OWNERS[through] = (model, owner_field.attname)
+                post_save.connect(sync_through_change, sender=through, weak=False)
+                post_delete.connect(sync_through_change, sender=through, weak=False)
+
+
+def _should_enqueue(using):
+    # Lokaliame development'e (DEBUG=True) replica sync išjungtas;
+    # pakeitimai, atlikti pačioje replica DB (outbox procesas), nesinchronizuojami atgal
+    return using != 'replica' and is_replica_sync_enabled()
 
 
-@receiver(post_save)
-def sync_model_save(sender, instance, created, **kwargs):
-    """Sinchronizuoti po save()"""
-    # Patikrinti, ar tai modelis, kurį reikia sinchronizuoti
-    if sender not in SYNC_MODELS:
+def sync_model_save(sender, instance, created, using=None, **kwargs):
+    """Įrašyti į outbox po save()"""
+    if not _should_enqueue(using):
         return
-    
-    # Lokaliame development'e (DEBUG=True) VISIŠKAI išjungti replica sync
-    from django.conf import settings
-    if settings.DEBUG:
-        # Lokaliame development'e ne sync'uojame į replica - praleisti visiškai
+
+    try:
+        enqueue(sender, instance.pk, 'save')
+    except Exception as e:
+        logger.error(f"Error queueing {sender.__name__} (pk={instance.pk}) for replica sync: {str(e)}", exc_info=True)
+
+
+def sync_model_delete(sender, instance, using=None, **kwargs):
+    """Įrašyti į outbox po delete() - objektas bus ištrintas iš replica DB"""
+    if not _should_enqueue(using):
         return
-    
-    # Production - visada bandyti sync
+
     try:
-        sync_to_replica(instance)
+        enqueue(sender, instance.pk, 'delete')
     except Exception as e:
-        logger.error(f"Error syncing {sender.__name__} (pk={instance.pk}): {str(e)}", exc_info=True)
+        logger.error(f"Error queueing {sender.__name__} (pk={instance.pk}) delete for replica sync: {str(e)}", exc_info=True)
 
 
-@receiver(post_delete)
-def sync_model_delete(sender, instance, **kwargs):
-    """Sinchronizuoti po delete() - ištrinti iš replica DB"""
-    if sender not in SYNC_MODELS:
+def sync_model_bulk_changed(sender, instances, **kwargs):
+    """Įrašyti į outbox po masinio pakeitimo (apps.core.bulk_changes) - vienu bulk_create"""
+    if not _should_enqueue(None):
         return
-    
-    # Lokaliame development'e (DEBUG=True) VISIŠKAI išjungti replica sync
-    from django.conf import settings
-    if settings.DEBUG:
-        # Lokaliame development'e ne sync'uojame į replica - praleisti visiškai
+
+    try:
+        enqueue_many(sender, instance_pks(instances))
+    except Exception as e:
+        logger.error(f"Error queueing {sender.__name__} bulk change for replica sync: {str(e)}", exc_info=True)
+
+
+def sync_model_m2m_changed(sender, instance, action, reverse, model, pk_set, using=None, **kwargs):
+    """Po ManyToMany pakeitimo įrašyti savininko objektą į outbox (tarpinė lentelė sinchronizuojama kartu)"""
+    if action not in ('pre_clear', 'post_add', 'post_remove', 'post_clear') or not _should_enqueue(using):
         return
-    
-    # Production - visada bandyti sync
-    model_class = instance.__class__
+
     try:
-        model_class.objects.using('replica').filter(pk=instance.pk).delete()
-        logger.info(f"Deleted {model_class.__name__} (pk={instance.pk}) from replica")
+        if not reverse:
+            if action != 'pre_clear':
+                enqueue(instance.__class__, instance.pk, 'save')
+        elif action == 'pre_clear':
+            # post_clear pk_set nepateikia - savininkai įsimenami prieš ištrinant tarpinės lentelės eilutes
+            owner_attname, related_attname = _THROUGH_FIELDS[sender]
+            instance.__dict__.setdefault('_replica_cleared_owners', {})[sender] = list(
+                sender.objects.using(using).filter(**{related_attname: instance.pk})
+                .values_list(owner_attname, flat=True)
+            )
+        elif action == 'post_clear':
+            owner_pks = instance.__dict__.get('_replica_cleared_owners', {}).pop(sender, [])
+            enqueue_many(model, owner_pks)
+        elif model in SYNC_MODELS:
+            for pk in pk_set or []:
+                enqueue(model, pk, 'save')
     except Exception as e:
-        logger.error(f"Error deleting from replica: {str(e)}", exc_info=True)
+        logger.error(f"Error queueing M2M change of {sender.__name__} for replica sync: {str(e)}", exc_info=True)
 
+
+def sync_through_change(sender, instance, using=None, **kwargs):
+    """Aiškaus tarpinio modelio pakeitimas - įrašyti savininko objektą į outbox"""
+    if not _should_enqueue(using):
+        return
+
+    owner_model, owner_attname = _THROUGH_OWNERS[sender]
+    try:
+        enqueue(owner_model, getattr(instance, owner_attname, None), 'save')
+    except Exception as e:
+        logger.error(f"Error queueing {sender.__name__} change for replica sync: {str(e)}", exc_info=True)
@@ -0,0 +1,214 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from . import numbering
+from .models import ActivityLog, ReplicaSyncOutbox
+from .numbering import configured_number_prefixes, find_number_gaps, normalize_number_prefix, split_document_number
+from .pagination import OptionalCursorPagination
+from .text import normalize_text, tokenize
+
+
+class SplitDocumentNumberTests(SimpleTestCase):
+    def test_configured_prefix_wins_over_trailing_digits(self):
+        self.assertEqual(split_document_number('E25000012', ['E25']), ('E25', 12))
+        self.assertEqual(split_document_number('E25000012'), ('E', 25000012))
+
+    def test_longest_prefix_and_separators(self):
+        self.assertEqual(split_document_number('LOG-2025-0012', ['LOG', 'LOG-2025']), ('LOG-2025', 12))
+        self.assertEqual(split_document_number('log/0007', ['LOG']), ('LOG', 7))
+
+    def test_prefix_not_followed_by_digits_falls_back_to_regex(self):
+        self.assertEqual(split_document_number('E25A-0003', ['E25']), ('E25A', 3))
+
+    def test_numbers_without_digits_and_too_long_suffixes(self):
+        self.assertEqual(split_document_number('Be numerio'), ('BE NUMERIO', None))
+        self.assertEqual(split_document_number(None), ('', None))
+        self.assertEqual(split_document_number('X' + '9' * 19), ('X', None))
+
+    def test_normalize_number_prefix(self):
+        self.assertEqual(normalize_number_prefix(' log- '), 'LOG')
+
+
+class TextTests(SimpleTestCase):
+    def test_normalize_and_tokenize(self):
+        self.assertEqual(normalize_text('Šiaulių Ąžuolas'), 'siauliu azuolas')
+        self.assertEqual(tokenize('UAB „Ąžuolas“, LT_76001'), ['uab', 'azuolas', 'lt', '76001'])
+        self.assertEqual(tokenize(None), [])
+
+    def test_matches_search_index_copy(self):
+        from apps.orders import search_index
+
+        for value in ('UAB „Šiaulių krovinys“, LT-76001', 'ORD_2025/0012', 'a' * 100):
+            with self.subTest(value=value):
+                self.assertEqual(tokenize(value), search_index.tokenize(value))
+
+
+class FindNumberGapsTests(TestCase):
+    def setUp(self):
+        # find_number_gaps dirba su bet kuriuo queryset, turinčiu number_prefix / number_suffix
+        from apps.orders.models import Order
+        from apps.partners.models import Partner
+
+        self.model = Order
+        client = Partner.objects.create(name='Klientas', code='100')
+        for number in ('E1', 'E2', 'E5', 'E6', 'E20', 'X3'):
+            Order.objects.create(client=client, order_number=number)
+
+    def test_gaps_in_ascending_order(self):
+        self.assertEqual(find_number_gaps(self.model.objects.all(), 'E'), [(3, 4), (7, 19)])
+        self.assertEqual(find_number_gaps(self.model.objects.all(), 'e', max_gaps=1), [(3, 4)])
+
+    def test_expand_small_gaps(self):
+        self.assertEqual(
+            find_number_gaps(self.model.objects.all(), 'E', max_gaps=3, expand_small=True),
+            [(3, 3), (4, 4), (7, 19)],
+        )
+
+    def test_unknown_prefix_and_no_limit(self):
+        self.assertEqual(find_number_gaps(self.model.objects.all(), 'Y'), [])
+        self.assertEqual(find_number_gaps(self.model.objects.all(), 'E', max_gaps=0), [])
+
+
+class NumberPartsSaveTests(TestCase):
+    """Esamo įrašo save() numerį perskaido tik jam pasikeitus; prefiksai laikomi iki versijos žymės pakeitimo"""
+
+    def setUp(self):
+        from apps.orders.models import Order
+        from apps.partners.models import Partner
+
+        self.model = Order
+        self.order = Order.objects.create(client=Partner.objects.create(name='Klientas', code='110'), order_number='E1')
+        prefixes = mock.patch.object(Order, 'number_prefixes', return_value=['E'])
+        self.number_prefixes = prefixes.start()
+        self.addCleanup(prefixes.stop)
+        # Cache neturi išlikti su pakeistu number_prefixes()
+        self.addCleanup(numbering._prefixes_cache.clear)
+
+    def test_unchanged_number_is_not_split(self):
+        self.order.save(update_fields=['status'])
+        self.order.price_net = 10
+        self.order.save()
+        self.model.objects.get(pk=self.order.pk).save()
+        self.model.objects.only('pk', 'status').get(pk=self.order.pk).save(update_fields=['status'])
+        self.number_prefixes.assert_not_called()
+
+    def test_changed_number_is_split(self):
+        self.order.order_number = 'E7'
+        self.order.save()
+        order = self.model.objects.get(pk=self.order.pk)
+        self.assertEqual((order.number_prefix, order.number_suffix), ('E', 7))
+
+        order.order_number = 'X8'
+        order.save(update_fields=['order_number'])
+        order = self.model.objects.get(pk=self.order.pk)
+        self.assertEqual((order.number_prefix, order.number_suffix), ('X', 8))
+
+    def test_prefixes_cached_until_settings_change(self):
+        from apps.settings.models import OrderSettings
+
+        configured_number_prefixes(self.model)
+        configured_number_prefixes(self.model)
+        calls = self.number_prefixes.call_count
+        self.assertLessEqual(calls, 1)
+        OrderSettings.load().save()
+        configured_number_prefixes(self.model)
+        self.assertEqual(self.number_prefixes.call_count, calls + 1)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        # object_id: pasikartojančios reikšmės ir NULL
+        for object_id in (5, None, 3, 5, None, 3, 1, 5):
+            ActivityLog.objects.create(action_type=ActivityLog.ActionType.CUSTOM, description='x', object_id=object_id)
+        self.factory = APIRequestFactory()
+
+    def paginate(self, url, queryset):
+        paginator = OptionalCursorPagination()
+        paginator.page_size = 3
+        request = Request(self.factory.get(url))
+        rows = paginator.paginate_queryset(queryset, request)
+        return [row.pk for row in rows], paginator.get_next_link(), paginator.get_previous_link()
+
+    def walk(self, ordering):
+        queryset = ActivityLog.objects.order_by(*ordering)
+        pages = []
+        url = '/logs/?pagination=cursor'
+        while url:
+            ids, url, _ = self.paginate(url, queryset)
+            pages.append(ids)
+        return pages
+
+    def expected(self, descending):
+        rows = list(ActivityLog.objects.values_list('object_id', 'pk'))
+        with_value = sorted((row for row in rows if row[0] is not None), reverse=descending)
+        # NULL - pabaigoje; lygios reikšmės - pagal pk ta pačia kryptimi
+        nulls = sorted((row for row in rows if row[0] is None), reverse=descending)
+        return [pk for _, pk in with_value + nulls]
+
+    def test_forward_walk_with_ties_and_nulls(self):
+        for ordering, descending in ((['object_id'], False), (['-object_id'], True)):
+            with self.subTest(ordering=ordering):
+                pages = self.walk(ordering)
+                self.assertEqual([pk for page in pages for pk in page], self.expected(descending))
+                self.assertTrue(all(len(page) == 3 for page in pages[:-1]))
+
+    def test_previous_link_returns_same_page(self):
+        queryset = ActivityLog.objects.order_by('-object_id')
+        first, next_url, previous_url = self.paginate('/logs/?pagination=cursor', queryset)
+        self.assertIsNone(previous_url)
+        second, next_url, previous_url = self.paginate(next_url, queryset)
+        _, _, previous_url = self.paginate(next_url, queryset)
+        self.assertEqual(self.paginate(previous_url, queryset)[0], second)
+        _, _, previous_url = self.paginate(previous_url, queryset)
+        self.assertEqual(self.paginate(previous_url, queryset)[0], first)
+
+    def test_without_cursor_parameter_page_numbers_are_used(self):
+        paginator = OptionalCursorPagination()
+        paginator.page_size = 3
+        request = Request(self.factory.get('/logs/'))
+        rows = paginator.paginate_queryset(ActivityLog.objects.order_by('pk'), request)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(paginator.get_paginated_response([]).data['count'], 8)
+
+
+class ReplicaM2MSyncTests(TestCase):
+    """M2M pakeitimas (ir iš susijusio objekto pusės) įrašo savininką į outbox"""
+
+    def setUp(self):
+        from datetime import date
+
+        from apps.invoices.models import PurchaseInvoice
+        from apps.orders.models import Order
+        from apps.partners.models import Partner
+
+        enabled = mock.patch('apps.core.signals.is_replica_sync_enabled', return_value=True)
+        enabled.start()
+        self.addCleanup(enabled.stop)
+        partner = Partner.objects.create(name='Vežėjas', code='120')
+        self.order = Order.objects.create(client=partner, order_number='M1')
+        self.invoices = [
+            PurchaseInvoice.objects.create(
+                received_invoice_number=f'V-{index}', partner=partner, amount_net=10, amount_total=12,
+                issue_date=date(2025, 1, 15), due_date=date(2025, 2, 15),
+            )
+            for index in range(2)
+        ]
+        self.order.purchase_invoices_m2m.add(*self.invoices)
+        ReplicaSyncOutbox.objects.all().delete()
+
+    def queued(self):
+        return set(ReplicaSyncOutbox.objects.values_list('model_label', 'object_pk', 'operation'))
+
+    def test_reverse_clear_enqueues_owners(self):
+        self.order.purchase_invoices_m2m.clear()
+        self.assertEqual(
+            self.queued(), {('invoices.PurchaseInvoice', str(invoice.pk), 'save') for invoice in self.invoices}
+        )
+
+    def test_forward_clear_enqueues_instance(self):
+        self.invoices[0].related_orders.clear()
+        self.assertEqual(self.queued(), {('invoices.PurchaseInvoice', str(self.invoices[0].pk), 'save')})
+
@@ -0,0 +1,27 @@
+"""
+Teksto normalizavimas palyginimams (banko išrašai, sąskaitų derinimas).
+
+Užsakymų paieškos indeksas (apps.orders.search_index) turi savo kopiją: jo žodžiai saugomi DB,
+todėl ten tokenizavimas keičiamas tik kartu su indekso perskaičiavimu.
+"""
+
+import re
+import unicodedata
+from typing import List
+
+TOKEN_MAX_LENGTH = 64
+
+_TOKEN_RE = re.compile(r'[^\W_]+')
+
+
+def normalize_text(text) -> str:
+    """Mažosios raidės be diakritikų (ą -> a, š -> s), kad 'siauliai' atitiktų 'Šiauliai'"""
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+def tokenize(text) -> List[str]:
+    """Raidžių / skaitmenų žodžiai iš normalize_text() (skyrybos ženklai ir '_' - skirtukai)"""
+    if not text:
+        return []
+    return [token[:TOKEN_MAX_LENGTH] for token in _TOKEN_RE.findall(normalize_text(text))]
@@ -263,27 +263,4 @@ class StatusTransitionRuleViewSet(viewsets.ModelViewSet):
         
         return queryset.order_by('entity_type', 'order', 'current_status')
     
-    def perform_create(self, serializer):
-        """Sukurti taisyklę ir išvalyti StatusService cache'ą"""
-        instance = serializer.save()
-        # Išvalyti cache'ą, kad naujos taisyklės būtų naudojamos
-        from apps.core.services.status_service import StatusService
-        StatusService.clear_cache()
-        return instance
-    
-    def perform_update(self, serializer):
-        """Atnaujinti taisyklę ir išvalyti StatusService cache'ą"""
-        instance = serializer.save()
-        # Išvalyti cache'ą, kad atnaujintos taisyklės būtų naudojamos
-        from apps.core.services.status_service import StatusService
-        StatusService.clear_cache()
-        return instance
-    
-    def perform_destroy(self, instance):
-        """Ištrinti taisyklę ir išvalyti StatusService cache'ą"""
-        instance.delete()
-        # Išvalyti cache'ą, kad pakeitimai būtų matomi
-        from apps.core.services.status_service import StatusService
-        StatusService.clear_cache()
-
-
+    # StatusService cache'as atnaujinamas StatusTransitionRule post_save / post_delete signal'ais visuose worker'iuose
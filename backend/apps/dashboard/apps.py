@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class DashboardConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'apps.dashboard'
+    verbose_name = 'Dashboard'
+
+    def ready(self):
+        """Užregistruoti snapshot'o invalidavimo signal'us (perskaičiavimas - rebuild_dashboard_snapshot --loop)"""
+        import apps.dashboard.signals  # noqa
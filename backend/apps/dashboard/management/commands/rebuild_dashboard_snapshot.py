@@ -0,0 +1,64 @@
+"""
+Dashboard snapshot perskaičiavimas (saugiklis signal'ams): cron kas 30 min. arba nuolatinis procesas
+(systemd / supervisor) su --loop, ne web workeriuose.
+
+Pavyzdžiai:
+    python manage.py rebuild_dashboard_snapshot
+    python manage.py rebuild_dashboard_snapshot --period all --period month:2025-01
+    python manage.py rebuild_dashboard_snapshot --only-stale
+    python manage.py rebuild_dashboard_snapshot --loop --interval 900
+"""
+
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.dashboard.snapshot import rebuild_dashboard_snapshot, run_snapshot_scheduler
+
+
+class Command(BaseCommand):
+    help = 'Perskaičiuoja dashboard snapshot sekcijas'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--period', action='append',
+            help="Laikotarpio raktas: 'all' arba 'month:YYYY-MM' (galima kartoti; numatytai - all, šis ir praėjęs mėnuo)"
+        )
+        parser.add_argument('--only-stale', action='store_true', help='Tik pasenusios / trūkstamos sekcijos')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Veikti nuolat: pasenusios sekcijos perskaičiuojamos kas --interval sekundžių'
+        )
+        parser.add_argument(
+            '--interval', type=int, default=None,
+            help='Perskaičiavimo intervalas sek. su --loop (numatytai DASHBOARD_SNAPSHOT_REBUILD_INTERVAL)'
+        )
+
+    def handle(self, *args, **options):
+        if options['loop']:
+            self._run_loop(options['interval'])
+            return
+
+        started = time.perf_counter()
+        rebuilt = rebuild_dashboard_snapshot(period_keys=options['period'], only_stale=options['only_stale'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Perskaičiuota sekcijų: {rebuilt} ({time.perf_counter() - started:.2f} s)'
+        ))
+
+    def _run_loop(self, interval):
+        interval = interval or getattr(settings, 'DASHBOARD_SNAPSHOT_REBUILD_INTERVAL', 1800)
+        if interval <= 0:
+            raise CommandError('Intervalas turi būti teigiamas (--interval arba DASHBOARD_SNAPSHOT_REBUILD_INTERVAL)')
+        stop_event = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write('Gautas sustabdymo signalas – baigiama...')
+            stop_event.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        self.stdout.write(f'Dashboard snapshot perskaičiavimas kas {interval} s (Ctrl+C sustabdyti)...')
+        run_snapshot_scheduler(interval=interval, stop_event=stop_event)
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DashboardSnapshotSection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_key', models.CharField(blank=True, default='', max_length=20, verbose_name='Laikotarpis')),
+                ('section', models.CharField(max_length=40, verbose_name='Sekcija')),
+                ('payload', models.JSONField(default=dict, verbose_name='Duomenys')),
+                ('is_dirty', models.BooleanField(default=False, verbose_name='Pasenęs')),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('computed_at', models.DateTimeField(verbose_name='Apskaičiuota')),
+                ('compute_ms', models.PositiveIntegerField(default=0, verbose_name='Skaičiavimo trukmė (ms)')),
+            ],
+            options={
+                'verbose_name': 'Dashboard sekcija',
+                'verbose_name_plural': 'Dashboard sekcijos',
+                'db_table': 'dashboard_snapshot_sections',
+                'indexes': [models.Index(fields=['section', 'is_dirty'], name='dashboard_snapshot_dirty_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dashboardsnapshotsection',
+            constraint=models.UniqueConstraint(fields=('period_key', 'section'), name='dashboard_snapshot_period_section_uniq'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class DashboardSnapshotSection(models.Model):
+    """
+    Apskaičiuota dashboard sekcija (apps.dashboard.snapshot).
+    period_key: '' - bendros sekcijos, 'all' - visas laikotarpis, 'month:YYYY-MM' - mėnuo.
+    """
+
+    period_key = models.CharField(max_length=20, blank=True, default='', verbose_name=_('Laikotarpis'))
+    section = models.CharField(max_length=40, verbose_name=_('Sekcija'))
+    payload = models.JSONField(default=dict, verbose_name=_('Duomenys'))
+    is_dirty = models.BooleanField(default=False, verbose_name=_('Pasenęs'))
+    # Didinamas kiekvieną kartą pažymint pasenusiu - perskaičiavimas neišvalo žymės, jei duomenys pasikeitė jo metu
+    version = models.PositiveIntegerField(default=0)
+    computed_at = models.DateTimeField(verbose_name=_('Apskaičiuota'))
+    compute_ms = models.PositiveIntegerField(default=0, verbose_name=_('Skaičiavimo trukmė (ms)'))
+
+    class Meta:
+        db_table = 'dashboard_snapshot_sections'
+        verbose_name = _('Dashboard sekcija')
+        verbose_name_plural = _('Dashboard sekcijos')
+        constraints = [
+            models.UniqueConstraint(fields=['period_key', 'section'], name='dashboard_snapshot_period_section_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['section', 'is_dirty'], name='dashboard_snapshot_dirty_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.period_key or '-'}: {self.section}"
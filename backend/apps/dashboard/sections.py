@@ -0,0 +1,668 @@
+"""
+Dashboard statistikos sekcijos.
+
+dashboard_statistics anksčiau visą atsakymą skaičiavo vienoje funkcijoje. Dabar kiekviena sekcija -
+atskira funkcija section(params) -> atsakymo fragmentas ({'invoices': {...}, 'alerts': [...]}),
+fragmentai sujungiami assemble_dashboard() SECTION_ORDER tvarka.
+
+Sekcijos dviejų rūšių:
+- laikotarpio (PERIOD_SECTIONS) - priklauso nuo period_type / date_from / date_to / filter_by,
+- bendros - "dabar" informacija (vėluojančios sąskaitos, užsakymų sekimas, tarpai numeracijoje),
+  nepriklauso nuo užklausos parametrų.
+Sekcijų rezultatai saugomi snapshot'e (apps.dashboard.snapshot).
+"""
+
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from apps.invoices.models import PurchaseInvoice, SalesInvoice, SalesInvoiceOrder
+from apps.invoices.utils import find_invoice_number_gaps, get_invoice_sequence_state
+from apps.orders.models import Order, OrderCarrier
+from apps.partners.models import Partner
+
+DashboardParams = namedtuple('DashboardParams', 'today date_from date_to filter_by')
+
+ORDER_STATUSES = [
+    'new', 'assigned', 'executing', 'waiting_for_docs', 'waiting_for_payment', 'finished', 'closed', 'canceled',
+]
+# filter_by reikšmės, kurios skaičiuojamos kaip numatytasis filtras (sąskaitos - pagal issue_date)
+DEFAULT_FILTERS = ('', 'issue_date')
+
+
+def month_bounds(year, month):
+    date_from = date(year, month, 1)
+    if month == 12:
+        date_to = date(year + 1, 1, 1) - timedelta(days=1)
+    else:
+        date_to = date(year, month + 1, 1) - timedelta(days=1)
+    return date_from, date_to
+
+
+def parse_dashboard_params(query_params) -> DashboardParams:
+    """
+    Užklausos parametrai -> DashboardParams.
+    - period_type: 'all' arba 'month' (default: 'month')
+    - date_from / date_to: YYYY-MM-DD – tikslius rėžiai (šiandien, savaitė, custom)
+    - year / month: mėnuo (default: dabartinis)
+    - filter_by: issue_date, due_date, payment_date, created_at, order_date, loading_date, unloading_date,
+      first_order, first_invoice
+    """
+    today = timezone.now().date()
+    period_type = query_params.get('period_type', 'month')
+    date_from_param = query_params.get('date_from')
+    date_to_param = query_params.get('date_to')
+    filter_by = query_params.get('filter_by', '')
+
+    if period_type == 'all':
+        # Nuo pradžių
+        date_from = None
+        date_to = None
+    elif date_from_param and date_to_param:
+        try:
+            date_from = date.fromisoformat(date_from_param)
+            date_to = date.fromisoformat(date_to_param)
+            if date_from > date_to:
+                date_from, date_to = date_to, date_from
+        except (ValueError, TypeError):
+            date_from, date_to = month_bounds(today.year, today.month)
+    else:
+        year = int(query_params.get('year') or today.year)
+        month = int(query_params.get('month') or today.month)
+        date_from, date_to = month_bounds(year, month)
+
+    return DashboardParams(today=today, date_from=date_from, date_to=date_to, filter_by=filter_by)
+
+
+def _day_bounds(params):
+    """Laikotarpio rėžiai kaip aware datetime (created_at ir pan. laukams)"""
+    date_from_dt = timezone.make_aware(datetime.combine(params.date_from, datetime.min.time()))
+    date_to_dt = timezone.make_aware(datetime.combine(params.date_to, datetime.max.time()))
+    return date_from_dt, date_to_dt
+
+
+def _filter_invoices_by_period(queryset, params):
+    """Sąskaitos pagal pasirinktą lauką (filter_by); be laikotarpio - visos"""
+    if not (params.date_from and params.date_to):
+        return queryset
+    if params.filter_by == 'due_date':
+        # Filtruoti pagal termino datą
+        return queryset.filter(due_date__gte=params.date_from, due_date__lte=params.date_to)
+    if params.filter_by == 'payment_date':
+        # Filtruoti pagal mokėjimo datą (tik apmokėtoms)
+        return queryset.filter(payment_date__gte=params.date_from, payment_date__lte=params.date_to)
+    if params.filter_by == 'created_at':
+        date_from_dt, date_to_dt = _day_bounds(params)
+        return queryset.filter(created_at__gte=date_from_dt, created_at__lte=date_to_dt)
+    # Default: filtruoti pagal issue_date (išrašymo datą)
+    return queryset.filter(issue_date__gte=params.date_from, issue_date__lte=params.date_to)
+
+
+def _purchase_number(invoice):
+    return invoice.received_invoice_number or invoice.invoice_number or f'INV{invoice.id}'
+
+
+def _invoice_brief(invoice, number):
+    return {
+        'invoice_number': number,
+        'partner_name': invoice.partner.name,
+        'amount_total': str(invoice.amount_total),
+        'issue_date': invoice.issue_date.isoformat() if invoice.issue_date else None,
+        'due_date': invoice.due_date.isoformat() if invoice.due_date else None,
+    }
+
+
+def _count_and_total(queryset):
+    result = queryset.aggregate(count=Count('id'), total=Sum('amount_total'))
+    return result['count'], result['total'] or Decimal('0.00')
+
+
+def _order_brief(order):
+    return {
+        'id': order.id,
+        'order_number': order.order_number or f'#{order.id}',
+        'client_name': order.client.name if order.client else '-',
+    }
+
+
+def period_invoices_section(params):
+    """Neapmokėtos / apmokėtos išrašytos ir gautos sąskaitos pasirinktame laikotarpyje"""
+    # Neįtraukti testinių duomenų (pagal partnerio pavadinimą)
+    sales_invoices_query = _filter_invoices_by_period(
+        SalesInvoice.objects.exclude(partner__name__icontains='test').exclude(
+            partner__name__icontains='demo'
+        ).exclude(partner__name__icontains='testinis'),
+        params
+    )
+    purchase_invoices_query = _filter_invoices_by_period(PurchaseInvoice.objects.all(), params)
+
+    unpaid_sales = sales_invoices_query.filter(
+        payment_status__in=['unpaid', 'partially_paid']
+    ).select_related('partner').order_by('issue_date', 'created_at')
+    unpaid_sales_count, unpaid_sales_total = _count_and_total(unpaid_sales)
+    paid_sales_count, paid_sales_total = _count_and_total(sales_invoices_query.filter(payment_status='paid'))
+
+    unpaid_purchase = purchase_invoices_query.filter(
+        payment_status__in=['unpaid', 'partially_paid']
+    ).select_related('partner').order_by('issue_date', 'created_at')
+    unpaid_purchase_count, unpaid_purchase_total = _count_and_total(unpaid_purchase)
+    paid_purchase_count, paid_purchase_total = _count_and_total(purchase_invoices_query.filter(payment_status='paid'))
+
+    return {
+        'invoices': {
+            'unpaid_sales': {
+                'count': unpaid_sales_count,
+                'total': str(unpaid_sales_total),
+                # 3 seniausios neapmokėtos išrašytos sąskaitos
+                'oldest_invoices': [_invoice_brief(inv, inv.invoice_number) for inv in unpaid_sales[:3]],
+            },
+            'paid_sales': {
+                'count': paid_sales_count,
+                'total': str(paid_sales_total),
+            },
+            'unpaid_purchase': {
+                'count': unpaid_purchase_count,
+                'total': str(unpaid_purchase_total),
+                'oldest_invoices': [_invoice_brief(inv, _purchase_number(inv)) for inv in unpaid_purchase[:3]],
+            },
+            'paid_purchase': {
+                'count': paid_purchase_count,
+                'total': str(paid_purchase_total),
+            },
+        }
+    }
+
+
+def open_invoices_section(params):
+    """
+    Dalinai apmokėtos ir vėluojančios sąskaitos – VISADA visos (kaip Mokėjimų valdyme, be laikotarpio filtro).
+    Vėluojančios = terminas praėjęs ir neapmokėta (įsk. statusą 'overdue').
+    """
+    today = params.today
+    partially_paid_sales = SalesInvoice.objects.filter(
+        payment_status=SalesInvoice.PaymentStatus.PARTIALLY_PAID
+    ).select_related('partner').order_by('issue_date', 'created_at')
+    partially_paid_sales_count, partially_paid_sales_total = _count_and_total(partially_paid_sales)
+
+    partially_paid_purchase = PurchaseInvoice.objects.filter(
+        payment_status=PurchaseInvoice.PaymentStatus.PARTIALLY_PAID
+    ).select_related('partner').order_by('issue_date', 'created_at')
+    partially_paid_purchase_count, partially_paid_purchase_total = _count_and_total(partially_paid_purchase)
+
+    overdue_sales = SalesInvoice.objects.filter(
+        due_date__lt=today
+    ).exclude(
+        payment_status='paid'
+    ).select_related('partner').order_by('due_date', 'issue_date')
+    overdue_sales_count = overdue_sales.count()
+    # Pirmos 50 - ir 3 seniausioms, ir pranešimo detalėms (tooltip'ui)
+    overdue_sales_list = list(overdue_sales[:50])
+
+    overdue_purchase = PurchaseInvoice.objects.filter(
+        due_date__lt=today
+    ).exclude(
+        payment_status='paid'
+    ).select_related('partner').order_by('due_date', 'issue_date')
+    overdue_purchase_count = overdue_purchase.count()
+    overdue_purchase_list = list(overdue_purchase[:50])
+
+    alerts = []
+    if overdue_sales_count > 0:
+        alerts.append({
+            'type': 'error',
+            'message': f'⚠️ {overdue_sales_count} vėluojančios išrašytos sąskaitos',
+            'link': '/invoices?status=overdue&type=sales',
+            'details': [
+                {
+                    'id': inv.id,
+                    'invoice_number': inv.invoice_number,
+                    'partner_name': inv.partner.name if inv.partner else '-',
+                    'amount_total': str(inv.amount_total),
+                    'due_date': inv.due_date.isoformat() if inv.due_date else None,
+                }
+                for inv in overdue_sales_list
+            ]
+        })
+    if overdue_purchase_count > 0:
+        alerts.append({
+            'type': 'error',
+            'message': f'⚠️ {overdue_purchase_count} vėluojančios gautos sąskaitos',
+            'link': '/invoices?status=overdue&type=purchase',
+            'details': [
+                {
+                    'id': inv.id,
+                    'invoice_number': _purchase_number(inv),
+                    'partner_name': inv.partner.name if inv.partner else '-',
+                    'amount_total': str(inv.amount_total),
+                    'due_date': inv.due_date.isoformat() if inv.due_date else None,
+                }
+                for inv in overdue_purchase_list
+            ]
+        })
+
+    return {
+        'invoices': {
+            'partially_paid_sales': {
+                'count': partially_paid_sales_count,
+                'total': str(partially_paid_sales_total),
+                'oldest_invoices': [_invoice_brief(inv, inv.invoice_number) for inv in partially_paid_sales[:3]],
+            },
+            'partially_paid_purchase': {
+                'count': partially_paid_purchase_count,
+                'total': str(partially_paid_purchase_total),
+                'oldest_invoices': [
+                    _invoice_brief(inv, _purchase_number(inv)) for inv in partially_paid_purchase[:3]
+                ],
+            },
+            'overdue_sales': {
+                'count': overdue_sales_count,
+                'oldest_invoices': [_invoice_brief(inv, inv.invoice_number) for inv in overdue_sales_list[:3]],
+            },
+            'overdue_purchase': {
+                'count': overdue_purchase_count,
+                'oldest_invoices': [_invoice_brief(inv, _purchase_number(inv)) for inv in overdue_purchase_list[:3]],
+            },
+        },
+        'alerts': alerts,
+    }
+
+
+def orders_section(params):
+    """Užsakymai – VISADA visi (nepriklausomai nuo laikotarpio), kiekis pagal statusą viena užklausa"""
+    counts = dict(Order.objects.values_list('status').annotate(count=Count('id')).order_by())
+    data = {'total': sum(counts.values())}
+    for order_status in ORDER_STATUSES:
+        data[order_status] = counts.get(order_status, 0)
+    # Nebaigti = visi ne finished, ne closed, ne canceled (atgaliniam suderinamumui)
+    data['unfinished'] = data['total'] - data['finished'] - data['closed'] - data['canceled']
+    return {'orders': data}
+
+
+def clients_section(params):
+    """Nauji klientai (filtruojami pagal pasirinktą datą)"""
+    if params.date_from and params.date_to:
+        date_from_dt, date_to_dt = _day_bounds(params)
+        if params.filter_by == 'first_order':
+            # Filtruoti pagal pirmą užsakymą
+            new_clients_count = Partner.objects.filter(
+                is_client=True,
+                orders__created_at__gte=date_from_dt,
+                orders__created_at__lte=date_to_dt
+            ).distinct().count()
+        elif params.filter_by == 'first_invoice':
+            # Filtruoti pagal pirmą sąskaitą
+            new_clients_count = Partner.objects.filter(
+                is_client=True,
+                sales_invoices__issue_date__gte=params.date_from,
+                sales_invoices__issue_date__lte=params.date_to
+            ).distinct().count()
+        else:
+            # Default: filtruoti pagal created_at (sukūrimo datą)
+            new_clients_count = Partner.objects.filter(
+                is_client=True,
+                created_at__gte=date_from_dt,
+                created_at__lte=date_to_dt
+            ).count()
+    else:
+        new_clients_count = Partner.objects.filter(is_client=True).count()
+    return {'clients': {'new_this_month': new_clients_count}}
+
+
+def _orders_with_prices(params):
+    """Užsakymai finansinei statistikai pagal pasirinktą filtravimo variantą"""
+    orders = Order.objects.filter(client_price_net__isnull=False)
+    if not (params.date_from and params.date_to):
+        # Jei period_type='all', naudoti visus užsakymus
+        return orders
+    first_day, last_day = params.date_from, params.date_to
+    date_from_dt, date_to_dt = _day_bounds(params)
+    if params.filter_by == 'payment_date':
+        # Užsakymai su apmokėtomis sąskaitomis
+        return orders.filter(
+            Q(sales_invoices__payment_date__gte=first_day, sales_invoices__payment_date__lte=last_day) |
+            Q(purchase_invoices_m2m__payment_date__gte=first_day, purchase_invoices_m2m__payment_date__lte=last_day)
+        ).distinct()
+    if params.filter_by == 'order_date':
+        return orders.filter(order_date__gte=date_from_dt, order_date__lte=date_to_dt)
+    if params.filter_by == 'loading_date':
+        return orders.filter(loading_date__gte=date_from_dt, loading_date__lte=date_to_dt)
+    if params.filter_by == 'unloading_date':
+        return orders.filter(unloading_date__gte=date_from_dt, unloading_date__lte=date_to_dt)
+
+    # Default: užsakymai su sąskaitomis pasirinktame laikotarpyje arba užsakymai su tikrąja data
+    orders_with_invoices = orders.filter(
+        Q(sales_invoices__issue_date__gte=first_day, sales_invoices__issue_date__lte=last_day) |
+        Q(purchase_invoices_m2m__issue_date__gte=first_day, purchase_invoices_m2m__issue_date__lte=last_day)
+    ).distinct()
+    orders_with_dates = orders.filter(
+        Q(order_date__date__gte=first_day, order_date__date__lte=last_day) |
+        Q(order_date__isnull=True, loading_date__date__gte=first_day, loading_date__date__lte=last_day) |
+        Q(order_date__isnull=True, loading_date__isnull=True,
+          unloading_date__date__gte=first_day, unloading_date__date__lte=last_day)
+    ).distinct()
+    return (orders_with_invoices | orders_with_dates).distinct()
+
+
+def finance_section(params):
+    """Pelnas, pajamos, išlaidos ir apmokėtos / neapmokėtos sąskaitos pasirinktame laikotarpyje"""
+    orders = list(_orders_with_prices(params).only('id', 'client_price_net', 'other_costs'))
+    # Vežėjų kainos - viena grupuota užklausa visiems užsakymams
+    carrier_costs_by_order = dict(
+        OrderCarrier.objects.filter(order_id__in=[order.id for order in orders])
+        .values_list('order_id')
+        .annotate(total=Sum('price_net'))
+        .order_by()
+    )
+
+    monthly_profit = Decimal('0.00')
+    monthly_revenue = Decimal('0.00')
+    monthly_expenses = Decimal('0.00')
+    for order in orders:
+        client_price = Decimal(str(order.client_price_net)) if order.client_price_net else Decimal('0.00')
+        monthly_revenue += client_price
+
+        carrier_costs = carrier_costs_by_order.get(order.id) or Decimal('0.00')
+        carrier_costs = Decimal(str(carrier_costs))
+
+        # Kitos išlaidos
+        other_costs = Decimal('0.00')
+        if isinstance(order.other_costs, list):
+            for cost in order.other_costs:
+                if isinstance(cost, dict) and 'amount' in cost:
+                    other_costs += Decimal(str(cost['amount']))
+
+        monthly_expenses += carrier_costs + other_costs
+        monthly_profit += client_price - carrier_costs - other_costs
+
+    # Apmokėtos ir neapmokėtos sąskaitos (filtruojamos pagal pasirinktą lauką, be testinių partnerių išimties)
+    sales_invoices_period = _filter_invoices_by_period(SalesInvoice.objects.all(), params)
+    purchase_invoices_period = _filter_invoices_by_period(PurchaseInvoice.objects.all(), params)
+    paid_sales = sales_invoices_period.filter(
+        payment_status='paid'
+    ).aggregate(total=Sum('amount_total'))['total'] or Decimal('0.00')
+    unpaid_sales = sales_invoices_period.filter(
+        payment_status__in=['unpaid', 'partially_paid']
+    ).aggregate(total=Sum('amount_total'))['total'] or Decimal('0.00')
+    paid_purchase = purchase_invoices_period.filter(
+        payment_status='paid'
+    ).aggregate(total=Sum('amount_total'))['total'] or Decimal('0.00')
+    unpaid_purchase = purchase_invoices_period.filter(
+        payment_status__in=['unpaid', 'partially_paid']
+    ).aggregate(total=Sum('amount_total'))['total'] or Decimal('0.00')
+
+    return {
+        'finance': {
+            'monthly_profit': str(monthly_profit),
+            'monthly_revenue': str(monthly_revenue),
+            'monthly_expenses': str(monthly_expenses),
+            'cash_flow': str(paid_sales - paid_purchase),
+            'paid_revenue': str(paid_sales),
+            'unpaid_revenue': str(unpaid_sales),
+            'paid_expenses': str(paid_purchase),
+            'unpaid_expenses': str(unpaid_purchase),
+        }
+    }
+
+
+def _date_string(value):
+    if not value:
+        return None
+    if isinstance(value, str):
+        return value
+    if hasattr(value, 'date'):
+        return value.date().isoformat()
+    return value.isoformat()
+
+
+def orders_tracking_section(params):
+    """Užsakymų sekimas (NEPRIKLAUSOMAI nuo datų filtro - tai yra "dabar" informacija)"""
+    today = params.today
+
+    # Užsakymai be vežėjų
+    orders_without_carriers_query = Order.objects.filter(
+        status__in=['new', 'assigned', 'executing']
+    ).annotate(carrier_count=Count('carriers')).filter(carrier_count=0)
+    orders_without_carriers = orders_without_carriers_query.count()
+    orders_without_carriers_list = [
+        _order_brief(order) for order in orders_without_carriers_query.select_related('client')[:50]
+    ]
+
+    # Užsakymai be sąskaitų (neturi nei pardavimo [FK arba M2M], nei pirkimo sąskaitų)
+    orders_without_invoices_query = Order.objects.exclude(
+        status='canceled'
+    ).annotate(
+        sales_inv_count=Count('sales_invoices'),
+        sales_m2m_count=Count('order_sales_invoices'),
+        purchase_inv_count=Count('purchase_invoices_m2m')
+    ).filter(
+        sales_inv_count=0,
+        sales_m2m_count=0,
+        purchase_inv_count=0
+    ).select_related('client')
+    orders_without_invoices = orders_without_invoices_query.count()
+    orders_without_invoices_list = [
+        dict(_order_brief(order), status=order.status) for order in orders_without_invoices_query[:50]
+    ]
+
+    # Užsakymai be krovinių (neturi cargo_items)
+    orders_without_cargo = Order.objects.exclude(
+        status='canceled'
+    ).annotate(cargo_count=Count('cargo_items')).filter(cargo_count=0).count()
+
+    # Užsakymai be maršruto (nauja sistema: 0 route_stops; sena: route_from/route_to ir miestai/šalys tušti)
+    orders_without_route = Order.objects.exclude(
+        status='canceled'
+    ).annotate(
+        route_stops_count=Count('route_stops')
+    ).filter(
+        Q(use_new_route_system=True, route_stops_count=0) |
+        Q(use_new_route_system=False, route_from='', route_to='', route_from_city='', route_from_country='',
+          route_to_city='', route_to_country='')
+    ).count()
+
+    # Užsakymai be kainos klientui (client_price_net tuščia arba 0)
+    orders_without_client_price = Order.objects.exclude(
+        status='canceled'
+    ).filter(Q(client_price_net__isnull=True) | Q(client_price_net=0)).count()
+
+    # Vežėjų priskyrimai be kainos (OrderCarrier su price_net tuščia arba 0)
+    carriers_without_price_count = OrderCarrier.objects.filter(
+        Q(price_net__isnull=True) | Q(price_net=0)
+    ).count()
+
+    # Artimiausi užsakymai (pakrovimo/iškrovimo datos per 7 dienas)
+    now = timezone.now()
+    upcoming_date = now + timedelta(days=7)
+    upcoming_orders = Order.objects.filter(
+        Q(loading_date__gte=now, loading_date__lte=upcoming_date) |
+        Q(unloading_date__gte=now, unloading_date__lte=upcoming_date)
+    ).exclude(status='canceled').select_related('client').order_by('loading_date', 'unloading_date')[:5]
+    upcoming_orders_list = [
+        dict(
+            _order_brief(order),
+            loading_date=_date_string(order.loading_date),
+            unloading_date=_date_string(order.unloading_date),
+            status=order.status,
+            route_from=order.route_from or f"{order.route_from_city or ''}, {order.route_from_country or ''}".strip(', ') or '-',
+            route_to=order.route_to or f"{order.route_to_city or ''}, {order.route_to_country or ''}".strip(', ') or '-',
+        )
+        for order in upcoming_orders
+    ]
+
+    # Užsakymai su vėluojančiomis išrašytomis sąskaitomis (per M2M SalesInvoiceOrder arba FK related_order_id)
+    overdue_sales_invoice_ids = SalesInvoice.objects.filter(
+        due_date__lt=today
+    ).exclude(
+        payment_status='paid'
+    ).values_list('id', flat=True)
+    order_ids_m2m = SalesInvoiceOrder.objects.filter(
+        invoice_id__in=overdue_sales_invoice_ids
+    ).values_list('order_id', flat=True).distinct()
+    order_ids_fk = SalesInvoice.objects.filter(
+        id__in=overdue_sales_invoice_ids
+    ).exclude(
+        related_order_id__isnull=True
+    ).values_list('related_order_id', flat=True).distinct()
+    orders_with_overdue = len(set(order_ids_m2m) | set(order_ids_fk))
+
+    alerts = []
+    if orders_without_carriers > 0:
+        alerts.append({
+            'type': 'warning',
+            'message': f'⚠️ {orders_without_carriers} užsakymai be vežėjų',
+            'link': '/orders?status=new,assigned,executing',
+            'details': orders_without_carriers_list  # Užsakymų sąrašas tooltip'ui
+        })
+    if orders_without_invoices > 0:
+        alerts.append({
+            'type': 'info',
+            'message': f'ℹ️ {orders_without_invoices} užsakymai be sąskaitų',
+            'link': '/orders',
+            'details': orders_without_invoices_list  # Užsakymų sąrašas tooltip'ui
+        })
+
+    return {
+        'orders_tracking': {
+            'without_carriers': orders_without_carriers,
+            'finished_without_invoices': orders_without_invoices,  # Dabar rodo visus užsakymus be sąskaitų, ne tik baigtus
+            'with_overdue_invoices': orders_with_overdue,
+            'without_cargo': orders_without_cargo,
+            'without_route': orders_without_route,
+            'without_client_price': orders_without_client_price,
+            'without_carrier_price': carriers_without_price_count,
+            'upcoming': upcoming_orders_list,
+        },
+        'alerts': alerts,
+    }
+
+
+def carriers_tracking_section(params):
+    """Vežėjai be gautų sąskaitų ir su vėluojančiomis sąskaitomis (NEPRIKLAUSOMAI nuo datų filtro)"""
+    today = params.today
+
+    # Užsakymai baigti, bet vežėjams negautos sąskaitos
+    carriers_without_invoices_query = OrderCarrier.objects.filter(
+        order__status='finished',
+        invoice_received=False
+    )
+    # PIRMA suskaičiuoti visus, PO TO apriboti sąrašą rodymui
+    carriers_without_invoices_count = carriers_without_invoices_query.count()
+    carriers_without_invoices_list = [
+        {
+            'order_id': carrier.order.id,
+            'order_number': carrier.order.order_number or f'#{carrier.order.id}',
+            'carrier_name': carrier.partner.name if carrier.partner else '-',
+            'order_created': carrier.order.created_at.isoformat() if carrier.order.created_at else None,
+        }
+        for carrier in carriers_without_invoices_query.select_related('order', 'partner').order_by('order__created_at')[:50]
+    ]
+
+    # Įskaitant statusą 'overdue' (kaip Mokėjimų valdyme)
+    carriers_with_overdue_query = OrderCarrier.objects.filter(
+        due_date__lt=today
+    ).exclude(
+        payment_status='paid'
+    )
+    carriers_with_overdue_count = carriers_with_overdue_query.count()
+    carriers_with_overdue_list = [
+        {
+            'order_id': carrier.order.id,
+            'order_number': carrier.order.order_number or f'#{carrier.order.id}',
+            'carrier_name': carrier.partner.name if carrier.partner else '-',
+            'due_date': carrier.due_date.isoformat() if carrier.due_date else None,
+            'overdue_days': (today - carrier.due_date).days if carrier.due_date else 0,
+        }
+        for carrier in carriers_with_overdue_query.select_related('order', 'partner').order_by('due_date')[:50]
+    ]
+
+    return {
+        'carriers_tracking': {
+            'without_invoices': {
+                'count': carriers_without_invoices_count,
+                'list': carriers_without_invoices_list
+            },
+            'with_overdue': {
+                'count': carriers_with_overdue_count,
+                'list': carriers_with_overdue_list
+            }
+        }
+    }
+
+
+def gaps_section(params):
+    """Tarpai sąskaitų numeracijoje (pranešimas su visais tarpais tooltip'ui)"""
+    invoice_gaps = find_invoice_number_gaps(max_gaps=1000)  # Didelis limitas, kad gautume visus
+    if not invoice_gaps:
+        return {'alerts': []}
+
+    from apps.settings.models import InvoiceSettings
+    inv_settings = InvoiceSettings.load()
+    prefix = inv_settings.invoice_prefix_sales or 'LOG'
+    width = inv_settings.invoice_number_width or 7
+    _, separator = get_invoice_sequence_state(prefix, width)
+
+    def number(value):
+        return f"{prefix}{separator}{value:0{width}d}"
+
+    # Pirmi 3 tarpai rodomi pagrindiniame pranešime
+    gap_messages = [
+        number(gap_start) if gap_start == gap_end else f"{number(gap_start)}-{number(gap_end)}"
+        for gap_start, gap_end in invoice_gaps[:3]
+    ]
+    # Kiekvienam tarpui - diapazonas IR visi numeriai tame diapazone
+    all_gaps_formatted = []
+    for gap_start, gap_end in invoice_gaps:
+        gap_numbers = [number(value) for value in range(gap_start, gap_end + 1)]
+        all_gaps_formatted.append({
+            'range': number(gap_start) if gap_start == gap_end else f"{number(gap_start)}-{number(gap_end)}",
+            'numbers': gap_numbers,
+            'count': len(gap_numbers)
+        })
+
+    gaps_text = ', '.join(gap_messages)
+    if len(invoice_gaps) > 3:
+        gaps_text += f' (+{len(invoice_gaps) - 3} dar)'
+
+    return {
+        'alerts': [{
+            'type': 'warning',
+            'message': f'⚠️ Yra tarpų sąskaitų numeracijoje: {gaps_text}',
+            'link': '/settings',
+            'gaps': all_gaps_formatted,  # Visi tarpai tooltip'ui
+            'gaps_count': len(invoice_gaps)  # Tikras tarpų skaičius
+        }]
+    }
+
+
+SECTIONS = {
+    'period_invoices': period_invoices_section,
+    'open_invoices': open_invoices_section,
+    'orders': orders_section,
+    'clients': clients_section,
+    'finance': finance_section,
+    'orders_tracking': orders_tracking_section,
+    'carriers_tracking': carriers_tracking_section,
+    'gaps': gaps_section,
+}
+# Atsakymo fragmentų (ir pranešimų) tvarka
+SECTION_ORDER = list(SECTIONS)
+PERIOD_SECTIONS = {'period_invoices', 'clients', 'finance'}
+
+
+def assemble_dashboard(fragments: dict) -> dict:
+    """Sekcijų fragmentai -> dashboard atsakymas (tos pačios viršutinio lygio dalys sujungiamos)"""
+    response = {}
+    alerts = []
+    for name in SECTION_ORDER:
+        for key, value in (fragments.get(name) or {}).items():
+            if key == 'alerts':
+                alerts.extend(value)
+            elif isinstance(value, dict) and isinstance(response.get(key), dict):
+                response[key].update(value)
+            else:
+                response[key] = value
+    response['alerts'] = alerts
+    return response
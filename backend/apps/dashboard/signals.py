@@ -0,0 +1,56 @@
+"""
+Dashboard snapshot invalidavimas: pakeitus užsakymus, vežėjus, sąskaitas, mokėjimus ar partnerius
+paveiktos sekcijos pažymimos pasenusiomis po transakcijos commit (žr. snapshot.MODEL_SECTIONS).
+Masiniai pakeitimai be post_save praneša per apps.core.bulk_changes.bulk_changed.
+"""
+
+import logging
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.core.bulk_changes import bulk_changed
+from apps.invoices.models import InvoicePayment, PurchaseInvoice, SalesInvoice, SalesInvoiceOrder
+from apps.orders.models import Order, OrderCarrier
+from apps.partners.models import Partner
+
+from .snapshot import schedule_model_invalidation
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(post_save, sender=OrderCarrier)
+@receiver(post_delete, sender=OrderCarrier)
+@receiver(post_save, sender=SalesInvoice)
+@receiver(post_delete, sender=SalesInvoice)
+@receiver(post_save, sender=SalesInvoiceOrder)
+@receiver(post_delete, sender=SalesInvoiceOrder)
+@receiver(post_save, sender=PurchaseInvoice)
+@receiver(post_delete, sender=PurchaseInvoice)
+@receiver(post_save, sender=InvoicePayment)
+@receiver(post_delete, sender=InvoicePayment)
+@receiver(post_save, sender=Partner)
+@receiver(post_delete, sender=Partner)
+def invalidate_dashboard_snapshot(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    try:
+        schedule_model_invalidation(sender.__name__)
+    except Exception as e:
+        logger.error(f"Klaida signal'e invalidate_dashboard_snapshot ({sender.__name__}): {e}", exc_info=True)
+
+
+@receiver(bulk_changed, sender=Order)
+@receiver(bulk_changed, sender=OrderCarrier)
+@receiver(bulk_changed, sender=SalesInvoice)
+@receiver(bulk_changed, sender=SalesInvoiceOrder)
+@receiver(bulk_changed, sender=PurchaseInvoice)
+@receiver(bulk_changed, sender=InvoicePayment)
+@receiver(bulk_changed, sender=Partner)
+def invalidate_dashboard_snapshot_bulk(sender, instances, **kwargs):
+    try:
+        schedule_model_invalidation(sender.__name__)
+    except Exception as e:
+        logger.error(f"Klaida signal'e invalidate_dashboard_snapshot_bulk ({sender.__name__}): {e}", exc_info=True)
@@ -0,0 +1,420 @@
+"""
+Dashboard snapshot - apskaičiuotos sekcijos (apps.dashboard.sections) saugomos DB.
+
+Anksčiau dashboard_statistics kiekvienam puslapio atidarymui ir kiekvienam vartotojui iš naujo
+vykdė kelias dešimtis užklausų (ir Python ciklų per mėnesio užsakymus). Dabar:
+- sekcijos rezultatas saugomas lentelėje dashboard_snapshot_sections: bendros sekcijos - vienas
+  įrašas (period_key ''), laikotarpio sekcijos - atskirai 'all' ir kiekvienam mėnesiui ('month:YYYY-MM'),
+  kai filtruojama numatytuoju būdu (filter_by '' / issue_date). Kiti filtrai ir laisvi rėžiai skaičiuojami gyvai;
+- Order, OrderCarrier, SalesInvoice, SalesInvoiceOrder, PurchaseInvoice, InvoicePayment, Partner signal'ai
+  pažymi paveiktas sekcijas pasenusiomis (viena UPDATE užklausa po transakcijos commit);
+- view nuskaito reikalingas sekcijas viena užklausa ir perskaičiuoja tik pasenusias, apskaičiuotas
+  ne šiandien (vėlavimas priklauso nuo datos) arba senesnes nei DASHBOARD_SNAPSHOT_MAX_AGE;
+- saugiklis - perskaičiavimas atskirame procese kas DASHBOARD_SNAPSHOT_REBUILD_INTERVAL sekundžių
+  (manage.py rebuild_dashboard_snapshot --loop) arba per cron (be --loop). Juo atnaujinami ir
+  pakeitimai, kurie nesiunčia signal'ų (queryset.update(), kroviniai, maršruto taškai, nustatymai).
+
+Kiekviena sekcija turi savo galiojimo laiką (SECTION_TTLS, DASHBOARD_SECTION_TTLS). Gyvai skaičiuojamos
+sekcijos (kiti filtrai / rėžiai, išjungtas snapshot) tiek laikomos Django cache; cache rakte yra kartos
+žymė, kurią pakeičia tie patys signal'ai. Žymė saugoma DB (settings_versions, kaip nustatymų cache),
+todėl pakeitimą pamato visi worker'iai, ne tik signal'ą gavęs procesas. Trūkstamos sekcijos skaičiuojamos lygiagrečiai
+(DASHBOARD_SECTION_WORKERS gijos, kiekviena su savo DB ryšiu). Jei sekcija neapskaičiuojama per
+DASHBOARD_SECTION_TIMEOUT ir turi ankstesnį rezultatą - grąžinamas jis, o naujas įrašomas fone.
+Kiekvienos sekcijos trukmė ir šaltinis grąžinami view'ui (Server-Timing antraštė, ?debug=1).
+"""
+
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .sections import (
+    DEFAULT_FILTERS, PERIOD_SECTIONS, SECTION_ORDER, SECTIONS, DashboardParams, month_bounds,
+)
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_PERIOD_KEY = ''
+ALL_PERIOD_KEY = 'all'
+
+# Modelis -> sekcijos, kurias paveikia jo pakeitimai
+MODEL_SECTIONS = {
+    'SalesInvoice': ('period_invoices', 'open_invoices', 'finance', 'orders_tracking', 'gaps'),
+    'PurchaseInvoice': ('period_invoices', 'open_invoices', 'finance', 'orders_tracking'),
+    'InvoicePayment': ('period_invoices', 'open_invoices', 'finance'),
+    'SalesInvoiceOrder': ('finance', 'orders_tracking'),
+    'Order': ('orders', 'finance', 'orders_tracking', 'carriers_tracking'),
+    'OrderCarrier': ('finance', 'orders_tracking', 'carriers_tracking'),
+    'Partner': ('period_invoices', 'clients'),
+}
+
+# Numatytasis sekcijos galiojimo laikas (sek.), ne ilgesnis nei DASHBOARD_SNAPSHOT_MAX_AGE.
+# Dažnai žiūrimos operatyvinės sekcijos - trumpiau, laikotarpio suvestinės ir tarpai - ilgiau
+SECTION_TTLS = {
+    'period_invoices': 300,
+    'open_invoices': 300,
+    'orders': 300,
+    'clients': 900,
+    'finance': 900,
+    'orders_tracking': 300,
+    'carriers_tracking': 300,
+    'gaps': 900,
+}
+
+# period_key None - gyva sekcija (rezultatas į cache_key); row - esamas snapshot įrašas (arba None)
+SectionJob = namedtuple('SectionJob', 'name period_key params row cache_key')
+
+_pending = threading.local()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def is_dashboard_snapshot_enabled() -> bool:
+    return getattr(settings, 'DASHBOARD_SNAPSHOT_ENABLED', True)
+
+
+def period_key_for(params: DashboardParams) -> Optional[str]:
+    """Laikotarpio raktas snapshot'ui arba None - toks laikotarpis / filtras skaičiuojamas gyvai"""
+    if params.filter_by not in DEFAULT_FILTERS:
+        return None
+    if params.date_from is None and params.date_to is None:
+        return ALL_PERIOD_KEY
+    if params.date_from is None or params.date_to is None:
+        return None
+    if (params.date_from, params.date_to) == month_bounds(params.date_from.year, params.date_from.month):
+        return f'month:{params.date_from:%Y-%m}'
+    return None
+
+
+def params_for_period_key(period_key: str, today=None) -> DashboardParams:
+    today = today or timezone.now().date()
+    if period_key in (GLOBAL_PERIOD_KEY, ALL_PERIOD_KEY):
+        return DashboardParams(today=today, date_from=None, date_to=None, filter_by='')
+    year, month = period_key.split(':', 1)[1].split('-')
+    date_from, date_to = month_bounds(int(year), int(month))
+    return DashboardParams(today=today, date_from=date_from, date_to=date_to, filter_by='')
+
+
+def section_period_key(name: str, params: DashboardParams) -> Optional[str]:
+    return period_key_for(params) if name in PERIOD_SECTIONS else GLOBAL_PERIOD_KEY
+
+
+def compute_section(name: str, params: DashboardParams):
+    """Returns: (fragmentas, trukmė ms)"""
+    started = time.perf_counter()
+    payload = SECTIONS[name](params)
+    return payload, int((time.perf_counter() - started) * 1000)
+
+
+def section_ttl(name: str) -> int:
+    """Sekcijos galiojimo laikas sekundėmis (DASHBOARD_SECTION_TTLS perrašo numatytąjį)"""
+    max_age = getattr(settings, 'DASHBOARD_SNAPSHOT_MAX_AGE', 900)
+    overrides = getattr(settings, 'DASHBOARD_SECTION_TTLS', None) or {}
+    if name in overrides:
+        return overrides[name]
+    return min(SECTION_TTLS.get(name, max_age), max_age)
+
+
+def is_fresh(row, now=None) -> bool:
+    now = now or timezone.now()
+    # Vėlavimas skaičiuojamas pagal timezone.now().date(), todėl ir diena lyginama taip pat
+    if row.is_dirty or row.computed_at.date() != now.date():
+        return False
+    return (now - row.computed_at).total_seconds() < section_ttl(row.section)
+
+
+def store_section(period_key: str, name: str, payload: dict, compute_ms: int, row=None):
+    """
+    Įrašyti apskaičiuotą sekciją. Jei skaičiuojant sekcija buvo pažymėta pasenusia (pasikeitė version),
+    duomenys įrašomi, bet žymė paliekama - kitas skaitymas perskaičiuos dar kartą.
+    """
+    from .models import DashboardSnapshotSection
+
+    values = {'payload': payload, 'computed_at': timezone.now(), 'compute_ms': compute_ms}
+    if row is None:
+        try:
+            with transaction.atomic():
+                DashboardSnapshotSection.objects.create(period_key=period_key, section=name, **values)
+            return
+        except IntegrityError:
+            # Tą pačią sekciją ką tik sukūrė kita užklausa
+            DashboardSnapshotSection.objects.filter(period_key=period_key, section=name).update(**values)
+            return
+    updated = DashboardSnapshotSection.objects.filter(pk=row.pk, version=row.version).update(is_dirty=False, **values)
+    if not updated:
+        DashboardSnapshotSection.objects.filter(pk=row.pk).update(**values)
+
+
+def live_cache_key(name: str, params: DashboardParams, generation: str) -> str:
+    return (
+        f'dashboard:section:{generation}:{name}:{params.today}:'
+        f'{params.date_from or ""}:{params.date_to or ""}:{params.filter_by}'
+    )
+
+
+def _live_generation() -> str:
+    """Gyvų sekcijų kartos žymė (settings_versions; HTTP užklausoje nuskaitoma kartu su nustatymų žymėmis)"""
+    from apps.settings.cache import get_version_stamp
+    from .models import DashboardSnapshotSection
+
+    return get_version_stamp(DashboardSnapshotSection) or '0'
+
+
+def _bump_live_generation():
+    """Gyvų sekcijų cache tampa nebenaudojamas visuose procesuose (naujos kartos raktai)"""
+    from apps.settings.cache import bump_version
+    from .models import DashboardSnapshotSection
+
+    bump_version(DashboardSnapshotSection)
+
+
+def _execute_job(job: SectionJob):
+    """Apskaičiuoti sekciją ir išsaugoti rezultatą (snapshot'e arba cache). Returns: (fragmentas, trukmė ms)"""
+    payload, compute_ms = compute_section(job.name, job.params)
+    if job.period_key is None:
+        cache.set(job.cache_key, (payload, compute_ms), section_ttl(job.name))
+    else:
+        store_section(job.period_key, job.name, payload, compute_ms, row=job.row)
+    slow_ms = getattr(settings, 'DASHBOARD_SECTION_SLOW_MS', 1000)
+    if slow_ms and compute_ms >= slow_ms:
+        logger.warning('Dashboard section %s took %s ms (period %s)', job.name, compute_ms, job.period_key)
+    return payload, compute_ms
+
+
+def _execute_job_in_thread(job: SectionJob):
+    # Pool gija naudoja savo DB ryšį - uždaromas kaip po HTTP užklausos
+    close_old_connections()
+    try:
+        return _execute_job(job)
+    finally:
+        close_old_connections()
+
+
+def _log_background_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f'Klaida skaičiuojant dashboard sekciją fone: {future.exception()}')
+
+
+def _get_executor(workers: int) -> ThreadPoolExecutor:
+    """Vienas gijų pool'as procesui - lygiagrečių DB ryšių skaičius ribotas visoms užklausoms kartu"""
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dashboard-section')
+        return _executor
+
+
+def run_section_jobs(jobs: list) -> dict:
+    """
+    Apskaičiuoti sekcijas: kelias - lygiagrečiai, kiekvieną savo gijoje ir DB ryšyje.
+
+    Nuosekliai skaičiuojama, kai sekcija viena, DASHBOARD_SECTION_WORKERS <= 1 arba vyksta transakcija
+    (kiti ryšiai nematytų dar neįrašytų duomenų). Sekcijos, neapskaičiuotos per DASHBOARD_SECTION_TIMEOUT
+    ir turinčios ankstesnį snapshot įrašą, į rezultatą neįtraukiamos - jos baigiamos ir įrašomos fone.
+
+    Returns:
+        {sekcija: (fragmentas, trukmė ms)}
+    """
+    workers = getattr(settings, 'DASHBOARD_SECTION_WORKERS', 4)
+    if len(jobs) <= 1 or workers <= 1 or connection.in_atomic_block:
+        return {job.name: _execute_job(job) for job in jobs}
+
+    executor = _get_executor(workers)
+    futures = {executor.submit(_execute_job_in_thread, job): job for job in jobs}
+    _, not_done = wait(futures, timeout=getattr(settings, 'DASHBOARD_SECTION_TIMEOUT', 10) or None)
+
+    results = {}
+    for future, job in futures.items():
+        if future in not_done and job.row is not None:
+            future.add_done_callback(_log_background_failure)
+            continue
+        results[job.name] = future.result()
+    return results
+
+
+def load_dashboard_sections(params: DashboardParams):
+    """
+    Visų sekcijų fragmentai užklausos parametrams: šviežios - iš snapshot'o (viena užklausa) arba cache,
+    pasenusios / trūkstamos - perskaičiuojamos (lygiagrečiai) ir įrašomos, ne snapshot'o laikotarpiai - gyvai.
+
+    Returns:
+        (fragmentai {sekcija: fragmentas}, snapshot informacija atsakymui arba None,
+         {sekcija: {'source': snapshot / cache / computed / stale, 'ms': skaičiavimo trukmė}})
+    """
+    from .models import DashboardSnapshotSection
+
+    snapshot_enabled = is_dashboard_snapshot_enabled()
+    now = timezone.now()
+    rows = {}
+    if snapshot_enabled:
+        period_key = period_key_for(params)
+        keys = [GLOBAL_PERIOD_KEY] + ([period_key] if period_key is not None else [])
+        rows = {
+            (row.period_key, row.section): row
+            for row in DashboardSnapshotSection.objects.filter(period_key__in=keys, section__in=SECTION_ORDER)
+        }
+
+    fragments = {}
+    computed_at = {}
+    timings = {}
+    jobs = []
+    live_jobs = []
+    generation = None
+    for name in SECTION_ORDER:
+        key = section_period_key(name, params) if snapshot_enabled else None
+        if key is None:
+            if generation is None:
+                generation = _live_generation()
+            live_jobs.append(SectionJob(name, None, params, None, live_cache_key(name, params, generation)))
+            continue
+        row = rows.get((key, name))
+        if row is not None and is_fresh(row, now):
+            fragments[name] = row.payload
+            computed_at[name] = row.computed_at
+            timings[name] = {'source': 'snapshot', 'ms': row.compute_ms}
+            continue
+        jobs.append(SectionJob(name, key, params_for_period_key(key, params.today), row, None))
+
+    cached = cache.get_many([job.cache_key for job in live_jobs]) if live_jobs else {}
+    for job in live_jobs:
+        if job.cache_key in cached:
+            fragments[job.name], compute_ms = cached[job.cache_key]
+            timings[job.name] = {'source': 'cache', 'ms': compute_ms}
+        else:
+            jobs.append(job)
+
+    results = run_section_jobs(jobs)
+    recomputed = []
+    for job in jobs:
+        if job.name not in results:
+            # Neapskaičiuota per DASHBOARD_SECTION_TIMEOUT - ankstesnis rezultatas
+            fragments[job.name] = job.row.payload
+            computed_at[job.name] = job.row.computed_at
+            timings[job.name] = {'source': 'stale', 'ms': job.row.compute_ms}
+            continue
+        fragments[job.name], compute_ms = results[job.name]
+        timings[job.name] = {'source': 'computed', 'ms': compute_ms}
+        if job.period_key is not None:
+            computed_at[job.name] = timezone.now()
+            recomputed.append(job.name)
+    timings = {name: timings[name] for name in SECTION_ORDER}
+
+    if not snapshot_enabled:
+        return fragments, None, timings
+    oldest = min(computed_at.values()) if computed_at else now
+    return fragments, {
+        'computed_at': oldest.isoformat(),
+        'age_seconds': max(0, int((now - oldest).total_seconds())),
+        'recomputed_sections': [name for name in SECTION_ORDER if name in recomputed],
+        'live_sections': [job.name for job in live_jobs],
+    }, timings
+
+
+def invalidate_sections(names: Iterable[str]) -> int:
+    """Pažymėti sekcijas (visų laikotarpių) pasenusiomis"""
+    from .models import DashboardSnapshotSection
+
+    names = sorted(set(names))
+    if not names:
+        return 0
+    return DashboardSnapshotSection.objects.filter(section__in=names).update(is_dirty=True, version=F('version') + 1)
+
+
+def _flush_pending():
+    names = getattr(_pending, 'sections', None)
+    _pending.sections = None
+    if not names:
+        return
+    _bump_live_generation()
+    if not is_dashboard_snapshot_enabled():
+        return
+    try:
+        invalidate_sections(names)
+    except DatabaseError as e:
+        logger.error(f"Klaida žymint dashboard sekcijas pasenusiomis {sorted(names)}: {e}", exc_info=True)
+
+
+def schedule_dashboard_invalidation(sections: Iterable[str]):
+    """
+    Pažymėti sekcijas pasenusiomis po transakcijos commit.
+    Kelių tos pačios transakcijos įrašų pakeitimai sujungiami į vieną UPDATE.
+    Gyvai skaičiuotų sekcijų cache pakeičiamas nauja karta.
+    """
+    sections = set(sections)
+    if not sections:
+        return
+    pending = getattr(_pending, 'sections', None)
+    if pending is None:
+        _pending.sections = pending = set()
+    pending.update(sections)
+    # Pirmasis įvykdytas callback apdoroja visas sukauptas sekcijas, likę - nieko nedaro
+    transaction.on_commit(_flush_pending)
+
+
+def schedule_model_invalidation(model_name: str):
+    schedule_dashboard_invalidation(MODEL_SECTIONS.get(model_name, ()))
+
+
+def rebuild_dashboard_snapshot(period_keys: Iterable[str] = None, only_stale: bool = False) -> int:
+    """
+    Perskaičiuoti snapshot'ą: bendras sekcijas ir laikotarpio sekcijas nurodytiems raktams
+    (numatytai - 'all', einamasis ir praėjęs mėnuo; senesni mėnesiai perskaičiuojami juos atidarius).
+
+    Returns:
+        Perskaičiuotų sekcijų skaičius
+    """
+    from .models import DashboardSnapshotSection
+
+    today = timezone.now().date()
+    if period_keys is None:
+        previous_month = today.replace(day=1) - timedelta(days=1)
+        period_keys = {ALL_PERIOD_KEY, f'month:{today:%Y-%m}', f'month:{previous_month:%Y-%m}'}
+    targets = [(GLOBAL_PERIOD_KEY, name) for name in SECTION_ORDER if name not in PERIOD_SECTIONS]
+    targets += [(key, name) for key in sorted(period_keys) for name in SECTION_ORDER if name in PERIOD_SECTIONS]
+
+    rows = {
+        (row.period_key, row.section): row
+        for row in DashboardSnapshotSection.objects.filter(period_key__in={key for key, _ in targets})
+    }
+    now = timezone.now()
+    rebuilt = 0
+    for key, name in targets:
+        row = rows.get((key, name))
+        if only_stale and row is not None and is_fresh(row, now):
+            continue
+        payload, compute_ms = compute_section(name, params_for_period_key(key, today))
+        store_section(key, name, payload, compute_ms, row=row)
+        rebuilt += 1
+    return rebuilt
+
+
+def run_snapshot_scheduler(interval: int = None, stop_event: Optional[threading.Event] = None):
+    """
+    Perskaičiuoti pasenusias sekcijas kas interval sekundžių, kol nustatomas stop_event (blokuoja).
+    Vykdoma atskirame procese (manage.py rebuild_dashboard_snapshot --loop), ne web workeriuose.
+    """
+    interval = interval or getattr(settings, 'DASHBOARD_SNAPSHOT_REBUILD_INTERVAL', 1800)
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        try:
+            # Signal'ai ir užklausos galėjo jau perskaičiuoti - perskaičiuojamos tik pasenusios sekcijos
+            rebuilt = rebuild_dashboard_snapshot(only_stale=True)
+            if rebuilt:
+                logger.info('Dashboard snapshot: rebuilt %s sections', rebuilt)
+        except DatabaseError as e:
+            logger.warning('Dashboard snapshot rebuild failed: %s', e)
+        except Exception as e:
+            logger.error(f'Klaida perskaičiuojant dashboard snapshot: {e}', exc_info=True)
+        finally:
+            close_old_connections()
+        stop_event.wait(interval)
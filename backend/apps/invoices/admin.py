@@ -1,6 +1,6 @@
 from django.contrib import admin
 from .models import (
-    SalesInvoice, PurchaseInvoice, ExpenseCategory, InvoiceNumberSequence, InvoiceReminder
+    SalesInvoice, PurchaseInvoice, ExpenseCategory, InvoiceNumberSequence, InvoicePrefixSequence, InvoiceReminder
 )
 
 
@@ -66,6 +66,12 @@ class InvoiceNumberSequenceAdmin(admin.ModelAdmin):
     readonly_fields = ['updated_at']
 
 
+@admin.register(InvoicePrefixSequence)
+class InvoicePrefixSequenceAdmin(admin.ModelAdmin):
+    list_display = ['prefix', 'last_number', 'separator', 'updated_at']
+    readonly_fields = ['updated_at']
+
+
 @admin.register(InvoiceReminder)
 class InvoiceReminderAdmin(admin.ModelAdmin):
     list_display = ['invoice', 'reminder_type', 'last_sent_at', 'sent_count', 'created_at']
@@ -0,0 +1,218 @@
+"""
+Banko išrašo suderinimas su neapmokėtomis sąskaitomis.
+
+Anksčiau kiekviena operacija buvo lyginama su kiekviena neapmokėta sąskaita (substring 'in' pagal
+numerį ir partnerio pavadinimą) - 2000 operacijų x 5000 sąskaitų = dešimtys milijonų palyginimų,
+o suderintos sąskaitos buvo žymimos po vieną (PaymentService.mark_as_paid).
+
+Dabar neapmokėtos sąskaitos vieną kartą sudedamos į hash indeksus:
+- normalizuotas numeris (tik raidės ir skaitmenys, didžiosiomis) ir jo dalis nuo pirmo skaitmens
+  ('SF2025-0001' randamas ir pagal '2025-0001'),
+- suma centais,
+- partnerio pavadinimo žodžiai (be teisinės formos: UAB, AB, MB, ...).
+Operacijos kandidatai imami tik iš indeksų pagal jos aprašymo žodžius, todėl suderinimas ~O(operacijų).
+Suderintos sąskaitos pažymimos vienoje transakcijoje (PaymentService.mark_many_as_paid).
+
+Patikimumas kaip ir anksčiau:
+- numeris + suma: 0.95, jei dar sutampa partneris - 1.0,
+- partneris + suma: 0.7,
+- tik suma (pardavimo sąskaitos): 0.3 - nelaikoma suderinimu (riba 0.5).
+Viena sąskaita suderinama ne daugiau kaip su viena išrašo operacija. Jei išraše nurodyta operacijos
+kryptis, gauti pinigai derinami tik su pardavimo, išleisti - tik su pirkimo sąskaitomis.
+"""
+
+import re
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from apps.core.text import tokenize
+
+from .models import SalesInvoice, PurchaseInvoice
+
+MATCH_THRESHOLD = 0.5
+OPEN_PAYMENT_STATUSES = ['unpaid', 'partially_paid']
+# BankTransaction.direction -> sąskaitų tipas
+DIRECTION_INVOICE_TYPES = {'credit': 'sales', 'debit': 'purchase'}
+# Trumpesni numerio fragmentai neindeksuojami (per daug atsitiktinių sutapimų)
+MIN_NUMBER_KEY_LENGTH = 4
+# Teisinės formos nelaikomos pavadinimo žodžiais
+LEGAL_FORM_TOKENS = {
+    'uab', 'ab', 'mb', 'ii', 'vsi', 'ltd', 'llc', 'gmbh', 'sp', 'z', 'o', 'oo', 'zoo', 'sa', 'as', 'sia',
+    'ou', 'oy', 'bv', 'srl', 'sro', 'kft', 'inc', 'co', 'kg', 'ag',
+}
+
+_NON_ALNUM_RE = re.compile(r'[^0-9A-Z]')
+_CHUNK_SPLIT_RE = re.compile(r'[\s,;:()\[\]"\']+')
+
+
+def to_cents(amount):
+    """Suma centais (None, jei suma netinkama)"""
+    if amount is None:
+        return None
+    try:
+        return int((Decimal(str(amount)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def invoice_number_keys(number) -> set:
+    """Numerio raktai: visas normalizuotas numeris ir jo dalis nuo pirmo skaitmens"""
+    normalized = _NON_ALNUM_RE.sub('', str(number or '').upper())
+    keys = set()
+    if len(normalized) >= MIN_NUMBER_KEY_LENGTH:
+        keys.add(normalized)
+    digit = re.search(r'\d', normalized)
+    if digit and digit.start() > 0 and len(normalized) - digit.start() >= MIN_NUMBER_KEY_LENGTH:
+        keys.add(normalized[digit.start():])
+    return keys
+
+
+def description_number_keys(transaction) -> set:
+    """Galimi sąskaitų numeriai operacijoje: ištrauktas numeris + aprašymo fragmentai su skaitmenimis"""
+    keys = invoice_number_keys(transaction.invoice_number) if transaction.invoice_number else set()
+    for chunk in _CHUNK_SPLIT_RE.split(transaction.description or ''):
+        if any(char.isdigit() for char in chunk):
+            keys |= invoice_number_keys(chunk)
+    return keys
+
+
+def name_tokens(name) -> set:
+    return {token for token in tokenize(name) if len(token) > 1 and token not in LEGAL_FORM_TOKENS}
+
+
+class InvoiceMatchIndex:
+    """Neapmokėtų sąskaitų indeksai (numeris, suma centais, partnerio žodžiai)"""
+
+    def __init__(self, sales_invoices, purchase_invoices):
+        self.by_number = defaultdict(list)
+        self.by_amount = defaultdict(list)
+        self.by_partner_amount = defaultdict(list)
+        self.partners_by_token = defaultdict(set)
+        self.partner_token_count = {}
+
+        for invoice_type, invoices in (('sales', sales_invoices), ('purchase', purchase_invoices)):
+            for invoice in invoices:
+                if invoice.payment_status not in OPEN_PAYMENT_STATUSES:
+                    continue
+                cents = to_cents(invoice.amount_total)
+                entry = (invoice_type, invoice, cents)
+                keys = invoice_number_keys(invoice.invoice_number)
+                if invoice_type == 'purchase':
+                    # Mokėdami tiekėjui nurodome jo sąskaitos numerį
+                    keys |= invoice_number_keys(getattr(invoice, 'received_invoice_number', None))
+                for key in keys:
+                    self.by_number[key].append(entry)
+                if cents is not None:
+                    self.by_amount[cents].append(entry)
+                    self.by_partner_amount[(invoice.partner_id, cents)].append(entry)
+                self._add_partner(invoice.partner_id, invoice.partner.name if invoice.partner_id else None)
+
+    @classmethod
+    def from_db(cls):
+        """Vienas užklausų rinkinys visam išrašui (po vieną kiekvienam sąskaitų tipui)"""
+        sales = SalesInvoice.objects.filter(payment_status__in=OPEN_PAYMENT_STATUSES).select_related('partner').only(
+            'id', 'invoice_number', 'amount_total', 'payment_status', 'partner__id', 'partner__name'
+        )
+        purchase = PurchaseInvoice.objects.filter(payment_status__in=OPEN_PAYMENT_STATUSES).select_related(
+            'partner'
+        ).only(
+            'id', 'invoice_number', 'received_invoice_number', 'amount_total', 'payment_status',
+            'partner__id', 'partner__name'
+        )
+        return cls(list(sales), list(purchase))
+
+    def _add_partner(self, partner_id, name):
+        if not partner_id or partner_id in self.partner_token_count:
+            return
+        tokens = name_tokens(name)
+        self.partner_token_count[partner_id] = len(tokens)
+        for token in tokens:
+            self.partners_by_token[token].add(partner_id)
+
+    def matching_partners(self, transaction) -> set:
+        """Partneriai, kurių visi pavadinimo žodžiai yra operacijos aprašyme"""
+        tokens = name_tokens(transaction.description) | name_tokens(transaction.partner_name)
+        hits = defaultdict(int)
+        for token in tokens:
+            for partner_id in self.partners_by_token.get(token, ()):
+                hits[partner_id] += 1
+        return {partner_id for partner_id, count in hits.items() if count == self.partner_token_count[partner_id]}
+
+    def match(self, transaction, claimed=None):
+        """
+        Geriausia sąskaita operacijai.
+
+        Returns:
+            (invoice, match_type, confidence) - invoice None, jei kandidatų nėra
+        """
+        claimed = claimed if claimed is not None else set()
+        cents = to_cents(transaction.amount)
+        best = (None, None, 0.0)
+        partners = None
+        # Gauti pinigai - tik pardavimo, išleisti - tik pirkimo sąskaitos (kryptis nežinoma - abi)
+        allowed_type = DIRECTION_INVOICE_TYPES.get(getattr(transaction, 'direction', None))
+
+        def consider(entry, confidence):
+            nonlocal best
+            invoice_type, invoice, _ = entry
+            if allowed_type and invoice_type != allowed_type:
+                return
+            if confidence > best[2] and (invoice_type, invoice.pk) not in claimed:
+                best = (invoice, invoice_type, confidence)
+
+        # 1. Numeris + suma
+        seen = set()
+        for key in sorted(description_number_keys(transaction)):
+            for entry in self.by_number.get(key, ()):
+                if id(entry[1]) in seen or entry[2] != cents:
+                    continue
+                seen.add(id(entry[1]))
+                if partners is None:
+                    partners = self.matching_partners(transaction)
+                consider(entry, 1.0 if entry[1].partner_id in partners else 0.95)
+
+        amount_candidates = self.by_amount.get(cents, ()) if cents is not None else ()
+
+        # 2. Partneris + suma
+        if best[2] < 0.8 and amount_candidates:
+            if partners is None:
+                partners = self.matching_partners(transaction)
+            for partner_id in sorted(partners):
+                for entry in self.by_partner_amount.get((partner_id, cents), ()):
+                    consider(entry, 0.7)
+
+        # 3. Tik suma (tik pardavimo sąskaitos, žemas prioritetas) - pirmas laisvas kandidatas
+        if best[2] < 0.3:
+            for entry in amount_candidates:
+                if entry[0] == 'sales' and (entry[0], entry[1].pk) not in claimed:
+                    consider(entry, 0.3)
+                    break
+
+        return best
+
+
+def reconcile_transactions(transactions, index=None, claimed=None):
+    """
+    Suderinti visas operacijas (nustato transaction.matched / matched_invoice / match_type / match_confidence).
+    Suderinta sąskaita daugiau kitoms operacijoms nesiūloma.
+
+    Args:
+        index: Sąskaitų indeksas (suderinant paketais - tas pats visiems paketams)
+        claimed: Jau suderintos sąskaitos {(tipas, id), ...} - papildomas šio kvietimo suderinimais
+
+    Returns:
+        [(transaction, invoice, match_type, confidence), ...] ta pačia tvarka
+    """
+    index = index or InvoiceMatchIndex.from_db()
+    claimed = claimed if claimed is not None else set()
+    results = []
+    for transaction in transactions:
+        invoice, match_type, confidence = index.match(transaction, claimed)
+        transaction.matched = confidence >= MATCH_THRESHOLD
+        transaction.matched_invoice = invoice
+        transaction.match_type = match_type
+        transaction.match_confidence = confidence
+        if transaction.matched:
+            claimed.add((match_type, invoice.pk))
+        results.append((transaction, invoice, match_type, confidence))
+    return results
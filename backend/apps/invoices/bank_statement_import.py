@@ -0,0 +1,544 @@
+"""
+Banko išrašo importas srautu (CSV ir ISO 20022 camt.053 XML).
+
+Anksčiau parse_csv_bank_statement() nuskaitydavo visą failą į atmintį, dekoduodavo tik UTF-8,
+kiekvienai eilutei iš naujo ieškodavo datos / sumos / aprašymo stulpelių, o netinkamas eilutes
+tyliai praleisdavo. Dabar:
+- failas skaitomas eilutė po eilutės (DecodedLines virš įkelto failo, XML - defusedxml iterparse),
+- koduotė nustatoma pagal failo pradžią (UTF-8, su BOM ar be jo, kitaip Windows-1257); eilutė, kuri
+  neatitinka nustatytos koduotės, dekoduojama Windows-1257, o neatpažįstama - StatementFormatError,
+- stulpeliai nustatomi vieną kartą pagal antraštę (Swedbank, SEB, Luminor, Šiaulių banko, Revolut,
+  Paysera eksportai; skirtukas ; , tab arba |, antraštė gali būti ne pirmoje eilutėje),
+- sumos priimamos lietuvišku formatu ('1 234,56', '-12,50 EUR') ir su atskirais debeto / kredito stulpeliais,
+- operacijos kryptis (BankTransaction.direction) imama iš D/K stulpelio, sumos ženklo, debeto / kredito
+  stulpelio arba camt CdtDbtInd,
+- netinkamos eilutės grąžinamos kaip klaidos (eilutės numeris + priežastis), likučio eilutės - praleidžiamos.
+Operacijos suderinamos paketais (BANK_IMPORT_CHUNK_SIZE) - metų išrašas neužkraunamas į atmintį.
+"""
+
+import codecs
+import csv
+import io
+import logging
+import re
+from datetime import datetime
+from collections import deque
+from decimal import Decimal, InvalidOperation
+
+from defusedxml import DefusedXmlException
+from defusedxml.ElementTree import ParseError, iterparse
+from django.conf import settings
+
+from apps.core.text import normalize_text
+
+from .bank_utils import BankTransaction, extract_invoice_number, extract_partner_name
+
+logger = logging.getLogger(__name__)
+
+# Failo pradžia koduotės ir formato nustatymui
+SAMPLE_SIZE = 64 * 1024
+# Lietuvos bankų eksportai be UTF-8 - Windows Baltic
+FALLBACK_ENCODING = 'cp1257'
+# Kiek eilučių ieškoma antraštės (SEB ir kt. prieš antraštę rašo sąskaitos informaciją)
+HEADER_SCAN_LINES = 30
+CSV_DELIMITERS = (';', ',', '\t', '|')
+DATE_FORMATS = ('%Y-%m-%d', '%Y.%m.%d', '%d.%m.%Y', '%Y/%m/%d', '%d/%m/%Y', '%d-%m-%Y', '%Y%m%d')
+
+# Stulpelių pavadinimai (normalizuoti: mažosios raidės, be diakritikų) prioriteto tvarka.
+# Pirmiausia ieškoma tikslaus sutapimo, tada - pavadinimo dalies.
+COLUMN_ALIASES = (
+    ('direction', ('d/k', 'k/d', 'debetas/kreditas', 'kreditas/debetas', 'debit/credit', 'credit/debit', 'c/d', 'd/c')),
+    ('date', (
+        'data', 'date', 'operacijos data', 'israsymo data', 'buhalterine data', 'iskaitymo data', 'completed date',
+        'booking date', 'transaction date', 'value date', 'valiutavimo data',
+    )),
+    ('amount', ('suma', 'amount', 'operacijos suma', 'suma eur', 'amount eur')),
+    ('debit', ('debetas', 'debit', 'islaidos', 'nurasyta', 'outgoing')),
+    ('credit', ('kreditas', 'credit', 'pajamos', 'iskaityta', 'gauta', 'incoming')),
+    ('description', (
+        'mokejimo paskirtis', 'paskirtis', 'paaiskinimai', 'aprasymas', 'description', 'details', 'purpose',
+        'informacija', 'info',
+    )),
+    ('counterparty', (
+        'moketojo arba gavejo pavadinimas', 'gavejo/moketojo pavadinimas', 'moketojas/gavejas', 'gavejas/moketojas',
+        'gavejas', 'moketojas', 'korespondentas', 'counterparty', 'beneficiary', 'payer', 'partneris',
+    )),
+)
+# Sumos stulpeliu nelaikomi likučio / komisinių stulpeliai
+AMOUNT_EXCLUDED_WORDS = ('likutis', 'balance', 'fee', 'komisin', 'mokest')
+# Likučio / apyvartos eilutės (Swedbank, SEB) - ne operacijos
+BALANCE_ROW_MARKERS = ('likutis pradziai', 'likutis pabaigai', 'pradinis likutis', 'galutinis likutis', 'apyvarta',
+                       'opening balance', 'closing balance', 'turnover')
+
+# D/K stulpelio reikšmės (normalizuotos)
+CREDIT_MARKERS = ('k', 'kr', 'kreditas', 'c', 'cr', 'crdt', 'credit', 'in', 'incoming')
+DEBIT_MARKERS = ('d', 'db', 'debetas', 'dbit', 'debit', 'out', 'outgoing')
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_AMOUNT_CLEAN_RE = re.compile('[\\s\u00a0\u202f\'€]|eur$|^eur', re.I)
+
+
+class StatementFormatError(ValueError):
+    """Failas neatpažintas kaip banko išrašas (nėra antraštės su data ir suma)"""
+
+
+def detect_encoding(sample: bytes) -> str:
+    """UTF-8 (su BOM arba be), UTF-16 pagal BOM, kitaip FALLBACK_ENCODING"""
+    if sample.startswith(codecs.BOM_UTF16_LE) or sample.startswith(codecs.BOM_UTF16_BE):
+        return 'utf-16'
+    try:
+        # final=False - pavyzdžio gale gali būti nukirstas kelių baitų simbolis
+        codecs.getincrementaldecoder('utf-8')().decode(sample, final=False)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return FALLBACK_ENCODING
+
+
+def open_binary(source):
+    """Įkeltas failas (UploadedFile), failo objektas arba kelias -> baitų srautas nuo pradžios"""
+    if isinstance(source, (str, bytes)) or hasattr(source, '__fspath__'):
+        return open(source, 'rb')
+    stream = getattr(source, 'file', source)
+    if hasattr(stream, 'seek'):
+        stream.seek(0)
+    return stream
+
+
+class DecodedLines:
+    """
+    Baitų srauto eilutės kaip tekstas (su eilutės pabaigos simboliais - tinka csv.reader).
+
+    Koduotė nustatoma pagal failo pradžią, todėl faile gali pasitaikyti kitaip užkoduota eilutė
+    (pvz. ranka papildytas eksportas): UTF-8 faile tokia eilutė dekoduojama FALLBACK_ENCODING, o
+    FALLBACK_ENCODING faile pirmiausia bandoma UTF-8; tokios eilutės skaičiuojamos fallback_lines.
+    Eilutė, kurios nepavyksta dekoduoti nė viena koduote, - StatementFormatError.
+    UTF-16 failai skaitomi io.TextIOWrapper (be pakeitimų: klaidinga seka - StatementFormatError).
+    """
+
+    def __init__(self, stream, encoding):
+        self.stream = stream
+        self.encoding = encoding
+        self.line_number = 0
+        self.fallback_lines = 0
+        self._pending = deque()
+        self._candidates = (
+            ('utf-8', FALLBACK_ENCODING) if encoding == FALLBACK_ENCODING else (encoding, FALLBACK_ENCODING)
+        )
+        self._text = (
+            io.TextIOWrapper(stream, encoding=encoding, errors='strict', newline='')
+            if encoding.startswith('utf-16') else None
+        )
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._text is not None:
+            try:
+                line = next(self._text)
+            except UnicodeDecodeError as e:
+                raise StatementFormatError(f'{self.line_number + 1} eilutė: netinkama {self.encoding} seka ({e.reason})')
+            self.line_number += 1
+            return line
+
+        while not self._pending:
+            raw = self.stream.readline()
+            if not raw:
+                raise StopIteration
+            # readline skaido tik pagal \n - eilutės, atskirtos vien \r, išskaidomos čia
+            self._pending.extend(raw.splitlines(keepends=True))
+        raw = self._pending.popleft()
+        self.line_number += 1
+        for candidate in self._candidates:
+            try:
+                line = raw.decode(candidate)
+            except UnicodeDecodeError:
+                continue
+            if candidate != self.encoding and not raw.isascii():
+                self.fallback_lines += 1
+            return line
+        raise StatementFormatError(
+            f"{self.line_number} eilutė: neatpažinta koduotė (ne {' ir ne '.join(self._candidates)})"
+        )
+
+    def readline(self):
+        return next(self, '')
+
+    def detach(self):
+        """Atjungti nuo baitų srauto jo neuždarant (įkeltas failas uždaromas Django)"""
+        if self._text is not None:
+            self._text.detach()
+            self._text = None
+        self.stream = None
+
+    def close(self):
+        if self._text is not None:
+            self._text.close()
+        elif self.stream is not None:
+            self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_text(source, encoding=None):
+    """
+    Tekstinis srautas failui su nustatyta koduote (DecodedLines).
+
+    Returns:
+        (srautas, koduotė) - jau tekstinis srautas grąžinamas toks pats (koduotė None)
+    """
+    stream = open_binary(source)
+    sample = stream.read(SAMPLE_SIZE)
+    stream.seek(0)
+    if isinstance(sample, str):
+        return stream, None
+    encoding = encoding or detect_encoding(sample)
+    return DecodedLines(stream, encoding), encoding
+
+
+def parse_amount(value) -> Decimal:
+    """'1 234,56', '1.234,56', '1,234.56', '-12,50 EUR', '(12.50)' -> Decimal"""
+    text = _AMOUNT_CLEAN_RE.sub('', str(value or '').strip())
+    negative = text.startswith('(') and text.endswith(')')
+    text = text.strip('()')
+    if ',' in text and '.' in text:
+        # Paskutinis skirtukas - dešimtainis
+        thousands = '.' if text.rfind(',') > text.rfind('.') else ','
+        text = text.replace(thousands, '')
+    if text.count(',') == 1:
+        text = text.replace(',', '.')
+    elif text.count(',') > 1 or text.count('.') > 1:
+        text = text.replace(',', '').replace('.', '')
+    if text.endswith('-'):
+        text = '-' + text[:-1]
+    try:
+        amount = Decimal(text)
+    except InvalidOperation:
+        raise ValueError(f"Netinkama suma '{value}'")
+    if not amount.is_finite():
+        raise ValueError(f"Netinkama suma '{value}'")
+    return -amount if negative else amount
+
+
+def parse_direction(value):
+    """D/K stulpelio reikšmė -> BankTransaction.CREDIT / DEBIT; tuščia - None"""
+    text = normalize_header(value).rstrip('.')
+    if not text:
+        return None
+    if text in CREDIT_MARKERS:
+        return BankTransaction.CREDIT
+    if text in DEBIT_MARKERS:
+        return BankTransaction.DEBIT
+    raise ValueError(f"Netinkama operacijos kryptis '{value}'")
+
+
+def normalize_header(name) -> str:
+    return _WHITESPACE_RE.sub(' ', normalize_text(name or '')).strip().strip('"').strip()
+
+
+def map_columns(header) -> dict:
+    """Antraštė -> {rolė: stulpelio indeksas}; kiekvienas stulpelis priskiriamas ne daugiau kaip vienai rolei"""
+    names = [normalize_header(name) for name in header]
+    columns = {}
+    used = set()
+
+    def allowed(role, index):
+        if index in used or not names[index]:
+            return False
+        return role not in ('amount', 'debit', 'credit') or not any(
+            word in names[index] for word in AMOUNT_EXCLUDED_WORDS
+        )
+
+    for role, aliases in COLUMN_ALIASES:
+        found = None
+        for alias in aliases:
+            found = next((i for i, name in enumerate(names) if name == alias and allowed(role, i)), None)
+            if found is not None:
+                break
+        if found is None:
+            for alias in aliases:
+                found = next((i for i, name in enumerate(names) if alias in name and allowed(role, i)), None)
+                if found is not None:
+                    break
+        if found is not None:
+            columns[role] = found
+            used.add(found)
+    if 'amount' in columns:
+        # Viena sumos kolona - atskiri debeto / kredito stulpeliai nereikalingi
+        columns.pop('debit', None)
+        columns.pop('credit', None)
+    return columns
+
+
+def has_required_columns(columns) -> bool:
+    return 'date' in columns and ('amount' in columns or 'debit' in columns or 'credit' in columns)
+
+
+class BankStatementReader:
+    """
+    Išrašo operacijų iteratorius (BankTransaction), failas skaitomas srautu.
+
+    Po iteracijos: format, encoding, delimiter, columns, rows (apdorotos eilutės), skipped,
+    fallback_lines (eilutės ne nustatyta koduote), error_count ir errors
+    (pirmos max_errors klaidos: [{'line': ..., 'error': ...}, ...]).
+    """
+
+    def __init__(self, source, encoding=None, max_errors=None):
+        self.source = source
+        self.forced_encoding = encoding
+        self.max_errors = max_errors if max_errors is not None else getattr(settings, 'BANK_IMPORT_MAX_ERRORS', 100)
+        self.format = None
+        self.encoding = None
+        self.delimiter = None
+        self.columns = {}
+        self.rows = 0
+        self.skipped = 0
+        self.fallback_lines = 0
+        self.error_count = 0
+        self.errors = []
+        self._date_format = None
+
+    def __iter__(self):
+        stream = open_binary(self.source)
+        sample = stream.read(SAMPLE_SIZE)
+        stream.seek(0)
+        head = sample.lstrip(codecs.BOM_UTF8 + b' \t\r\n') if isinstance(sample, bytes) else sample.lstrip('﻿ \t\r\n')
+        if head[:1] in (b'<', '<'):
+            self.format = 'camt.053'
+            yield from self._iter_camt(stream)
+            return
+        self.format = 'csv'
+        if isinstance(sample, str):
+            yield from self._iter_csv(stream)
+            return
+        self.encoding = self.forced_encoding or detect_encoding(sample)
+        text = DecodedLines(stream, self.encoding)
+        try:
+            yield from self._iter_csv(text)
+        finally:
+            self.fallback_lines = text.fallback_lines
+            if text.fallback_lines:
+                logger.warning(
+                    'Bank statement import: %s lines not in detected encoding %s', text.fallback_lines, self.encoding
+                )
+            # Įkeltas failas neuždaromas kartu su srautu
+            text.detach()
+
+    def summary(self) -> dict:
+        return {
+            'format': self.format,
+            'encoding': self.encoding,
+            'rows': self.rows,
+            'skipped_count': self.skipped,
+            'fallback_encoding_lines': self.fallback_lines,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+
+    def _error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({'line': line, 'error': message})
+
+    def _parse_date(self, value):
+        text = str(value or '').strip()
+        # Revolut ir kt.: '2025-01-31 10:15:00' / '2025-01-31T10:15:00'
+        candidates = (text, re.split(r'[\sT]', text, 1)[0])
+        formats = (self._date_format,) + DATE_FORMATS if self._date_format else DATE_FORMATS
+        for candidate in candidates:
+            for date_format in formats:
+                try:
+                    parsed = datetime.strptime(candidate, date_format).date()
+                except ValueError:
+                    continue
+                self._date_format = date_format
+                return parsed
+        raise ValueError(f"Netinkama data '{value}'")
+
+    def _transaction(self, date_value, amount, description, counterparty=None, direction=None):
+        description = (description or '').strip()
+        counterparty = (counterparty or '').strip()
+        return BankTransaction(
+            date=self._parse_date(date_value),
+            amount=abs(amount),  # Visada teigiamas, kryptis - direction
+            description=description or counterparty,
+            invoice_number=extract_invoice_number(description),
+            partner_name=counterparty or extract_partner_name(description),
+            direction=direction,
+        )
+
+    # --- CSV ---
+
+    def _find_header(self, text):
+        """Antraštės eilutė: (eilutės numeris, skirtukas, stulpeliai)"""
+        for line_number in range(1, HEADER_SCAN_LINES + 1):
+            line = text.readline()
+            if not line:
+                break
+            delimiters = sorted(
+                (delimiter for delimiter in CSV_DELIMITERS if delimiter in line),
+                key=line.count, reverse=True
+            )
+            for delimiter in delimiters:
+                header = next(csv.reader([line], delimiter=delimiter), [])
+                columns = map_columns(header)
+                if has_required_columns(columns):
+                    return line_number, delimiter, columns
+        raise StatementFormatError(
+            'Neatpažintas banko išrašo formatas: nerasta antraštė su datos ir sumos stulpeliais'
+        )
+
+    def _iter_csv(self, text):
+        header_line, self.delimiter, self.columns = self._find_header(text)
+        columns = self.columns
+        width = max(columns.values()) + 1
+        reader = csv.reader(text, delimiter=self.delimiter)
+
+        for cells in reader:
+            line = header_line + reader.line_num
+            if not any(cell.strip() for cell in cells):
+                continue
+            self.rows += 1
+            if len(cells) < width:
+                self._error(line, f'Per mažai stulpelių ({len(cells)} iš {width})')
+                continue
+
+            row = {role: cells[index].strip() for role, index in columns.items()}
+            description = row.get('description', '')
+            if normalize_header(description).startswith(BALANCE_ROW_MARKERS):
+                self.skipped += 1
+                continue
+            try:
+                # Kryptis: D/K stulpelis, kitaip - sumos ženklas arba užpildytas debeto / kredito stulpelis
+                direction = parse_direction(row['direction']) if 'direction' in columns else None
+                if 'amount' in columns:
+                    value = row['amount']
+                elif row.get('credit'):
+                    value, direction = row['credit'], direction or BankTransaction.CREDIT
+                else:
+                    value, direction = row.get('debit'), direction or BankTransaction.DEBIT
+                if not value:
+                    raise ValueError('Nenurodyta operacijos suma')
+                amount = parse_amount(value)
+                if direction is None and amount:
+                    direction = BankTransaction.DEBIT if amount < 0 else BankTransaction.CREDIT
+                yield self._transaction(row['date'], amount, description, row.get('counterparty'), direction)
+            except ValueError as e:
+                self._error(line, str(e))
+
+    # --- camt.053 ---
+
+    def _iter_camt(self, stream):
+        parents = []
+        entry_number = 0
+        try:
+            # defusedxml - be išorinių esybių ir esybių plėtimo ("billion laughs") įkeltame faile
+            for event, element in iterparse(stream, events=('start', 'end')):
+                if event == 'start':
+                    parents.append(element)
+                    continue
+                parents.pop()
+                if _local_name(element.tag) != 'Ntry':
+                    continue
+                entry_number += 1
+                self.rows += 1
+                try:
+                    transactions = self._camt_entry(element)
+                except ValueError as e:
+                    self._error(entry_number, str(e))
+                    transactions = []
+                if transactions is None:
+                    self.skipped += 1
+                yield from transactions or ()
+                # Apdorotas įrašas pašalinamas iš medžio - atmintis nepriklauso nuo išrašo dydžio
+                element.clear()
+                if parents:
+                    parents[-1].remove(element)
+        except ParseError as e:
+            raise StatementFormatError(f'Netinkamas XML išrašas: {e}')
+        except DefusedXmlException as e:
+            raise StatementFormatError(f'Neleistinas XML išrašo turinys: {e}')
+        if self.rows == 0:
+            raise StatementFormatError('XML faile nerasta camt.053 operacijų (Ntry)')
+
+    def _camt_entry(self, entry):
+        """Ntry -> [BankTransaction, ...]; None - neįrašyta (laukianti) operacija"""
+        namespace = entry.tag[:entry.tag.index('}') + 1] if entry.tag.startswith('{') else ''
+
+        def find(element, path):
+            return element.find('/'.join(namespace + part for part in path.split('/')))
+
+        def text(element, *paths):
+            for path in paths:
+                found = find(element, path)
+                if found is not None and (found.text or '').strip():
+                    return found.text.strip()
+            return ''
+
+        status = text(entry, 'Sts/Cd', 'Sts')
+        if status and status != 'BOOK':
+            return None
+        booking_date = text(entry, 'BookgDt/Dt', 'BookgDt/DtTm', 'ValDt/Dt', 'ValDt/DtTm')
+        if not booking_date:
+            raise ValueError('Nenurodyta operacijos data')
+        indicator = text(entry, 'CdtDbtInd')
+        direction = {'CRDT': BankTransaction.CREDIT, 'DBIT': BankTransaction.DEBIT}.get(indicator)
+        party = 'Dbtr' if direction == BankTransaction.CREDIT else 'Cdtr'
+        details = entry.findall('/'.join(namespace + part for part in ('NtryDtls', 'TxDtls')))
+        entry_info = text(entry, 'AddtlNtryInf')
+
+        def describe(details_element):
+            if details_element is None:
+                return entry_info, ''
+            remittance = find(details_element, 'RmtInf')
+            parts = []
+            if remittance is not None:
+                parts = [
+                    (element.text or '').strip() for element in remittance.iter()
+                    if _local_name(element.tag) in ('Ustrd', 'Ref') and (element.text or '').strip()
+                ]
+            description = ' '.join(parts) or text(details_element, 'AddtlTxInf') or entry_info
+            counterparty = text(details_element, f'RltdPties/{party}/Nm', f'RltdPties/{party}/Pty/Nm')
+            return description, counterparty
+
+        amounts = [text(details_element, 'Amt', 'AmtDtls/TxAmt/Amt') for details_element in details]
+        if len(details) > 1 and all(amounts):
+            # Paketinis įrašas - kiekviena TxDtls atskira operacija
+            return [
+                self._transaction(booking_date, parse_amount(amount), *describe(details_element), direction)
+                for details_element, amount in zip(details, amounts)
+            ]
+        amount = text(entry, 'Amt')
+        if not amount:
+            raise ValueError('Nenurodyta operacijos suma')
+        return [self._transaction(
+            booking_date, parse_amount(amount), *describe(details[0] if details else None), direction
+        )]
+
+
+def _local_name(tag) -> str:
+    return tag.rsplit('}', 1)[-1] if isinstance(tag, str) else ''
+
+
+def import_bank_statement(source, chunk_size=None):
+    """
+    Importuoti išrašą: operacijos skaitomos srautu ir suderinamos paketais po chunk_size.
+
+    Returns:
+        process_bank_statement() rezultatas + format / encoding / rows / skipped_count / error_count / errors
+    """
+    from .bank_utils import process_bank_statement
+
+    reader = BankStatementReader(source)
+    chunk_size = chunk_size or getattr(settings, 'BANK_IMPORT_CHUNK_SIZE', 500)
+    result = process_bank_statement(reader, chunk_size=chunk_size)
+    result.update(reader.summary())
+    if reader.error_count:
+        logger.warning(
+            'Bank statement import: %s malformed rows of %s (%s)', reader.error_count, reader.rows, reader.format
+        )
+    return result
@@ -1,21 +1,16 @@
-import csv
-import io
-from datetime import datetime
-from decimal import Decimal
-from django.utils import timezone
-from django.db import transaction as db_transaction
-from .models import SalesInvoice, PurchaseInvoice
-
-
 class BankTransaction:
     """Banko operacijos modelis"""
     
-    def __init__(self, date, amount, description, invoice_number=None, partner_name=None):
+    CREDIT = 'credit'  # Gauti pinigai (pardavimo sąskaitų apmokėjimai)
+    DEBIT = 'debit'  # Išleisti pinigai (pirkimo sąskaitų apmokėjimai)
+
+    def __init__(self, date, amount, description, invoice_number=None, partner_name=None, direction=None):
         self.date = date
         self.amount = amount
         self.description = description
         self.invoice_number = invoice_number
         self.partner_name = partner_name
+        self.direction = direction  # CREDIT / DEBIT; None - kryptis išraše nenurodyta
         self.matched = False
         self.matched_invoice = None
         self.match_type = None  # 'sales' or 'purchase'
@@ -24,76 +19,16 @@ class BankTransaction:
 
 def parse_csv_bank_statement(csv_file):
     """
-    Apdoroja CSV banko išrašo failą.
-    Laukia formatą: data, suma, aprašymas
+    Apdoroja banko išrašo failą (CSV arba camt.053 XML) ir grąžina visų operacijų sąrašą.
+    Dideliems išrašams naudoti bank_statement_import.import_bank_statement() - skaito srautu ir
+    suderina paketais.
     """
-    transactions = []
-    
+    from .bank_statement_import import BankStatementReader
+
     try:
-        # Nuskaitome failą
-        content = csv_file.read()
-        if isinstance(content, bytes):
-            content = content.decode('utf-8')
-        
-        csv_reader = csv.DictReader(io.StringIO(content))
-        
-        for row in csv_reader:
-            try:
-                # Bandoma rasti datos lauką
-                date_field = None
-                amount_field = None
-                description_field = None
-                
-                for field in row.keys():
-                    field_lower = field.lower()
-                    if 'data' in field_lower or 'date' in field_lower:
-                        date_field = field
-                    if 'suma' in field_lower or 'amount' in field_lower or 'sum' in field_lower:
-                        amount_field = field
-                    if 'aprašymas' in field_lower or 'description' in field_lower or 'info' in field_lower:
-                        description_field = field
-                
-                if not all([date_field, amount_field, description_field]):
-                    continue
-                
-                # Apdorojame datą
-                date_str = row[date_field].strip()
-                try:
-                    date = datetime.strptime(date_str, '%Y-%m-%d').date()
-                except:
-                    try:
-                        date = datetime.strptime(date_str, '%d.%m.%Y').date()
-                    except:
-                        continue
-                
-                # Apdorojame sumą
-                amount_str = row[amount_field].replace(',', '.').replace(' ', '')
-                try:
-                    amount = Decimal(amount_str)
-                except:
-                    continue
-                
-                description = row[description_field].strip()
-                
-                # Bandome ištraukti sąskaitos numerį iš aprašymo
-                invoice_number = extract_invoice_number(description)
-                partner_name = extract_partner_name(description)
-                
-                transaction = BankTransaction(
-                    date=date,
-                    amount=abs(amount),  # Visada teigiamas
-                    description=description,
-                    invoice_number=invoice_number,
-                    partner_name=partner_name
-                )
-                
-                transactions.append(transaction)
-                
-            except Exception as e:
-                continue
-        
-        return transactions
-        
+        return list(BankStatementReader(csv_file))
+    except ValueError:
+        raise
     except Exception as e:
         raise ValueError(f"Klaida apdorojant CSV failą: {str(e)}")
 
@@ -136,263 +71,113 @@ def match_transaction_to_invoice(transaction, all_sales_invoices=None, all_purch
     Bando suderinti banko operaciją su sąskaita.
     Grąžina (matched_invoice, match_type, confidence)
     
-    Optimizuota: naudoja užkrautas invoices list'us, kad išvengtų N+1 queries.
+    Vienai operacijai sukuriamas indeksas (iš perduotų sąrašų arba DB); visam išrašui
+    naudoti process_bank_statement() / bank_reconciliation.reconcile_transactions().
     """
-    best_match = None
-    best_confidence = 0.0
-    match_type = None
-    
-    # Jei neperduotos užkrautos invoices, naudoti seną būdą (backward compatibility)
-    use_optimized = all_sales_invoices is not None and all_purchase_invoices is not None
-    
-    if use_optimized:
-        # Filtruojame memory'e
-        # 1. Bandoma rasti pagal sąskaitos numerį ir sumą (aukščiausias prioritetas)
-        if transaction.invoice_number:
-            # Sales invoices
-            sales_matches = [
-                inv for inv in all_sales_invoices
-                if transaction.invoice_number.upper() in inv.invoice_number.upper()
-                and inv.payment_status in ['unpaid', 'partially_paid']
-            ]
-            
-            for invoice in sales_matches:
-                if abs(float(invoice.amount_total) - float(transaction.amount)) < 0.01:
-                    confidence = 0.95
-                    if transaction.partner_name and transaction.partner_name.lower() in invoice.partner.name.lower():
-                        confidence = 1.0
-                    
-                    if confidence > best_confidence:
-                        best_match = invoice
-                        best_confidence = confidence
-                        match_type = 'sales'
-            
-            # Purchase invoices
-            purchase_matches = [
-                inv for inv in all_purchase_invoices
-                if transaction.invoice_number.upper() in inv.invoice_number.upper()
-                and inv.payment_status in ['unpaid', 'partially_paid']
-            ]
-            
-            for invoice in purchase_matches:
-                if abs(float(invoice.amount_total) - float(transaction.amount)) < 0.01:
-                    confidence = 0.95
-                    if transaction.partner_name and transaction.partner_name.lower() in invoice.partner.name.lower():
-                        confidence = 1.0
-                    
-                    if confidence > best_confidence:
-                        best_match = invoice
-                        best_confidence = confidence
-                        match_type = 'purchase'
-        
-        # 2. Jei nerasta pagal numerį, bandoma pagal sumą ir partnerio pavadinimą
-        if best_confidence < 0.8 and transaction.partner_name:
-            # Sales invoices
-            sales_matches = [
-                inv for inv in all_sales_invoices
-                if transaction.partner_name.lower() in inv.partner.name.lower()
-                and inv.payment_status in ['unpaid', 'partially_paid']
-            ]
-            
-            for invoice in sales_matches:
-                amount_diff = abs(float(invoice.amount_total) - float(transaction.amount))
-                if abs(amount_diff) < 0.01:
-                    confidence = 0.7
-                    if confidence > best_confidence:
-                        best_match = invoice
-                        best_confidence = confidence
-                        match_type = 'sales'
-            
-            # Purchase invoices
-            purchase_matches = [
-                inv for inv in all_purchase_invoices
-                if transaction.partner_name.lower() in inv.partner.name.lower()
-                and inv.payment_status in ['unpaid', 'partially_paid']
-            ]
-            
-            for invoice in purchase_matches:
-                amount_diff = abs(float(invoice.amount_total) - float(transaction.amount))
-                if abs(amount_diff) < 0.01:
-                    confidence = 0.7
-                    if confidence > best_confidence:
-                        best_match = invoice
-                        best_confidence = confidence
-                        match_type = 'purchase'
-        
-        # 3. Paskutinis variantas - tik pagal sumą (žemas prioritetas)
-        if best_confidence < 0.5:
-            # Tikriname sales invoices (tik pirmus 50)
-            sales_matches = [
-                inv for inv in all_sales_invoices[:50]
-                if inv.payment_status in ['unpaid', 'partially_paid']
-                and inv.amount_total is not None
-            ]
-            
-            for invoice in sales_matches:
-                if abs(float(invoice.amount_total) - float(transaction.amount)) < 0.01:
-                    confidence = 0.3
-                    if confidence > best_confidence:
-                        best_match = invoice
-                        best_confidence = confidence
-                        match_type = 'sales'
+    from .bank_reconciliation import InvoiceMatchIndex, reconcile_transactions
+
+    if all_sales_invoices is not None and all_purchase_invoices is not None:
+        index = InvoiceMatchIndex(all_sales_invoices, all_purchase_invoices)
     else:
-        # Senasis būdas (backward compatibility)
-        # 1. Bandoma rasti pagal sąskaitos numerį ir sumą (aukščiausias prioritetas)
-        if transaction.invoice_number:
-            # Sales invoices
-            sales_matches = SalesInvoice.objects.filter(
-                invoice_number__icontains=transaction.invoice_number,
-                payment_status__in=['unpaid', 'partially_paid']
-            ).select_related('partner')
-            
-            for invoice in sales_matches:
-                if abs(float(invoice.amount_total) - float(transaction.amount)) < 0.01:
-                    confidence = 0.95
-                    if transaction.partner_name and transaction.partner_name.lower() in invoice.partner.name.lower():
-                        confidence = 1.0
-                    
-                    if confidence > best_confidence:
-                        best_match = invoice
-                        best_confidence = confidence
-                        match_type = 'sales'
-            
-            # Purchase invoices
-            purchase_matches = PurchaseInvoice.objects.filter(
-                invoice_number__icontains=transaction.invoice_number,
-                payment_status__in=['unpaid', 'partially_paid']
-            ).select_related('partner')
-            
-            for invoice in purchase_matches:
-                if abs(float(invoice.amount_total) - float(transaction.amount)) < 0.01:
-                    confidence = 0.95
-                    if transaction.partner_name and transaction.partner_name.lower() in invoice.partner.name.lower():
-                        confidence = 1.0
-                    
-                    if confidence > best_confidence:
-                        best_match = invoice
-                        best_confidence = confidence
-                        match_type = 'purchase'
-        
-        # 2. Jei nerasta pagal numerį, bandoma pagal sumą ir partnerio pavadinimą
-        if best_confidence < 0.8 and transaction.partner_name:
-            # Sales invoices
-            sales_matches = SalesInvoice.objects.filter(
-                partner__name__icontains=transaction.partner_name,
-                payment_status__in=['unpaid', 'partially_paid']
-            ).select_related('partner')
-            
-            for invoice in sales_matches:
-                amount_diff = abs(float(invoice.amount_total) - float(transaction.amount))
-                if abs(amount_diff) < 0.01:
-                    confidence = 0.7
-                    if confidence > best_confidence:
-                        best_match = invoice
-                        best_confidence = confidence
-                        match_type = 'sales'
-            
-            # Purchase invoices
-            purchase_matches = PurchaseInvoice.objects.filter(
-                partner__name__icontains=transaction.partner_name,
-                payment_status__in=['unpaid', 'partially_paid']
-            ).select_related('partner')
-            
-            for invoice in purchase_matches:
-                amount_diff = abs(float(invoice.amount_total) - float(transaction.amount))
-                if abs(amount_diff) < 0.01:
-                    confidence = 0.7
-                    if confidence > best_confidence:
-                        best_match = invoice
-                        best_confidence = confidence
-                        match_type = 'purchase'
-        
-        # 3. Paskutinis variantas - tik pagal sumą (žemas prioritetas)
-        if best_confidence < 0.5:
-            # Tikriname sales invoices
-            sales_matches = SalesInvoice.objects.filter(
-                payment_status__in=['unpaid', 'partially_paid']
-            ).exclude(amount_total__isnull=True).select_related('partner')[:50]
-            
-            for invoice in sales_matches:
-                if abs(float(invoice.amount_total) - float(transaction.amount)) < 0.01:
-                    confidence = 0.3
-                    if confidence > best_confidence:
-                        best_match = invoice
-                        best_confidence = confidence
-                        match_type = 'sales'
-    
-    transaction.matched = best_confidence >= 0.5
-    transaction.matched_invoice = best_match
-    transaction.match_type = match_type
-    transaction.match_confidence = best_confidence
-    
-    return best_match, match_type, best_confidence
+        index = InvoiceMatchIndex.from_db()
+    _, invoice, match_type, confidence = reconcile_transactions([transaction], index=index)[0]
+    return invoice, match_type, confidence
 
 
-def process_bank_statement(transactions):
+def process_bank_statement(transactions, chunk_size=None, max_results=None):
     """
     Apdoroja banko išrašą ir suderina su sąskaitomis.
-    Grąžina rezultatų sąrašą su kiekvienos operacijos statusu.
-    
-    Optimizuota: naudoja bulk_update vietoj individual save() operacijų.
+    Grąžina suvestinę ir pirmų max_results operacijų detales (BANK_IMPORT_MAX_RESULTS) -
+    metų išrašo atsakymas nepriklauso nuo operacijų skaičiaus, praleistų detalių skaičius - results_truncated.
+    
+    Neapmokėtos sąskaitos indeksuojamos vieną kartą (bank_reconciliation), suderintos sąskaitos
+    pažymimos kaip apmokėtos vienoje transakcijoje (PaymentService.mark_many_as_paid).
+    transactions gali būti ir iteratorius (BankStatementReader) - tada su chunk_size operacijos
+    suderinamos ir pažymimos paketais, atmintyje laikomas tik vienas paketas.
+    Nepavykus pažymėti paketo, jo operacijos laikomos nesuderintomis (failed_count, detalėse - 'error').
     """
+    import logging
+    from itertools import islice
+    from django.conf import settings
+    from .bank_reconciliation import InvoiceMatchIndex, reconcile_transactions
+    from .payment_service import PaymentService
+
+    logger = logging.getLogger(__name__)
+    if max_results is None:
+        max_results = getattr(settings, 'BANK_IMPORT_MAX_RESULTS', 500)
+    iterator = iter(transactions)
+    index = None
+    claimed = set()
     results = []
+    total_count = 0
     matched_count = 0
-    
-    # Užkrauti visas unpaid/partially_paid invoices vieną kartą (optimizacija)
-    all_sales_invoices = list(SalesInvoice.objects.filter(
-        payment_status__in=['unpaid', 'partially_paid']
-    ).select_related('partner').all())
-    
-    all_purchase_invoices = list(PurchaseInvoice.objects.filter(
-        payment_status__in=['unpaid', 'partially_paid']
-    ).select_related('partner').all())
-    
-    # Apdoroti visas transactions
-    for transaction in transactions:
-        invoice, match_type, confidence = match_transaction_to_invoice(
-            transaction,
-            all_sales_invoices=all_sales_invoices,
-            all_purchase_invoices=all_purchase_invoices
-        )
-        
-        result = {
-            'date': transaction.date.isoformat(),
-            'amount': str(transaction.amount),
-            'description': transaction.description,
-            'matched': transaction.matched,
-            'match_type': match_type,
-            'confidence': confidence,
-            'invoice_number': invoice.invoice_number if invoice else None,
-            'invoice_id': invoice.id if invoice else None,
-        }
-        
-        # Jei suderinta, naudoti PaymentService.mark_as_paid()
-        if transaction.matched and invoice:
-            from .payment_service import PaymentService
-            
+    failed_count = 0
+
+    while True:
+        chunk = list(islice(iterator, chunk_size)) if chunk_size else list(iterator)
+        if not chunk:
+            break
+        # Indeksas ir suderintos sąskaitos bendri visiems paketams
+        index = index or InvoiceMatchIndex.from_db()
+        matches = reconcile_transactions(chunk, index=index, claimed=claimed)
+        total_count += len(chunk)
+
+        items = [
+            {
+                'invoice_type': match_type,
+                'invoice_id': invoice.id,
+                'payment_date': transaction.date,
+                'notes': f'Automatiškai suderinta su banko išrašu. Suma: {transaction.amount}',
+            }
+            for transaction, invoice, match_type, confidence in matches
+            if transaction.matched and invoice
+        ]
+        failed = set()
+        error = None
+        if items:
             try:
-                # Naudoti PaymentService, kad būtų sukurtas InvoicePayment įrašas
-                result = PaymentService.mark_as_paid(
-                    invoice_type=match_type,
-                    invoice_id=invoice.id,
-                    payment_date=transaction.date.strftime('%Y-%m-%d'),
+                PaymentService.mark_many_as_paid(
+                    items,
                     payment_method='Banko pavedimas',
-                    notes=f'Automatiškai suderinta su banko išrašu. Suma: {transaction.amount}',
                     created_by=None  # Banko importas nėra susijęs su konkrečiu vartotoju
                 )
-                matched_count += 1
+                matched_count += len(items)
             except Exception as e:
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.error(f'Klaida pažymint sąskaitą kaip apmokėtą per PaymentService: {e}', exc_info=True)
-                # Tęsti su kitais invoice'ais net jei vienas nepavyko
-        
-        results.append(result)
-    
+                logger.error(f'Klaida pažymint sąskaitas kaip apmokėtas per PaymentService: {e}', exc_info=True)
+                error = f'Nepavyko pažymėti sąskaitos kaip apmokėtos: {e}'
+                failed_count += len(items)
+                for transaction, invoice, match_type, confidence in matches:
+                    if transaction.matched and invoice:
+                        # Sąskaita liko neapmokėta - gali būti suderinta su kita operacija
+                        transaction.matched = False
+                        failed.add(id(transaction))
+                        claimed.discard((match_type, invoice.pk))
+
+        for transaction, invoice, match_type, confidence in matches:
+            if len(results) >= max_results:
+                break
+            result = {
+                'date': transaction.date.isoformat(),
+                'amount': str(transaction.amount),
+                'direction': transaction.direction,
+                'description': transaction.description,
+                'matched': transaction.matched,
+                'match_type': match_type,
+                'confidence': confidence,
+                'invoice_number': invoice.invoice_number if invoice else None,
+                'invoice_id': invoice.id if invoice else None,
+            }
+            if id(transaction) in failed:
+                result['error'] = error
+            results.append(result)
+        if not chunk_size:
+            break
+
     return {
-        'total_transactions': len(transactions),
+        'total_transactions': total_count,
         'matched_count': matched_count,
-        'unmatched_count': len(transactions) - matched_count,
-        'results': results
+        'unmatched_count': total_count - matched_count,
+        'failed_count': failed_count,
+        'results': results,
+        'results_truncated': total_count - len(results),
     }
-
@@ -0,0 +1,179 @@
+"""
+Banko išrašo suderinimo matavimas su sintetiniu išrašu.
+
+Pavyzdžiai:
+    python manage.py benchmark_bank_reconciliation --invoices 5000 --transactions 2000
+    python manage.py benchmark_bank_reconciliation --invoices 5000 --transactions 2000 --naive
+    python manage.py benchmark_bank_reconciliation --invoices 2000 --transactions 500 --apply
+
+Be --apply matuojamas tik suderinimas atmintyje (sąskaitos neišsaugotos).
+--naive - palyginimui senasis būdas (kiekviena operacija x kiekviena sąskaita, substring paieška).
+--apply - sąskaitos sukuriamos DB ir vykdomas process_bank_statement() (transakcija atšaukiama pabaigoje).
+"""
+
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from apps.invoices.bank_reconciliation import InvoiceMatchIndex, reconcile_transactions
+from apps.invoices.bank_utils import BankTransaction, extract_invoice_number, extract_partner_name
+from apps.invoices.models import PurchaseInvoice, SalesInvoice
+from apps.partners.models import Partner
+
+PARTNER_WORDS = ['Baltic', 'Trans', 'Logistika', 'Cargo', 'Nord', 'Vilniaus', 'Kauno', 'Express', 'Fleet', 'Auto']
+
+
+class Command(BaseCommand):
+    help = 'Išmatuoti banko išrašo suderinimo laiką su sintetinėmis sąskaitomis ir operacijomis'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invoices', type=int, default=5000, help='Neapmokėtų sąskaitų skaičius')
+        parser.add_argument('--transactions', type=int, default=2000, help='Išrašo operacijų skaičius')
+        parser.add_argument('--partners', type=int, default=300, help='Partnerių skaičius')
+        parser.add_argument('--seed', type=int, default=1, help='Atsitiktinių skaičių generatoriaus sėkla')
+        parser.add_argument('--naive', action='store_true', help='Išmatuoti ir senąjį (pilno perrinkimo) būdą')
+        parser.add_argument('--apply', action='store_true', help='Sukurti sąskaitas DB ir pažymėti apmokėtas')
+
+    def _partner_names(self, rng, count):
+        return [
+            f'UAB {rng.choice(PARTNER_WORDS)} {rng.choice(PARTNER_WORDS)} {index}'
+            for index in range(count)
+        ]
+
+    def _build_invoices(self, rng, count, partners):
+        """[(tipas, numeris, suma, partneris), ...] - 80 % pardavimo, 20 % pirkimo sąskaitų"""
+        rows = []
+        for index in range(count):
+            invoice_type = 'sales' if index % 5 else 'purchase'
+            prefix = 'BSF' if invoice_type == 'sales' else 'BPI'
+            amount = Decimal(rng.randint(5000, 500000)) / 100
+            rows.append((invoice_type, f'{prefix}{index + 1:07d}', amount, rng.choice(partners)))
+        return rows
+
+    def _build_transactions(self, rng, count, invoice_rows):
+        """60 % su numeriu ir partneriu, 20 % tik partneris + suma, 20 % nesusijusios operacijos"""
+        transactions = []
+        targets = rng.sample(invoice_rows, min(count, len(invoice_rows)))
+        for index in range(count):
+            kind = index % 5
+            if kind < 3 and index < len(targets):
+                _, number, amount, partner = targets[index]
+                description = f'{partner.name}, apmokejimas pagal saskaita {number}'
+            elif kind == 3 and index < len(targets):
+                _, _, amount, partner = targets[index]
+                description = f'{partner.name} mokejimas uz paslaugas'
+            else:
+                amount = Decimal(rng.randint(100, 10000)) / 100
+                description = f'Kortele {rng.randint(1000, 9999)} degalai'
+            transactions.append(BankTransaction(
+                date=date.today() - timedelta(days=rng.randint(0, 30)),
+                amount=amount,
+                description=description,
+                invoice_number=extract_invoice_number(description),
+                partner_name=extract_partner_name(description),
+            ))
+        return transactions
+
+    def _in_memory_invoices(self, invoice_rows):
+        sales, purchase = [], []
+        for pk, (invoice_type, number, amount, partner) in enumerate(invoice_rows, start=1):
+            model = SalesInvoice if invoice_type == 'sales' else PurchaseInvoice
+            invoice = model(pk=pk, invoice_number=number, amount_total=amount, payment_status='unpaid', partner=partner)
+            (sales if invoice_type == 'sales' else purchase).append(invoice)
+        return sales, purchase
+
+    def _naive_match(self, bank_transaction, sales, purchase):
+        """Senasis būdas: kiekviena sąskaita tikrinama substring palyginimu"""
+        number, partner_name = bank_transaction.invoice_number, bank_transaction.partner_name
+        amount = float(bank_transaction.amount)
+        best, best_confidence = None, 0.0
+        for invoices in (sales, purchase):
+            for invoice in invoices:
+                if number and number.upper() in invoice.invoice_number.upper():
+                    if abs(float(invoice.amount_total) - amount) < 0.01 and best_confidence < 0.95:
+                        best, best_confidence = invoice, 0.95
+        if best_confidence < 0.8 and partner_name:
+            for invoices in (sales, purchase):
+                for invoice in invoices:
+                    if partner_name.lower() in invoice.partner.name.lower():
+                        if abs(float(invoice.amount_total) - amount) < 0.01 and best_confidence < 0.7:
+                            best, best_confidence = invoice, 0.7
+        return best, best_confidence
+
+    def _report(self, label, seconds, transactions):
+        matched = sum(1 for bank_transaction in transactions if bank_transaction.matched)
+        self.stdout.write(
+            f'{label:<28} {seconds:>9.3f} s   suderinta {matched}/{len(transactions)}'
+            f'   ({seconds / max(1, len(transactions)) * 1000:.3f} ms/operacijai)'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        partners = [
+            Partner(pk=index + 1, name=name)
+            for index, name in enumerate(self._partner_names(rng, max(1, options['partners'])))
+        ]
+        invoice_rows = self._build_invoices(rng, options['invoices'], partners)
+        transactions = self._build_transactions(rng, options['transactions'], invoice_rows)
+        self.stdout.write(f"Sąskaitos: {len(invoice_rows)}, operacijos: {len(transactions)}\n")
+
+        sales, purchase = self._in_memory_invoices(invoice_rows)
+        started = time.perf_counter()
+        index = InvoiceMatchIndex(sales, purchase)
+        index_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        reconcile_transactions(transactions, index=index)
+        match_seconds = time.perf_counter() - started
+        self.stdout.write(f"{'Indekso sudarymas':<28} {index_seconds:>9.3f} s")
+        self._report('Suderinimas (indeksas)', match_seconds, transactions)
+
+        if options['naive']:
+            started = time.perf_counter()
+            for bank_transaction in transactions:
+                _, confidence = self._naive_match(bank_transaction, sales, purchase)
+                bank_transaction.matched = confidence >= 0.5
+            self._report('Suderinimas (perrinkimas)', time.perf_counter() - started, transactions)
+
+        if options['apply']:
+            self._apply(invoice_rows, transactions)
+
+    def _apply(self, invoice_rows, transactions):
+        from apps.invoices.bank_utils import process_bank_statement
+
+        with transaction.atomic():
+            partner_names = sorted({partner.name for _, _, _, partner in invoice_rows})
+            saved_partners = Partner.objects.bulk_create([
+                Partner(name=name, code=f'BENCH-BANK-{index}', is_client=True, is_supplier=True)
+                for index, name in enumerate(partner_names)
+            ])
+            if not saved_partners or saved_partners[0].pk is None:
+                saved_partners = list(Partner.objects.filter(code__startswith='BENCH-BANK-'))
+            partner_ids = {partner.name: partner.pk for partner in saved_partners}
+            today = date.today()
+            for invoice_type, model in (('sales', SalesInvoice), ('purchase', PurchaseInvoice)):
+                model.objects.bulk_create([
+                    model(
+                        invoice_number=number, partner_id=partner_ids[partner.name], amount_net=amount,
+                        vat_rate=Decimal('0.00'), amount_total=amount, payment_status='unpaid',
+                        issue_date=today, due_date=today + timedelta(days=30),
+                    )
+                    for row_type, number, amount, partner in invoice_rows
+                    if row_type == invoice_type
+                ], batch_size=1000)
+
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                result = process_bank_statement(transactions)
+                seconds = time.perf_counter() - started
+            self.stdout.write(
+                f"{'process_bank_statement':<28} {seconds:>9.3f} s   pažymėta {result['matched_count']}"
+                f"/{result['total_transactions']}, užklausų: {len(captured.captured_queries)}"
+            )
+            transaction.set_rollback(True)
+        self.stdout.write(self.style.SUCCESS('Laikinos sąskaitos atšauktos'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from apps.invoices.order_payment_summary import refresh_order_payment_summaries
+from apps.orders.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Perskaičiuoja užsakymų pardavimo sąskaitų suvestinę (Order.sales_invoices_* laukus)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--order-id', type=int, action='append', help='Tik nurodyti užsakymai (galima kartoti)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Užsakymų skaičius vienam paketui')
+
+    def handle(self, *args, **options):
+        queryset = Order.objects.order_by('pk')
+        if options['order_id']:
+            queryset = queryset.filter(pk__in=options['order_id'])
+        order_ids = list(queryset.values_list('pk', flat=True))
+        chunk_size = max(1, options['chunk_size'])
+
+        self.stdout.write(f'Perskaičiuojama {len(order_ids)} užsakymų suvestinė...')
+        updated = 0
+        for start in range(0, len(order_ids), chunk_size):
+            updated += refresh_order_payment_summaries(order_ids[start:start + chunk_size])
+            self.stdout.write(f'  {min(start + chunk_size, len(order_ids))}/{len(order_ids)}')
+
+        self.stdout.write(self.style.SUCCESS(f'Atnaujinta užsakymų: {updated}'))
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0023_add_back_display_options_fields'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='purchaseinvoice',
+            index=models.Index(fields=['issue_date', 'id'], name='purchase_in_issue_d_c57f83_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchaseinvoice',
+            index=models.Index(fields=['created_at', 'id'], name='purchase_in_created_ba9355_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salesinvoice',
+            index=models.Index(fields=['issue_date', 'id'], name='sales_invoi_issue_d_a34741_idx'),
+        ),
+    ]
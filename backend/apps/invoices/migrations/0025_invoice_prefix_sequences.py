@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0024_invoice_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InvoicePrefixSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=20, unique=True, verbose_name='Prefiksas')),
+                ('last_number', models.PositiveIntegerField(default=0, verbose_name='Paskutinis numeris')),
+                ('separator', models.CharField(blank=True, default='', help_text='Tarp prefikso ir skaitmenų (pvz. "-" numeriui LOG-0000123)', max_length=10, verbose_name='Skirtukas')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atnaujinta')),
+            ],
+            options={
+                'verbose_name': 'Sąskaitų numeracijos seka (pagal prefiksą)',
+                'verbose_name_plural': 'Sąskaitų numeracijos sekos (pagal prefiksą)',
+                'db_table': 'invoice_prefix_sequences',
+            },
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:52
+
+import re
+
+from django.db import migrations, models
+
+
+# Numerio skaidymo kopija (apps.core.numbering tuo metu) - migracija nepriklauso nuo programos kodo
+NUMBER_SEPARATORS = ' -/_.#'
+NUMBER_RE = re.compile(r'^(.*?)(\d+)$', re.S)
+
+
+def normalize_prefix(prefix):
+    return str(prefix or '').strip().rstrip(NUMBER_SEPARATORS).strip().upper()[:32]
+
+
+def numeric_part(digits):
+    if not digits.isascii() or not digits.isdigit() or len(digits.lstrip('0')) > 18:
+        return None
+    return int(digits)
+
+
+def split_number(number, prefixes):
+    value = str(number or '').strip()
+    for prefix in sorted({prefix.strip() for prefix in prefixes if prefix and prefix.strip()}, key=len, reverse=True):
+        if value[:len(prefix)].upper() == prefix.upper():
+            suffix = numeric_part(value[len(prefix):].lstrip(NUMBER_SEPARATORS))
+            if suffix is not None:
+                return normalize_prefix(prefix), suffix
+    match = NUMBER_RE.match(value)
+    if not match:
+        return normalize_prefix(value), None
+    return normalize_prefix(match.group(1)), numeric_part(match.group(2))
+
+
+def backfill(model, number_field, prefixes):
+    changed = []
+    rows = model.objects.order_by('pk').values_list('pk', number_field, 'number_prefix', 'number_suffix')
+    for pk, number, prefix, suffix in rows.iterator(chunk_size=1000):
+        parts = split_number(number, prefixes)
+        if parts != (prefix, suffix):
+            changed.append(model(pk=pk, number_prefix=parts[0], number_suffix=parts[1]))
+        if len(changed) >= 1000:
+            model.objects.bulk_update(changed, ['number_prefix', 'number_suffix'])
+            changed = []
+    if changed:
+        model.objects.bulk_update(changed, ['number_prefix', 'number_suffix'])
+
+
+def setting_value(apps, model_name, field, default=''):
+    instance = apps.get_model('settings', model_name).objects.order_by('pk').first()
+    return (getattr(instance, field, None) or default) if instance is not None else default
+
+
+def fill_number_parts(apps, schema_editor):
+    """Užpildo išskaidytus sąskaitų numerius (vėliau nustatoma save() metu)"""
+    prefixes = list(apps.get_model('invoices', 'InvoicePrefixSequence').objects.values_list('prefix', flat=True))
+    prefixes.append(setting_value(apps, 'InvoiceSettings', 'invoice_prefix_sales', 'LOG'))
+    backfill(apps.get_model('invoices', 'SalesInvoice'), 'invoice_number', prefixes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('invoices', '0025_invoice_prefix_sequences'),
+        ('settings', '0002_invoicesettings_invoice_number_width_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesinvoice',
+            name='number_prefix',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32, verbose_name='Numerio prefiksas'),
+        ),
+        migrations.AddField(
+            model_name='salesinvoice',
+            name='number_suffix',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='Numerio skaitinė dalis'),
+        ),
+        migrations.AddIndex(
+            model_name='salesinvoice',
+            index=models.Index(fields=['number_prefix', 'number_suffix'], name='sales_invoi_number__031d5d_idx'),
+        ),
+        migrations.RunPython(fill_number_parts, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,7 @@ from django.core.validators import MinValueValidator
 from decimal import Decimal
 from apps.partners.models import Partner
 from apps.orders.models import Order
+from apps.core.numbering import NumberPartsQuerySet, set_number_parts
 
 
 def purchase_invoice_file_path(instance, filename):
@@ -48,6 +49,13 @@ class SalesInvoice(models.Model):
         db_index=True,
         verbose_name=_('Sąskaitos numeris')
     )
+    # Išskaidytas numeris tarpų paieškai (apps.core.numbering, nustatoma save() metu)
+    number_prefix = models.CharField(
+        max_length=32, blank=True, default='', editable=False, verbose_name=_('Numerio prefiksas')
+    )
+    number_suffix = models.PositiveBigIntegerField(
+        null=True, blank=True, editable=False, verbose_name=_('Numerio skaitinė dalis')
+    )
     invoice_type = models.CharField(
         max_length=20,
         choices=InvoiceType.choices,
@@ -142,7 +150,22 @@ class SalesInvoice(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    
+
+    NUMBER_FIELD = 'invoice_number'
+    # number_prefixes() perkraunamas tik pasikeitus šių modelių versijos žymėms
+    NUMBER_PREFIX_SOURCES = ('settings.InvoiceSettings', 'invoices.InvoicePrefixSequence')
+    # update() / bulk_* taip pat nustato number_prefix / number_suffix (apps.core.numbering)
+    objects = NumberPartsQuerySet.as_manager()
+
+    @classmethod
+    def number_prefixes(cls):
+        """Numerių prefiksai iš nustatymų - numeris skaidomas pagal juos (apps.core.numbering)"""
+        from apps.settings.models import InvoiceSettings
+
+        prefixes = list(InvoicePrefixSequence.objects.values_list('prefix', flat=True))
+        prefixes.append(InvoiceSettings.load().invoice_prefix_sales or 'LOG')
+        return prefixes
+
     class Meta:
         db_table = 'sales_invoices'
         verbose_name = _('Pardavimo sąskaita')
@@ -153,10 +176,16 @@ class SalesInvoice(models.Model):
             models.Index(fields=['partner']),
             models.Index(fields=['payment_status']),
             models.Index(fields=['due_date']),
+            models.Index(fields=['issue_date', 'id']),  # ?ordering=-issue_date keyset puslapiavimui
+            models.Index(fields=['number_prefix', 'number_suffix']),
         ]
     
     def __str__(self):
         return f"{self.invoice_number} - {self.partner.name}"
+
+    def save(self, *args, **kwargs):
+        set_number_parts(self, 'invoice_number', kwargs)
+        super().save(*args, **kwargs)
     
     @property
     def paid_amount(self):
@@ -351,6 +380,8 @@ class PurchaseInvoice(models.Model):
             models.Index(fields=['partner']),
             models.Index(fields=['payment_status']),
             models.Index(fields=['due_date']),
+            models.Index(fields=['issue_date', 'id']),  # ?ordering=-issue_date keyset puslapiavimui
+            models.Index(fields=['created_at', 'id']),  # numatytasis -created_at rikiavimas
         ]
     
     def __str__(self):
@@ -560,6 +591,30 @@ class InvoiceNumberSequence(models.Model):
         return f"{self.year}: {self.last_number}"
 
 
+class InvoicePrefixSequence(models.Model):
+    """
+    Sąskaitų numeracijos seka pagal prefiksą: didžiausia panaudota skaitinė dalis (sales + purchase).
+    Numeris išduodamas vienu užrakintu padidinimu (žr. utils.generate_invoice_number).
+    """
+
+    prefix = models.CharField(max_length=20, unique=True, verbose_name=_('Prefiksas'))
+    last_number = models.PositiveIntegerField(default=0, verbose_name=_('Paskutinis numeris'))
+    separator = models.CharField(
+        max_length=10, blank=True, default='',
+        verbose_name=_('Skirtukas'),
+        help_text=_('Tarp prefikso ir skaitmenų (pvz. "-" numeriui LOG-0000123)')
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Atnaujinta'))
+
+    class Meta:
+        db_table = 'invoice_prefix_sequences'
+        verbose_name = _('Sąskaitų numeracijos seka (pagal prefiksą)')
+        verbose_name_plural = _('Sąskaitų numeracijos sekos (pagal prefiksą)')
+
+    def __str__(self):
+        return f"{self.prefix}: {self.last_number}"
+
+
 class InvoiceReminder(models.Model):
     """Sąskaitų priminimų modelis"""
     
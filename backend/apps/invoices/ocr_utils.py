@@ -276,15 +276,17 @@ class InvoiceDataExtractor:
         return 'unknown'
 
 
-def process_pdf_attachment(attachment) -> Dict:
+def process_pdf_attachment(attachment, text: Optional[str] = None) -> Dict:
     """
     Apdoroti PDF priedą ir ištraukti sąskaitos duomenis.
+    text - jau ištrauktas priedo tekstas (OCR / cache); None - ištraukiama (per PDF teksto cache).
     """
     from apps.mail.mail_matching_helper_NEW import _extract_pdf_text
 
     try:
         # Ištraukti tekstą iš PDF
-        text = _extract_pdf_text(attachment)
+        if text is None:
+            text = _extract_pdf_text(attachment)
 
         if not text or not text.strip():
             logger.warning(f"Nepavyko ištraukti teksto iš PDF priedo {attachment.filename}")
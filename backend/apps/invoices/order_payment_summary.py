@@ -0,0 +1,140 @@
+"""
+Užsakymų pardavimo sąskaitų suvestinė (Order.sales_invoices_* laukai).
+
+Anksčiau Order.payment_status_info kiekvienam užsakymui vykdė iki 8 užklausų, o sąrašo serializer'is
+tą patį skaičiavo iš prefetch'ų. Dabar suvestinė saugoma pačiame užsakyme ir atnaujinama
+SalesInvoice / SalesInvoiceOrder / InvoicePayment signal'ais:
+- paveikti užsakymai surenkami per transakciją ir perskaičiuojami vieną kartą po commit,
+- perskaičiavimas - 2 užklausos bet kokiam užsakymų kiekiui, įrašomi tik pasikeitę užsakymai.
+"""
+
+import logging
+import threading
+from typing import Dict, Iterable
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_FIELDS = [
+    'sales_invoices_count',
+    'sales_invoices_paid_count',
+    'sales_invoices_partially_paid_count',
+    'sales_invoices_overdue_count',
+    'sales_invoices_earliest_due_date',
+    'sales_invoices_last_payment_date',
+]
+
+EMPTY_SUMMARY = {
+    'sales_invoices_count': 0,
+    'sales_invoices_paid_count': 0,
+    'sales_invoices_partially_paid_count': 0,
+    'sales_invoices_overdue_count': 0,
+    'sales_invoices_earliest_due_date': None,
+    'sales_invoices_last_payment_date': None,
+}
+
+_pending = threading.local()
+
+
+def compute_order_payment_summaries(order_ids: Iterable[int]) -> Dict[int, dict]:
+    """
+    Apskaičiuoti suvestinę užsakymams (sąskaitos per related_order FK ir per SalesInvoiceOrder).
+    Migracija 0068 turi savo kopiją (istoriniai modeliai) - pakeitus logiką, ji nekeičiama.
+    """
+    from apps.invoices.models import SalesInvoice, SalesInvoiceOrder
+
+    order_ids = list(order_ids)
+    invoices_by_order = {order_id: {} for order_id in order_ids}
+
+    for order_id, invoice_id, payment_status, due_date, payment_date in (
+        SalesInvoice.objects.filter(related_order_id__in=order_ids)
+        .values_list('related_order_id', 'id', 'payment_status', 'due_date', 'payment_date')
+    ):
+        invoices_by_order[order_id][invoice_id] = (payment_status, due_date, payment_date)
+
+    for order_id, invoice_id, payment_status, due_date, payment_date in (
+        SalesInvoiceOrder.objects.filter(order_id__in=order_ids)
+        .values_list('order_id', 'invoice_id', 'invoice__payment_status', 'invoice__due_date', 'invoice__payment_date')
+    ):
+        invoices_by_order[order_id][invoice_id] = (payment_status, due_date, payment_date)
+
+    summaries = {}
+    for order_id, invoices in invoices_by_order.items():
+        summary = dict(EMPTY_SUMMARY)
+        summary['sales_invoices_count'] = len(invoices)
+        unpaid_due_dates = []
+        paid_dates = []
+        for payment_status, due_date, payment_date in invoices.values():
+            if payment_status == 'paid':
+                summary['sales_invoices_paid_count'] += 1
+                if payment_date:
+                    paid_dates.append(payment_date)
+            elif payment_status == 'partially_paid':
+                summary['sales_invoices_partially_paid_count'] += 1
+            elif payment_status in ('unpaid', 'overdue'):
+                if payment_status == 'overdue':
+                    summary['sales_invoices_overdue_count'] += 1
+                if due_date:
+                    unpaid_due_dates.append(due_date)
+        # Vėlavimas skaičiuojamas skaitymo metu (terminas < šiandien), todėl saugomas anksčiausias terminas
+        summary['sales_invoices_earliest_due_date'] = min(unpaid_due_dates) if unpaid_due_dates else None
+        summary['sales_invoices_last_payment_date'] = max(paid_dates) if paid_dates else None
+        summaries[order_id] = summary
+    return summaries
+
+
+def refresh_order_payment_summaries(order_ids: Iterable[int], batch_size: int = 500) -> int:
+    """
+    Perskaičiuoti ir įrašyti suvestinę. Įrašomi tik pasikeitę užsakymai (bulk_update + bulk_changed).
+
+    Returns:
+        Atnaujintų užsakymų skaičius
+    """
+    from apps.orders.models import Order
+    from apps.core.bulk_changes import send_bulk_changed
+
+    order_ids = [order_id for order_id in set(order_ids) if order_id]
+    if not order_ids:
+        return 0
+
+    summaries = compute_order_payment_summaries(order_ids)
+    changed = []
+    for row in Order.objects.filter(pk__in=order_ids).values('pk', *SUMMARY_FIELDS):
+        summary = summaries[row['pk']]
+        if any(row[field] != summary[field] for field in SUMMARY_FIELDS):
+            changed.append(Order(pk=row['pk'], **summary))
+
+    if changed:
+        Order.objects.bulk_update(changed, SUMMARY_FIELDS, batch_size=batch_size)
+        # bulk_update nesiunčia post_save
+        send_bulk_changed(Order, changed, fields=SUMMARY_FIELDS)
+    return len(changed)
+
+
+def _flush_pending():
+    order_ids = getattr(_pending, 'order_ids', None)
+    _pending.order_ids = None
+    if not order_ids:
+        return
+    try:
+        refresh_order_payment_summaries(order_ids)
+    except Exception as e:
+        logger.error(f"Klaida atnaujinant užsakymų mokėjimų suvestinę {sorted(order_ids)}: {e}", exc_info=True)
+
+
+def schedule_order_payment_summary_refresh(order_ids: Iterable[int]):
+    """
+    Pažymėti užsakymus perskaičiavimui po transakcijos commit.
+    Kelios tos pačios transakcijos sąskaitos / eilutės sujungiamos į vieną perskaičiavimą.
+    """
+    order_ids = {order_id for order_id in order_ids if order_id}
+    if not order_ids:
+        return
+    pending = getattr(_pending, 'order_ids', None)
+    if pending is None:
+        _pending.order_ids = pending = set()
+    pending.update(order_ids)
+    # Callback registruojamas kiekvieną kartą (atšaukus transakciją jis dingsta kartu su ja);
+    # pirmasis įvykdytas callback apdoroja visus sukauptus užsakymus, likę - nieko nedaro
+    transaction.on_commit(_flush_pending)
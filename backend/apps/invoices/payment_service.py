@@ -40,17 +40,9 @@ class PaymentService:
             bool: True jei payment_status pasikeitė, False jei nepasikeitė
         """
         old_status = invoice.payment_status
-        paid_amount = invoice.paid_amount
-        remaining_amount = invoice.remaining_amount
-        total_amount = invoice.amount_total
         
         # Apskaičiuoti naują payment_status
-        if paid_amount >= total_amount and remaining_amount <= Decimal('0.01'):
-            new_status = 'paid'
-        elif paid_amount > Decimal('0.00') and remaining_amount > Decimal('0.01'):
-            new_status = 'partially_paid'
-        else:
-            new_status = 'unpaid'
+        new_status = PaymentService._new_payment_status(invoice.amount_total, invoice.paid_amount)
         
         # Atnaujinti payment_status, jei pasikeitė
         if old_status != new_status:
@@ -473,6 +465,157 @@ class PaymentService:
             'status_changed': status_changed
         }
     
+    @staticmethod
+    def _new_payment_status(total_amount: Decimal, paid_amount: Decimal) -> str:
+        """payment_status pagal sumas (ta pati logika kaip _update_payment_status)"""
+        remaining_amount = total_amount - paid_amount
+        if paid_amount >= total_amount and remaining_amount <= Decimal('0.01'):
+            return 'paid'
+        if paid_amount > Decimal('0.00') and remaining_amount > Decimal('0.01'):
+            return 'partially_paid'
+        return 'unpaid'
+
+    @staticmethod
+    def mark_many_as_paid(
+        items: List[Dict[str, Any]],
+        payment_method: str = 'Pavedimu',
+        created_by: Optional[User] = None
+    ) -> Dict[str, Any]:
+        """
+        Pažymėti daug sąskaitų kaip apmokėtas vienoje transakcijoje (pvz. banko išrašo suderinimas).
+        Rezultatas toks pat kaip mark_as_paid() kiekvienai sąskaitai, bet:
+        - sąskaitos ir jų mokėjimų sumos nuskaitomos po vieną užklausą kiekvienam tipui,
+        - InvoicePayment įrašai kuriami bulk_create, payment_status / payment_date - bulk_update,
+        - statusų pakeitimai registruojami ActivityLog vienu bulk_create.
+
+        Args:
+            items: [{'invoice_type': 'sales'|'purchase', 'invoice_id': int, 'payment_date': date|str, 'notes': str}]
+            payment_method: Mokėjimo būdas
+            created_by: Vartotojas (banko importui - None)
+
+        Returns:
+            Dict: 'payments' - sukurti mokėjimai, 'paid' - {'sales': [id, ...], 'purchase': [id, ...]}
+                  (sąskaitos, kurios po operacijos apmokėtos)
+        """
+        from django.db import transaction
+        from django.db.models import Sum
+        from django.contrib.contenttypes.models import ContentType
+        from apps.core.bulk_changes import send_bulk_changed
+        from apps.core.models import ActivityLog
+        from apps.core.services.status_service import StatusService
+
+        wanted = {'sales': {}, 'purchase': {}}
+        for item in items:
+            if item['invoice_type'] not in wanted:
+                raise ValueError(f"Netinkamas invoice_type: {item['invoice_type']}. Turi būti 'sales' arba 'purchase'")
+            # Ta pati sąskaita kelis kartus - pirmasis įrašas
+            wanted[item['invoice_type']].setdefault(item['invoice_id'], item)
+
+        today = timezone.now().date()
+        user_name = (created_by.get_full_name() or created_by.username) if created_by else ''
+        payments = []
+        paid = {'sales': [], 'purchase': []}
+        changed_by_type = {'sales': [], 'purchase': []}
+
+        with transaction.atomic():
+            for invoice_type, model in (('sales', SalesInvoice), ('purchase', PurchaseInvoice)):
+                if not wanted[invoice_type]:
+                    continue
+                fk_name = f'{invoice_type}_invoice_id'
+                invoices = list(model.objects.select_for_update().filter(pk__in=list(wanted[invoice_type])))
+                paid_amounts = dict(
+                    InvoicePayment.objects.filter(**{f'{fk_name}__in': [invoice.pk for invoice in invoices]})
+                    .values_list(fk_name)
+                    .annotate(total=Sum('amount'))
+                )
+
+                changed = []
+                logs = []
+                content_type = ContentType.objects.get_for_model(model)
+                entity_type = f'{invoice_type}_invoice'
+                for invoice in invoices:
+                    item = wanted[invoice_type][invoice.pk]
+                    payment_date = item.get('payment_date') or today
+                    if isinstance(payment_date, str):
+                        try:
+                            payment_date = datetime.strptime(payment_date, '%Y-%m-%d').date()
+                        except ValueError:
+                            payment_date = today
+
+                    # Kaip mark_as_paid(): be mokėjimų - visa suma, kitaip - likusi suma (jei > 0.01)
+                    paid_amount = paid_amounts.get(invoice.pk)
+                    total_amount = invoice.amount_total or Decimal('0.00')
+                    if paid_amount is None:
+                        payment_amount = total_amount
+                    else:
+                        remaining_amount = total_amount - paid_amount
+                        payment_amount = remaining_amount if remaining_amount > Decimal('0.01') else Decimal('0.00')
+                    if payment_amount > Decimal('0.00'):
+                        payments.append(InvoicePayment(
+                            amount=payment_amount,
+                            payment_date=payment_date,
+                            payment_method=payment_method,
+                            notes=item.get('notes', ''),
+                            created_by=created_by,
+                            **{fk_name: invoice.pk}
+                        ))
+
+                    old_status = invoice.payment_status
+                    new_status = PaymentService._new_payment_status(
+                        total_amount, (paid_amount or Decimal('0.00')) + payment_amount
+                    )
+                    if new_status == 'paid':
+                        paid[invoice_type].append(invoice.pk)
+                    if new_status == old_status and (new_status != 'paid' or invoice.payment_date):
+                        continue
+                    invoice.payment_status = new_status
+                    if new_status == 'paid' and not invoice.payment_date:
+                        invoice.payment_date = payment_date
+                    changed.append(invoice)
+                    if new_status != old_status:
+                        reason = 'Automatinis statuso atnaujinimas pagal mokėjimų sumą'
+                        logs.append(ActivityLog(
+                            action_type=ActivityLog.ActionType.INVOICE_STATUS_CHANGED,
+                            description=(
+                                f'{StatusService._get_entity_name(entity_type)} #{invoice.pk} statusas pakeistas: '
+                                f'{old_status} -> {new_status}. Priežastis: {reason}'
+                            ),
+                            content_type=content_type,
+                            object_id=invoice.pk,
+                            metadata={
+                                'entity_type': entity_type,
+                                'entity_id': invoice.pk,
+                                'old_status': old_status,
+                                'new_status': new_status,
+                                'reason': reason,
+                            },
+                            user=created_by,
+                            user_name=user_name,
+                        ))
+
+                if changed:
+                    model.objects.bulk_update(changed, ['payment_status', 'payment_date'], batch_size=500)
+                    changed_by_type[invoice_type] = changed
+                if logs:
+                    ActivityLog.objects.bulk_create(logs, batch_size=500)
+
+            if payments:
+                InvoicePayment.objects.bulk_create(payments, batch_size=500)
+
+            # bulk_update / bulk_create nesiunčia post_save
+            send_bulk_changed(SalesInvoice, changed_by_type['sales'], fields=['payment_status', 'payment_date'])
+            send_bulk_changed(PurchaseInvoice, changed_by_type['purchase'], fields=['payment_status', 'payment_date'])
+            send_bulk_changed(InvoicePayment, payments)
+
+        logger.info(
+            f'Marked invoices as paid in bulk: payments={len(payments)}, '
+            f'sales={len(paid["sales"])}, purchase={len(paid["purchase"])}'
+        )
+        return {
+            'payments': payments,
+            'paid': paid,
+        }
+    
     @staticmethod
     def mark_as_unpaid(
         invoice_type: str,
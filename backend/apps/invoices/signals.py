@@ -1,13 +1,19 @@
 """
 Django signal'ai sąskaitų moduliui.
-Automatiškai atnaujina client_invoice_issued lauką užsakymuose.
+Automatiškai atnaujina client_invoice_issued lauką ir mokėjimų suvestinę užsakymuose.
 Sinchronizuoja PurchaseInvoice payment_status su OrderCarrier.
+Palaiko sąskaitų numeracijos sekas (InvoicePrefixSequence) pagal įvestus / ištrintus numerius.
+Masiniams pakeitimams be post_save (apps.core.bulk_changes) - atitinkami bulk_changed receiver'iai.
 """
 import logging
-from django.db.models.signals import post_save, post_delete, pre_delete
+from django.db.models.signals import post_init, post_save, post_delete, pre_delete
 from django.db import models
 from django.dispatch import receiver
-from .models import SalesInvoice, SalesInvoiceOrder, PurchaseInvoice
+from apps.core.bulk_changes import bulk_changed, instance_pks
+from apps.settings.cache import bump_version
+from .models import SalesInvoice, SalesInvoiceOrder, PurchaseInvoice, InvoicePayment, InvoicePrefixSequence
+from .order_payment_summary import schedule_order_payment_summary_refresh
+from .utils import note_invoice_number_used, release_invoice_number
 from apps.orders.models import Order, OrderCarrier
 
 logger = logging.getLogger(__name__)
@@ -263,3 +269,168 @@ def purchase_invoice_saved(sender, instance, created, **kwargs):
         _sync_purchase_invoice_to_carriers(instance)
     except Exception as e:
         logger.error("Klaida signal'e purchase_invoice_saved: %s", e, exc_info=True)
+
+
+# --- Užsakymų mokėjimų suvestinė (Order.sales_invoices_*) ---
+
+def _invoice_order_ids(invoice_id, related_order_id=None):
+    """Užsakymai, su kuriais susieta sąskaita (FK + SalesInvoiceOrder)"""
+    order_ids = set(SalesInvoiceOrder.objects.filter(invoice_id=invoice_id).values_list('order_id', flat=True))
+    if related_order_id:
+        order_ids.add(related_order_id)
+    return order_ids
+
+
+@receiver(post_init, sender=SalesInvoice)
+def sales_invoice_remember_related_order(sender, instance, **kwargs):
+    """Įsiminti pradinį related_order_id, kad pakeitus užsakymą būtų perskaičiuotas ir senasis"""
+    instance._initial_related_order_id = instance.__dict__.get('related_order_id')
+
+
+@receiver(post_save, sender=SalesInvoice)
+def sales_invoice_refresh_order_payment_summary(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    try:
+        order_ids = _invoice_order_ids(instance.id, instance.related_order_id)
+        order_ids.add(getattr(instance, '_initial_related_order_id', None))
+        instance._initial_related_order_id = instance.related_order_id
+        schedule_order_payment_summary_refresh(order_ids)
+    except Exception as e:
+        logger.error(f"Klaida signal'e sales_invoice_refresh_order_payment_summary: {e}", exc_info=True)
+
+
+@receiver(post_delete, sender=SalesInvoice)
+def sales_invoice_deleted_refresh_order_payment_summary(sender, instance, **kwargs):
+    # SalesInvoiceOrder eilutės ištrinamos kaskadu ir siunčia savo post_delete
+    schedule_order_payment_summary_refresh([
+        instance.related_order_id, getattr(instance, '_initial_related_order_id', None)
+    ])
+
+
+@receiver(post_save, sender=SalesInvoiceOrder)
+@receiver(post_delete, sender=SalesInvoiceOrder)
+def sales_invoice_order_refresh_order_payment_summary(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    schedule_order_payment_summary_refresh([instance.order_id])
+
+
+@receiver(post_save, sender=InvoicePayment)
+@receiver(post_delete, sender=InvoicePayment)
+def invoice_payment_refresh_order_payment_summary(sender, instance, raw=False, **kwargs):
+    if raw or not instance.sales_invoice_id:
+        return
+    try:
+        related_order_id = (
+            SalesInvoice.objects.filter(id=instance.sales_invoice_id)
+            .values_list('related_order_id', flat=True)
+            .first()
+        )
+        schedule_order_payment_summary_refresh(_invoice_order_ids(instance.sales_invoice_id, related_order_id))
+    except Exception as e:
+        logger.error(f"Klaida signal'e invoice_payment_refresh_order_payment_summary: {e}", exc_info=True)
+
+
+@receiver(post_init, sender=SalesInvoice)
+@receiver(post_init, sender=PurchaseInvoice)
+def invoice_remember_number(sender, instance, **kwargs):
+    instance._initial_invoice_number = instance.__dict__.get('invoice_number')
+
+
+@receiver(post_save, sender=SalesInvoice)
+@receiver(post_save, sender=PurchaseInvoice)
+def invoice_number_update_sequence(sender, instance, created, raw=False, **kwargs):
+    """Rankiniu būdu įvestas didesnis numeris pakelia prefikso seką"""
+    if raw or not instance.invoice_number:
+        return
+    if not created and instance.invoice_number == getattr(instance, '_initial_invoice_number', None):
+        return
+    instance._initial_invoice_number = instance.invoice_number
+    try:
+        note_invoice_number_used(instance.invoice_number)
+    except Exception as e:
+        logger.error(f"Klaida signal'e invoice_number_update_sequence: {e}", exc_info=True)
+
+
+@receiver(post_delete, sender=SalesInvoice)
+@receiver(post_delete, sender=PurchaseInvoice)
+def invoice_number_release_sequence(sender, instance, **kwargs):
+    """Ištrynus paskutinę sąskaitą jos numeris vėl bus išduotas"""
+    if not instance.invoice_number:
+        return
+    try:
+        release_invoice_number(instance.invoice_number)
+    except Exception as e:
+        logger.error(f"Klaida signal'e invoice_number_release_sequence: {e}", exc_info=True)
+
+
+@receiver(post_save, sender=InvoicePrefixSequence)
+@receiver(post_delete, sender=InvoicePrefixSequence)
+def invoice_prefix_sequence_changed(sender, update_fields=None, using=None, **kwargs):
+    """
+    SalesInvoice.number_prefixes() cache'uojamas pagal versijos žymę (apps.core.numbering).
+    Žymė keičiama tik pasikeitus prefiksams, ne kiekvieną kartą išdavus numerį (last_number).
+    """
+    if update_fields is not None and 'prefix' not in update_fields:
+        return
+    bump_version(sender, using=using)
+
+
+# --- Masiniai pakeitimai be post_save (apps.core.bulk_changes) ---
+
+def _invoices_order_ids(invoice_ids):
+    """_invoice_order_ids() daugeliui sąskaitų"""
+    invoice_ids = list(invoice_ids)
+    order_ids = set(SalesInvoiceOrder.objects.filter(invoice_id__in=invoice_ids).values_list('order_id', flat=True))
+    order_ids.update(SalesInvoice.objects.filter(pk__in=invoice_ids).values_list('related_order_id', flat=True))
+    return order_ids
+
+
+@receiver(bulk_changed, sender=SalesInvoice)
+def sales_invoices_bulk_refresh_order_payment_summary(sender, instances, **kwargs):
+    try:
+        schedule_order_payment_summary_refresh(_invoices_order_ids(instance_pks(instances)))
+    except Exception as e:
+        logger.error(f"Klaida signal'e sales_invoices_bulk_refresh_order_payment_summary: {e}", exc_info=True)
+
+
+@receiver(bulk_changed, sender=InvoicePayment)
+def invoice_payments_bulk_refresh_order_payment_summary(sender, instances, **kwargs):
+    # bulk_create MySQL'e pk nepriskiria - naudojamas sales_invoice_id
+    sales_ids = {payment.sales_invoice_id for payment in instances if payment.sales_invoice_id}
+    if not sales_ids:
+        return
+    try:
+        schedule_order_payment_summary_refresh(_invoices_order_ids(sales_ids))
+    except Exception as e:
+        logger.error(f"Klaida signal'e invoice_payments_bulk_refresh_order_payment_summary: {e}", exc_info=True)
+
+
+@receiver(bulk_changed, sender=PurchaseInvoice)
+def purchase_invoices_bulk_saved(sender, instances, **kwargs):
+    """purchase_invoice_saved() daugeliui sąskaitų: (užsakymas, partneris) poros surenkamos dviem užklausomis"""
+    pks = instance_pks(instances)
+    if not pks:
+        return
+    partner_by_invoice = {}
+    pairs = set()
+    for pk, partner_id, related_order_id in PurchaseInvoice.objects.filter(
+        pk__in=pks, partner_id__isnull=False
+    ).values_list('pk', 'partner_id', 'related_order_id'):
+        partner_by_invoice[pk] = partner_id
+        if related_order_id:
+            pairs.add((related_order_id, partner_id))
+    through = PurchaseInvoice.related_orders.through
+    for invoice_id, order_id in through.objects.filter(
+        purchaseinvoice_id__in=list(partner_by_invoice)
+    ).values_list('purchaseinvoice_id', 'order_id'):
+        pairs.add((order_id, partner_by_invoice[invoice_id]))
+    for order_id, partner_id in pairs:
+        try:
+            _sync_order_partner_carrier_status(order_id, partner_id)
+        except Exception as e:
+            logger.warning(
+                "Klaida sinchronizuojant PurchaseInvoice -> OrderCarrier order_id=%s: %s",
+                order_id, e, exc_info=True
+            )
@@ -0,0 +1,347 @@
+import io
+from datetime import date
+from decimal import Decimal
+from types import SimpleNamespace
+
+from django.test import SimpleTestCase, TestCase
+
+from apps.core.bulk_changes import bulk_changed
+from apps.orders.models import Order, OrderCarrier
+from apps.partners.models import Partner
+
+from .bank_reconciliation import InvoiceMatchIndex, invoice_number_keys, reconcile_transactions
+from .bank_statement_import import BankStatementReader, StatementFormatError, parse_amount, parse_direction
+from .bank_utils import BankTransaction
+from .models import InvoicePayment, InvoicePrefixSequence, PurchaseInvoice, SalesInvoice
+from .payment_service import PaymentService
+from .utils import generate_invoice_number, set_invoice_sequence_last_number, synchronize_invoice_sequence
+
+CAMT = '''<?xml version="1.0" encoding="UTF-8"?>
+<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.02"><BkToCstmrStmt><Stmt>
+<Ntry><Amt Ccy="EUR">1210.00</Amt><CdtDbtInd>CRDT</CdtDbtInd><Sts>BOOK</Sts><BookgDt><Dt>2025-01-15</Dt></BookgDt>
+  <NtryDtls><TxDtls><RltdPties><Dbtr><Nm>UAB Šiaulių krovinys</Nm></Dbtr></RltdPties>
+  <RmtInf><Ustrd>Apmokėjimas pagal SF LOG-0012</Ustrd></RmtInf></TxDtls></NtryDtls></Ntry>
+<Ntry><Amt Ccy="EUR">99.00</Amt><CdtDbtInd>DBIT</CdtDbtInd><Sts>PDNG</Sts><BookgDt><Dt>2025-01-16</Dt></BookgDt></Ntry>
+<Ntry><Amt Ccy="EUR">300.00</Amt><CdtDbtInd>DBIT</CdtDbtInd><Sts>BOOK</Sts><BookgDt><Dt>2025-01-17</Dt></BookgDt>
+  <NtryDtls>
+    <TxDtls><Amt Ccy="EUR">100.00</Amt><RltdPties><Cdtr><Nm>Vezejas A</Nm></Cdtr></RltdPties></TxDtls>
+    <TxDtls><Amt Ccy="EUR">200.00</Amt><RltdPties><Cdtr><Nm>Vezejas B</Nm></Cdtr></RltdPties></TxDtls>
+  </NtryDtls></Ntry>
+</Stmt></BkToCstmrStmt></Document>
+'''
+
+
+def read(data: bytes, **kwargs):
+    reader = BankStatementReader(io.BytesIO(data), **kwargs)
+    return reader, list(reader)
+
+
+def invoice(pk, number, amount, partner_id, partner_name, status='unpaid', **extra):
+    return SimpleNamespace(
+        pk=pk, invoice_number=number, amount_total=Decimal(amount), payment_status=status,
+        partner_id=partner_id, partner=SimpleNamespace(name=partner_name), **extra,
+    )
+
+
+def transaction(amount, description, direction=None, partner_name=None, invoice_number=None):
+    return BankTransaction(
+        date=date(2025, 1, 15), amount=Decimal(amount), description=description,
+        invoice_number=invoice_number, partner_name=partner_name, direction=direction,
+    )
+
+
+class ParseAmountTests(SimpleTestCase):
+    def test_lithuanian_and_international_formats(self):
+        cases = {
+            '1 234,56': '1234.56', '1.234,56': '1234.56', '1,234.56': '1234.56', '-12,50 EUR': '-12.50',
+            '(12.50)': '-12.50', '12,50-': '-12.50', '1 000': '1000', '€ 5': '5', '1.000.000': '1000000',
+        }
+        for value, expected in cases.items():
+            with self.subTest(value=value):
+                self.assertEqual(parse_amount(value), Decimal(expected))
+
+    def test_invalid_amounts(self):
+        for value in ('', 'abc', 'NaN', 'Infinity'):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    parse_amount(value)
+
+    def test_direction_markers(self):
+        self.assertEqual(parse_direction('K'), BankTransaction.CREDIT)
+        self.assertEqual(parse_direction(' D. '), BankTransaction.DEBIT)
+        self.assertEqual(parse_direction('CRDT'), BankTransaction.CREDIT)
+        self.assertIsNone(parse_direction(''))
+        with self.assertRaises(ValueError):
+            parse_direction('X')
+
+
+class BankStatementReaderCsvTests(SimpleTestCase):
+    def test_header_after_preamble_and_direction_column(self):
+        data = (
+            'Sąskaita;LT000000000000000000\n'
+            'Data;Mokėtojas arba gavėjas;Mokėjimo paskirtis;Suma;D/K\n'
+            '2025-01-15;UAB Šiaulių krovinys;SF LOG-0012;1 210,00;K\n'
+            '2025-01-16;Vežėjas;Už pervežimą;300,00;D\n'
+            '2025-01-16;;Likutis pabaigai;5000,00;K\n'
+        ).encode('utf-8')
+        reader, transactions = read(data)
+        self.assertEqual(reader.format, 'csv')
+        self.assertEqual(reader.delimiter, ';')
+        self.assertEqual([t.amount for t in transactions], [Decimal('1210.00'), Decimal('300.00')])
+        self.assertEqual([t.direction for t in transactions], [BankTransaction.CREDIT, BankTransaction.DEBIT])
+        self.assertEqual(transactions[0].partner_name, 'UAB Šiaulių krovinys')
+        self.assertEqual(transactions[0].date, date(2025, 1, 15))
+        self.assertEqual(reader.skipped, 1)
+
+    def test_direction_from_sign_and_debit_credit_columns(self):
+        _, signed = read(b'Date,Description,Amount\n2025-01-15,In,10.00\n2025-01-16,Out,-5.00\n')
+        self.assertEqual([(t.amount, t.direction) for t in signed],
+                         [(Decimal('10.00'), 'credit'), (Decimal('5.00'), 'debit')])
+        _, split = read(b'Data;Paskirtis;Debetas;Kreditas\n2025-01-15;A;;10,00\n2025-01-16;B;5,00;\n')
+        self.assertEqual([t.direction for t in split], ['credit', 'debit'])
+
+    def test_malformed_rows_are_reported(self):
+        reader, transactions = read(
+            b'Data;Paskirtis;Suma\n2025-01-15;A;10,00\n2025-13-45;B;5,00\n2025-01-16;C;abc\n2025-01-17\n'
+        )
+        self.assertEqual(len(transactions), 1)
+        self.assertEqual(reader.error_count, 3)
+        self.assertEqual([error['line'] for error in reader.errors], [3, 4, 5])
+
+    def test_unknown_format(self):
+        with self.assertRaises(StatementFormatError):
+            read(b'vardas;pavarde\nJonas;Jonaitis\n')
+
+    def test_encodings(self):
+        header = 'Data;Mokėtojas;Paskirtis;Suma\n'
+        line = '2025-01-15;Šiaulių bankas;SF 1;10,00\n'
+        reader, transactions = read((header + line).encode('cp1257'))
+        self.assertEqual(reader.encoding, 'cp1257')
+        self.assertEqual(transactions[0].partner_name, 'Šiaulių bankas')
+
+        reader, transactions = read((header + line).encode('utf-16'))
+        self.assertEqual(transactions[0].partner_name, 'Šiaulių bankas')
+
+        # Ranka papildytas failas: UTF-8 ir Windows-1257 eilutės viename faile
+        mixed = (header + line).encode('utf-8') + line.encode('cp1257')
+        reader, transactions = read(mixed)
+        self.assertEqual(reader.encoding, 'cp1257')
+        self.assertEqual([t.partner_name for t in transactions], ['Šiaulių bankas'] * 2)
+        self.assertEqual(reader.fallback_lines, 2)
+
+        reader, transactions = read(mixed, encoding='utf-8-sig')
+        self.assertEqual([t.partner_name for t in transactions], ['Šiaulių bankas'] * 2)
+        self.assertEqual(reader.fallback_lines, 1)
+
+        with self.assertRaises(StatementFormatError):
+            read((header + line).encode('utf-16') + b'\x00\xd8\x00')
+
+
+class BankStatementReaderCamtTests(SimpleTestCase):
+    def test_entries_batches_and_pending(self):
+        reader, transactions = read(CAMT.encode('utf-8'))
+        self.assertEqual(reader.format, 'camt.053')
+        self.assertEqual(
+            [(t.amount, t.direction, t.partner_name) for t in transactions],
+            [(Decimal('1210.00'), 'credit', 'UAB Šiaulių krovinys'),
+             (Decimal('100.00'), 'debit', 'Vezejas A'), (Decimal('200.00'), 'debit', 'Vezejas B')],
+        )
+        self.assertIn('LOG-0012', transactions[0].description)
+        self.assertEqual(reader.skipped, 1)
+
+    def test_entity_expansion_is_rejected(self):
+        data = (
+            b'<?xml version="1.0"?><!DOCTYPE d [<!ENTITY a "aaaa"><!ENTITY b "&a;&a;&a;">]>'
+            b'<Document><Ntry>&b;</Ntry></Document>'
+        )
+        with self.assertRaises(StatementFormatError):
+            read(data)
+
+
+class InvoiceMatchIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.sales = [
+            invoice(1, 'LOG-0012', '1210.00', 10, 'UAB Šiaulių krovinys'),
+            invoice(2, 'LOG-0013', '500.00', 11, 'Kauno transportas'),
+            invoice(3, 'LOG-0014', '500.00', 12, 'Baltic Cargo', status='paid'),
+        ]
+        self.purchase = [
+            invoice(4, 'P-0001', '1210.00', 20, 'Vežėjas A', received_invoice_number='VA 77001'),
+        ]
+        self.index = InvoiceMatchIndex(self.sales, self.purchase)
+
+    def test_number_keys(self):
+        self.assertEqual(invoice_number_keys('SF 2025-0001'), {'SF20250001', '20250001'})
+        self.assertEqual(invoice_number_keys('A1'), set())
+
+    def test_number_amount_and_partner(self):
+        invoice_obj, match_type, confidence = self.index.match(
+            transaction('1210.00', 'Apmokėjimas pagal SF LOG-0012', partner_name='UAB Šiaulių krovinys')
+        )
+        self.assertEqual((invoice_obj.pk, match_type, confidence), (1, 'sales', 1.0))
+        invoice_obj, _, confidence = self.index.match(transaction('1210.00', 'SF LOG0012'))
+        self.assertEqual((invoice_obj.pk, confidence), (1, 0.95))
+
+    def test_partner_and_amount_and_amount_only(self):
+        invoice_obj, _, confidence = self.index.match(transaction('500.00', 'Kauno transportas už krovinį'))
+        self.assertEqual((invoice_obj.pk, confidence), (2, 0.7))
+        invoice_obj, _, confidence = self.index.match(transaction('500.00', 'Pervedimas'))
+        self.assertEqual((invoice_obj.pk, confidence), (2, 0.3))
+        self.assertEqual(self.index.match(transaction('7.00', 'Pervedimas')), (None, None, 0.0))
+
+    def test_direction_limits_invoice_type(self):
+        description = 'Mokėjimas VA 77001 LOG-0012'
+        invoice_obj, match_type, _ = self.index.match(transaction('1210.00', description, BankTransaction.DEBIT))
+        self.assertEqual((invoice_obj.pk, match_type), (4, 'purchase'))
+        invoice_obj, match_type, _ = self.index.match(transaction('1210.00', description, BankTransaction.CREDIT))
+        self.assertEqual((invoice_obj.pk, match_type), (1, 'sales'))
+        # Išleisti pinigai su pardavimo sąskaita nederinami ir pagal sumą
+        self.assertEqual(self.index.match(transaction('500.00', 'Pervedimas', BankTransaction.DEBIT))[0], None)
+
+    def test_invoice_is_matched_once(self):
+        first = transaction('1210.00', 'SF LOG-0012', BankTransaction.CREDIT)
+        second = transaction('1210.00', 'SF LOG-0012', BankTransaction.CREDIT)
+        results = reconcile_transactions([first, second], index=self.index)
+        self.assertTrue(first.matched)
+        self.assertEqual(first.matched_invoice.pk, 1)
+        self.assertFalse(second.matched)
+        self.assertEqual(len(results), 2)
+
+
+class InvoiceNumberSequenceTests(TestCase):
+    """Numeriai išduodami iš InvoicePrefixSequence; seką palaiko invoice_number_* signal'ai"""
+
+    def setUp(self):
+        self.partner = Partner.objects.create(name='Klientas', code='400')
+
+    def create(self, invoice_number):
+        return SalesInvoice.objects.create(
+            invoice_number=invoice_number, partner=self.partner, amount_net=Decimal('100'),
+            amount_total=Decimal('121'), issue_date=date(2025, 1, 15), due_date=date(2025, 2, 15),
+        )
+
+    def next_number(self):
+        return generate_invoice_number('TST', 4)
+
+    def last_number(self):
+        return InvoicePrefixSequence.objects.get(prefix='TST').last_number
+
+    def test_sequential_allocation(self):
+        first = self.create(self.next_number())
+        second = self.create(self.next_number())
+        self.assertEqual([first.invoice_number, second.invoice_number], ['TST0001', 'TST0002'])
+        self.assertEqual(self.last_number(), 2)
+
+    def test_sequence_starts_after_existing_numbers_and_keeps_separator(self):
+        self.create('TST-0007')
+        self.assertEqual(self.next_number(), 'TST-0008')
+
+    def test_deleted_last_number_is_reallocated(self):
+        self.create(self.next_number())
+        middle = self.create(self.next_number())
+        last = self.create(self.next_number())
+        last.delete()
+        self.assertEqual(self.last_number(), 2)
+        self.assertEqual(self.next_number(), 'TST0003')
+
+        # Ne paskutinio numerio ištrynimas seką palieka (tarpas - find_invoice_number_gaps)
+        middle.delete()
+        self.assertEqual(self.last_number(), 3)
+        self.assertEqual(self.next_number(), 'TST0004')
+
+    def test_deleting_last_number_skips_back_over_gaps(self):
+        self.create('TST0001')
+        self.next_number()
+        set_invoice_sequence_last_number(4, 'TST', 4)
+        self.create('TST0005').delete()
+        self.assertEqual(self.last_number(), 1)
+
+    def test_manually_entered_higher_number_bumps_sequence(self):
+        self.create(self.next_number())
+        self.create('TST0050')
+        self.assertEqual(self.next_number(), 'TST0051')
+
+        invoice = self.create(self.next_number())
+        invoice.invoice_number = 'TST0060'
+        invoice.save()
+        self.assertEqual(self.last_number(), 60)
+        self.assertEqual(self.next_number(), 'TST0061')
+
+    def test_lower_manual_number_does_not_lower_sequence(self):
+        self.create(self.next_number())
+        self.create(self.next_number())
+        invoice = SalesInvoice.objects.get(invoice_number='TST0002')
+        invoice.invoice_number = 'TST0001A'
+        invoice.save(update_fields=['invoice_number'])
+        self.assertEqual(self.last_number(), 2)
+
+    def test_occupied_number_is_skipped(self):
+        self.create(self.next_number())
+        set_invoice_sequence_last_number(0, 'TST', 4)
+        self.assertEqual(self.next_number(), 'TST0002')
+
+    def test_synchronize_repairs_sequence_in_both_directions(self):
+        self.create(self.next_number())
+        self.create(self.next_number())
+        set_invoice_sequence_last_number(500, 'TST', 4)
+        self.assertEqual(synchronize_invoice_sequence('TST', 4), 2)
+        self.assertEqual(self.next_number(), 'TST0003')
+
+        # Numeris įrašytas be signal'ų (update()) - seka atsilieka, kol pataisoma
+        SalesInvoice.objects.filter(invoice_number='TST0001').update(invoice_number='TST0090')
+        self.assertEqual(self.last_number(), 3)
+        self.assertEqual(synchronize_invoice_sequence('TST', 4), 90)
+        self.assertEqual(self.next_number(), 'TST0091')
+
+
+class MarkManyAsPaidTests(TestCase):
+    """bulk_update / bulk_create nesiunčia post_save - post_save receiver'ių darbą atlieka bulk_changed receiver'iai"""
+
+    def setUp(self):
+        client = Partner.objects.create(name='Klientas', code='500')
+        carrier = Partner.objects.create(name='Vežėjas', code='501')
+        self.order = Order.objects.create(client=client, order_number='B1')
+        self.carrier = OrderCarrier.objects.create(order=self.order, partner=carrier)
+        dates = {'issue_date': date(2025, 1, 15), 'due_date': date(2025, 2, 15)}
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sales = SalesInvoice.objects.create(
+                invoice_number='BLK-0001', partner=client, related_order=self.order,
+                amount_net=Decimal('100'), amount_total=Decimal('121'), **dates,
+            )
+        self.purchase = PurchaseInvoice.objects.create(
+            received_invoice_number='V-1', partner=carrier, amount_net=Decimal('50'),
+            amount_total=Decimal('60.50'), **dates,
+        )
+        self.purchase.related_orders.add(self.order)
+        self.received = []
+        bulk_changed.connect(self.collect, dispatch_uid='invoices_tests_collect')
+        self.addCleanup(bulk_changed.disconnect, dispatch_uid='invoices_tests_collect')
+
+    def collect(self, sender, instances, fields=None, **kwargs):
+        self.received.append((sender, len(instances), fields))
+
+    def test_receivers_run_for_bulk_payment(self):
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.sales_invoices_paid_count, 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PaymentService.mark_many_as_paid([
+                {'invoice_type': 'sales', 'invoice_id': self.sales.pk, 'payment_date': date(2025, 2, 1)},
+                {'invoice_type': 'purchase', 'invoice_id': self.purchase.pk, 'payment_date': date(2025, 2, 2)},
+            ])
+
+        self.assertEqual(InvoicePayment.objects.count(), 2)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.sales_invoices_paid_count, 1)
+        self.assertEqual(self.order.sales_invoices_last_payment_date, date(2025, 2, 1))
+        self.carrier.refresh_from_db()
+        self.assertEqual(self.carrier.payment_status, 'paid')
+        self.assertEqual(self.carrier.payment_date, date(2025, 2, 2))
+
+        payment_fields = frozenset({'payment_status', 'payment_date'})
+        self.assertIn((SalesInvoice, 1, payment_fields), self.received)
+        self.assertIn((PurchaseInvoice, 1, payment_fields), self.received)
+        self.assertIn((InvoicePayment, 2, None), self.received)
+        # Suvestinės bulk_update - taip pat per bulk_changed
+        self.assertIn(Order, [sender for sender, _, _ in self.received])
+
@@ -2,7 +2,7 @@ from datetime import datetime
 from decimal import Decimal
 import re
 from typing import Optional
-from .models import InvoiceNumberSequence, SalesInvoice
+from .models import InvoicePrefixSequence, SalesInvoice
 
 
 def _generate_invoice_items_structure(invoice):
@@ -11,7 +11,7 @@ def _generate_invoice_items_structure(invoice):
     Naudojama calculate_visible_items_indexes funkcijoje.
     """
     from decimal import Decimal
-    from datetime import datetime, date
+    from datetime import date
     from apps.orders.models import Order
     from apps.settings.models import InvoiceSettings
     
@@ -331,53 +331,11 @@ def find_invoice_number_gaps(prefix: str = None, width: int = None, max_gaps: in
     Returns:
         List of tuples: [(start_gap, end_gap), ...] - tarpų diapazonai
     """
-    from apps.settings.models import InvoiceSettings
-    
-    if prefix is None or width is None:
-        settings = InvoiceSettings.load()
-        if prefix is None:
-            prefix = settings.invoice_prefix_sales or 'LOG'
-        if width is None:
-            width = settings.invoice_number_width or 7
-    
-    prefix_upper = prefix.upper()
-
-    # Gauti visus numerius su prefix
-    all_numbers = SalesInvoice.objects.filter(
-        invoice_number__istartswith=prefix_upper
-    ).values_list('invoice_number', flat=True)
-
-    # Išgauti skaitines dalis
-    numeric_parts = []
-    for number in all_numbers:
-        num, _ = _extract_numeric_suffix(number, prefix)
-        if num is not None:
-            numeric_parts.append(num)
+    from apps.core.numbering import find_number_gaps
 
-    if not numeric_parts:
-        return []
-    
-    # Surūšiuoti numerius
-    numeric_parts.sort()
-    
-    # Rasti tarpus
-    gaps = []
-    for i in range(len(numeric_parts) - 1):
-        current = numeric_parts[i]
-        next_num = numeric_parts[i + 1]
-
-        # Jei tarpas didesnis nei 1 (pvz. 3990, 4042 - tarpas nuo 3991 iki 4041)
-        if next_num - current > 1:
-            gap_start = current + 1
-            gap_end = next_num - 1
-
-            # Visada rodyti kaip diapazoną
-            gaps.append((gap_start, gap_end))
-
-            if len(gaps) >= max_gaps:
-                break
-
-    return gaps[:max_gaps]
+    # Viena užklausa per (number_prefix, number_suffix) indeksą - numeriai į Python nekeliami
+    prefix, width = _get_invoice_number_format(prefix, width)
+    return find_number_gaps(SalesInvoice.objects.all(), prefix, max_gaps=max_gaps)
 
 
 def get_first_available_gap_number(prefix: str = None, width: int = None):
@@ -393,18 +351,9 @@ def get_first_available_gap_number(prefix: str = None, width: int = None):
     gap = gaps[0]
     gap_start = gap[0]
     
-    # Formatuoti numerį
-    if prefix is None or width is None:
-        from apps.settings.models import InvoiceSettings
-        settings = InvoiceSettings.load()
-        if prefix is None:
-            prefix = settings.invoice_prefix_sales or 'LOG'
-        if width is None:
-            width = settings.invoice_number_width or 7
-    
-    # Naudoti tą patį separator kaip didžiausiam numeriui, jei toks yra
-    _, separator = get_max_existing_invoice_number(prefix, width, return_separator=True)
-    separator = separator or ''
+    # Formatuoti numerį (tas pats skirtukas kaip sekos numeriams)
+    prefix, width = _get_invoice_number_format(prefix, width)
+    _, separator = get_invoice_sequence_state(prefix, width)
 
     return f"{prefix}{separator}{gap_start:0{width}d}"
 
@@ -455,131 +404,165 @@ def get_max_existing_invoice_number(prefix: str = None, width: int = None, retur
     return max_number
 
 
-def synchronize_invoice_sequence(prefix: str = None, width: int = None) -> None:
-    """
-    Sinchronizuoja InvoiceNumberSequence su didžiausiu egzistuojančiu numeriu.
-    VISADA atnaujina seką, net jei tai reiškia sekos sumažinimą.
-    """
-    from apps.settings.models import InvoiceSettings
-    from datetime import datetime
-    
-    current_year = datetime.now().year
-    
+def _get_invoice_number_format(prefix: str = None, width: int = None) -> tuple[str, int]:
+    """Prefiksas ir skaitmenų skaičius (nenurodyti - iš InvoiceSettings)"""
     if prefix is None or width is None:
+        from apps.settings.models import InvoiceSettings
         settings = InvoiceSettings.load()
         if prefix is None:
             prefix = settings.invoice_prefix_sales or 'LOG'
         if width is None:
             width = settings.invoice_number_width or 7
-    
-    max_existing, _ = get_max_existing_invoice_number(prefix, width, return_separator=True)
-    
-    # VISADA atnaujinti seką pagal didžiausią egzistuojantį numerį
-    sequence, _ = InvoiceNumberSequence.objects.get_or_create(
-        year=current_year,
-        defaults={'last_number': 0}
+    return prefix, width
+
+
+def _invoice_number_exists(invoice_number: str) -> bool:
+    from .models import PurchaseInvoice
+
+    return (
+        SalesInvoice.objects.filter(invoice_number=invoice_number).exists()
+        or PurchaseInvoice.objects.filter(invoice_number=invoice_number).exists()
     )
-    
-    # Atnaujinti seką, net jei max_existing mažesnis nei sequence.last_number
-    # (tai gali atsitikti trinant paskutinę sąskaitą)
-    if max_existing != sequence.last_number:
-        sequence.last_number = max_existing
-        sequence.save(update_fields=['last_number'])
+
+
+def _get_prefix_sequence(prefix: str, width: int, lock: bool = False) -> InvoicePrefixSequence:
+    """
+    Prefikso seka. Jei jos dar nėra - sukuriama pagal didžiausią esamą numerį
+    (vienintelis kartas, kai skenuojami numeriai; vėliau seka atnaujinama signal'ais).
+    lock=True - užrakinama iki transakcijos pabaigos (kviesti transaction.atomic() viduje).
+    """
+    from django.db import IntegrityError, transaction
+
+    key = prefix.upper()
+    queryset = InvoicePrefixSequence.objects.select_for_update() if lock else InvoicePrefixSequence.objects
+    sequence = queryset.filter(prefix=key).first()
+    if sequence is not None:
+        return sequence
+
+    max_existing, separator = get_max_existing_invoice_number(prefix, width, return_separator=True)
+    try:
+        with transaction.atomic():
+            InvoicePrefixSequence.objects.create(prefix=key, last_number=max_existing, separator=separator or '')
+    except IntegrityError:
+        pass  # Sukūrė kita užklausa
+    return queryset.get(prefix=key)
+
+
+def get_invoice_sequence_state(prefix: str = None, width: int = None) -> tuple[int, str]:
+    """(paskutinis panaudotas numeris, skirtukas) pagal prefikso seką - be numerių skenavimo"""
+    prefix, width = _get_invoice_number_format(prefix, width)
+    sequence = _get_prefix_sequence(prefix, width)
+    return sequence.last_number, sequence.separator
+
+
+def set_invoice_sequence_last_number(last_number: int, prefix: str = None, width: int = None) -> None:
+    """Rankiniu būdu nustatyti paskutinį numerį (nustatymuose keičiant sekantį numerį)"""
+    from django.db import transaction
+
+    prefix, width = _get_invoice_number_format(prefix, width)
+    with transaction.atomic():
+        sequence = _get_prefix_sequence(prefix, width, lock=True)
+        sequence.last_number = max(0, last_number)
+        sequence.save(update_fields=['last_number', 'updated_at'])
+
+
+def _matching_prefix_sequences(invoice_number: str):
+    """[(seka, skaitinė dalis, skirtukas)] sekoms, kurių prefiksu prasideda numeris"""
+    if not invoice_number:
+        return []
+    matches = []
+    for sequence in InvoicePrefixSequence.objects.all():
+        number, separator = _extract_numeric_suffix(invoice_number, sequence.prefix)
+        if number is not None:
+            matches.append((sequence, number, separator))
+    return matches
+
+
+def note_invoice_number_used(invoice_number: str) -> None:
+    """
+    Rankiniu būdu įvestas / importuotas numeris: jei jis didesnis už sekos paskutinį,
+    seka pakeliama (sąlyginis UPDATE, be skenavimo).
+    """
+    for sequence, number, separator in _matching_prefix_sequences(invoice_number):
+        if number > sequence.last_number:
+            InvoicePrefixSequence.objects.filter(pk=sequence.pk, last_number__lt=number).update(
+                last_number=number, separator=separator
+            )
+
+
+def release_invoice_number(invoice_number: str, max_steps: int = 50) -> None:
+    """
+    Ištrinta sąskaita: jei tai buvo paskutinis sekos numeris, seka grąžinama iki didžiausio
+    likusio numerio (tikrinami tik gretimi numeriai per unikalų indeksą, ne daugiau max_steps),
+    kad paskutinis numeris būtų panaudotas pakartotinai kaip anksčiau.
+    """
+    from django.db import transaction
+
+    for sequence, number, separator in _matching_prefix_sequences(invoice_number):
+        if number != sequence.last_number:
+            continue
+        width = len(invoice_number.strip()) - len(sequence.prefix) - len(separator)
+        with transaction.atomic():
+            sequence = InvoicePrefixSequence.objects.select_for_update().get(pk=sequence.pk)
+            if sequence.last_number != number:
+                continue
+            candidate = number - 1
+            steps = 0
+            while candidate > 0 and steps < max_steps and not _invoice_number_exists(
+                f"{sequence.prefix}{separator}{candidate:0{width}d}"
+            ):
+                candidate -= 1
+                steps += 1
+            sequence.last_number = candidate
+            sequence.save(update_fields=['last_number', 'updated_at'])
+
+
+def synchronize_invoice_sequence(prefix: str = None, width: int = None) -> int:
+    """
+    Taisymas: nustatyti prefikso seką pagal didžiausią egzistuojantį numerį (skenuoja visus numerius).
+    VISADA atnaujina seką, net jei tai reiškia sekos sumažinimą.
+    Naudojama tik rankiniam taisymui (manage.py repair_number_sequences), ne kuriant sąskaitas.
+
+    Returns:
+        Naujas paskutinis numeris
+    """
+    from django.db import transaction
+
+    prefix, width = _get_invoice_number_format(prefix, width)
+    with transaction.atomic():
+        sequence = _get_prefix_sequence(prefix, width, lock=True)
+        max_existing, separator = get_max_existing_invoice_number(prefix, width, return_separator=True)
+        if max_existing != sequence.last_number or (separator or '') != sequence.separator:
+            sequence.last_number = max_existing
+            sequence.separator = separator or sequence.separator
+            sequence.save(update_fields=['last_number', 'separator', 'updated_at'])
+    return max_existing
 
 
 def generate_invoice_number(prefix: str = None, width: int = None) -> str:
     """
-    Generuoja unikalų sąskaitos numerį pagal metus ir prefix, naudojant seką per einamuosius metus.
-    Formatas: PREFIX + zero-pad sekos numeris.
+    Generuoja unikalų sąskaitos numerį: PREFIX + skirtukas + zero-pad sekos numeris.
     Pvz.: LOG0001234 (kai width=7, prefix='LOG')
-    
+
     Jei prefix arba width nenurodyti, naudoja InvoiceSettings nustatymus.
-    
-    DĖMESYS: Kadangi InvoiceNumberSequence neturi prefix lauko, kiekvienas prefix turi
-    savo unikalų numerį gauti iš DB pagal prefix. Naudojame get_max_existing_invoice_number
-    ir patikriname, ar numeris jau egzistuoja prieš grąžinant.
+
+    Numeris išduodamas iš prefikso sekos (InvoicePrefixSequence) vienu užrakintu padidinimu -
+    kaina nepriklauso nuo sąskaitų skaičiaus. Rankiniu būdu įvesti numeriai seką pakelia per
+    signal'us, todėl užimtas numeris praleidžiamas tik tada, kai seka buvo pakeista ranka.
     """
-    from apps.settings.models import InvoiceSettings
-    from django.db.models import F
     from django.db import transaction
-    
-    current_year = datetime.now().year
-    
-    # Gauti nustatymus, jei prefix arba width nenurodyti
-    if prefix is None or width is None:
-        settings = InvoiceSettings.load()
-        if prefix is None:
-            prefix = settings.invoice_prefix_sales or 'LOG'
-        if width is None:
-            width = settings.invoice_number_width or 7
 
-    # Pirmiausia sinchronizuoti seką su didžiausiu egzistuojančiu numeriu šiam prefix
-    synchronize_invoice_sequence(prefix, width)
-    
-    # Gauti maksimalų egzistuojantį numerį šiam prefix
-    max_existing, separator = get_max_existing_invoice_number(prefix, width, return_separator=True)
-    
-    # Gauname arba sukuriame seką šiems metams su row-level lock (select_for_update)
-    # Tai užtikrina, kad tik viena užklausa gali atnaujinti seką vienu metu
+    prefix, width = _get_invoice_number_format(prefix, width)
+
     with transaction.atomic():
-        # Bandyti gauti seką su lock
-        try:
-            sequence = InvoiceNumberSequence.objects.select_for_update().get(year=current_year)
-        except InvoiceNumberSequence.DoesNotExist:
-            # Jei neegzistuoja, sukurti (bet gali būti race condition)
-            try:
-                sequence = InvoiceNumberSequence.objects.create(year=current_year, last_number=0)
-            except Exception:
-                # Jei kitoje užklausoje jau sukurtas, bandyti gauti dar kartą
-                sequence = InvoiceNumberSequence.objects.select_for_update().get(year=current_year)
-        
-        # Naudoti maksimalų egzistuojantį numerį + 1 kaip pradžios tašką
-        # (kadangi skirtingi prefix dalijasi tą pačią seką, turime naudoti maksimalų)
-        # Bet jei sequence.last_number didesnis, naudoti jį
-        start_number = max(max_existing + 1, sequence.last_number + 1)
-        
-        # Atomiškai nustatyti numerį naudojant F() expression
-        InvoiceNumberSequence.objects.filter(id=sequence.id).update(
-            last_number=start_number
-        )
-        
-        # Perkrauti objektą iš DB, kad gautume atnaujintą last_number
-        sequence.refresh_from_db()
-        
-        # Naudoti atnaujintą numerį
-        next_number = sequence.last_number
-    
-    # Formatas be metų ir brūkšnio: PREFIX + zero-pad(next_number)
-    separator = separator or ''
-    invoice_number = f"{prefix}{separator}{next_number:0{width}d}"
-    
-    # Patikrinti, ar numeris jau egzistuoja (apsauga nuo dublikatų)
-    # Tai yra svarbu, nes skirtingi prefix gali gauti tą patį numerį iš sekos
-    from .models import PurchaseInvoice
-    max_attempts = 10
-    attempts = 0
-    while (SalesInvoice.objects.filter(invoice_number=invoice_number).exists() or 
-           PurchaseInvoice.objects.filter(invoice_number=invoice_number).exists()):
-        attempts += 1
-        if attempts >= max_attempts:
-            raise ValueError(f"Neįmanoma sugeneruoti unikalaus numerio su prefix {prefix} po {max_attempts} bandymų")
-        
-        # Gauti maksimalų egzistuojantį numerį dar kartą (gali būti atnaujintas)
-        max_existing, separator = get_max_existing_invoice_number(prefix, width, return_separator=True)
-        
-        # Didinti numerį ir bandyti dar kartą
-        with transaction.atomic():
-            sequence = InvoiceNumberSequence.objects.select_for_update().get(year=current_year)
-            # Naudoti maksimalų + 1 arba sekos numerį + 1, kas didesnis
-            next_candidate = max(max_existing + 1, sequence.last_number + 1)
-            InvoiceNumberSequence.objects.filter(id=sequence.id).update(
-                last_number=next_candidate
-            )
-            sequence.refresh_from_db()
-            next_number = sequence.last_number
-        
-        separator = separator or ''
-        invoice_number = f"{prefix}{separator}{next_number:0{width}d}"
+        sequence = _get_prefix_sequence(prefix, width, lock=True)
+        next_number = sequence.last_number + 1
+        invoice_number = f"{prefix}{sequence.separator}{next_number:0{width}d}"
+        while _invoice_number_exists(invoice_number):
+            next_number += 1
+            invoice_number = f"{prefix}{sequence.separator}{next_number:0{width}d}"
+        sequence.last_number = next_number
+        sequence.save(update_fields=['last_number', 'updated_at'])
 
     return invoice_number
 
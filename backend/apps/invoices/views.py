@@ -3,7 +3,7 @@ import re
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.pagination import PageNumberPagination
+from apps.core.pagination import OptionalCursorPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from django_filters import rest_framework as filters
 from rest_framework import filters as drf_filters
@@ -14,8 +14,6 @@ from django.shortcuts import get_object_or_404, render
 from django.http import HttpResponse
 from django.db import models
 from decimal import Decimal
-from io import BytesIO
-from xhtml2pdf import pisa
 from django.core.mail import EmailMessage, get_connection
 from smtplib import SMTPException
 import socket
@@ -23,11 +21,14 @@ from .models import SalesInvoice, PurchaseInvoice, ExpenseCategory, SalesInvoice
 from .serializers import (
     SalesInvoiceSerializer, SalesInvoiceListSerializer, PurchaseInvoiceSerializer, ExpenseCategorySerializer
 )
-from .utils import generate_invoice_number, amount_to_words, get_max_existing_invoice_number, synchronize_invoice_sequence, get_first_available_gap_number, find_invoice_number_gaps
-from .bank_utils import parse_csv_bank_statement, process_bank_statement
+from .utils import generate_invoice_number, amount_to_words, get_first_available_gap_number, find_invoice_number_gaps
+from .bank_statement_import import import_bank_statement
 from .tasks import update_overdue_invoices
 from .email_service import send_debtor_reminder_email, send_debtor_reminder_bulk
 from apps.mail.email_logger import send_email_message_with_logging
+from apps.core.pdf_renderer import PdfRenderError
+from apps.core.pdf_cache import get_or_render_pdf, cache_tag
+from apps.core.pdf_batch import PdfJob, PdfResult, batch_pdf_response, iter_by_ids
 from apps.orders.models import Order
 from apps.settings.models import CompanyInfo, InvoiceSettings
 from apps.settings.email_utils import render_email_template
@@ -36,7 +37,7 @@ import logging
 logger = logging.getLogger(__name__)
 
 
-class InvoicePageNumberPagination(PageNumberPagination):
+class InvoicePageNumberPagination(OptionalCursorPagination):
     """Paginacija sąskaitoms su page_size parametru"""
     page_size = 20
     page_size_query_param = 'page_size'
@@ -192,53 +193,17 @@ class SalesInvoiceViewSet(viewsets.ModelViewSet):
         """Priskiria sąskaitos numerį, sumuoja pasirinktų užsakymų sumas ir išsaugo ryšius."""
         provided_number = serializer.validated_data.get('invoice_number')
         
-        # Optimizacija: užkrauti visas esamas invoice_numbers vieną kartą
-        existing_numbers = set(SalesInvoice.objects.values_list('invoice_number', flat=True))
-        
-        # Jei pateiktas numeris – naudoti, bet patikrinti unikalumą; jei toks jau yra, generuoti sekantį
+        # Jei pateiktas numeris – naudoti, bet patikrinti unikalumą; jei toks jau yra, generuoti sekantį.
+        # Seka atnaujinama signal'u (pateiktas didesnis numeris ją pakelia)
         if isinstance(provided_number, str) and provided_number.strip():
             candidate = provided_number.strip().upper()
-            if candidate in existing_numbers:
-                # Sugeneruoti sekantį laisvą numerį (sinchronizacija jau atlikta generate_invoice_number viduje)
+            if SalesInvoice.objects.filter(invoice_number=candidate).exists():
                 invoice_number = generate_invoice_number()
-                # Jei vis tiek kolizija (retai), rasti pirmą laisvą numerį
-                max_attempts = 10
-                attempts = 0
-                while invoice_number in existing_numbers and attempts < max_attempts:
-                    # Panaudoti seką, bet rasti pirmą laisvą numerį
-                    from apps.settings.models import InvoiceSettings
-                    from apps.invoices.models import InvoiceNumberSequence
-                    from datetime import datetime
-                    inv_settings = InvoiceSettings.load()
-                    prefix = (inv_settings.invoice_prefix_sales or 'LOG')
-                    width = inv_settings.invoice_number_width or 7
-                    current_year = datetime.now().year
-                    seq, _ = InvoiceNumberSequence.objects.get_or_create(year=current_year)
-                    seq.last_number += 1
-                    seq.save()
-                    invoice_number = f"{prefix}{seq.last_number:0{width}d}"
-                    attempts += 1
-                if invoice_number in existing_numbers:
-                    # Jei vis tiek kolizija po max_attempts, naudoti pateiktą su unikalumu
-                    import uuid
-                    invoice_number = f"{candidate}_{uuid.uuid4().hex[:4]}"
             else:
                 invoice_number = candidate
         else:
-            # Generuoti automatiškai
+            # Generuoti automatiškai (užrakinta prefikso seka - be kolizijų)
             invoice_number = generate_invoice_number()
-            # Jei kolizija (labai retai), rasti pirmą laisvą
-            if invoice_number in existing_numbers:
-                from apps.invoices.models import InvoiceNumberSequence
-                from datetime import datetime
-                inv_settings = InvoiceSettings.load()
-                prefix = (inv_settings.invoice_prefix_sales or 'LOG')
-                width = inv_settings.invoice_number_width or 7
-                current_year = datetime.now().year
-                seq, _ = InvoiceNumberSequence.objects.get_or_create(year=current_year)
-                seq.last_number += 1
-                seq.save()
-                invoice_number = f"{prefix}{seq.last_number:0{width}d}"
 
         # Gauti numatytąsias display_options vertes iš InvoiceSettings
         from apps.settings.models import InvoiceSettings
@@ -293,15 +258,6 @@ class SalesInvoiceViewSet(viewsets.ModelViewSet):
                 logger = logging.getLogger(__name__)
                 logger.warning(f"Klaida apskaičiuojant visible_items_indexes: {e}")
 
-        # Visada sinchronizuoti seką su didžiausiu egzistuojančiu numeriu
-        try:
-            from .utils import synchronize_invoice_sequence
-            synchronize_invoice_sequence()
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f"Klaida sinchronizuojant sąskaitos numeracijos seką: {e}")
-
         self._sync_invoice_orders(invoice, orders_sequence, order_amounts)
         
         # Registruoti veiksmą ActivityLog
@@ -434,62 +390,20 @@ class SalesInvoiceViewSet(viewsets.ModelViewSet):
     
     def perform_destroy(self, instance):
         """
-        Trinant sąskaitą, patikrinti ar trinama paskutinė (didžiausia) sąskaita.
-        Jei taip - atnaujinti numeracijos seką su didžiausiu likusiu numeriu.
-        Jei trinama vidurinė/senesnė sąskaita - sekantis numeris nesikeičia.
+        Ištrinti sąskaitą.
+        Jei trinama paskutinė (didžiausia) sąskaita - numeracijos seka grąžinama atgal signal'u
+        (release_invoice_number), trinant vidurinę/senesnę sekantis numeris nesikeičia.
         
         Pastaba: client_invoice_issued flag'ų atnaujinimas dabar vykdomas automatiškai per signal'us.
         """
+        # Registruoti veiksmą ActivityLog prieš ištrynimą
         try:
-            from apps.settings.models import InvoiceSettings
-            
-            # Gauti nustatymus
-            inv_settings = InvoiceSettings.load()
-            prefix = (inv_settings.invoice_prefix_sales or 'LOG')
-            width = inv_settings.invoice_number_width or 7
-            
-            # Patikrinti ar trinamas numeris prasideda prefix
-            deleted_number = None
-            if instance.invoice_number and instance.invoice_number.upper().startswith(prefix.upper()):
-                suffix = instance.invoice_number[len(prefix):]
-                match = re.search(r'(\d+)(?!.*\d)', suffix)
-                if match:
-                    try:
-                        deleted_number = int(match.group(1))
-                    except ValueError:
-                        deleted_number = None
-            
-            # Registruoti veiksmą ActivityLog prieš ištrynimą
-            try:
-                from apps.core.services.activity_log_service import ActivityLogService
-                ActivityLogService.log_sales_invoice_deleted(instance, user=self.request.user, request=self.request)
-            except Exception as e:
-                logger.warning(f"Failed to log sales invoice deletion: {e}")
-            
-            # Ištrinti sąskaitą (signal'ai automatiškai atnaujins client_invoice_issued)
-            super().perform_destroy(instance)
-            
-            # Jei trinamas numeris su prefix, patikrinti ar tai buvo didžiausias
-            if deleted_number is not None:
-                # Surasti didžiausią likusį numerį (po trinimo)
-                max_existing, _ = get_max_existing_invoice_number(prefix, width, return_separator=True)
-                
-                # Jei trinta sąskaita buvo didžiausia arba lygi didžiausiam (po trinimo max_existing jau mažesnis)
-                # Tai reiškia, kad trinta buvo paskutinė - reikia atnaujinti seką
-                # Jei trinta vidurinė/senesnė - sekantis numeris nesikeičia
-                if deleted_number >= max_existing:
-                    # Sinchronizuoti seką su didžiausiu likusiu numeriu
-                    synchronize_invoice_sequence(prefix, width)
-                    
+            from apps.core.services.activity_log_service import ActivityLogService
+            ActivityLogService.log_sales_invoice_deleted(instance, user=self.request.user, request=self.request)
         except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Klaida trinant sąskaitą ir atnaujinant numeracijos seką: {e}", exc_info=True)
-            # Jei klaida, vis tiek ištrinti sąskaitą (jei dar neištrinta)
-            try:
-                super().perform_destroy(instance)
-            except:
-                pass
+            logger.warning(f"Failed to log sales invoice deletion: {e}")
+        
+        super().perform_destroy(instance)
     
     @action(detail=False, methods=['get'])
     def get_first_gap_number(self, request):
@@ -658,10 +572,6 @@ class SalesInvoiceViewSet(viewsets.ModelViewSet):
             logger = logging.getLogger(__name__)
             logger.warning(f"Klaida apskaičiuojant visible_items_indexes: {e}")
         
-        # Sinchronizuoti seką, jei naudotas pateiktas numeris
-        if isinstance(provided_invoice_number, str) and provided_invoice_number.strip():
-            synchronize_invoice_sequence()
-        
         serializer = SalesInvoiceSerializer(invoice)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
@@ -1466,7 +1376,26 @@ class SalesInvoiceViewSet(viewsets.ModelViewSet):
                 content_type='application/json'
             )
         
-        # Konvertuoti logo į base64, jei yra (kad veiktų PDF be priklausomybės nuo URL)
+        import logging
+        logger = logging.getLogger(__name__)
+        
+        # Chromium pool -> WeasyPrint -> xhtml2pdf (su PDF cache)
+        try:
+            pdf_bytes = self._render_invoice_pdf(invoice, request, context)
+        except PdfRenderError as e:
+            logger.error(f"Klaida generuojant sąskaitos PDF: {e}")
+            return Response(
+                {'error': f'Klaida generuojant PDF: {str(e)}'},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                content_type='application/json'
+            )
+        
+        response = HttpResponse(pdf_bytes, content_type='application/pdf')
+        response['Content-Disposition'] = f'inline; filename="{invoice.invoice_number}.pdf"'
+        return response
+    
+    def _inline_logo(self, context):
+        """Konvertuoti logo į base64, jei yra (kad veiktų PDF be priklausomybės nuo URL)"""
         from apps.settings.models import CompanyInfo
         company = CompanyInfo.load()
         
@@ -1539,6 +1468,13 @@ class SalesInvoiceViewSet(viewsets.ModelViewSet):
                 logger = logging.getLogger(__name__)
                 logger.warning(f"Could not convert logo to base64: {e}")
                 pass
+    
+    def _build_invoice_pdf_html(self, request, context):
+        """
+        Sugeneruoti PDF skirtą HTML. Naudojama pdf(), send_email() ir priminimuose -
+        vienodas HTML reiškia ir vienodą PDF cache raktą.
+        """
+        self._inline_logo(context)
         
         # Generuoti HTML su visais duomenimis
         html_string = render(request, 'invoices/sales_invoice.html', context).content.decode('utf-8')
@@ -1550,139 +1486,18 @@ class SalesInvoiceViewSet(viewsets.ModelViewSet):
         
         # NEPAŠALINTI @media print stilių - užsakymuose jie veikia gerai
         # Problema gali būti kitur, ne @media print stiliuose
+        return html_string
+    
+    def _render_invoice_pdf(self, invoice, request, context):
+        """
+        Grąžina sąskaitos PDF baitus (iš PDF cache arba sugeneruotus).
         
+        Raises:
+            PdfRenderError: jei PDF sugeneruoti nepavyko
+        """
+        html_string = self._build_invoice_pdf_html(request, context)
         base_url = request.build_absolute_uri('/')
-        import logging
-        logger = logging.getLogger(__name__)
-        
-        # 1) Bandyti Playwright (Chromium) – PDF tiksliai kaip HTML peržiūroje
-        try:
-            from playwright.sync_api import sync_playwright
-            with sync_playwright() as p:
-                browser = p.chromium.launch()
-                context = browser.new_context(base_url=base_url)
-                page = context.new_page()
-                page.set_content(html_string)
-                page.emulate_media(media='screen')  # kad būtų kaip peržiūroje, ne print
-                pdf_bytes = page.pdf(
-                    format='A4',
-                    margin={'top': '0', 'right': '0', 'bottom': '0', 'left': '0'},
-                    print_background=True,
-                )
-                context.close()
-                browser.close()
-            response = HttpResponse(pdf_bytes, content_type='application/pdf')
-            response['Content-Disposition'] = f'inline; filename="{invoice.invoice_number}.pdf"'
-            return response
-        except ImportError:
-            pass  # Playwright neįdiegtas – naudoti WeasyPrint
-        except Exception as e:
-            logger.warning(f"Playwright (Chromium) PDF nepavyko: {e}, naudojamas WeasyPrint")
-        
-        # 2) Bandyti naudoti WeasyPrint (puikus HTML/CSS palaikymas Linux serveryje)
-        try:
-            from weasyprint import HTML, CSS
-            from django.conf import settings
-            import os
-            
-            # WeasyPrint base_url - svarbu vaizdų apdorojimui
-            # media_type='screen' kad PDF atrodytų identiškai kaip HTML peržiūroje (ne @media print)
-            html_doc = HTML(string=html_string, base_url=base_url, media_type='screen')
-            
-            # CSS - tik minimalus @page, template jau turi visą reikalingą CSS
-            # Neperrašome esamų stilių, tik nustatome puslapio parametrus
-            pdf_css_string = """
-                @page {
-                    size: A4;
-                    margin: 0;
-                }
-            """
-            css_doc = CSS(string=pdf_css_string)
-            
-            # Generuoti PDF - template CSS naudojamas automatiškai
-            pdf_bytes = html_doc.write_pdf(stylesheets=[css_doc])
-            
-            response = HttpResponse(pdf_bytes, content_type='application/pdf')
-            response['Content-Disposition'] = f'inline; filename="{invoice.invoice_number}.pdf"'
-            return response
-            
-        except (ImportError, OSError) as e:
-            # WeasyPrint nėra įdiegtas arba trūksta sisteminių bibliotekų
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.warning(f"WeasyPrint nepasiekiamas: {e}, naudojamas xhtml2pdf fallback")
-        except Exception as e:
-            # Kitos WeasyPrint klaidos
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"WeasyPrint klaida: {e}, naudojamas xhtml2pdf fallback")
-        
-        # Fallback į xhtml2pdf jei WeasyPrint nepavyko
-        try:
-            result = BytesIO()
-            
-            def link_callback(uri, rel):
-                """Handles images and other resources for PDF generation"""
-                from urllib.parse import urlparse, urljoin
-                from django.conf import settings
-                import os
-                
-                # Jei tai data URI, grąžinti kaip yra
-                if uri.startswith('data:'):
-                    return uri
-                
-                # Jei tai relative path, paversti į absoliutų
-                if uri.startswith('/'):
-                    if uri.startswith(settings.MEDIA_URL):
-                        # Media failas - bandyti gauti absoliutų kelią
-                        file_path = uri.replace(settings.MEDIA_URL, '')
-                        full_path = os.path.join(settings.MEDIA_ROOT, file_path)
-                        if os.path.exists(full_path):
-                            return f"file://{full_path}"
-                    # Jei kitaip - naudoti base URL
-                    base_url = request.build_absolute_uri('/').rstrip('/')
-                    return urljoin(base_url, uri)
-                
-                # Jei tai absoliutus URL, grąžinti kaip yra
-                return uri
-            
-            # Generuoti PDF su pagerinta link_callback funkcija
-            pdf = pisa.pisaDocument(
-                BytesIO(html_string.encode("UTF-8")), 
-                result,
-                encoding='UTF-8',
-                link_callback=link_callback,
-                show_error_as_pdf=False
-            )
-            
-            if not pdf.err:
-                response = HttpResponse(result.getvalue(), content_type='application/pdf')
-                response['Content-Disposition'] = f'inline; filename="{invoice.invoice_number}.pdf"'
-                return response
-            else:
-                # Detalesnė klaidos informacija
-                error_msg = str(pdf.err) if pdf.err else "Nežinoma PDF generavimo klaida"
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.error(f"PDF generavimo klaida (xhtml2pdf): {error_msg}")
-                from rest_framework.response import Response
-                from rest_framework import status
-                return Response(
-                    {'error': f'Klaida generuojant PDF: {error_msg}'},
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                    content_type='application/json'
-                )
-        except Exception as e:
-            import logging
-            logger = logging.getLogger(__name__)
-            logger.error(f"Klaida generuojant sąskaitos PDF: {e}", exc_info=True)
-            from rest_framework.response import Response
-            from rest_framework import status
-            return Response(
-                {'error': f'Klaida generuojant PDF: {str(e)}'},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                content_type='application/json'
-            )
+        return get_or_render_pdf(html_string, base_url, tag=cache_tag('salesinvoice', invoice.pk))
     
     def _get_invoice_pdf_bytes(self, invoice, request, lang='lt'):
         """
@@ -1691,62 +1506,61 @@ class SalesInvoiceViewSet(viewsets.ModelViewSet):
         """
         try:
             context = self._prepare_invoice_context(invoice, request, lang=lang)
-            html_string = render(request, 'invoices/sales_invoice.html', context).content.decode('utf-8')
-            import re
-            html_string = re.sub(r'<div[^>]*class=["\'][^"\']*action-buttons[^"\']*["\'][^>]*>.*?</div>\s*', '', html_string, flags=re.DOTALL)
-            html_string = re.sub(r'<script[^>]*>.*?</script>', '', html_string, flags=re.DOTALL | re.IGNORECASE)
-            html_string = re.sub(r'<div[^>]*id=["\']toastContainer["\'][^>]*>.*?</div>\s*', '', html_string, flags=re.DOTALL)
-            base_url = request.build_absolute_uri('/')
-            pdf_bytes = None
             try:
-                from playwright.sync_api import sync_playwright
-                with sync_playwright() as p:
-                    browser = p.chromium.launch()
-                    ctx = browser.new_context(base_url=base_url)
-                    page = ctx.new_page()
-                    page.set_content(html_string)
-                    page.emulate_media(media='screen')
-                    pdf_bytes = page.pdf(format='A4', margin={'top': '0', 'right': '0', 'bottom': '0', 'left': '0'}, print_background=True)
-                    ctx.close()
-                    browser.close()
-            except (ImportError, Exception):
-                pass
-            if not pdf_bytes:
-                try:
-                    from weasyprint import HTML, CSS
-                    html_doc = HTML(string=html_string, base_url=base_url, media_type='screen')
-                    css_doc = CSS(string='@page { size: A4; margin: 0; }')
-                    pdf_bytes = html_doc.write_pdf(stylesheets=[css_doc])
-                except (ImportError, OSError, Exception):
-                    pass
-            if not pdf_bytes:
-                from io import BytesIO
-                from xhtml2pdf import pisa
-                from django.conf import settings
-                from urllib.parse import urljoin
-                import os
-                result = BytesIO()
-                def link_callback(uri, rel):
-                    if uri.startswith('data:'):
-                        return uri
-                    if uri.startswith('/'):
-                        if uri.startswith(settings.MEDIA_URL):
-                            file_path = uri.replace(settings.MEDIA_URL, '')
-                            full_path = os.path.join(settings.MEDIA_ROOT, file_path)
-                            if os.path.exists(full_path):
-                                return f"file://{full_path}"
-                        return urljoin(base_url.rstrip('/'), uri)
-                    return uri
-                pdf = pisa.pisaDocument(BytesIO(html_string.encode('UTF-8')), result, encoding='UTF-8', link_callback=link_callback, show_error_as_pdf=False)
-                if not pdf.err and result.getvalue() and result.getvalue().startswith(b'%PDF'):
-                    pdf_bytes = result.getvalue()
-            if pdf_bytes and pdf_bytes.startswith(b'%PDF'):
-                return (pdf_bytes, None)
-            return (None, 'Nepavyko generuoti PDF')
+                pdf_bytes = self._render_invoice_pdf(invoice, request, context)
+            except PdfRenderError as e:
+                return (None, str(e) or 'Nepavyko generuoti PDF')
+            return (pdf_bytes, None)
         except Exception as e:
             logger.warning(f"Sąskaitos PDF generavimas priminimui nepavyko: {e}")
             return (None, str(e))
     
+    def _iter_invoice_pdf_jobs(self, invoices, request, lang='lt'):
+        """PDF darbai masiniam eksportui - HTML ruošiamas čia, PDF generuojami procesų pool'e"""
+        base_url = request.build_absolute_uri('/')
+        for index, invoice in enumerate(invoices):
+            filename = f"{invoice.invoice_number or invoice.id}.pdf"
+            try:
+                context = self._prepare_invoice_context(invoice, request, lang=lang)
+                html_string = self._build_invoice_pdf_html(request, context)
+            except Exception as e:
+                logger.warning(f"Sąskaitos {invoice.id} HTML paruošimas masiniam eksportui nepavyko: {e}")
+                yield PdfResult(index, filename, None, str(e))
+                continue
+            yield PdfJob(index, filename, html_string, base_url, cache_tag('salesinvoice', invoice.pk), 'chromium', 'screen')
+    
+    @action(detail=False, methods=['post'])
+    def batch_pdf(self, request):
+        """
+        Masinis sąskaitų PDF eksportas.
+        Body: { "invoice_ids": [1, 2, 3], "format": "zip" | "pdf", "lang": "lt" }
+        Be invoice_ids naudojami tie patys filtrai kaip sąrašui (query parametrai).
+        """
+        invoice_ids = request.data.get('invoice_ids', [])
+        output_format = request.data.get('format', 'zip')
+        lang = str(request.data.get('lang', 'lt')).lower()
+        if output_format not in ('zip', 'pdf'):
+            return Response({'error': 'format turi būti "zip" arba "pdf"'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        if invoice_ids:
+            queryset = queryset.filter(id__in=invoice_ids)
+        queryset = queryset.order_by('invoice_number', 'id')
+        
+        from django.conf import settings
+        max_documents = getattr(settings, 'PDF_BATCH_MAX_DOCUMENTS', 500)
+        ids = list(queryset.values_list('id', flat=True))
+        if not ids:
+            return Response({'error': 'Nerasta sąskaitų'}, status=status.HTTP_404_NOT_FOUND)
+        if len(ids) > max_documents:
+            return Response(
+                {'error': f'Per daug sąskaitų ({len(ids)}). Maksimalus kiekis: {max_documents}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        jobs = self._iter_invoice_pdf_jobs(iter_by_ids(queryset, ids), request, lang=lang)
+        return batch_pdf_response(jobs, output_format, filename=f'saskaitos_{timezone.now():%Y%m%d_%H%M}')
+    
     @action(detail=True, methods=['post'])
     def send_email(self, request, pk=None):
         """Siunčia sąskaitos PDF el. paštu"""
@@ -1786,133 +1600,14 @@ class SalesInvoiceViewSet(viewsets.ModelViewSet):
             # Gauti kalbą iš užklausos duomenų
             lang = request.data.get('lang', 'lt')
             
-            # Generuoti PDF - naudoti TIKSLIAI tą patį metodą kaip pdf() endpoint'as
+            # Generuoti PDF - naudoti TIKSLIAI tą patį metodą kaip pdf() endpoint'as (tas pats PDF cache)
             context = self._prepare_invoice_context(invoice, request, lang=lang)
-            html_string = render(request, 'invoices/sales_invoice.html', context).content.decode('utf-8')
-            
-            # Tik minimalus valymas - pašalinti tik script tag'us ir action buttons HTML
-            import re
-            html_string = re.sub(r'<div[^>]*class=["\'][^"\']*action-buttons[^"\']*["\'][^>]*>.*?</div>\s*', '', html_string, flags=re.DOTALL)
-            html_string = re.sub(r'<script[^>]*>.*?</script>', '', html_string, flags=re.DOTALL | re.IGNORECASE)
-            html_string = re.sub(r'<div[^>]*id=["\']toastContainer["\'][^>]*>.*?</div>\s*', '', html_string, flags=re.DOTALL)
-            
-            # NEPAŠALINTI @media print stilių - užsakymuose jie veikia gerai
-            # Problema gali būti kitur, ne @media print stiliuose
-            
-            pdf_bytes = None
-            base_url = request.build_absolute_uri('/')
-            
-            # 1) Bandyti Playwright (Chromium) – PDF tiksliai kaip HTML peržiūroje
             try:
-                from playwright.sync_api import sync_playwright
-                with sync_playwright() as p:
-                    browser = p.chromium.launch()
-                    context = browser.new_context(base_url=base_url)
-                    page = context.new_page()
-                    page.set_content(html_string)
-                    page.emulate_media(media='screen')
-                    pdf_bytes = page.pdf(
-                        format='A4',
-                        margin={'top': '0', 'right': '0', 'bottom': '0', 'left': '0'},
-                        print_background=True,
-                    )
-                    context.close()
-                    browser.close()
-                logger.info("Playwright (Chromium) sėkmingai sugeneravo PDF el. laiške")
-            except ImportError:
-                pass  # Playwright neįdiegtas – naudoti WeasyPrint
-            except Exception as e:
-                logger.warning(f"Playwright PDF el. laiške nepavyko: {e}, naudojamas WeasyPrint")
-            
-            # 2) Bandyti naudoti WeasyPrint (geresnė kokybė)
-            # media_type='screen' kad PDF atrodytų identiškai kaip HTML peržiūroje
-            if not pdf_bytes:
-                try:
-                    from weasyprint import HTML, CSS
-                    html_doc = HTML(string=html_string, base_url=base_url, media_type='screen')
-                    
-                    pdf_css_string = """
-                        @page {
-                            size: A4;
-                            margin: 0;
-                        }
-                    """
-                    css_doc = CSS(string=pdf_css_string)
-                    
-                    pdf_bytes = html_doc.write_pdf(stylesheets=[css_doc])
-                    logger.info("WeasyPrint sėkmingai sugeneravo PDF el. laiške")
-                    
-                except (ImportError, OSError) as e:
-                    logger.warning(f"WeasyPrint nepasiekiamas el. laiške: {e}, naudojamas xhtml2pdf fallback")
-                except Exception as e:
-                    logger.error(f"WeasyPrint klaida el. laiške: {e}, naudojamas xhtml2pdf fallback")
-            
-            # Fallback į xhtml2pdf
-            if not pdf_bytes:
-                try:
-                    from io import BytesIO
-                    from xhtml2pdf import pisa
-                    
-                    result = BytesIO()
-                    
-                    def link_callback(uri, rel):
-                        from urllib.parse import urlparse, urljoin
-                        from django.conf import settings
-                        import os
-                        
-                        if uri.startswith('data:'):
-                            return uri
-                        
-                        if uri.startswith('/'):
-                            if uri.startswith(settings.MEDIA_URL):
-                                file_path = uri.replace(settings.MEDIA_URL, '')
-                                full_path = os.path.join(settings.MEDIA_ROOT, file_path)
-                                if os.path.exists(full_path):
-                                    return f"file://{full_path}"
-                            base_url = request.build_absolute_uri('/').rstrip('/')
-                            return urljoin(base_url, uri)
-                        
-                        return uri
-                    
-                    pdf = pisa.pisaDocument(
-                        BytesIO(html_string.encode("UTF-8")), 
-                        result,
-                        encoding='UTF-8',
-                        link_callback=link_callback,
-                        show_error_as_pdf=False
-                    )
-                    
-                    if pdf.err:
-                        error_msg = str(pdf.err) if pdf.err else "Nežinoma PDF generavimo klaida"
-                        logger.error(f"xhtml2pdf klaida el. laiške: {error_msg}")
-                        return Response(
-                            {'success': False, 'error': f'PDF generavimo klaida: {error_msg}'},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                        )
-                    
-                    pdf_bytes = result.getvalue()
-                    
-                    # Patikrinti, ar tikrai PDF (prasideda su %PDF)
-                    if not pdf_bytes or not pdf_bytes.startswith(b'%PDF'):
-                        error_msg = "Generuotas failas nėra PDF formatas"
-                        logger.error(f"xhtml2pdf klaida el. laiške: {error_msg}")
-                        if pdf_bytes:
-                            logger.error(f"Grąžintas turinys (pirmi 500 simbolių): {pdf_bytes[:500]}")
-                        return Response(
-                            {'success': False, 'error': f'PDF generavimo klaida: {error_msg}'},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                        )
-                    
-                except ImportError:
-                    logger.error("xhtml2pdf nepasiekiamas el. laiške")
-                    return Response(
-                        {'success': False, 'error': 'PDF generavimo biblioteka nepasiekiama'},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                    )
-            
-            if not pdf_bytes:
+                pdf_bytes = self._render_invoice_pdf(invoice, request, context)
+            except PdfRenderError as e:
+                logger.error(f"PDF generavimo klaida el. laiške: {e}")
                 return Response(
-                    {'success': False, 'error': 'Nepavyko generuoti PDF'},
+                    {'success': False, 'error': f'PDF generavimo klaida: {str(e)}'},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
             
@@ -2547,7 +2242,7 @@ class PurchaseInvoiceViewSet(viewsets.ModelViewSet):
             # Gauti SMTP nustatymus
             from apps.settings.models import NotificationSettings
             try:
-                config = NotificationSettings.objects.first()
+                config = NotificationSettings.load()
             except NotificationSettings.DoesNotExist:
                 return Response(
                     {'success': False, 'error': 'SMTP nustatymai nerasti'},
@@ -2822,8 +2517,9 @@ class BankImportViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['post'])
     def upload(self, request):
         """
-        Įkelia CSV banko išrašą ir suderina su sąskaitomis.
+        Įkelia banko išrašą (CSV arba camt.053 XML) ir suderina su sąskaitomis.
         Body: multipart/form-data su 'file' lauku
+        Failas skaitomas srautu, operacijos suderinamos paketais; netinkamos eilutės grąžinamos 'errors'.
         """
         if 'file' not in request.FILES:
             return Response(
@@ -2831,14 +2527,10 @@ class BankImportViewSet(viewsets.ViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        csv_file = request.FILES['file']
+        statement_file = request.FILES['file']
         
         try:
-            # Parsiname CSV failą
-            transactions = parse_csv_bank_statement(csv_file)
-            
-            # Suderiname su sąskaitomis
-            result = process_bank_statement(transactions)
+            result = import_bank_statement(statement_file)
             
             return Response(result, status=status.HTTP_200_OK)
             
@@ -1,6 +1,9 @@
 from django.contrib import admin
 
-from .models import MailAttachment, MailMessage, MailMessageTag, MailSender, MailSyncState, MailTag, EmailLog
+from .models import (
+    MailAttachment, MailMessage, MailMessageTag, MailOcrJob, MailSender, MailSyncState, MailTag, EmailLog,
+    PdfTextExtraction,
+)
 
 
 @admin.register(MailMessage)
@@ -38,6 +41,23 @@ class MailSyncStateAdmin(admin.ModelAdmin):
     readonly_fields = ('updated_at',)
 
 
+@admin.register(MailOcrJob)
+class MailOcrJobAdmin(admin.ModelAdmin):
+    list_display = ('attachment', 'status', 'priority', 'attempts', 'available_at', 'wait_ms', 'duration_ms', 'finished_at')
+    list_filter = ('status', 'priority')
+    search_fields = ('attachment__filename', 'last_error')
+    raw_id_fields = ('attachment',)
+    readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(PdfTextExtraction)
+class PdfTextExtractionAdmin(admin.ModelAdmin):
+    list_display = ('content_hash', 'method', 'extractor_version', 'duration_ms', 'created_at')
+    list_filter = ('method', 'extractor_version')
+    search_fields = ('content_hash',)
+    readonly_fields = ('created_at',)
+
+
 @admin.register(EmailLog)
 class EmailLogAdmin(admin.ModelAdmin):
     list_display = ('id', 'email_type', 'subject', 'recipient_email', 'status', 'sent_at', 'created_at')
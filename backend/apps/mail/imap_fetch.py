@@ -0,0 +1,234 @@
+"""
+IMAP UID FETCH atsakymų analizė paketinei pašto sinchronizacijai (apps.mail.services, MAIL_SYNC_BATCHED).
+
+Anksčiau kiekvienas laiškas buvo atsiunčiamas atskira `UID FETCH <uid> (RFC822 FLAGS)` komanda - visas
+laiškas su visais priedais, net jei siuntėjas reklaminis ir laiškas praleidžiamas.
+
+Paketinis režimas:
+- viena komanda UID intervalui: FLAGS, RFC822.SIZE, BODYSTRUCTURE ir tik reikalingos antraštės,
+- pagal BODYSTRUCTURE parenkamos tik reikalingos dalys (tekstas ir priedai - tas pats atrinkimas kaip
+  _extract_body / _save_attachments), jos atsiunčiamos `BODY.PEEK[<dalis>.MIME] BODY.PEEK[<dalis>]`
+  laiškų grupei su vienoda struktūra,
+- iš dalių sudedamas email.message.Message, todėl toliau naudojamas tas pats apdorojimas kaip ir anksčiau.
+"""
+
+import email
+import re
+from collections import namedtuple
+from email.message import Message
+from typing import Dict, Iterable, List, Optional
+
+HEADER_FIELDS = 'FROM TO CC BCC SUBJECT DATE MESSAGE-ID'
+SUMMARY_ITEMS = f'(UID FLAGS RFC822.SIZE BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS ({HEADER_FIELDS})])'
+
+# uid, flags ('\\Seen \\Answered'), size (baitais), headers (bytes), sections (None - visas laiškas)
+MessageSummary = namedtuple('MessageSummary', 'uid flags size headers sections')
+
+_LITERAL_RE = re.compile(rb'\{(\d+)\}$')
+
+
+def uid_set(uids: Iterable[int]) -> str:
+    """UID sąrašas -> IMAP sequence set su intervalais ('1:5,7,9:10')"""
+    ranges = []
+    for uid in sorted(set(uids)):
+        if ranges and uid == ranges[-1][1] + 1:
+            ranges[-1][1] = uid
+        else:
+            ranges.append([uid, uid])
+    return ','.join(str(start) if start == end else f'{start}:{end}' for start, end in ranges)
+
+
+def _segments(data):
+    """imaplib atsakymo elementai -> (tekstas, literal arba None)"""
+    for item in data or []:
+        if item is None:
+            continue
+        if isinstance(item, tuple):
+            yield _LITERAL_RE.sub(b'', item[0].rstrip()), item[1]
+        else:
+            yield item, None
+
+
+def _parse(data) -> list:
+    """FETCH atsakymas -> įdėtų sąrašų medis: atom - str, eilutė / literal - bytes, NIL - None"""
+    root = []
+    stack = [root]
+    for text, literal in _segments(data):
+        i, length = 0, len(text)
+        while i < length:
+            char = text[i:i + 1]
+            if char in (b' ', b'\r', b'\n'):
+                i += 1
+            elif char == b'(':
+                child = []
+                stack[-1].append(child)
+                stack.append(child)
+                i += 1
+            elif char == b')':
+                if len(stack) > 1:
+                    stack.pop()
+                i += 1
+            elif char == b'"':
+                j = i + 1
+                value = bytearray()
+                while j < length and text[j:j + 1] != b'"':
+                    if text[j:j + 1] == b'\\' and j + 1 < length:
+                        j += 1
+                    value += text[j:j + 1]
+                    j += 1
+                stack[-1].append(bytes(value))
+                i = j + 1
+            else:
+                # Atom; BODY[HEADER.FIELDS (FROM TO)] - tarpai ir skliaustai [] viduje priklauso atom'ui
+                j, depth = i, 0
+                while j < length:
+                    char = text[j:j + 1]
+                    if char == b'[':
+                        depth += 1
+                    elif char == b']':
+                        depth -= 1
+                    elif depth <= 0 and char in (b' ', b'(', b')'):
+                        break
+                    j += 1
+                atom = text[i:j].decode('ascii', errors='replace')
+                stack[-1].append(None if atom.upper() == 'NIL' else atom)
+                i = j
+        if literal is not None:
+            stack[-1].append(literal)
+    return root
+
+
+def _text(value) -> str:
+    if isinstance(value, bytes):
+        return value.decode('utf-8', errors='replace')
+    return value or ''
+
+
+def parse_fetch_response(data) -> Dict[int, dict]:
+    """
+    UID -> {'FLAGS': [...], 'RFC822.SIZE': '123', 'BODYSTRUCTURE': [...], 'BODY': {sekcija: bytes}}.
+    Sekcijos: 'HEADER' (HEADER.FIELDS ...), '1', '1.MIME', '' (visas laiškas). Atsakymai be UID
+    (nepaprašyti FLAGS pranešimai) praleidžiami.
+    """
+    result = {}
+    for entry in _parse(data):
+        if not isinstance(entry, list):
+            continue
+        items = {'BODY': {}}
+        for key, value in zip(entry[0::2], entry[1::2]):
+            if not isinstance(key, str):
+                continue
+            key = key.upper()
+            if key.startswith('BODY['):
+                section = key[5:key.rfind(']')]
+                if section.startswith('HEADER'):
+                    section = 'HEADER'
+                items['BODY'][section] = value if isinstance(value, bytes) else _text(value).encode()
+            else:
+                items[key] = value
+        try:
+            uid = int(items.get('UID'))
+        except (TypeError, ValueError):
+            continue
+        result[uid] = items
+    return result
+
+
+def _has_param(params, name: str) -> bool:
+    """BODYSTRUCTURE parametrų sąraše yra `name` (ir RFC 2231 formos name*, name*0...)"""
+    if not isinstance(params, list):
+        return False
+    return any(_text(key).lower().split('*')[0] == name for key in params[0::2])
+
+
+def _leaf_parts(structure, prefix=''):
+    """(sekcija, dalis) kiekvienai ne multipart daliai; message/rfc822 - viena dalis su visu turiniu"""
+    if structure and isinstance(structure[0], list):
+        index = 0
+        for child in structure:
+            if not isinstance(child, list):
+                break
+            index += 1
+            yield from _leaf_parts(child, f'{prefix}.{index}' if prefix else str(index))
+        return
+    yield prefix or '1', structure
+
+
+def needed_sections(structure) -> Optional[List[str]]:
+    """
+    Atsisiųstinos multipart laiško dalys: tekstas, dalys su failo vardu arba attachment disposition,
+    įdėti laiškai. None - laiškas ne multipart (atsiunčiamas visas, tai ir yra vienintelė dalis).
+    """
+    if not isinstance(structure, list) or not structure or not isinstance(structure[0], list):
+        return None
+
+    sections = []
+    for section, part in _leaf_parts(structure):
+        if len(part) < 2:
+            continue
+        main_type, sub_type = _text(part[0]).lower(), _text(part[1]).lower()
+        # Disposition vieta priklauso nuo tipo (RFC 3501 body-ext-1part)
+        if main_type == 'text':
+            disposition_index = 9
+        elif main_type == 'message' and sub_type == 'rfc822':
+            disposition_index = 11
+        else:
+            disposition_index = 8
+        disposition = part[disposition_index] if len(part) > disposition_index else None
+        disposition_type, disposition_params = '', None
+        if isinstance(disposition, list) and disposition:
+            disposition_type = _text(disposition[0]).lower()
+            disposition_params = disposition[1] if len(disposition) > 1 else None
+
+        is_attachment = 'attachment' in disposition_type
+        has_filename = _has_param(disposition_params, 'filename') or _has_param(part[2] if len(part) > 2 else None, 'name')
+        is_body_text = main_type == 'text' and sub_type in ('plain', 'html')
+        is_embedded_message = main_type == 'message' and sub_type == 'rfc822'
+        if is_attachment or has_filename or is_body_text or is_embedded_message:
+            sections.append(section)
+    return sections
+
+
+def summarize(items: dict, uid: int) -> MessageSummary:
+    flags = items.get('FLAGS')
+    flags = ' '.join(_text(flag) for flag in flags) if isinstance(flags, list) else ''
+    try:
+        size = int(items.get('RFC822.SIZE') or 0)
+    except (TypeError, ValueError):
+        size = 0
+    return MessageSummary(
+        uid=uid,
+        flags=flags,
+        size=size,
+        headers=items['BODY'].get('HEADER', b''),
+        sections=needed_sections(items.get('BODYSTRUCTURE')),
+    )
+
+
+def section_fetch_items(sections: Optional[List[str]]) -> str:
+    if sections is None:
+        return '(BODY.PEEK[])'
+    return '(' + ' '.join(f'BODY.PEEK[{section}.MIME] BODY.PEEK[{section}]' for section in sections) + ')'
+
+
+def build_message(summary: MessageSummary, bodies: Dict[str, bytes]) -> Message:
+    """
+    Laiškas iš atsiųstų dalių: antraštės + atrinktos dalys kaip multipart/mixed turinys.
+    _extract_body / _save_attachments jį apdoroja taip pat, kaip visą RFC822 laišką.
+    """
+    if summary.sections is None:
+        return email.message_from_bytes(bodies.get('', b'') or summary.headers)
+
+    message = email.message_from_bytes(summary.headers)
+    del message['Content-Type']
+    message['Content-Type'] = 'multipart/mixed'
+    parts = []
+    for section in summary.sections:
+        body = bodies.get(section)
+        if body is None:
+            continue
+        # Dalies antraštės turi baigtis tuščia eilute, kitaip turinys būtų skaitomas kaip antraštės
+        mime = (bodies.get(f'{section}.MIME') or b'').strip(b'\r\n')
+        parts.append(email.message_from_bytes((mime + b'\r\n\r\n' if mime else b'\r\n') + body))
+    message.set_payload(parts)
+    return message
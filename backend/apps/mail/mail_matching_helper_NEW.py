@@ -1,13 +1,15 @@
 import re
 import logging
 from datetime import timedelta
-from typing import Iterable, List, Sequence, Set
+from typing import Iterable, List, Sequence, Set, Tuple
 
 from django.db import transaction
 from django.db.models.functions import Upper
 from django.utils import timezone
 
 from .models import MailMessage
+from .ocr_queue import is_ocr_queue_enabled
+from .pdf_text import cached_pdf_texts, queue_pdf_extraction
 
 logger = logging.getLogger(__name__)
 
@@ -18,21 +20,22 @@ def _normalize_candidate(value: str) -> str:
     return (value or '').strip().upper()
 
 
-def _extract_pdf_text(attachment) -> str:
+def _extract_pdf_text_with_method(attachment) -> Tuple[str, str]:
     """
     Ištraukia tekstą iš PDF priedo naudojant hibridinį metodą.
     Pirmiausia bando pdfplumber, jei nepavyksta - naudoja OCR.
-    Grąžina tuščią eilutę, jei nepavyko arba failas nėra PDF.
+    Grąžina (tekstas, metodas): metodas - pdfplumber / ocr / pypdf2;
+    ('', ''), jei nepavyko arba failas nėra PDF.
     """
     if not attachment.file:
-        return ''
+        return '', ''
 
     filename = (attachment.filename or '').lower()
     content_type = (attachment.content_type or '').lower()
 
     # Patikrinti ar tai PDF failas
     if not (filename.endswith('.pdf') or 'pdf' in content_type):
-        return ''
+        return '', ''
 
     try:
         # HIBRIDINIS METODAS: pdfplumber + OCR fallback
@@ -62,7 +65,7 @@ def _extract_pdf_text(attachment) -> str:
         # Jei radome tekstą su pdfplumber - grąžiname jį
         if pdf_text_found and text_parts:
             logger.info(f"Sėkmingai ištrauktas tekstas iš PDF naudodamas pdfplumber (attachment {attachment.id})")
-            return ' '.join(text_parts)
+            return ' '.join(text_parts), 'pdfplumber'
 
         # 2. Jei pdfplumber nerado teksto arba neįdiegtas - bandome OCR
         logger.info(f"PDF neturi ištraukiamo teksto arba pdfplumber nepavyko - bandome OCR (attachment {attachment.id})")
@@ -78,7 +81,7 @@ def _extract_pdf_text(attachment) -> str:
                 pytesseract.get_tesseract_version()
             except Exception as e:
                 logger.warning(f"Tesseract OCR neįdiegtas arba neveikia: {e}")
-                return ''
+                return '', ''
 
             if attachment.file.storage.exists(attachment.file.name):
                 with attachment.file.open('rb') as pdf_file:
@@ -102,7 +105,7 @@ def _extract_pdf_text(attachment) -> str:
                         if ocr_texts:
                             final_text = ' '.join(ocr_texts)
                             logger.info(f"Sėkmingai ištrauktas tekstas iš PDF naudodamas OCR (attachment {attachment.id})")
-                            return final_text
+                            return final_text, 'ocr'
 
                     except Exception as e:
                         logger.warning(f"PDF konvertavimo į paveikslėlius klaida (attachment {attachment.id}): {e}")
@@ -130,7 +133,7 @@ def _extract_pdf_text(attachment) -> str:
 
                     if fallback_texts:
                         logger.info(f"Ištrauktas tekstas naudodamas PyPDF2 fallback (attachment {attachment.id})")
-                        return ' '.join(fallback_texts)
+                        return ' '.join(fallback_texts), 'pypdf2'
 
         except ImportError:
             logger.warning("PyPDF2 biblioteka neįdiegta")
@@ -139,11 +142,21 @@ def _extract_pdf_text(attachment) -> str:
 
         # Jei niekas nepavyko
         logger.warning(f"Nepavyko ištraukti teksto iš PDF failo {attachment.filename} (ID: {attachment.id}) jokiu metodu")
-        return ''
+        return '', ''
 
     except Exception as e:
         logger.error(f"Kritinė klaida apdorojant PDF failą {attachment.filename} (ID: {attachment.id}): {e}")
-        return ''
+        return '', ''
+
+
+def _extract_pdf_text(attachment) -> str:
+    """
+    PDF priedo tekstas per ištraukimo cache (apps.mail.pdf_text): tas pats failas (pagal turinio hash'ą)
+    apdorojamas vieną kartą. Sunkus darbas (OCR) - tik foniniuose darbuose, ne sutapimų paieškoje.
+    """
+    from .pdf_text import get_or_extract_pdf_text
+
+    return get_or_extract_pdf_text(attachment)
 
 
 def _collect_text_chunks(message: MailMessage) -> List[str]:
@@ -160,20 +173,32 @@ def _collect_text_chunks(message: MailMessage) -> List[str]:
         # Paprastas HTML išvalymas – pašaliname tag'us
         stripped = re.sub(r'<[^>]+>', ' ', message.body_html)
         chunks.append(stripped)
-    for attachment in message.attachments.all():
+    attachments = list(message.attachments.all())
+    # PDF tekstas - tik iš cache; neištraukti priedai įrašomi į OCR eilę, sutapimai perskaičiuojami po OCR.
+    # Išjungus eilę (MAIL_OCR_QUEUE_ENABLED=False) tekstas, kaip anksčiau, ištraukiamas vietoje (per cache).
+    cached_texts = cached_pdf_texts(
+        attachment for attachment in attachments if not (attachment.ocr_text or '').strip()
+    )
+    queue_enabled = is_ocr_queue_enabled()
+    for attachment in attachments:
         if attachment.filename:
             chunks.append(attachment.filename)
-            # Naudoti išsaugotą OCR tekstą, jei yra (po OCR); kitaip ištraukti iš PDF
+            # Naudoti išsaugotą OCR tekstą, jei yra (po OCR); kitaip - ištraukimo cache
             if getattr(attachment, 'ocr_text', None) and (attachment.ocr_text or '').strip():
                 chunks.append(attachment.ocr_text.strip())
             else:
-                pdf_text = _extract_pdf_text(attachment)
+                pdf_text = cached_texts.get(attachment.id)
+                if pdf_text is None:
+                    if queue_enabled:
+                        queue_pdf_extraction(attachment)
+                    else:
+                        pdf_text = _extract_pdf_text(attachment)
                 if pdf_text:
                     chunks.append(pdf_text)
                     # OCR APODOROJIMAS: Ištraukti sąskaitos duomenis (tik kai dar nėra ocr_text)
                     try:
                         from apps.invoices.ocr_utils import process_pdf_attachment
-                        ocr_result = process_pdf_attachment(attachment)
+                        ocr_result = process_pdf_attachment(attachment, text=pdf_text)
 
                         if ocr_result['success']:
                             # Pridėti OCR duomenis į chunks
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from apps.mail.match_index import reindex_messages
+from apps.mail.models import MailMessage
+
+
+class Command(BaseCommand):
+    help = 'Perskaičiuoja laiškų numerių indeksą (MailMessageToken)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--message-id', type=int, action='append', help='Tik nurodyti laiškai (galima kartoti)')
+        parser.add_argument('--chunk-size', type=int, default=500, help='Laiškų skaičius vienam paketui')
+
+    def handle(self, *args, **options):
+        queryset = MailMessage.objects.order_by('pk')
+        if options['message_id']:
+            queryset = queryset.filter(pk__in=options['message_id'])
+        message_ids = list(queryset.values_list('pk', flat=True))
+        chunk_size = max(1, options['chunk_size'])
+
+        self.stdout.write(f'Indeksuojama {len(message_ids)} laiškų...')
+        changed = 0
+        for start in range(0, len(message_ids), chunk_size):
+            changed += reindex_messages(message_ids[start:start + chunk_size], chunk_size=chunk_size)
+            self.stdout.write(f'  {min(start + chunk_size, len(message_ids))}/{len(message_ids)}')
+
+        self.stdout.write(self.style.SUCCESS(f'Pakeista indekso įrašų: {changed}'))
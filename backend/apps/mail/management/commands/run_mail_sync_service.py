@@ -0,0 +1,77 @@
+"""
+Pašto sinchronizacijos servisas atskirame procese (systemd / supervisor), ne gunicorn workeriuose.
+
+Kiekvienas aplankas sinchronizuojamas savo gijoje, nauji laiškai laukiami per IMAP IDLE.
+Web workeriuose foninį planuoklį išjungti: DISABLE_MAIL_SYNC_SCHEDULER=1.
+
+Pavyzdžiai:
+    python manage.py run_mail_sync_service
+    python manage.py run_mail_sync_service --folder INBOX --folder "Sent"
+    python manage.py run_mail_sync_service --once
+"""
+
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.mail.services import _acquire_scheduler_lock, fcntl, run_mail_housekeeping
+from apps.mail.sync_service import FolderSync, run_mail_sync_service, service_folders
+from apps.settings.models import NotificationSettings
+
+
+class Command(BaseCommand):
+    help = 'Nuolatinė IMAP sinchronizacija keliems aplankams lygiagrečiai (IDLE, atidėjimas po klaidų)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--folder', action='append',
+            help='Sinchronizuojamas aplankas (galima kartoti; numatytai MAIL_SYNC_FOLDERS arba imap_folder)'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Vienas praėjimas visiems aplankams (be IDLE) ir pabaiga'
+        )
+
+    def handle(self, *args, **options):
+        config = NotificationSettings.load()
+        folders = options['folder'] or service_folders(config)
+
+        # Tas pats užraktas kaip web planuoklio - vienu metu sinchronizuoja tik vienas procesas
+        lock_file = _acquire_scheduler_lock()
+        if options['once']:
+            if lock_file is None and fcntl is not None:
+                self.stderr.write(self.style.ERROR('Pašto sinchronizacija jau vyksta kitame procese – praleidžiama.'))
+                return
+            try:
+                for folder in folders:
+                    result = FolderSync(folder, threading.Event()).sync_once()
+                    self.stdout.write(f'{folder}: {result.get("status")} ({result.get("count", 0)} laiškų)')
+                run_mail_housekeeping()
+            finally:
+                if lock_file is not None:
+                    lock_file.close()
+            return
+
+        while lock_file is None and fcntl is not None:
+            self.stderr.write('Pašto sinchronizacija jau vyksta kitame procese (web planuoklis?) – laukiama 30 s. '
+                              'Web workeriuose nustatykite DISABLE_MAIL_SYNC_SCHEDULER=1.')
+            time.sleep(30)
+            lock_file = _acquire_scheduler_lock()
+
+        stop_event = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write('Gautas sustabdymo signalas – baigiama...')
+            stop_event.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        self.stdout.write(self.style.SUCCESS(f'Pašto sinchronizacijos servisas: {", ".join(folders)}'))
+        try:
+            run_mail_sync_service(folders, stop_event)
+        finally:
+            if lock_file is not None:
+                lock_file.close()
@@ -0,0 +1,129 @@
+"""
+PDF priedų OCR eilės vykdymas (MailOcrJob) fiksuoto dydžio procesų pool'e, atskirai nuo web procesų.
+
+Pavyzdžiai:
+    python manage.py run_ocr_workers
+    python manage.py run_ocr_workers --workers 2
+    python manage.py run_ocr_workers --once
+    python manage.py run_ocr_workers --enqueue-missing --once
+    python manage.py run_ocr_workers --stats
+"""
+
+import signal
+import threading
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.mail.models import MailAttachment, MailOcrJob
+from apps.mail.ocr_queue import enqueue_attachment, get_worker_count, queue_stats, run_ocr_workers
+from apps.mail.pdf_text import cached_pdf_texts
+
+
+class Command(BaseCommand):
+    help = 'Vykdo PDF priedų OCR eilę (sąskaitos - pirmiausia, pakartojimai po klaidų)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Procesų skaičius (numatytai MAIL_OCR_WORKERS arba pusė branduolių)'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Apdoroti šiuo metu vykdytinus darbus ir baigti (kitaip veikia nuolat)'
+        )
+        parser.add_argument(
+            '--enqueue-missing', action='store_true',
+            help='Įrašyti į eilę PDF priedus be ištraukto teksto (ocr_text ir cache), kurių eilėje nėra '
+                 '(pvz. gauti prieš įjungiant eilę)'
+        )
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help='Grąžinti nepavykusius darbus į eilę'
+        )
+        parser.add_argument(
+            '--stats', action='store_true',
+            help='Parodyti eilės būseną ir paskutinės paros laikus ir baigti'
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            self._print_stats()
+            return
+
+        if options['retry_failed']:
+            reset = MailOcrJob.objects.filter(status=MailOcrJob.Status.FAILED).update(
+                status=MailOcrJob.Status.PENDING, attempts=0, available_at=timezone.now(), last_error='',
+            )
+            self.stdout.write(f'Į eilę grąžinta {reset} nepavykusių darbų')
+
+        if options['enqueue_missing']:
+            self.stdout.write(f'Į eilę įrašyta {self._enqueue_missing()} priedų')
+
+        workers = options['workers'] or get_worker_count()
+        stop_event = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write('Gautas sustabdymo signalas – baigiami vykdomi darbai...')
+            stop_event.set()
+
+        if not options['once']:
+            signal.signal(signal.SIGTERM, stop)
+            signal.signal(signal.SIGINT, stop)
+            self.stdout.write(f'OCR darbuotojai paleisti: {workers} procesai (Ctrl+C sustabdyti)...')
+
+        stats = run_ocr_workers(stop_event=stop_event, once=options['once'], workers=workers)
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ OCR: {stats['done']} atlikta, {stats['retried']} kartojama, {stats['failed']} nepavyko"
+        ))
+
+    def _enqueue_missing(self, chunk_size=500):
+        """
+        PDF priedai be teksto: ocr_text tuščias ir cache įrašo nėra. ocr_processed nežiūrimas - senoji OCR gija
+        žymėdavo priedus apdorotais, bet teksto neišsaugodavo.
+        """
+        attachments = (
+            MailAttachment.objects
+            .filter(Q(filename__iendswith='.pdf') | Q(content_type__icontains='pdf'), ocr_job__isnull=True)
+            .filter(Q(ocr_text__isnull=True) | Q(ocr_text=''))
+            .select_related('mail_message')
+            .order_by('pk')
+        )
+        queued = 0
+        chunk = []
+        for attachment in attachments.iterator(chunk_size=chunk_size):
+            chunk.append(attachment)
+            if len(chunk) >= chunk_size:
+                queued += self._enqueue_uncached(chunk)
+                chunk = []
+        if chunk:
+            queued += self._enqueue_uncached(chunk)
+        return queued
+
+    @staticmethod
+    def _enqueue_uncached(attachments):
+        cached = cached_pdf_texts(attachments)
+        queued = 0
+        for attachment in attachments:
+            if attachment.id not in cached:
+                enqueue_attachment(attachment)
+                queued += 1
+        return queued
+
+    def _print_stats(self):
+        stats = queue_stats(since=timezone.now() - timedelta(days=1))
+        counts = stats['counts']
+        self.stdout.write('Eilė: ' + ', '.join(
+            f'{label}: {counts.get(value, 0)}' for value, label in MailOcrJob.Status.choices
+        ))
+        timings = stats['timings']
+        if not timings['jobs']:
+            self.stdout.write('Per paskutinę parą atliktų darbų nėra')
+            return
+        self.stdout.write(
+            f"Per parą atlikta {timings['jobs']}: laukimas vid. {timings['avg_wait_ms'] or 0:.0f} ms "
+            f"(maks. {timings['max_wait_ms'] or 0} ms), apdorojimas vid. {timings['avg_duration_ms'] or 0:.0f} ms "
+            f"(maks. {timings['max_duration_ms'] or 0} ms)"
+        )
@@ -10,13 +10,25 @@ class Command(BaseCommand):
         parser.add_argument(
             '--limit',
             type=int,
-            default=50,
-            help='Kiek maksimaliai naujų laiškų sinchronizuoti vieno paleidimo metu.',
+            default=None,
+            help='Kiek maksimaliai naujų laiškų sinchronizuoti vieno paleidimo metu '
+                 '(numatyta: MAIL_SYNC_BATCH_LIMIT paketiniu režimu, 50 - po vieną).',
+        )
+        parser.add_argument(
+            '--serial',
+            action='store_true',
+            help='Sinchronizuoti po vieną laišką (RFC822), nepaisant MAIL_SYNC_BATCHED.',
+        )
+        parser.add_argument(
+            '--batched',
+            action='store_true',
+            help='Paketinė sinchronizacija (viena FETCH komanda paketui), nepaisant MAIL_SYNC_BATCHED.',
         )
 
     def handle(self, *args, **options):
         limit = options['limit']
-        result = sync_imap(limit=limit)
+        batched = False if options['serial'] else (True if options['batched'] else None)
+        result = sync_imap(limit=limit, batched=batched)
         status = result.get('status')
         message = result.get('message', '')
         count = result.get('count', 0)
@@ -0,0 +1,185 @@
+"""
+Laiškų numerių indeksas (MailMessageToken).
+
+Anksčiau MailMessageViewSet.match_summary kiekvienos užklausos metu užkraudavo visus užsakymų ir
+ekspedicijų numerius, perskaitydavo visus (ne rankiniu būdu priskirtus) laiškus su priedais, HTML
+ir OCR tekstu ir kiekvieną tokenizuodavo - atsakymo laikas augo kartu su pašto dėžute.
+
+Dabar kiekvieno laiško numerių kandidatai (tas pats šablonas kaip match_summary / serializeryje)
+įrašomi vieną kartą:
+- gavus ar pakeitus laišką (MailMessage post_save),
+- išsaugojus / ištrynus priedą ir po OCR (MailAttachment post_save / post_delete).
+Suvestinė ir "kuriuose laiškuose yra numeris" užklausos - indeksuoti JOIN'ai (token = numeris),
+todėl laikas priklauso nuo numerių (užsakymų, ekspedicijų) kiekio, o ne nuo laiškų skaičiaus.
+
+Pilnas perskaičiavimas - manage.py rebuild_mail_match_index.
+"""
+
+import logging
+import re
+import threading
+from typing import Dict, Iterable, Set
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Ilgesni kandidatai nesutampa su jokiu numeriu (order_number 20, expedition_number 32 simboliai)
+TOKEN_MAX_LENGTH = 64
+
+CANDIDATE_PATTERN = re.compile(r'[A-Z0-9][A-Z0-9\-/]{2,}')
+HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+# MailMessage laukai, patenkantys į laiško dokumentą (body_html - be tag'ų)
+MESSAGE_DOCUMENT_FIELDS = ['subject', 'sender', 'recipients', 'cc', 'bcc', 'snippet', 'body_plain', 'body_html']
+ATTACHMENT_DOCUMENT_FIELDS = ['filename', 'ocr_processed', 'ocr_text']
+
+_pending = threading.local()
+
+
+def is_mail_match_index_enabled() -> bool:
+    return getattr(settings, 'MAIL_MATCH_INDEX_ENABLED', True)
+
+
+def tokenize(text) -> Set[str]:
+    """Numerių kandidatai iš teksto (didžiosiomis raidėmis, kaip match_summary)"""
+    if not text:
+        return set()
+    return {token for token in CANDIDATE_PATTERN.findall(text.upper()) if len(token) <= TOKEN_MAX_LENGTH}
+
+
+def is_number_token(text) -> bool:
+    """Ar tekstas yra vienas pilnas numerio kandidatas (tik tokį galima rasti indekse)"""
+    value = (text or '').strip().upper()
+    return bool(value) and tokenize(value) == {value}
+
+
+def attachment_pieces(filename, ocr_processed, ocr_text):
+    """Priedo teksto dalys: pavadinimas ir OCR tekstas (tik jei OCR atliktas)"""
+    pieces = [filename or '']
+    if ocr_processed and ocr_text:
+        pieces.append(ocr_text)
+    return pieces
+
+
+def compute_message_tokens(message_ids: Iterable[int]) -> Dict[int, Set[str]]:
+    """Apskaičiuoti laiškų numerių kandidatus (2 užklausos bet kokiam laiškų kiekiui)"""
+    from apps.mail.models import MailAttachment, MailMessage
+
+    message_ids = list(message_ids)
+    tokens_by_message = {}
+
+    for row in MailMessage.objects.filter(pk__in=message_ids).values_list('pk', *MESSAGE_DOCUMENT_FIELDS):
+        tokens = set()
+        *fields, body_html = row[1:]
+        for value in fields:
+            tokens.update(tokenize(value))
+        if body_html:
+            tokens.update(tokenize(HTML_TAG_PATTERN.sub(' ', body_html)))
+        tokens_by_message[row[0]] = tokens
+
+    for row in MailAttachment.objects.filter(mail_message_id__in=message_ids).values_list(
+        'mail_message_id', *ATTACHMENT_DOCUMENT_FIELDS
+    ):
+        tokens = tokens_by_message.get(row[0])
+        if tokens is None:
+            continue
+        for piece in attachment_pieces(*row[1:]):
+            tokens.update(tokenize(piece))
+
+    return tokens_by_message
+
+
+def reindex_messages(message_ids: Iterable[int], chunk_size: int = 500) -> int:
+    """
+    Atnaujinti laiškų numerių indeksą (paketais): įrašomi tik nauji, šalinami tik dingę žodžiai.
+
+    Returns:
+        Pakeistų (įterptų + ištrintų) įrašų skaičius
+    """
+    from apps.mail.models import MailMessageToken
+
+    message_ids = sorted({message_id for message_id in message_ids if message_id})
+    changed = 0
+
+    for start in range(0, len(message_ids), chunk_size):
+        chunk = message_ids[start:start + chunk_size]
+        wanted = compute_message_tokens(chunk)
+        existing = {}
+        for row_id, message_id, token in (
+            MailMessageToken.objects.filter(mail_message_id__in=chunk).values_list('id', 'mail_message_id', 'token')
+        ):
+            existing.setdefault(message_id, {})[token] = row_id
+
+        to_delete = []
+        to_create = []
+        for message_id in chunk:
+            current = existing.get(message_id, {})
+            tokens = wanted.get(message_id, set())  # ištrintas laiškas - žodžiai šalinami
+            to_delete.extend(row_id for token, row_id in current.items() if token not in tokens)
+            to_create.extend(
+                MailMessageToken(mail_message_id=message_id, token=token) for token in tokens if token not in current
+            )
+
+        if to_delete:
+            MailMessageToken.objects.filter(id__in=to_delete).delete()
+        if to_create:
+            MailMessageToken.objects.bulk_create(to_create, batch_size=1000, ignore_conflicts=True)
+        changed += len(to_delete) + len(to_create)
+    return changed
+
+
+def _flush_pending():
+    message_ids = getattr(_pending, 'message_ids', None)
+    _pending.message_ids = None
+    if not message_ids:
+        return
+    try:
+        reindex_messages(message_ids)
+    except Exception as e:
+        logger.error(f"Klaida atnaujinant laiškų numerių indeksą {sorted(message_ids)[:20]}: {e}", exc_info=True)
+
+
+def schedule_message_reindex(message_ids: Iterable[int]):
+    """Pažymėti laiškus indekso atnaujinimui po transakcijos commit (sujungiama per transakciją)"""
+    if not is_mail_match_index_enabled():
+        return
+    message_ids = {message_id for message_id in message_ids if message_id}
+    if not message_ids:
+        return
+    pending = getattr(_pending, 'message_ids', None)
+    if pending is None:
+        _pending.message_ids = pending = set()
+    pending.update(message_ids)
+    # Kaip ir užsakymų paieškos indekse - callback registruojamas kiekvieną kartą, įvykdomas tik pirmasis
+    transaction.on_commit(_flush_pending)
+
+
+def message_ids_with_token(number: str):
+    """Subquery: laiškų ID, kurių turinyje (ar prieduose) yra numeris"""
+    from apps.mail.models import MailMessageToken
+
+    return MailMessageToken.objects.filter(token=(number or '').strip().upper()).values('mail_message_id')
+
+
+def numbers_found_in_messages(model, field: str, messages) -> Set[str]:
+    """
+    Modelio numerio lauko (order_number / expedition_number) reikšmės (strip + upper),
+    kurios yra laiškų `messages` indekse. Vienas SELECT: kiekvienam numeriui - (token, laiškas) indekso paieška.
+    """
+    from django.db.models import Exists, OuterRef
+    from django.db.models.functions import Trim, Upper
+    from apps.mail.models import MailMessageToken
+
+    in_messages = MailMessageToken.objects.filter(
+        token=OuterRef('_match_number'),
+        mail_message__in=messages,
+    )
+    numbers = (
+        model.objects.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+        .annotate(_match_number=Upper(Trim(field)))
+        .filter(Exists(in_messages))
+        .values_list('_match_number', flat=True)
+    )
+    return {number for number in numbers if number}
@@ -0,0 +1,81 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+import re
+
+# apps.mail.match_index būsena migracijos metu (migracija nepriklauso nuo vėlesnių jo pakeitimų)
+TOKEN_MAX_LENGTH = 64
+CANDIDATE_PATTERN = re.compile(r'[A-Z0-9][A-Z0-9\-/]{2,}')
+HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+MESSAGE_DOCUMENT_FIELDS = ['subject', 'sender', 'recipients', 'cc', 'bcc', 'snippet', 'body_plain', 'body_html']
+CHUNK_SIZE = 500
+
+
+def tokenize(text):
+    if not text:
+        return set()
+    return {token for token in CANDIDATE_PATTERN.findall(text.upper()) if len(token) <= TOKEN_MAX_LENGTH}
+
+
+def fill_mail_message_tokens(apps, schema_editor):
+    """Užpildo laiškų numerių indeksą (vėliau palaikomas signal'ais)"""
+    MailMessage = apps.get_model('mail', 'MailMessage')
+    MailAttachment = apps.get_model('mail', 'MailAttachment')
+    MailMessageToken = apps.get_model('mail', 'MailMessageToken')
+
+    message_ids = list(MailMessage.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(message_ids), CHUNK_SIZE):
+        chunk = message_ids[start:start + CHUNK_SIZE]
+        tokens_by_message = {}
+        for row in MailMessage.objects.filter(pk__in=chunk).values_list('pk', *MESSAGE_DOCUMENT_FIELDS):
+            tokens = set()
+            *fields, body_html = row[1:]
+            for value in fields:
+                tokens.update(tokenize(value))
+            if body_html:
+                tokens.update(tokenize(HTML_TAG_PATTERN.sub(' ', body_html)))
+            tokens_by_message[row[0]] = tokens
+
+        for message_id, filename, ocr_processed, ocr_text in MailAttachment.objects.filter(
+            mail_message_id__in=chunk
+        ).values_list('mail_message_id', 'filename', 'ocr_processed', 'ocr_text'):
+            tokens = tokens_by_message.setdefault(message_id, set())
+            tokens.update(tokenize(filename))
+            if ocr_processed:
+                tokens.update(tokenize(ocr_text))
+
+        MailMessageToken.objects.bulk_create(
+            [
+                MailMessageToken(mail_message_id=message_id, token=token)
+                for message_id, tokens in tokens_by_message.items() for token in tokens
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mail', '0020_add_matches_computed_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailMessageToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64, verbose_name='Žodis')),
+                ('mail_message', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='match_tokens', to='mail.mailmessage', verbose_name='Laiškas')),
+            ],
+            options={
+                'verbose_name': 'Laiško numerio žodis',
+                'verbose_name_plural': 'Laiškų numerių žodžiai',
+                'db_table': 'mail_message_tokens',
+                'indexes': [models.Index(fields=['token', 'mail_message'], name='mail_message_token_idx')],
+                'unique_together': {('mail_message', 'token')},
+            },
+        ),
+        migrations.RunPython(fill_mail_message_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mail', '0021_mail_message_tokens'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailOcrJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Laukia'), ('running', 'Vykdoma'), ('done', 'Atlikta'), ('failed', 'Nepavyko')], default='pending', max_length=16, verbose_name='Būsena')),
+                ('priority', models.PositiveSmallIntegerField(default=10, help_text='Mažesnis - vykdoma anksčiau (0 - sąskaitos)', verbose_name='Prioritetas')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Bandymų skaičius')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Vykdyti nuo')),
+                ('locked_by', models.CharField(blank=True, max_length=128, verbose_name='Darbuotojas')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Pradėta')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Baigta')),
+                ('wait_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='Laukimas eilėje (ms)')),
+                ('duration_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='Apdorojimo trukmė (ms)')),
+                ('last_error', models.TextField(blank=True, verbose_name='Paskutinė klaida')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Sukurta')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atnaujinta')),
+                ('attachment', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ocr_job', to='mail.mailattachment', verbose_name='Priedas')),
+            ],
+            options={
+                'verbose_name': 'OCR darbas',
+                'verbose_name_plural': 'OCR darbų eilė',
+                'db_table': 'mail_ocr_jobs',
+                'ordering': ['priority', 'available_at', 'id'],
+                'indexes': [models.Index(fields=['status', 'priority', 'available_at'], name='mail_ocr_job_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mail', '0022_mail_ocr_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PdfTextExtraction',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True, verbose_name='Turinio SHA-256')),
+                ('text', models.TextField(blank=True, verbose_name='Tekstas')),
+                ('method', models.CharField(help_text='pdfplumber / ocr / pypdf2', max_length=16, verbose_name='Metodas')),
+                ('extractor_version', models.PositiveSmallIntegerField(default=1, verbose_name='Ištraukimo versija')),
+                ('duration_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='Ištraukimo trukmė (ms)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Sukurta')),
+            ],
+            options={
+                'verbose_name': 'PDF teksto ištraukimas',
+                'verbose_name_plural': 'PDF teksto ištraukimai',
+                'db_table': 'mail_pdf_text_extractions',
+            },
+        ),
+    ]
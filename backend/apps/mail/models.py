@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
@@ -242,6 +243,117 @@ class MailAttachment(models.Model):
         return self.filename
 
 
+class MailMessageToken(models.Model):
+    """
+    Laiškų numerių indeksas (inverted index): vienas įrašas - laiškas ir numerio kandidatas
+    (tema, adresai, turinys, priedų pavadinimai, OCR tekstas). Pildomas apps.mail.match_index.
+    """
+    mail_message = models.ForeignKey(
+        MailMessage,
+        related_name='match_tokens',
+        on_delete=models.CASCADE,
+        db_index=False,
+        verbose_name=_('Laiškas'),
+    )
+    token = models.CharField(max_length=64, verbose_name=_('Žodis'))
+
+    class Meta:
+        db_table = 'mail_message_tokens'
+        verbose_name = _('Laiško numerio žodis')
+        verbose_name_plural = _('Laiškų numerių žodžiai')
+        unique_together = [['mail_message', 'token']]
+        indexes = [
+            # Numerio paieška (token = X) - laiško id imamas iš indekso
+            models.Index(fields=['token', 'mail_message'], name='mail_message_token_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.mail_message_id}: {self.token}'
+
+
+class MailOcrJob(models.Model):
+    """
+    PDF priedo OCR darbas (eilė). Įrašas sukuriamas išsaugojus priedą, vykdo manage.py run_ocr_workers
+    (apps.mail.ocr_queue).
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', _('Laukia')
+        RUNNING = 'running', _('Vykdoma')
+        DONE = 'done', _('Atlikta')
+        FAILED = 'failed', _('Nepavyko')
+
+    # Mažesnis prioritetas vykdomas anksčiau
+    PRIORITY_INVOICE = 0
+    PRIORITY_DEFAULT = 10
+
+    attachment = models.OneToOneField(
+        MailAttachment,
+        related_name='ocr_job',
+        on_delete=models.CASCADE,
+        verbose_name=_('Priedas'),
+    )
+    status = models.CharField(
+        max_length=16,
+        choices=Status.choices,
+        default=Status.PENDING,
+        verbose_name=_('Būsena'),
+    )
+    priority = models.PositiveSmallIntegerField(
+        default=PRIORITY_DEFAULT,
+        verbose_name=_('Prioritetas'),
+        help_text=_('Mažesnis - vykdoma anksčiau (0 - sąskaitos)'),
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name=_('Bandymų skaičius'))
+    available_at = models.DateTimeField(default=timezone.now, verbose_name=_('Vykdyti nuo'))
+    locked_by = models.CharField(max_length=128, blank=True, verbose_name=_('Darbuotojas'))
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Pradėta'))
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Baigta'))
+    wait_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name=_('Laukimas eilėje (ms)'))
+    duration_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name=_('Apdorojimo trukmė (ms)'))
+    last_error = models.TextField(blank=True, verbose_name=_('Paskutinė klaida'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Sukurta'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Atnaujinta'))
+
+    class Meta:
+        db_table = 'mail_ocr_jobs'
+        verbose_name = _('OCR darbas')
+        verbose_name_plural = _('OCR darbų eilė')
+        ordering = ['priority', 'available_at', 'id']
+        indexes = [
+            # Eilės paėmimas: status = pending, pagal prioritetą ir laiką
+            models.Index(fields=['status', 'priority', 'available_at'], name='mail_ocr_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'OCR #{self.attachment_id} ({self.status})'
+
+
+class PdfTextExtraction(models.Model):
+    """
+    PDF teksto ištraukimo cache: vienas įrašas unikaliam failo turiniui (SHA-256),
+    bendras visiems priedams su tuo pačiu failu (apps.mail.pdf_text).
+    """
+    content_hash = models.CharField(max_length=64, unique=True, verbose_name=_('Turinio SHA-256'))
+    text = models.TextField(blank=True, verbose_name=_('Tekstas'))
+    method = models.CharField(
+        max_length=16,
+        verbose_name=_('Metodas'),
+        help_text=_('pdfplumber / ocr / pypdf2'),
+    )
+    extractor_version = models.PositiveSmallIntegerField(default=1, verbose_name=_('Ištraukimo versija'))
+    duration_ms = models.PositiveIntegerField(null=True, blank=True, verbose_name=_('Ištraukimo trukmė (ms)'))
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Sukurta'))
+
+    class Meta:
+        db_table = 'mail_pdf_text_extractions'
+        verbose_name = _('PDF teksto ištraukimas')
+        verbose_name_plural = _('PDF teksto ištraukimai')
+
+    def __str__(self):
+        return f'{self.content_hash[:12]} ({self.method}, v{self.extractor_version})'
+
+
 class MailTag(models.Model):
     name = models.CharField(max_length=100, unique=True, verbose_name=_('Žyma'))
     color = models.CharField(max_length=7, default='#6b7280', verbose_name=_('Spalva (HEX)'))
@@ -0,0 +1,359 @@
+"""
+PDF priedų OCR eilė (MailOcrJob) ir darbuotojų procesų pool'as.
+
+Anksčiau _start_ocr_for_attachment kiekvienam PDF priedui web procese paleisdavo naują giją: laiškų
+antplūdžio metu vienu metu veikdavo dešimtys Tesseract darbų (300 DPI), o perkrovus procesą
+nebaigti darbai dingdavo.
+
+Dabar:
+- priedas įrašomas į eilę (MailOcrJob) - darbas išlieka perkrovus,
+- darbus vykdo manage.py run_ocr_workers: fiksuoto dydžio procesų pool'as (MAIL_OCR_WORKERS),
+- sąskaitos (pagal priedo pavadinimą / laiško temą) vykdomos pirmiau už kitus dokumentus,
+- nepavykus - kartojama po MAIL_OCR_RETRY_BASE * 2^(bandymas-1) s., iki MAIL_OCR_MAX_ATTEMPTS kartų,
+- ilgiau nei MAIL_OCR_JOB_TIMEOUT trunkantis darbas nutraukiamas (pool'as perkuriamas),
+- kiekvienam darbui įrašomas laukimo eilėje ir apdorojimo laikas (wait_ms, duration_ms),
+- ištrauktas tekstas saugomas pagal failo hash'ą (apps.mail.pdf_text) - tas pats failas OCR'inamas vieną kartą.
+"""
+
+import logging
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+
+from .models import MailAttachment, MailOcrJob
+from .ocr_worker import extract_text, init_worker
+from .pdf_text import attachment_content_hash, cached_pdf_text, store_pdf_text
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def is_ocr_queue_enabled() -> bool:
+    return _setting('MAIL_OCR_QUEUE_ENABLED', True)
+
+
+def get_worker_count() -> int:
+    configured = _setting('MAIL_OCR_WORKERS', 0)
+    if configured:
+        return max(1, configured)
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - ne Linux
+        cores = os.cpu_count() or 1
+    # Tesseract pats naudoja kelias gijas - pusė branduolių palieka vietos kitiems procesams
+    return max(1, cores // 2)
+
+
+def job_priority(attachment: MailAttachment) -> int:
+    """Sąskaitos - pirmiausia (atpažįstama pagal priedo pavadinimą ir laiško temą)"""
+    from apps.invoices.ocr_utils import InvoiceDataExtractor
+
+    subject = attachment.mail_message.subject if attachment.mail_message_id else ''
+    if InvoiceDataExtractor.detect_document_type(f'{attachment.filename or ""} {subject or ""}') == 'invoice':
+        return MailOcrJob.PRIORITY_INVOICE
+    return MailOcrJob.PRIORITY_DEFAULT
+
+
+def enqueue_attachment(attachment: MailAttachment, requeue: bool = False) -> MailOcrJob:
+    """
+    Įrašyti priedą į OCR eilę. Jau esantis darbas nekeičiamas, nebent requeue=True
+    (tada baigtas / nepavykęs darbas grąžinamas į eilę su nauju bandymų skaičiumi).
+    """
+    job, created = MailOcrJob.objects.get_or_create(
+        attachment=attachment,
+        defaults={'priority': job_priority(attachment)},
+    )
+    if not created and requeue and job.status != MailOcrJob.Status.RUNNING:
+        job.status = MailOcrJob.Status.PENDING
+        job.attempts = 0
+        job.available_at = timezone.now()
+        job.last_error = ''
+        job.save(update_fields=['status', 'attempts', 'available_at', 'last_error', 'updated_at'])
+    return job
+
+
+def claim_jobs(limit: int, worker: str) -> List[MailOcrJob]:
+    """
+    Paimti iki `limit` vykdytinų darbų (prioriteto, tada laiko tvarka).
+    Sąlyginis UPDATE (status = pending) - kelių run_ocr_workers procesų atveju darbą gauna tik vienas.
+    """
+    if limit <= 0:
+        return []
+
+    now = timezone.now()
+    candidate_ids = list(
+        MailOcrJob.objects.filter(status=MailOcrJob.Status.PENDING, available_at__lte=now)
+        .order_by('priority', 'available_at', 'id')
+        .values_list('id', flat=True)[:limit * 2]
+    )
+    claimed = []
+    for job_id in candidate_ids:
+        if len(claimed) >= limit:
+            break
+        updated = MailOcrJob.objects.filter(pk=job_id, status=MailOcrJob.Status.PENDING).update(
+            status=MailOcrJob.Status.RUNNING,
+            locked_by=worker,
+            started_at=now,
+            attempts=F('attempts') + 1,
+            updated_at=now,
+        )
+        if updated:
+            claimed.append(job_id)
+
+    return list(
+        MailOcrJob.objects.filter(pk__in=claimed)
+        .select_related('attachment')
+        .order_by('priority', 'available_at', 'id')
+    )
+
+
+def requeue_stale_jobs() -> int:
+    """Darbai, kurių darbuotojas dingo (procesas nužudytas) - grąžinami į eilę"""
+    now = timezone.now()
+    cutoff = now - timedelta(seconds=max(60, _setting('MAIL_OCR_JOB_TIMEOUT', 300)) * 2)
+    return MailOcrJob.objects.filter(status=MailOcrJob.Status.RUNNING, started_at__lt=cutoff).update(
+        status=MailOcrJob.Status.PENDING,
+        available_at=now,
+        locked_by='',
+        last_error='Darbuotojas nebaigė darbo (procesas sustabdytas?)',
+        updated_at=now,
+    )
+
+
+def release_jobs(job_ids, worker: str) -> int:
+    """Nepradėti / nutraukti darbai grąžinami į eilę (bandymas neįskaičiuojamas)"""
+    now = timezone.now()
+    return MailOcrJob.objects.filter(pk__in=list(job_ids), status=MailOcrJob.Status.RUNNING, locked_by=worker).update(
+        status=MailOcrJob.Status.PENDING,
+        attempts=F('attempts') - 1,
+        available_at=now,
+        locked_by='',
+        updated_at=now,
+    )
+
+
+def _elapsed_ms(start, end) -> Optional[int]:
+    if not start or not end:
+        return None
+    return max(0, int((end - start).total_seconds() * 1000))
+
+
+def complete_job(job: MailOcrJob, text: str, duration_ms: int):
+    """Išsaugoti OCR tekstą priede ir perskaičiuoti laiško sutapimus"""
+    from .services import _check_auto_match
+
+    now = timezone.now()
+    attachment = MailAttachment.objects.filter(pk=job.attachment_id).select_related('mail_message').first()
+    if attachment is None:
+        return  # Priedas ištrintas (pvz. laiškas sinchronizuotas iš naujo) - darbas ištrintas kartu
+
+    attachment.ocr_text = text or ''
+    attachment.ocr_processed = True
+    attachment.ocr_processed_at = now
+    attachment.ocr_error = None
+    attachment.save(update_fields=['ocr_text', 'ocr_processed', 'ocr_processed_at', 'ocr_error'])
+
+    wait_ms = _elapsed_ms(job.available_at, job.started_at)
+    MailOcrJob.objects.filter(pk=job.pk).update(
+        status=MailOcrJob.Status.DONE,
+        finished_at=now,
+        wait_ms=wait_ms,
+        duration_ms=duration_ms,
+        locked_by='',
+        last_error='',
+        updated_at=now,
+    )
+    logger.info(
+        f'OCR baigtas: {attachment.filename} ({len(attachment.ocr_text)} simbolių, '
+        f'laukė {wait_ms} ms, truko {duration_ms} ms, bandymas {job.attempts})'
+    )
+
+    # Automatiškai patikrinti ar galima susieti laišką
+    _check_auto_match(attachment.mail_message)
+
+
+def fail_job(job: MailOcrJob, error) -> bool:
+    """
+    Nepavykęs bandymas: atidėti pakartojimui arba (viršijus MAIL_OCR_MAX_ATTEMPTS) pažymėti nepavykusiu.
+
+    Returns:
+        True - darbas bus kartojamas
+    """
+    now = timezone.now()
+    message = str(error) or type(error).__name__
+    max_attempts = max(1, _setting('MAIL_OCR_MAX_ATTEMPTS', 3))
+    retry = job.attempts < max_attempts
+    fields = {
+        'locked_by': '',
+        'last_error': message,
+        'duration_ms': _elapsed_ms(job.started_at, now),
+        'updated_at': now,
+    }
+    if retry:
+        delay = _setting('MAIL_OCR_RETRY_BASE', 60) * 2 ** max(0, job.attempts - 1)
+        fields.update(status=MailOcrJob.Status.PENDING, available_at=now + timedelta(seconds=delay))
+        logger.warning(f'OCR klaida (priedas {job.attachment_id}, bandymas {job.attempts}, kartojama po {delay} s.): '
+                       f'{message}')
+    else:
+        fields.update(status=MailOcrJob.Status.FAILED, finished_at=now)
+        MailAttachment.objects.filter(pk=job.attachment_id).update(ocr_error=message)
+        logger.error(f'OCR klaida (priedas {job.attachment_id}, bandymų limitas išnaudotas): {message}')
+    MailOcrJob.objects.filter(pk=job.pk).update(**fields)
+    return retry
+
+
+def _new_executor(workers: int) -> ProcessPoolExecutor:
+    # spawn - be užrakintų gijų ir DB jungčių kopijų po fork'o
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_worker,
+    )
+
+
+def _terminate_executor(executor: ProcessPoolExecutor):
+    """Sustabdyti pool'ą neužstrigus ties kabančiu Tesseract procesu"""
+    processes = list((getattr(executor, '_processes', None) or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+def run_ocr_workers(stop_event: Optional[threading.Event] = None, once: bool = False,
+                    workers: Optional[int] = None) -> dict:
+    """
+    Vykdyti OCR eilę procesų pool'e (blokuoja, kol nustatomas stop_event).
+    Vienu metu vykdoma ne daugiau kaip `workers` darbų - laisvas procesas iškart gauna kitą darbą.
+
+    once=True - apdoroti šiuo metu vykdytinus darbus ir baigti (atidėti pakartojimai nelaukiami).
+    """
+    stop_event = stop_event or threading.Event()
+    workers = workers or get_worker_count()
+    poll_interval = max(1, _setting('MAIL_OCR_POLL_INTERVAL', 5))
+    job_timeout = max(10, _setting('MAIL_OCR_JOB_TIMEOUT', 300))
+    worker = f'{socket.gethostname()}:{os.getpid()}'
+    stats = {'done': 0, 'retried': 0, 'failed': 0}
+
+    executor = _new_executor(workers)
+    in_flight = {}  # future -> (MailOcrJob, pateikimo laikas)
+    last_stale_check = 0.0
+    logger.info(f'OCR darbuotojai paleisti: {workers} procesai ({worker})')
+
+    def record_failure(job, error):
+        if fail_job(job, error):
+            stats['retried'] += 1
+        else:
+            stats['failed'] += 1
+
+    try:
+        while not stop_event.is_set():
+            close_old_connections()
+            if time.monotonic() - last_stale_check > 60:
+                last_stale_check = time.monotonic()
+                stale = requeue_stale_jobs()
+                if stale:
+                    logger.warning(f'Į OCR eilę grąžinta {stale} nebaigtų darbų')
+
+            for job in claim_jobs(workers - len(in_flight), worker):
+                # Tas pats failas jau apdorotas (pvz. persiųsta sąskaita) - tekstas iš cache, be OCR
+                cached_text = cached_pdf_text(job.attachment)
+                if cached_text is not None:
+                    try:
+                        complete_job(job, cached_text, 0)
+                        stats['done'] += 1
+                    except Exception as e:
+                        logger.error(f'Klaida išsaugant OCR rezultatą (priedas {job.attachment_id}): {e}', exc_info=True)
+                        record_failure(job, e)
+                    continue
+                in_flight[executor.submit(extract_text, job.attachment)] = (job, time.monotonic())
+
+            if not in_flight:
+                if once:
+                    break
+                stop_event.wait(poll_interval)
+                continue
+
+            done, _ = wait(list(in_flight), timeout=1, return_when=FIRST_COMPLETED)
+            broken = []  # (pateikimo laikas, darbas, klaida)
+            for future in done:
+                job, submitted = in_flight.pop(future)
+                try:
+                    text, method, duration_ms = future.result()
+                except BrokenProcessPool as e:
+                    # Procesas nukrito (pvz. trūko atminties) - BrokenProcessPool gauna visi pool'o darbai
+                    broken.append((submitted, job, e))
+                    continue
+                except Exception as e:
+                    record_failure(job, e)
+                    continue
+                try:
+                    store_pdf_text(attachment_content_hash(job.attachment), text, method, duration_ms)
+                    complete_job(job, text, duration_ms)
+                    stats['done'] += 1
+                except Exception as e:
+                    logger.error(f'Klaida išsaugant OCR rezultatą (priedas {job.attachment_id}): {e}', exc_info=True)
+                    record_failure(job, e)
+
+            now = time.monotonic()
+            expired = [future for future, (_, submitted) in in_flight.items() if now - submitted > job_timeout]
+            if broken:
+                # Bandymas įskaitomas tik ilgiausiai vykdytam darbui (greičiausiai jis ir nuvertė procesą),
+                # kiti grąžinami į eilę nepadidinus bandymų skaičiaus
+                broken.sort(key=lambda item: item[0])
+                _, job, error = broken[0]
+                record_failure(job, error)
+                release_jobs([job.pk for _, job, _ in broken[1:]], worker)
+            if expired or broken:
+                # Procesų pool'as neleidžia nutraukti vieno darbo - perkuriamas, kiti darbai grąžinami į eilę
+                for future in expired:
+                    job, _ = in_flight.pop(future)
+                    record_failure(job, TimeoutError(f'OCR truko ilgiau nei {job_timeout} s.'))
+                release_jobs((job.pk for job, _ in in_flight.values()), worker)
+                in_flight.clear()
+                _terminate_executor(executor)
+                executor = _new_executor(workers)
+    finally:
+        if in_flight:
+            try:
+                release_jobs((job.pk for job, _ in in_flight.values()), worker)
+            except Exception:
+                logger.exception('Nepavyko grąžinti nebaigtų OCR darbų į eilę')
+        _terminate_executor(executor)
+        close_old_connections()
+
+    logger.info(f"OCR darbuotojai sustabdyti: {stats['done']} atlikta, {stats['retried']} kartojama, "
+                f"{stats['failed']} nepavyko")
+    return stats
+
+
+def queue_stats(since=None) -> dict:
+    """Eilės būsena ir laikai (atliktiems darbams nuo `since`)"""
+    from django.db.models import Avg, Count, Max
+
+    counts = dict(MailOcrJob.objects.order_by().values_list('status').annotate(count=Count('id')).values_list('status', 'count'))
+    done = MailOcrJob.objects.filter(status=MailOcrJob.Status.DONE)
+    if since is not None:
+        done = done.filter(finished_at__gte=since)
+    timings = done.aggregate(
+        jobs=Count('id'),
+        avg_wait_ms=Avg('wait_ms'),
+        max_wait_ms=Max('wait_ms'),
+        avg_duration_ms=Avg('duration_ms'),
+        max_duration_ms=Max('duration_ms'),
+    )
+    return {'counts': counts, 'timings': timings}
@@ -0,0 +1,24 @@
+"""
+OCR darbuotojo proceso funkcijos (apps.mail.ocr_queue procesų pool'as).
+
+Atskiras modulis be modelių importų: spawn procesas jį importuoja prieš django.setup().
+"""
+
+import os
+import time
+
+
+def init_worker():
+    """Darbuotojo proceso paruošimas: be foninių gijų (tik teksto ištraukimas, DB nenaudojama)"""
+    os.environ['DISABLE_MAIL_SYNC_SCHEDULER'] = '1'
+    import django
+    django.setup()
+
+
+def extract_text(attachment):
+    """PDF tekstas (pdfplumber / Tesseract / PyPDF2): (tekstas, metodas, trukmė ms)"""
+    from apps.mail.mail_matching_helper_NEW import _extract_pdf_text_with_method
+
+    started = time.monotonic()
+    text, method = _extract_pdf_text_with_method(attachment)
+    return text, method, int((time.monotonic() - started) * 1000)
@@ -0,0 +1,137 @@
+"""
+PDF teksto ištraukimo cache pagal failo turinio hash'ą (PdfTextExtraction).
+
+Anksčiau _collect_text_chunks kiekvienam priedui be ocr_text kviesdavo _extract_pdf_text (pdfplumber,
+pdf2image 300 DPI + Tesseract, PyPDF2) ir dar kartą tą patį per process_pdf_attachment - kiekvieną
+kartą, kai perskaičiuojami laiško sutapimai (pvz. update_matches_for_order - iki 200 laiškų).
+
+Dabar:
+- priedo turinio SHA-256 apskaičiuojamas išsaugant priedą (MailAttachment.metadata['content_sha256']),
+- tekstas ištraukiamas vieną kartą unikaliam failui (OCR eilėje, apps.mail.ocr_queue) ir saugomas
+  su metodu ir EXTRACTOR_VERSION,
+- sutapimų paieška tekstą tik skaito (cached_pdf_texts); dar neištrauktas PDF įrašomas į OCR eilę,
+  o po OCR sutapimai perskaičiuojami (_check_auto_match).
+
+Pakeitus ištraukimo logiką - padidinti EXTRACTOR_VERSION: senesni įrašai laikomi nebegaliojančiais.
+"""
+
+import hashlib
+import logging
+from typing import Dict, Iterable, Optional
+
+from .models import MailAttachment, PdfTextExtraction
+
+logger = logging.getLogger(__name__)
+
+EXTRACTOR_VERSION = 1
+
+
+def is_pdf_attachment(attachment: MailAttachment) -> bool:
+    filename = (attachment.filename or '').lower()
+    content_type = (attachment.content_type or '').lower()
+    return filename.endswith('.pdf') or 'pdf' in content_type
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def attachment_content_hash(attachment: MailAttachment) -> Optional[str]:
+    """Priedo turinio SHA-256: iš metadata, kitaip - perskaičius failą (ir įrašius į metadata)"""
+    metadata = attachment.metadata or {}
+    if metadata.get('content_sha256'):
+        return metadata['content_sha256']
+    if not attachment.file:
+        return None
+
+    digest = hashlib.sha256()
+    try:
+        with attachment.file.open('rb') as attachment_file:
+            for chunk in iter(lambda: attachment_file.read(1024 * 1024), b''):
+                digest.update(chunk)
+    except (OSError, ValueError) as e:
+        logger.debug(f'Nepavyko perskaityti priedo {attachment.id} failo: {e}')
+        return None
+
+    metadata = dict(metadata, content_sha256=digest.hexdigest())
+    attachment.metadata = metadata
+    if attachment.pk:
+        # UPDATE be signalų - hash'as nekeičia laiško turinio
+        MailAttachment.objects.filter(pk=attachment.pk).update(metadata=metadata)
+    return metadata['content_sha256']
+
+
+def cached_pdf_texts(attachments: Iterable[MailAttachment]) -> Dict[int, str]:
+    """
+    Ištrauktas PDF priedų tekstas iš cache (viena užklausa), be PDF / OCR darbo.
+    Priedų, kurių tekstas dar neištrauktas, rezultate nėra.
+    """
+    hashes = {}
+    for attachment in attachments:
+        if attachment.id and is_pdf_attachment(attachment):
+            attachment_hash = attachment_content_hash(attachment)
+            if attachment_hash:
+                hashes[attachment.id] = attachment_hash
+    if not hashes:
+        return {}
+
+    texts = dict(
+        PdfTextExtraction.objects.filter(
+            content_hash__in=set(hashes.values()),
+            extractor_version=EXTRACTOR_VERSION,
+        ).values_list('content_hash', 'text')
+    )
+    return {attachment_id: texts[attachment_hash] for attachment_id, attachment_hash in hashes.items()
+            if attachment_hash in texts}
+
+
+def cached_pdf_text(attachment: MailAttachment) -> Optional[str]:
+    return cached_pdf_texts([attachment]).get(attachment.id)
+
+
+def store_pdf_text(attachment_hash: Optional[str], text: str, method: str, duration_ms: Optional[int] = None):
+    """Įrašyti ištrauktą tekstą į cache (tuščias rezultatas nesaugomas - pvz. neįdiegtas Tesseract)"""
+    if not attachment_hash or not (text or '').strip():
+        return
+    PdfTextExtraction.objects.update_or_create(
+        content_hash=attachment_hash,
+        defaults={
+            'text': text,
+            'method': method or '',
+            'extractor_version': EXTRACTOR_VERSION,
+            'duration_ms': duration_ms,
+        },
+    )
+
+
+def get_or_extract_pdf_text(attachment: MailAttachment) -> str:
+    """
+    Tekstas iš cache arba ištraukiamas (pdfplumber / OCR / PyPDF2) ir įrašomas į cache.
+    Sunkus darbas - naudoti tik foniniuose darbuose.
+    """
+    from .mail_matching_helper_NEW import _extract_pdf_text_with_method
+
+    if not is_pdf_attachment(attachment):
+        return ''
+    text = cached_pdf_text(attachment)
+    if text is not None:
+        return text
+
+    text, method = _extract_pdf_text_with_method(attachment)
+    store_pdf_text(attachment_content_hash(attachment), text, method)
+    return text
+
+
+def queue_pdf_extraction(attachment: MailAttachment):
+    """
+    Neištrauktą PDF priedą (be ocr_text ir be cache įrašo) įrašyti į OCR eilę, jei dar neįrašytas ir eilė įjungta.
+    ocr_processed nežiūrimas: senoji OCR gija žymėdavo priedą apdorotu, bet teksto neišsaugodavo.
+    """
+    from .ocr_queue import enqueue_attachment, is_ocr_queue_enabled
+
+    if (attachment.ocr_text or '').strip() or not is_pdf_attachment(attachment) or not is_ocr_queue_enabled():
+        return
+    try:
+        enqueue_attachment(attachment)
+    except Exception as e:
+        logger.warning(f'Nepavyko įrašyti priedo {attachment.filename} į OCR eilę: {e}')
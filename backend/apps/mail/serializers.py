@@ -347,12 +347,24 @@ class MailMessageSerializer(serializers.ModelSerializer):
         return decode_address_list(obj.sender or '')
 
     def get_ocr_results(self, obj: MailMessage) -> dict:
-        """Grąžina OCR rezultatus iš PDF priedų."""
+        """
+        Grąžina OCR rezultatus iš PDF priedų: tik jau ištrauktam tekstui (ocr_text / PDF teksto cache),
+        PDF ir OCR darbas užklausos metu nevykdomas.
+        """
+        from apps.mail.pdf_text import cached_pdf_texts
+
         results = {}
-        for attachment in obj.attachments.filter(filename__endswith='.pdf'):
+        attachments = list(obj.attachments.filter(filename__endswith='.pdf'))
+        cached_texts = cached_pdf_texts(
+            attachment for attachment in attachments if not (attachment.ocr_text or '').strip()
+        )
+        for attachment in attachments:
+            text = (attachment.ocr_text or '').strip() or cached_texts.get(attachment.id)
+            if not text:
+                continue  # Tekstas dar neištrauktas (OCR eilėje)
             try:
                 from apps.invoices.ocr_utils import process_pdf_attachment
-                ocr_result = process_pdf_attachment(attachment)
+                ocr_result = process_pdf_attachment(attachment, text=text)
                 if ocr_result['success']:
                     results[attachment.filename] = {
                         'document_type': ocr_result.get('document_type'),
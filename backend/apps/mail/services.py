@@ -2,8 +2,10 @@ import email
 import logging
 import os
 import shutil
+import socket
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime, timezone
 from email.header import decode_header, make_header
 from typing import List, Optional
@@ -11,7 +13,9 @@ from typing import List, Optional
 import imaplib
 from django.conf import settings
 from django.core.files.base import ContentFile
-from django.db import close_old_connections
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat
 from django.db.utils import OperationalError, ProgrammingError
 from django.utils import timezone as dj_timezone
 
@@ -25,7 +29,18 @@ from .models import MailAttachment, MailMessage, MailMessageTag, MailSender, Mai
 from apps.orders.models import Order, OrderCarrier
 from apps.partners.models import Contact
 from .bounce_handler import process_bounce_emails
+from .imap_fetch import (
+    SUMMARY_ITEMS,
+    build_message,
+    parse_fetch_response,
+    section_fetch_items,
+    summarize,
+    uid_set,
+)
 from .mail_matching_helper_NEW import update_message_matches
+from .match_index import schedule_message_reindex
+from .ocr_queue import enqueue_attachment, is_ocr_queue_enabled
+from .pdf_text import content_hash
 from .utils import extract_email_from_sender, normalize_email
 
 logger = logging.getLogger(__name__)
@@ -78,12 +93,15 @@ class ImapClient:
         except OSError as exc:
             raise ImapSyncError(f'IMAP ryšio klaida: {exc}') from exc
 
-    def select_folder(self, folder: str):
+    def select_folder(self, folder: str) -> Optional[str]:
         if not self.client:
             raise ImapSyncError('IMAP klientas neprisijungęs.')
         status, _ = self.client.select(folder, readonly=False)
         if status != 'OK':
             raise ImapSyncError(f'Aplankas „{folder}“ neprieinamas.')
+        # UIDVALIDITY (SELECT atsakymo kodas) - pasikeitus, aplanko UID kursorius nebegalioja
+        _, data = self.client.response('UIDVALIDITY')
+        return data[-1].decode(errors='ignore') if data and data[-1] else None
 
     def fetch_uids_since(self, last_uid: Optional[int], limit: int = 50) -> List[int]:
         if not self.client:
@@ -116,6 +134,89 @@ class ImapClient:
             raise ImapSyncError(f'Nepavyko gauti laiško (UID {uid}).')
         return data[0]
 
+    def fetch_summaries(self, uids: List[int]) -> dict:
+        """Vienu UID FETCH: FLAGS, dydis, BODYSTRUCTURE ir antraštės visam UID paketui"""
+        if not self.client:
+            raise ImapSyncError('IMAP klientas neprisijungęs.')
+
+        status, data = self.client.uid('fetch', uid_set(uids), SUMMARY_ITEMS)
+        if status != 'OK':
+            raise ImapSyncError(f'Nepavyko gauti laiškų struktūros (UID {uid_set(uids)}).')
+        return parse_fetch_response(data)
+
+    def fetch_sections(self, uids: List[int], sections: Optional[List[str]]) -> dict:
+        """Vienu UID FETCH: nurodytos dalys (None - visas laiškas) laiškams su vienoda struktūra"""
+        if not self.client:
+            raise ImapSyncError('IMAP klientas neprisijungęs.')
+
+        status, data = self.client.uid('fetch', uid_set(uids), section_fetch_items(sections))
+        if status != 'OK':
+            raise ImapSyncError(f'Nepavyko gauti laiškų turinio (UID {uid_set(uids)}).')
+        return parse_fetch_response(data)
+
+    def supports_idle(self) -> bool:
+        return bool(self.client) and 'IDLE' in getattr(self.client, 'capabilities', ())
+
+    def idle(self, timeout: float) -> bool:
+        """
+        IMAP IDLE (RFC 2177): laukia, kol serveris praneš apie naujus laiškus (EXISTS), ne ilgiau kaip timeout sek.
+
+        True - gautas pranešimas, ryšys toliau naudojamas. False - laikas baigėsi; ryšys uždaromas
+        (imaplib failas po socket timeout nebeskaitomas), kitam laukimui jungiamasi iš naujo.
+        """
+        if not self.client:
+            raise ImapSyncError('IMAP klientas neprisijungęs.')
+
+        client = self.client
+        tag = client._new_tag()
+        try:
+            client.send(tag + b' IDLE\r\n')
+            client.sock.settimeout(timeout)
+            line = client.readline()
+            if not line.startswith(b'+'):
+                raise ImapSyncError(f'Serveris atmetė IDLE: {line.strip()!r}')
+            while True:
+                line = client.readline()
+                if not line:
+                    raise ImapSyncError('IMAP ryšys nutrūko laukiant laiškų (IDLE).')
+                if line.startswith(b'*') and line.rstrip().upper().endswith((b'EXISTS', b'RECENT')):
+                    break
+            client.sock.settimeout(None)
+            client.send(b'DONE\r\n')
+            while True:
+                line = client.readline()
+                if not line:
+                    raise ImapSyncError('IMAP ryšys nutrūko baigiant IDLE.')
+                if line.startswith(tag):
+                    return True
+        except TimeoutError:
+            self._drop()
+            return False
+        except (OSError, imaplib.IMAP4.error) as exc:
+            self._drop()
+            raise ImapSyncError(f'IMAP IDLE klaida: {exc}') from exc
+        except ImapSyncError:
+            self._drop()
+            raise
+
+    def interrupt(self):
+        """Nutraukti laukimą (IDLE) iš kitos gijos - servisas stabdomas"""
+        client = self.client
+        if client is not None:
+            try:
+                client.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+    def _drop(self):
+        if self.client:
+            try:
+                self.client.shutdown()
+            except Exception:
+                logger.debug('Nepavyko uždaryti IMAP ryšio', exc_info=True)
+            finally:
+                self.client = None
+
     def logout(self):
         if self.client:
             try:
@@ -212,20 +313,22 @@ def _add_sender_email_to_client(mail_message: MailMessage, order: Order):
         logger.warning(f'Nepavyko pridėti kontakto iš el. laiško: {e}')
 
 
-def _classify_as_promotional(mail_message: MailMessage) -> bool:
+def _classify_as_promotional(mail_message: MailMessage, check_contact: bool = True) -> bool:
     """
     Klasifikuoja laišką kaip reklaminį pagal kelis kriterijus:
     1. Jei siuntėjas yra patikimas (trusted), laiškas nėra reklaminis
     2. Siuntėjo email domenas (noreply, marketing, newsletter, ir kt.)
     3. Subject eilutė su reklaminiais žodžiais
     4. HTML turinyje yra unsubscribe/opt-out nuorodos
+
+    check_contact=False - kontaktas jau patikrintas kviečiančiojo (paketinė sinchronizacija).
     """
     import re
     from apps.partners.models import Contact
 
     # 0. Patikrinti ar siuntėjas yra trusted - jei taip, tai nėra reklaminis
     try:
-        contact = Contact.objects.filter(email__iexact=mail_message.sender_email).first()
+        contact = Contact.objects.filter(email__iexact=mail_message.sender_email).first() if check_contact else None
         if contact and contact.is_trusted and not contact.is_advertising:
             return False
     except Exception:
@@ -299,23 +402,32 @@ def _auto_match_and_add_contacts(mail_message: MailMessage):
 
 
 def _start_ocr_for_attachment(attachment: MailAttachment):
-    """Paleidžia OCR procesą naujam PDF attachment'ui asinchroniškai."""
-    if attachment.ocr_processed:
-        return  # Jau apdorota
+    """
+    Paleidžia OCR procesą naujam PDF attachment'ui asinchroniškai.
+    MAIL_OCR_QUEUE_ENABLED - įrašoma į OCR eilę (vykdo manage.py run_ocr_workers), kitaip - atskira gija.
+    """
+    if (attachment.ocr_text or '').strip():
+        return  # Tekstas jau išsaugotas
+
+    if is_ocr_queue_enabled():
+        try:
+            enqueue_attachment(attachment)
+        except Exception as e:
+            logger.error(f'Nepavyko įrašyti priedo {attachment.filename} į OCR eilę: {e}')
+        return
 
     def ocr_worker():
         """OCR darbo funkcija kuri veikia atskirame thread'e."""
         try:
-            from apps.invoices.ocr_utils import process_pdf_attachment
+            from .pdf_text import get_or_extract_pdf_text
 
             logger.info(f'Pradedamas OCR apdorojimas: {attachment.filename}')
-            ocr_result = process_pdf_attachment(attachment)
-
-            # Išsaugoti rezultatus
-            attachment.ocr_text = ocr_result.get('text', '')
+            # Tekstas ištraukiamas per cache (kaip OCR eilėje) - sutapimų paieška jį skaito iš ocr_text / cache
+            attachment.ocr_text = get_or_extract_pdf_text(attachment)
             attachment.ocr_processed = True
             attachment.ocr_processed_at = dj_timezone.now()
-            attachment.save()
+            attachment.ocr_error = None
+            attachment.save(update_fields=['ocr_text', 'ocr_processed', 'ocr_processed_at', 'ocr_error'])
 
             logger.info(f'OCR baigtas: {attachment.filename} ({len(attachment.ocr_text or "")} simbolių)')
 
@@ -535,6 +647,8 @@ def _save_attachments(message: email.message.Message, mail_message: MailMessage)
                 filename=filename,
                 content_type=content_type,
                 size=size,
+                # PDF teksto cache raktas (apps.mail.pdf_text) - be pakartotinio failo skaitymo
+                metadata={'content_sha256': content_hash(payload)},
             )
             attachment.file.save(filename, ContentFile(payload), save=True)
             saved_count += 1
@@ -553,121 +667,445 @@ def _save_attachments(message: email.message.Message, mail_message: MailMessage)
         logger.info(f'Išsaugota {saved_count} priedų laiško {mail_message.id} (subject: {mail_message.subject[:50]})')
 
 
-def sync_imap(limit: int = 50) -> dict:
-    """Sinchronizuoja naujus laiškus iš IMAP pagal NotificationSettings."""
-    config = NotificationSettings.load()
-    if not config.imap_enabled:
-        return {'status': 'disabled', 'message': 'IMAP sinchronizacija išjungta'}
+def _message_defaults(email_message: email.message.Message, folder: str, flags: str = '') -> dict:
+    """MailMessage laukai iš laiško antraščių ir turinio"""
+    subject = decode_header_value(email_message.get('Subject'))
+    sender = _extract_addresses(email_message.get('From') or '')
+    recipients = _extract_addresses(email_message.get('To') or '')
+    cc = _extract_addresses(email_message.get('Cc') or '')
+    bcc = _extract_addresses(email_message.get('Bcc') or '')
+    message_id = email_message.get('Message-ID', '')
 
-    client = ImapClient(config)
-    folder = config.imap_folder or 'INBOX'
-    sync_state, _ = MailSyncState.objects.get_or_create(folder=folder)
+    date_header = email_message.get('Date')
+    parsed_date = None
+    if date_header:
+        try:
+            parsed_date = email.utils.parsedate_to_datetime(date_header)
+            if parsed_date and parsed_date.tzinfo is None:
+                parsed_date = parsed_date.replace(tzinfo=timezone.utc)
+        except (TypeError, ValueError):
+            parsed_date = None
+    if not parsed_date:
+        parsed_date = dj_timezone.now()
+
+    body_plain, body_html = _extract_body(email_message)
+
+    snippet = body_plain[:280] if body_plain else body_html[:280]
+
+    return {
+        'message_id': message_id or '',
+        'subject': subject,
+        'sender': sender,
+        'recipients': recipients,
+        'cc': cc,
+        'bcc': bcc,
+        'date': parsed_date,
+        'folder': folder,
+        'snippet': snippet,
+        'body_plain': body_plain,
+        'body_html': body_html,
+        'flags': flags,
+        'sender_email': normalize_email(extract_email_from_sender(sender)),
+    }
+
+
+def _delete_attachments(attachments):
+    """Ištrina priedus kartu su failais (pakartotinai sinchronizuojant laišką)"""
+    attachments = list(attachments)
+    for attachment in attachments:
+        try:
+            if attachment.file:
+                storage = attachment.file.storage
+                if storage.exists(attachment.file.name):
+                    storage.delete(attachment.file.name)
+        except Exception:
+            logger.warning('Nepavyko ištrinti seno priedo failo', exc_info=True)
+    if attachments:
+        MailAttachment.objects.filter(pk__in=[attachment.pk for attachment in attachments]).delete()
+
+
+def _process_synced_message(email_message: email.message.Message, mail_message: MailMessage):
+    """Priedai, atitiktys ir kontaktai ką tik įrašytam laiškui"""
+    _save_attachments(email_message, mail_message)
 
     try:
-        client.connect()
-        client.select_folder(folder)
-        last_uid = int(sync_state.last_uid) if sync_state.last_uid and sync_state.last_uid.isdigit() else None
-        new_uids = client.fetch_uids_since(last_uid, limit=limit)
+        update_message_matches(mail_message)
+    except Exception as e:
+        logger.warning(f'Nepavyko atnaujinti laiško {mail_message.id} atitikčių: {e}')
 
-        synced_messages = []
-        for uid in new_uids:
-            raw_response = client.fetch_message(uid)
-            raw_email = raw_response[1]
-            email_message = email.message_from_bytes(raw_email)
+    # Automatiškai pridedame kontaktą, jei galime
+    try:
+        _auto_match_and_add_contacts(mail_message)
+    except Exception as e:
+        logger.warning(f'Nepavyko automatiškai suderinti laiško {mail_message.id}: {e}')
 
-            subject = decode_header_value(email_message.get('Subject'))
-            sender = _extract_addresses(email_message.get('From') or '')
-            recipients = _extract_addresses(email_message.get('To') or '')
-            cc = _extract_addresses(email_message.get('Cc') or '')
-            bcc = _extract_addresses(email_message.get('Bcc') or '')
-            message_id = email_message.get('Message-ID', '')
 
-            date_header = email_message.get('Date')
-            parsed_date = None
-            if date_header:
-                try:
-                    parsed_date = email.utils.parsedate_to_datetime(date_header)
-                    if parsed_date and parsed_date.tzinfo is None:
-                        parsed_date = parsed_date.replace(tzinfo=timezone.utc)
-                except (TypeError, ValueError):
-                    parsed_date = None
-            if not parsed_date:
-                parsed_date = dj_timezone.now()
-
-            body_plain, body_html = _extract_body(email_message)
-
-            snippet = body_plain[:280] if body_plain else body_html[:280]
-            flags = ''
-            if len(raw_response) > 0 and isinstance(raw_response[0], bytes):
-                meta = raw_response[0].decode(errors='ignore')
-                if 'FLAGS' in meta:
-                    flags = meta.split('FLAGS', 1)[-1].strip().strip(' ()')
-
-            senders_email = normalize_email(extract_email_from_sender(sender))
-            sender_record = None
-            if senders_email:
-                sender_record = Contact.objects.filter(email=senders_email).first()
+# Laiškų, gautų prieš aplanko UIDVALIDITY pasikeitimą, UID žymė: '~<senas UIDVALIDITY>:<senas raktas>'
+STALE_UID_MARK = '~'
 
-            if sender_record and sender_record.is_advertising:
-                logger.info('Praleidžiame reklaminį siuntėją %s', senders_email)
-                continue
 
-            mail_message, _ = MailMessage.objects.update_or_create(
-                uid=str(uid),
-                defaults={
-                    'message_id': message_id or '',
-                    'subject': subject,
-                    'sender': sender,
-                    'recipients': recipients,
-                    'cc': cc,
-                    'bcc': bcc,
-                    'date': parsed_date,
-                    'folder': folder,
-                    'snippet': snippet,
-                    'body_plain': body_plain,
-                    'body_html': body_html,
-                    'flags': flags,
-                    'sender_email': senders_email,
-                },
-            )
+def folder_uid_prefix(folder: str) -> str:
+    """
+    MailMessage.uid unikalus visoje lentelėje, o IMAP UID - tik aplanke: INBOX laiškų raktas - UID,
+    kitų aplankų - '<aplankas>:<UID>' (nepriklausomai nuo NotificationSettings.imap_folder).
+    """
+    return '' if folder.upper() == 'INBOX' else f'{folder}:'
 
-            # Remove old attachments if syncing again
-            if mail_message.attachments.exists():
-                for attachment in mail_message.attachments.all():
-                    try:
-                        if attachment.file:
-                            storage = attachment.file.storage
-                            if storage.exists(attachment.file.name):
-                                storage.delete(attachment.file.name)
-                    except Exception:
-                        logger.warning('Nepavyko ištrinti seno priedo failo', exc_info=True)
-                mail_message.attachments.all().delete()
 
-            _save_attachments(email_message, mail_message)
+def retire_folder_uids(folder: str, uid_validity: str) -> int:
+    """
+    Aplanko UIDVALIDITY pasikeitė - nauji UID gali sutapti su senaisiais. Seni aplanko laiškai
+    pervadinami ('~<UIDVALIDITY>:<raktas>'); sinchronizuojant iš naujo tas pats laiškas (Message-ID)
+    perima seną įrašą kartu su susiejimais (_stale_messages_by_message_id).
+    """
+    return MailMessage.objects.filter(folder=folder).exclude(uid__startswith=STALE_UID_MARK).update(
+        uid=Concat(Value(f'{STALE_UID_MARK}{uid_validity}:'), F('uid'))
+    )
 
-            try:
-                update_message_matches(mail_message)
-            except Exception as e:
-                logger.warning(f'Nepavyko atnaujinti laiško {mail_message.id} atitikčių: {e}')
 
-            # Automatiškai pridedame kontaktą, jei galime
-            try:
-                _auto_match_and_add_contacts(mail_message)
-            except Exception as e:
-                logger.warning(f'Nepavyko automatiškai suderinti laiško {mail_message.id}: {e}')
-            
-            # Klasifikuoti kaip reklaminį
+def _stale_messages_by_message_id(folder: str, message_ids) -> dict:
+    """Pervadinti (retire_folder_uids) aplanko laiškai pagal Message-ID: {message_id: MailMessage}"""
+    message_ids = {str(message_id) for message_id in message_ids if message_id}
+    if not message_ids:
+        return {}
+    stale = {}
+    for message in MailMessage.objects.filter(
+        folder=folder, uid__startswith=STALE_UID_MARK, message_id__in=message_ids
+    ).order_by('pk'):
+        stale.setdefault(message.message_id, message)
+    return stale
+
+
+def _sync_uids_serial(client: ImapClient, folder: str, sync_state: MailSyncState, uids: List[int],
+                      uid_prefix: str = '') -> List[int]:
+    """Po vieną laišką: visas RFC822 turinys, įrašymas ir apdorojimas nuosekliai"""
+    synced_messages = []
+    for uid in uids:
+        raw_response = client.fetch_message(uid)
+        raw_email = raw_response[1]
+        email_message = email.message_from_bytes(raw_email)
+
+        flags = ''
+        if len(raw_response) > 0 and isinstance(raw_response[0], bytes):
+            meta = raw_response[0].decode(errors='ignore')
+            if 'FLAGS' in meta:
+                flags = meta.split('FLAGS', 1)[-1].strip().strip(' ()')
+
+        defaults = _message_defaults(email_message, folder, flags)
+        senders_email = defaults['sender_email']
+        sender_record = None
+        if senders_email:
+            sender_record = Contact.objects.filter(email=senders_email).first()
+
+        if sender_record and sender_record.is_advertising:
+            logger.info('Praleidžiame reklaminį siuntėją %s', senders_email)
+            continue
+
+        uid_key = f'{uid_prefix}{uid}'
+        if not MailMessage.objects.filter(uid=uid_key).exists():
+            stale = _stale_messages_by_message_id(folder, [defaults['message_id']])
+            if stale:
+                # Tas pats laiškas po UIDVALIDITY pasikeitimo - perimamas senas įrašas (su susiejimais)
+                MailMessage.objects.filter(pk=stale[defaults['message_id']].pk).update(uid=uid_key)
+        mail_message, _ = MailMessage.objects.update_or_create(uid=uid_key, defaults=defaults)
+
+        # Remove old attachments if syncing again
+        if mail_message.attachments.exists():
+            _delete_attachments(mail_message.attachments.all())
+
+        _process_synced_message(email_message, mail_message)
+
+        # Klasifikuoti kaip reklaminį
+        try:
+            if sender_record and sender_record.is_trusted:
+                mail_message.is_promotional = False
+            else:
+                mail_message.is_promotional = _classify_as_promotional(mail_message)
+            mail_message.save(update_fields=['is_promotional'])
+        except Exception as e:
+            logger.warning(f'Nepavyko klasifikuoti laiško {mail_message.id}: {e}')
+
+        synced_messages.append(mail_message.id)
+        sync_state.last_uid = str(uid)
+    return synced_messages
+
+
+# --- Paketinė sinchronizacija (MAIL_SYNC_BATCHED) ---
+
+_sync_executor: Optional[ThreadPoolExecutor] = None
+_sync_executor_lock = threading.Lock()
+
+
+def _get_sync_executor(workers: int) -> ThreadPoolExecutor:
+    """Vienas gijų pool'as procesui priedų / atitikčių apdorojimui"""
+    global _sync_executor
+
+    with _sync_executor_lock:
+        if _sync_executor is None:
+            _sync_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='mail-sync')
+        return _sync_executor
+
+
+def _process_synced_message_in_thread(email_message: email.message.Message, mail_message: MailMessage):
+    # Pool gija naudoja savo DB ryšį - uždaromas kaip po HTTP užklausos
+    close_old_connections()
+    try:
+        _process_synced_message(email_message, mail_message)
+    except Exception:
+        logger.exception(f'Klaida apdorojant laiško {mail_message.id} priedus')
+        # Klaida lieka future - paketo last_uid neišsaugomas (_save_chunk_progress)
+        raise
+    finally:
+        close_old_connections()
+
+
+def _contacts_by_email(emails) -> dict:
+    """Kontaktai pagal normalizuotą el. paštą (vienas SELECT paketui; pirmas rastas - kaip .first())"""
+    from django.db.models.functions import Lower
+
+    emails = {value for value in emails if value}
+    contacts = {}
+    if not emails:
+        return contacts
+    for contact in Contact.objects.annotate(email_lower=Lower('email')).filter(email_lower__in=emails):
+        contacts.setdefault(contact.email_lower, contact)
+    return contacts
+
+
+def _fetch_chunk_bodies(client: ImapClient, summaries: list) -> dict:
+    """
+    Reikalingų dalių atsiuntimas: laiškai grupuojami pagal dalių sąrašą (viena FETCH komanda grupei),
+    grupė dalijama, kad vienu atsakymu nebūtų siunčiama daugiau nei MAIL_SYNC_FETCH_MAX_BYTES.
+    """
+    max_bytes = getattr(settings, 'MAIL_SYNC_FETCH_MAX_BYTES', 20 * 1024 * 1024)
+    groups = {}
+    for summary in summaries:
+        if summary.sections == []:
+            continue  # multipart be teksto ir priedų - nieko nesiunčiame
+        key = None if summary.sections is None else tuple(summary.sections)
+        groups.setdefault(key, []).append(summary)
+
+    bodies = {}
+
+    def fetch(sections, batch):
+        fetched = client.fetch_sections([summary.uid for summary in batch], sections)
+        for uid, items in fetched.items():
+            bodies.setdefault(uid, {}).update(items['BODY'])
+
+    for key, members in groups.items():
+        sections = None if key is None else list(key)
+        batch, batch_bytes = [], 0
+        for summary in members:
+            if batch and batch_bytes + summary.size > max_bytes:
+                fetch(sections, batch)
+                batch, batch_bytes = [], 0
+            batch.append(summary)
+            batch_bytes += summary.size
+        if batch:
+            fetch(sections, batch)
+    return bodies
+
+
+def _store_chunk(records: list, folder: str, uid_prefix: str = '') -> list:
+    """
+    Paketo laiškai viena transakcija: esami atnaujinami (bulk_update, seni priedai šalinami), nauji - bulk_create.
+
+    Returns:
+        [(email.message.Message, MailMessage)]
+    """
+    uid_keys = [f'{uid_prefix}{summary.uid}' for summary, _, _ in records]
+    sync_fields = None
+    stored = {}
+
+    with transaction.atomic():
+        existing = {message.uid: message for message in MailMessage.objects.filter(uid__in=uid_keys)}
+        stale = _stale_messages_by_message_id(folder, [
+            email_message.get('Message-ID', '') or ''
+            for summary, email_message, _ in records if f'{uid_prefix}{summary.uid}' not in existing
+        ])
+        now = dj_timezone.now()
+        to_create, to_update = [], []
+        for summary, email_message, sender_record in records:
+            defaults = _message_defaults(email_message, folder, summary.flags)
+            sync_fields = list(defaults)
+            uid_key = f'{uid_prefix}{summary.uid}'
+            mail_message = existing.get(uid_key) or stale.pop(defaults['message_id'], None) or MailMessage()
+            # Po UIDVALIDITY pasikeitimo perimtas senas įrašas gauna naują UID
+            mail_message.uid = uid_key
+            for field, value in defaults.items():
+                setattr(mail_message, field, value)
+
+            # Klasifikuoti kaip reklaminį (kontaktas jau užkrautas paketui)
             try:
                 if sender_record and sender_record.is_trusted:
                     mail_message.is_promotional = False
                 else:
-                    mail_message.is_promotional = _classify_as_promotional(mail_message)
-                mail_message.save(update_fields=['is_promotional'])
+                    mail_message.is_promotional = _classify_as_promotional(mail_message, check_contact=False)
             except Exception as e:
-                logger.warning(f'Nepavyko klasifikuoti laiško {mail_message.id}: {e}')
-            
+                logger.warning(f'Nepavyko klasifikuoti laiško UID {summary.uid}: {e}')
+            mail_message.updated_at = now
+            (to_update if mail_message.pk else to_create).append(mail_message)
+
+        if to_create:
+            MailMessage.objects.bulk_create(to_create, batch_size=500)
+        if to_update:
+            MailMessage.objects.bulk_update(
+                to_update, sync_fields + ['uid', 'is_promotional', 'updated_at'], batch_size=500
+            )
+            _delete_attachments(MailAttachment.objects.filter(mail_message__in=to_update))
+
+        # bulk_create (MySQL) negrąžina ID, bulk_* nesiunčia post_save - ID ir indeksas atskirai
+        stored = {message.uid: message for message in MailMessage.objects.filter(uid__in=uid_keys)}
+        schedule_message_reindex(message.pk for message in stored.values())
+
+    return [
+        (email_message, stored[f'{uid_prefix}{summary.uid}'])
+        for summary, email_message, _ in records
+        if f'{uid_prefix}{summary.uid}' in stored
+    ]
+
+
+def _sync_uids_batched(client: ImapClient, folder: str, sync_state: MailSyncState, uids: List[int],
+                       uid_prefix: str = '') -> List[int]:
+    """
+    Paketinė sinchronizacija:
+    - MAIL_SYNC_FETCH_CHUNK UID - viena FETCH komanda struktūrai ir antraštėms, turinys - tik reikalingos
+      dalys (reklaminių siuntėjų laiškų turinys nesiunčiamas),
+    - paketo laiškai įrašomi viena transakcija,
+    - priedai, atitiktys ir kontaktai apdorojami gijų pool'e (MAIL_SYNC_WORKERS), kol siunčiamas
+      kitas paketas; atmintyje - ne daugiau kaip du paketai,
+    - last_uid išsaugomas tik sėkmingai apdorojus visus paketo laiškus (ir priedus); nepavykus -
+      ImapSyncError, kita sinchronizacija pradeda nuo paskutinio pilnai apdoroto paketo.
+    """
+    chunk_size = max(1, getattr(settings, 'MAIL_SYNC_FETCH_CHUNK', 100))
+    workers = getattr(settings, 'MAIL_SYNC_WORKERS', 4)
+    use_pool = workers > 1 and not connection.in_atomic_block
+    synced_messages = []
+    previous = None  # (paketo didžiausias UID, apdorojimo futures)
+
+    for start in range(0, len(uids), chunk_size):
+        chunk = uids[start:start + chunk_size]
+        summaries = [summarize(items, uid) for uid, items in sorted(client.fetch_summaries(chunk).items())]
+
+        headers = {summary.uid: email.message_from_bytes(summary.headers) for summary in summaries}
+        sender_emails = {
+            uid: normalize_email(extract_email_from_sender(_extract_addresses(message.get('From') or '')))
+            for uid, message in headers.items()
+        }
+        contacts = _contacts_by_email(sender_emails.values())
+
+        wanted = []
+        for summary in summaries:
+            sender_record = contacts.get(sender_emails[summary.uid])
+            if sender_record and sender_record.is_advertising:
+                logger.info('Praleidžiame reklaminį siuntėją %s', sender_emails[summary.uid])
+                continue
+            wanted.append(summary)
+
+        bodies = _fetch_chunk_bodies(client, wanted)
+        records = [
+            (summary, build_message(summary, bodies.get(summary.uid, {})), contacts.get(sender_emails[summary.uid]))
+            for summary in wanted
+        ]
+        stored = _store_chunk(records, folder, uid_prefix) if records else []
+
+        futures = []
+        for email_message, mail_message in stored:
+            if use_pool:
+                futures.append(
+                    _get_sync_executor(workers).submit(_process_synced_message_in_thread, email_message, mail_message)
+                )
+            else:
+                _process_synced_message(email_message, mail_message)
             synced_messages.append(mail_message.id)
-            sync_state.last_uid = str(uid)
+
+        # Ankstesnio paketo priedai baigiami, kol šis apdorojamas
+        if previous is not None:
+            try:
+                _save_chunk_progress(sync_state, *previous)
+            except ImapSyncError:
+                wait(futures)
+                raise
+        previous = (max(chunk), futures)
+
+    if previous is not None:
+        _save_chunk_progress(sync_state, *previous)
+    return synced_messages
+
+
+def _save_chunk_progress(sync_state: MailSyncState, chunk_uid: int, futures: list):
+    """Palaukti paketo apdorojimo ir išsaugoti last_uid tik jei visi laiškai apdoroti be klaidų"""
+    wait(futures)
+    errors = [future.exception() for future in futures if future.exception() is not None]
+    if errors:
+        raise ImapSyncError(
+            f'Nepavyko apdoroti {len(errors)} laiškų priedų (paketas iki UID {chunk_uid}): {errors[0]}'
+        )
+    sync_state.last_uid = str(chunk_uid)
+    sync_state.save(update_fields=['last_uid', 'updated_at'])
+
+
+def run_mail_housekeeping():
+    """Po sinchronizacijos: bounce laiškai ir trūkstami priedai iš serverio"""
+    # Apdoroti bounce laiškus po sinchronizacijos
+    try:
+        bounce_result = process_bounce_emails()
+        logger.info(f'Apdoroti bounce laiškai: {bounce_result["processed"]} iš {bounce_result["total_checked"]}')
+    except Exception as e:
+        logger.warning(f'Nepavyko apdoroti bounce laiškų: {e}')
+
+    # Automatiškai atsisiųsti trūkstamus priedus iš serverio
+    try:
+        _sync_missing_attachments_from_server()
+    except Exception as e:
+        logger.warning(f'Nepavyko sinchronizuoti trūkstamų priedų iš serverio: {e}')
+
+
+def sync_imap(limit: Optional[int] = None, batched: Optional[bool] = None, folder: Optional[str] = None,
+              post_process: bool = True) -> dict:
+    """
+    Sinchronizuoja naujus laiškus iš IMAP pagal NotificationSettings.
+
+    batched=None - pagal MAIL_SYNC_BATCHED; limit=None - MAIL_SYNC_BATCH_LIMIT paketiniu režimu, 50 - po vieną.
+    folder=None - NotificationSettings.imap_folder. post_process=False - be bounce / trūkstamų priedų
+    apdorojimo (sinchronizacijos servisas juos vykdo atskirai).
+    """
+    config = NotificationSettings.load()
+    if not config.imap_enabled:
+        return {'status': 'disabled', 'message': 'IMAP sinchronizacija išjungta'}
+
+    if batched is None:
+        batched = getattr(settings, 'MAIL_SYNC_BATCHED', False)
+    if limit is None:
+        limit = getattr(settings, 'MAIL_SYNC_BATCH_LIMIT', 2000) if batched else 50
+
+    client = ImapClient(config)
+    primary_folder = config.imap_folder or 'INBOX'
+    folder = folder or primary_folder
+    uid_prefix = folder_uid_prefix(folder)
+    sync_state, _ = MailSyncState.objects.get_or_create(folder=folder)
+
+    try:
+        client.connect()
+        uid_validity = client.select_folder(folder)
+        last_uid = int(sync_state.last_uid) if sync_state.last_uid and sync_state.last_uid.isdigit() else None
+        previous_validity = (sync_state.metadata or {}).get('uid_validity')
+        if uid_validity and previous_validity and previous_validity != uid_validity:
+            # Aplankas perkurtas serveryje - seni UID nebegalioja, aplankas skaitomas iš naujo
+            retired = retire_folder_uids(folder, previous_validity)
+            logger.warning(f'Aplanko {folder} UIDVALIDITY pasikeitė ({previous_validity} -> {uid_validity}), '
+                           f'sinchronizuojama iš naujo ({retired} seni laiškai pervadinti)')
+            last_uid = None
+            # Naujasis UIDVALIDITY įrašomas iškart - nutrūkus sinchronizacijai laiškai nepervadinami dar kartą
+            sync_state.last_uid = ''
+            sync_state.metadata = dict(sync_state.metadata or {}, uid_validity=uid_validity)
+            sync_state.save(update_fields=['last_uid', 'metadata', 'updated_at'])
+        new_uids = client.fetch_uids_since(last_uid, limit=limit)
+
+        if batched:
+            synced_messages = _sync_uids_batched(client, folder, sync_state, new_uids, uid_prefix)
+        else:
+            synced_messages = _sync_uids_serial(client, folder, sync_state, new_uids, uid_prefix)
 
         sync_state.last_synced_at = dj_timezone.now()
         sync_state.status = 'ok'
@@ -675,21 +1113,13 @@ def sync_imap(limit: int = 50) -> dict:
         sync_state.metadata = {
             'synced_ids': synced_messages,
             'limit': limit,
+            'batched': batched,
+            'uid_validity': uid_validity,
         }
         sync_state.save()
 
-        # Apdoroti bounce laiškus po sinchronizacijos
-        try:
-            bounce_result = process_bounce_emails()
-            logger.info(f'Apdoroti bounce laiškai: {bounce_result["processed"]} iš {bounce_result["total_checked"]}')
-        except Exception as e:
-            logger.warning(f'Nepavyko apdoroti bounce laiškų: {e}')
-
-        # Automatiškai atsisiųsti trūkstamus priedus iš serverio
-        try:
-            _sync_missing_attachments_from_server()
-        except Exception as e:
-            logger.warning(f'Nepavyko sinchronizuoti trūkstamų priedų iš serverio: {e}')
+        if post_process:
+            run_mail_housekeeping()
 
         return {
             'status': 'ok',
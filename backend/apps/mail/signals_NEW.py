@@ -1,5 +1,5 @@
 from django.db import transaction
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_init, post_save
 from django.dispatch import receiver
 
 from apps.orders.models import Order, OrderCarrier
@@ -8,6 +8,8 @@ from .mail_matching_helper_NEW import (
     update_matches_for_order,
     update_matches_for_expedition,
 )
+from .match_index import ATTACHMENT_DOCUMENT_FIELDS, MESSAGE_DOCUMENT_FIELDS, schedule_message_reindex
+from .models import MailAttachment, MailMessage
 
 
 @receiver(post_save, sender=Order)
@@ -34,3 +36,42 @@ def handle_order_carrier_post_save(sender, instance: OrderCarrier, created: bool
     transaction.on_commit(lambda: update_matches_for_expedition(instance.id))
 
 
+# --- Laiškų numerių indeksas (MailMessageToken) ---
+
+_MESSAGE_DOCUMENT_COLUMNS = set(MESSAGE_DOCUMENT_FIELDS)
+
+
+@receiver(post_save, sender=MailMessage)
+def mail_message_update_match_index(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if update_fields and not _MESSAGE_DOCUMENT_COLUMNS.intersection(update_fields):
+        return
+    schedule_message_reindex([instance.pk])
+
+
+def _attachment_document(instance):
+    return tuple(instance.__dict__.get(field) for field in ['mail_message_id', *ATTACHMENT_DOCUMENT_FIELDS])
+
+
+@receiver(post_init, sender=MailAttachment)
+def attachment_remember_document(sender, instance, **kwargs):
+    """Įsiminti pavadinimą ir OCR tekstą - indeksas perskaičiuojamas tik jiems pasikeitus (pvz. po OCR)"""
+    instance._initial_match_document = _attachment_document(instance)
+
+
+@receiver(post_save, sender=MailAttachment)
+def attachment_update_match_index(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    initial = getattr(instance, '_initial_match_document', None)
+    current = _attachment_document(instance)
+    if not created and initial == current:
+        return
+    instance._initial_match_document = current
+    schedule_message_reindex([instance.mail_message_id, initial[0] if initial else None])
+
+
+@receiver(post_delete, sender=MailAttachment)
+def attachment_delete_update_match_index(sender, instance, **kwargs):
+    schedule_message_reindex([instance.mail_message_id])
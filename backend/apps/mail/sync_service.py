@@ -0,0 +1,204 @@
+"""
+Atskiras pašto sinchronizacijos servisas (manage.py run_mail_sync_service).
+
+Anksčiau laiškus sinchronizavo viena foninė gija web workeryje (_mail_sync_scheduler_loop): vienas
+aplankas, fiksuotas miegas (imap_sync_interval_minutes), bounce ir priedų kopijavimas po kiekvieno
+praėjimo - laiškai pasirodydavo po kelių minučių, o darbas vyko gunicorn procese.
+
+Servisas veikia atskirame procese:
+- kiekvienam aplankui (MAIL_SYNC_FOLDERS arba NotificationSettings.imap_folder) - atskira gija su savo
+  MailSyncState kursoriumi; aplankai sinchronizuojami lygiagrečiai,
+- po praėjimo gija laukia naujų laiškų per IMAP IDLE (serveris praneša per kelias sekundes);
+  serveriui nepalaikant IDLE - MAIL_SYNC_POLL_INTERVAL,
+- klaidos atveju - eksponentinis atidėjimas (iki MAIL_SYNC_BACKOFF_MAX), įrašomas į MailSyncState.metadata,
+- bounce laiškai ir trūkstami priedai - atskira gija kas MAIL_SYNC_HOUSEKEEPING_INTERVAL.
+
+Web workeriuose planuoklį išjungti: DISABLE_MAIL_SYNC_SCHEDULER=1. Servisas laiko tą patį procesų
+užraktą, todėl web planuoklis, jei neišjungtas, nestartuoja.
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.utils import OperationalError, ProgrammingError
+from django.utils import timezone
+
+from apps.settings.models import NotificationSettings
+from .models import MailSyncState
+from .services import ImapClient, ImapSyncError, run_mail_housekeeping, sync_imap
+
+logger = logging.getLogger(__name__)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def service_folders(config: NotificationSettings) -> List[str]:
+    """Sinchronizuojami aplankai: MAIL_SYNC_FOLDERS arba NotificationSettings.imap_folder"""
+    folders = [folder.strip() for folder in _setting('MAIL_SYNC_FOLDERS', None) or [] if folder.strip()]
+    return list(dict.fromkeys(folders)) or [config.imap_folder or 'INBOX']
+
+
+def register_failure(folder: str, error) -> float:
+    """Klaidų skaičius ir kito bandymo laikas MailSyncState.metadata; grąžina atidėjimą sekundėmis"""
+    base = max(1, _setting('MAIL_SYNC_BACKOFF_BASE', 15))
+    sync_state, _ = MailSyncState.objects.get_or_create(folder=folder)
+    metadata = dict(sync_state.metadata or {})
+    failures = int(metadata.get('failures') or 0) + 1
+    delay = min(_setting('MAIL_SYNC_BACKOFF_MAX', 900), base * 2 ** min(failures - 1, 16))
+    metadata.update({
+        'failures': failures,
+        'retry_at': (timezone.now() + timedelta(seconds=delay)).isoformat(),
+    })
+    sync_state.metadata = metadata
+    sync_state.status = 'error'
+    sync_state.message = str(error)
+    sync_state.save(update_fields=['metadata', 'status', 'message', 'updated_at'])
+    return delay
+
+
+class FolderSync:
+    """Vieno aplanko sinchronizacijos ciklas: praėjimas -> IDLE laukimas -> praėjimas ..."""
+
+    def __init__(self, folder: str, stop_event: threading.Event):
+        self.folder = folder
+        self.stop_event = stop_event
+        self.watcher: Optional[ImapClient] = None
+
+    def sync_once(self) -> dict:
+        result = sync_imap(folder=self.folder, post_process=False)
+        if result.get('status') == 'error':
+            raise ImapSyncError(result.get('message') or 'IMAP sinchronizacijos klaida')
+        if result.get('count'):
+            logger.info('Aplankas %s: sinchronizuota %s laiškų.', self.folder, result['count'])
+        return result
+
+    def wait_for_mail(self, config: NotificationSettings):
+        """Laukti naujų laiškų: IDLE atskiru ryšiu arba MAIL_SYNC_POLL_INTERVAL"""
+        poll_interval = max(5, _setting('MAIL_SYNC_POLL_INTERVAL', 60))
+        if not _setting('MAIL_SYNC_IDLE_ENABLED', True):
+            self.stop_event.wait(poll_interval)
+            return
+
+        if self.watcher is None or self.watcher.client is None:
+            self.watcher = ImapClient(config)
+            self.watcher.connect()
+            self.watcher.select_folder(self.folder)
+            # Laiškai, atėję tarp praėjimo ir prisijungimo, IDLE nebūtų pranešti - patikrinti kursorių
+            if self.has_new_mail():
+                return
+
+        if not self.watcher.supports_idle():
+            self.stop_event.wait(poll_interval)
+            return
+
+        self.watcher.idle(max(30, _setting('MAIL_SYNC_IDLE_TIMEOUT', 300)))
+
+    def has_new_mail(self) -> bool:
+        last_uid = MailSyncState.objects.filter(folder=self.folder).values_list('last_uid', flat=True).first()
+        last_uid = int(last_uid) if last_uid and last_uid.isdigit() else None
+        return bool(self.watcher.fetch_uids_since(last_uid, limit=1))
+
+    def close(self):
+        if self.watcher is not None:
+            self.watcher.logout()
+            self.watcher = None
+
+    def pending_backoff(self) -> float:
+        """Likęs atidėjimas po ankstesnės klaidos (išlieka ir perkrovus servisą)"""
+        sync_state = MailSyncState.objects.filter(folder=self.folder).only('metadata').first()
+        retry_at = ((sync_state.metadata or {}).get('retry_at') if sync_state else None)
+        if not retry_at:
+            return 0
+        try:
+            return max(0.0, (datetime.fromisoformat(retry_at) - timezone.now()).total_seconds())
+        except (TypeError, ValueError):
+            return 0
+
+    def run(self):
+        logger.info('Startuoja aplanko %s sinchronizacija.', self.folder)
+        try:
+            self.stop_event.wait(self.pending_backoff())
+        except Exception:
+            logger.debug('Nepavyko nuskaityti aplanko %s atidėjimo.', self.folder, exc_info=True)
+        while not self.stop_event.is_set():
+            try:
+                close_old_connections()
+                try:
+                    config = NotificationSettings.load()
+                except (OperationalError, ProgrammingError):
+                    logger.debug('NotificationSettings lentelė dar nepasiekiama – laukiam 60 s.')
+                    self.stop_event.wait(60)
+                    continue
+
+                if not config.imap_enabled:
+                    self.close()
+                    self.stop_event.wait(60)
+                    continue
+
+                self.sync_once()
+                if not self.stop_event.is_set():
+                    self.wait_for_mail(config)
+            except Exception as e:
+                self.close()
+                if self.stop_event.is_set():
+                    break
+                try:
+                    delay = register_failure(self.folder, e)
+                except Exception:
+                    logger.exception('Nepavyko įrašyti aplanko %s klaidos.', self.folder)
+                    delay = _setting('MAIL_SYNC_BACKOFF_MAX', 900)
+                logger.warning('Aplanko %s sinchronizacijos klaida: %s. Kitas bandymas po %s s.', self.folder, e, delay)
+                self.stop_event.wait(delay)
+            finally:
+                close_old_connections()
+        self.close()
+        logger.info('Aplanko %s sinchronizacija sustabdyta.', self.folder)
+
+    def interrupt(self):
+        if self.watcher is not None:
+            self.watcher.interrupt()
+
+
+def _housekeeping_loop(stop_event: threading.Event):
+    interval = max(30, _setting('MAIL_SYNC_HOUSEKEEPING_INTERVAL', 300))
+    while not stop_event.wait(interval):
+        try:
+            close_old_connections()
+            run_mail_housekeeping()
+        except Exception:
+            logger.exception('Klaida pašto sinchronizacijos servise (bounce / priedai).')
+        finally:
+            close_old_connections()
+
+
+def run_mail_sync_service(folders: Optional[List[str]] = None, stop_event: Optional[threading.Event] = None):
+    """
+    Paleisti aplankų gijas ir laukti stop_event (blokuoja). Aplankų sąrašas nuskaitomas paleidimo metu.
+    """
+    stop_event = stop_event or threading.Event()
+    config = NotificationSettings.load()
+    workers = [FolderSync(folder, stop_event) for folder in (folders or service_folders(config))]
+
+    threads = [
+        threading.Thread(target=worker.run, name=f'mail-sync-{worker.folder}', daemon=True)
+        for worker in workers
+    ]
+    threads.append(threading.Thread(target=_housekeeping_loop, args=(stop_event,), name='mail-housekeeping', daemon=True))
+    for thread in threads:
+        thread.start()
+
+    try:
+        while not stop_event.wait(1):
+            pass
+    finally:
+        stop_event.set()
+        for worker in workers:
+            worker.interrupt()
+        for thread in threads:
+            thread.join(timeout=30)
@@ -0,0 +1,106 @@
+from django.test import SimpleTestCase
+
+from .imap_fetch import MessageSummary, _parse, build_message, needed_sections, parse_fetch_response, uid_set
+
+TEXT_PLAIN = b'("text" "plain" ("charset" "utf-8") NIL NIL "7bit" 12 1 NIL NIL NIL NIL)'
+TEXT_HTML = b'("text" "html" ("charset" "utf-8") NIL NIL "quoted-printable" 40 2 NIL NIL NIL NIL)'
+PDF_ATTACHMENT = (
+    b'("application" "pdf" ("name" "SF-001.pdf") NIL NIL "base64" 1000 NIL '
+    b'("attachment" ("filename" "SF-001.pdf")) NIL NIL)'
+)
+INLINE_IMAGE = b'("image" "png" NIL "<logo@x>" NIL "base64" 500 NIL ("inline" NIL) NIL NIL)'
+
+
+def structure(raw: bytes):
+    return _parse([raw])[0]
+
+
+class UidSetTests(SimpleTestCase):
+    def test_ranges_and_single_uids(self):
+        self.assertEqual(uid_set([10, 9, 7, 5, 3, 2, 1]), '1:3,5,7,9:10')
+
+    def test_duplicates_and_empty(self):
+        self.assertEqual(uid_set([4, 4, 5]), '4:5')
+        self.assertEqual(uid_set([]), '')
+
+
+class ParseTests(SimpleTestCase):
+    def test_atoms_strings_and_nil(self):
+        self.assertEqual(
+            _parse([b'(UID 7 FLAGS (\\Seen \\Answered) X NIL "a \\"b\\"")']),
+            [['UID', '7', 'FLAGS', ['\\Seen', '\\Answered'], 'X', None, b'a "b"']],
+        )
+
+    def test_section_atom_keeps_spaces_inside_brackets(self):
+        parsed = _parse([b'(BODY[HEADER.FIELDS (FROM TO)] NIL)'])
+        self.assertEqual(parsed, [['BODY[HEADER.FIELDS (FROM TO)]', None]])
+
+    def test_literal_is_attached_to_its_key(self):
+        data = [
+            (b'1 (UID 101 RFC822.SIZE 2048 BODY[HEADER.FIELDS (FROM SUBJECT)] {29}',
+             b'From: a@b.lt\r\nSubject: Test\r\n'),
+            b' FLAGS (\\Seen))',
+        ]
+        response = parse_fetch_response(data)
+        self.assertEqual(list(response), [101])
+        self.assertEqual(response[101]['BODY']['HEADER'], b'From: a@b.lt\r\nSubject: Test\r\n')
+        self.assertEqual(response[101]['RFC822.SIZE'], '2048')
+        self.assertEqual(response[101]['FLAGS'], ['\\Seen'])
+
+    def test_several_messages_with_section_literals(self):
+        data = [
+            (b'1 (UID 5 BODY[1.MIME] {26}', b'Content-Type: text/plain\r\n'),
+            (b' BODY[1] {5}', b'Hello'),
+            b')',
+            (b'2 (UID 6 BODY[] {13}', b'Subject: x\r\n\r'),
+            b')',
+        ]
+        response = parse_fetch_response(data)
+        self.assertEqual(response[5]['BODY'], {'1.MIME': b'Content-Type: text/plain\r\n', '1': b'Hello'})
+        self.assertEqual(response[6]['BODY'], {'': b'Subject: x\r\n\r'})
+
+    def test_flag_only_responses_are_skipped(self):
+        data = [b'3 (FLAGS (\\Seen))', b'4 (UID 12 FLAGS ())']
+        response = parse_fetch_response(data)
+        self.assertEqual(list(response), [12])
+        self.assertEqual(response[12]['FLAGS'], [])
+
+
+class NeededSectionsTests(SimpleTestCase):
+    def test_single_part_message_is_fetched_whole(self):
+        self.assertIsNone(needed_sections(structure(TEXT_PLAIN)))
+        self.assertIsNone(needed_sections(None))
+
+    def test_nested_multipart_selects_text_and_attachments(self):
+        raw = b'((' + TEXT_PLAIN + TEXT_HTML + b' "alternative")' + PDF_ATTACHMENT + INLINE_IMAGE + b' "mixed")'
+        self.assertEqual(needed_sections(structure(raw)), ['1.1', '1.2', '2'])
+
+    def test_rfc2231_name_and_embedded_message(self):
+        named = (
+            b'("application" "octet-stream" ("name*" "utf-8\'\'s%C4%85skaita.pdf") NIL NIL "base64" 10 NIL NIL NIL NIL)'
+        )
+        embedded = (
+            b'("message" "rfc822" NIL NIL NIL "7bit" 300 ("Mon, 1 Jan 2024 10:00:00 +0000" "Fwd" NIL NIL NIL NIL '
+            b'NIL NIL NIL NIL) ' + TEXT_PLAIN + b' 10 NIL NIL NIL NIL)'
+        )
+        raw = b'(' + TEXT_PLAIN + named + embedded + INLINE_IMAGE + b' "mixed")'
+        self.assertEqual(needed_sections(structure(raw)), ['1', '2', '3'])
+
+
+class BuildMessageTests(SimpleTestCase):
+    def test_selected_parts_become_multipart(self):
+        summary = MessageSummary(
+            uid=1, flags='', size=0, headers=b'Subject: SF\r\nContent-Type: multipart/mixed; boundary=x\r\n\r\n',
+            sections=['1', '2'],
+        )
+        message = build_message(summary, {
+            '1.MIME': b'Content-Type: text/plain; charset=utf-8\r\n',
+            '1': b'Sveiki',
+            '2.MIME': b'Content-Type: application/pdf; name="SF.pdf"\r\n'
+                      b'Content-Disposition: attachment; filename="SF.pdf"\r\n',
+            '2': b'%PDF-1.4',
+        })
+        parts = message.get_payload()
+        self.assertEqual(message['Subject'], 'SF')
+        self.assertEqual(parts[0].get_payload(), 'Sveiki')
+        self.assertEqual(parts[1].get_filename(), 'SF.pdf')
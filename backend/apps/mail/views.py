@@ -11,6 +11,7 @@ from django.db.models import Q
 from rest_framework import filters, status, viewsets
 from rest_framework.decorators import action
 from rest_framework.pagination import PageNumberPagination
+from apps.core.pagination import OptionalCursorPagination
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
@@ -20,7 +21,7 @@ from .models import MailAttachment, MailMessage, MailMessageTag, MailSender, Mai
 from apps.partners.models import Contact
 
 
-class MailPagePagination(PageNumberPagination):
+class MailPagePagination(OptionalCursorPagination):
     page_size = 10
 from .serializers import (
     MailAttachmentSerializer,
@@ -365,55 +366,61 @@ class MailMessageViewSet(viewsets.ModelViewSet):
 
         from apps.orders.models import Order, OrderCarrier
         from django.db.models import Exists, OuterRef
-
-        # 1. Pirmiausia gauname VISUS užsakymų ir ekspedicijų numerius iš DB
-        order_numbers = {
-            (num or '').strip().upper()
-            for num in Order.objects.exclude(order_number__isnull=True).exclude(order_number='').values_list('order_number', flat=True)
-        }
-        expedition_numbers = {
-            (num or '').strip().upper()
-            for num in OrderCarrier.objects.exclude(expedition_number__isnull=True).exclude(expedition_number='').values_list('expedition_number', flat=True)
-        }
+        from .match_index import is_mail_match_index_enabled, numbers_found_in_messages
 
         matched_orders = set()
         matched_expeditions = set()
 
-        # 2. Randame užsakymus kurie turi SUSIETUS laiškus (matched_mail_messages ARBA related_order_id)
-
-        # Užsakymai su susietais laiškais
+        # 1. Užsakymai, kurie turi SUSIETUS laiškus (matched_mail_messages ARBA related_order_id)
         orders_with_messages = Order.objects.filter(
-            matched_mail_messages__isnull=False
+            Exists(MailMessage.matched_orders.through.objects.filter(order_id=OuterRef('pk')))
+            | Exists(MailMessage.objects.filter(related_order_id=OuterRef('pk')))
         ).values_list('order_number', flat=True)
 
         for order_num in orders_with_messages:
             if order_num:
                 matched_orders.add(order_num.strip().upper())
 
-        # BONUS: Užsakymai su tiesiogiai susietais laiškais (related_order_id)
-        from django.db.models import Exists, OuterRef
-        orders_with_direct_messages = Order.objects.filter(
-            Exists(MailMessage.objects.filter(related_order_id=OuterRef('pk')))
-        ).values_list('order_number', flat=True)
-
-        for order_num in orders_with_direct_messages:
-            if order_num:
-                matched_orders.add(order_num.strip().upper())
-
         # Ekspedicijos su susietais laiškais
         expeditions_with_messages = OrderCarrier.objects.filter(
-            matched_mail_messages__isnull=False
+            Exists(MailMessage.matched_expeditions.through.objects.filter(ordercarrier_id=OuterRef('pk')))
         ).values_list('expedition_number', flat=True)
 
         for exp_num in expeditions_with_messages:
             if exp_num:
                 matched_expeditions.add(exp_num.strip().upper())
 
-        # 3. BONUS: Ieškome numerių laiškų turinyje (jei OCR neveikia, bent jau turime susietus)
+        # 2. Numeriai laiškų turinyje (jei OCR neveikia, bent jau turime susietus)
         # Išskyrus laiškus kurie buvo priskirti rankiniu būdu
-        queryset = self.get_queryset().exclude(manually_assigned=True).prefetch_related('attachments')
+        queryset = self.get_queryset().exclude(manually_assigned=True)
 
-        for message in queryset:
+        if is_mail_match_index_enabled():
+            # Indeksuotas JOIN per MailMessageToken - laiškų turinys neskaitomas
+            matched_orders.update(numbers_found_in_messages(Order, 'order_number', queryset))
+            matched_expeditions.update(numbers_found_in_messages(OrderCarrier, 'expedition_number', queryset))
+        else:
+            self._scan_match_summary(queryset, matched_orders, matched_expeditions)
+
+        return Response({
+            'order_numbers': sorted(matched_orders),
+            'expedition_numbers': sorted(matched_expeditions),
+        })
+
+    @staticmethod
+    def _scan_match_summary(queryset, matched_orders: set, matched_expeditions: set):
+        """Senasis būdas (MAIL_MATCH_INDEX_ENABLED=False): tokenizuoja kiekvieno laiško turinį."""
+        from apps.orders.models import Order, OrderCarrier
+
+        order_numbers = {
+            (num or '').strip().upper()
+            for num in Order.objects.exclude(order_number__isnull=True).exclude(order_number='').values_list('order_number', flat=True)
+        }
+        expedition_numbers = {
+            (num or '').strip().upper()
+            for num in OrderCarrier.objects.exclude(expedition_number__isnull=True).exclude(expedition_number='').values_list('expedition_number', flat=True)
+        }
+
+        for message in queryset.prefetch_related('attachments'):
             pieces = [
                 message.subject or '',
                 message.sender or '',
@@ -447,11 +454,6 @@ class MailMessageViewSet(viewsets.ModelViewSet):
                 if candidate in expedition_numbers:
                     matched_expeditions.add(candidate)
 
-        return Response({
-            'order_numbers': sorted(matched_orders),
-            'expedition_numbers': sorted(matched_expeditions),
-        })
-
     @action(detail=False, methods=['get'], url_path='by-expedition')
     def by_expedition(self, request):
         """Grąžina laiškus, kuriuose rastas konkretus ekspedicijos numeris."""
@@ -469,6 +471,18 @@ class MailMessageViewSet(viewsets.ModelViewSet):
 
         queryset = self.get_queryset().prefetch_related('attachments')
 
+        from .match_index import is_mail_match_index_enabled, message_ids_with_token
+        if is_mail_match_index_enabled():
+            # Kandidatai per indeksus: susieti su ekspedicija arba (dar neapskaičiuotiems) numeris turinyje.
+            # Galutinis patikrinimas - kaip anksčiau, pagal serializerio matches
+            linked_ids = MailMessage.matched_expeditions.through.objects.filter(
+                ordercarrier__expedition_number__iexact=expedition_number
+            ).values('mailmessage_id')
+            queryset = queryset.filter(
+                Q(pk__in=linked_ids)
+                | Q(matches_computed_at__isnull=True, pk__in=message_ids_with_token(expedition_number))
+            )
+
         for message in queryset:
             serializer = self.get_serializer(message)
             data = serializer.data
@@ -526,19 +540,27 @@ class MailMessageViewSet(viewsets.ModelViewSet):
             )
 
         # Rasti laiškus, kuriuose užsakymo numeris gali būti tekste
-        # Optimizuota: filtruojame tik svarbiausius laukus (subject, snippet, body_plain)
-        # body_html paliekame, bet tik jei kiti laukai neranda
-        text_search = self.get_queryset().filter(
-            Q(subject__icontains=order_number) |
-            Q(snippet__icontains=order_number) |
-            Q(body_plain__icontains=order_number)
-        ).prefetch_related('attachments__related_purchase_invoice__partner')
-
-        # Jei nerasta tekste, tikrinti body_html (lėčiau)
-        if not text_search.exists() and not directly_linked.exists() and not matched_linked.exists():
+        from .match_index import is_mail_match_index_enabled, is_number_token, message_ids_with_token
+        if is_mail_match_index_enabled() and order_id and is_number_token(order_number):
+            # Numerių indeksas: tema, adresai, turinys (ir HTML), priedų pavadinimai ir OCR tekstas.
+            # Laisvas tekstas (ne užsakymo numeris, keli žodžiai, fragmentas) - paieška pagal teksto dalį žemiau
             text_search = self.get_queryset().filter(
-                Q(body_html__icontains=order_number)
+                pk__in=message_ids_with_token(order_number)
             ).prefetch_related('attachments__related_purchase_invoice__partner')
+        else:
+            # Optimizuota: filtruojame tik svarbiausius laukus (subject, snippet, body_plain)
+            # body_html paliekame, bet tik jei kiti laukai neranda
+            text_search = self.get_queryset().filter(
+                Q(subject__icontains=order_number) |
+                Q(snippet__icontains=order_number) |
+                Q(body_plain__icontains=order_number)
+            ).prefetch_related('attachments__related_purchase_invoice__partner')
+
+            # Jei nerasta tekste, tikrinti body_html (lėčiau)
+            if not text_search.exists() and not directly_linked.exists() and not matched_linked.exists():
+                text_search = self.get_queryset().filter(
+                    Q(body_html__icontains=order_number)
+                ).prefetch_related('attachments__related_purchase_invoice__partner')
 
         # Sujungti visus queryset'us ir pašalinti dublikatus, limit'as 200 laiškų
         # Svarbu: directly_linked turi pirmenybę prieš matched_linked
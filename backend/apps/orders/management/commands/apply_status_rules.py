@@ -1,7 +1,6 @@
 from django.core.management.base import BaseCommand
-from django.db import transaction
 from apps.orders.models import Order
-from apps.orders.signals import auto_update_order_status
+from apps.orders.status_rules import apply_status_rules_batch
 
 
 class Command(BaseCommand):
@@ -53,56 +52,21 @@ class Command(BaseCommand):
                 self.style.WARNING('DRY RUN MODE - No changes will be made.')
             )
 
-        processed = 0
-        updated = 0
-        skipped = 0
-
-        for order in orders:
-            old_status = order.status
-
-            if dry_run:
-                # Simulate the status update
-                try:
-                    # Create a temporary copy to test the rules
-                    temp_order = Order.objects.get(pk=order.pk)
-                    auto_update_order_status(Order, temp_order)
-                    new_status = temp_order.status
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(f'Error simulating rule application for order {order.order_number}: {e}')
-                    )
-                    continue
-            else:
-                # Actually apply the rules
-                try:
-                    order.save()  # This will trigger the auto_update_order_status signal
-                    order.refresh_from_db()
-                    new_status = order.status
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(f'Error applying rules to order {order.order_number}: {e}')
-                    )
-                    continue
-
-            processed += 1
+        # Taisyklės pritaikomos aibei: viena SELECT ir UPDATE užklausa kiekvienai taisyklei
+        try:
+            updated, changes = apply_status_rules_batch(orders, dry_run=dry_run)
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Error applying status rules: {e}'))
+            return
 
-            if old_status != new_status:
-                updated += 1
-                self.stdout.write(
-                    self.style.SUCCESS(
-                        f'Updated: {order.order_number} | {old_status} → {new_status}'
-                    )
+        for change in changes:
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Updated: {change.order_number} | {change.from_status} → {change.to_status}'
                 )
-            else:
-                skipped += 1
-                if not dry_run and options.get('verbosity', 1) >= 2:
-                    self.stdout.write(
-                        f'No change: {order.order_number} | {old_status}'
-                    )
-
-            # Show progress every 100 orders
-            if processed % 100 == 0:
-                self.stdout.write(f'Processed {processed}/{total_orders} orders...')
+            )
+        processed = total_orders
+        skipped = processed - updated
 
         # Summary
         self.stdout.write('\n' + '='*50)
@@ -0,0 +1,140 @@
+"""
+Užsakymų sąrašo API matavimas: pilnas OrderSerializer vs OrderListSerializer (?view=list) vs ?fields=.
+
+Pavyzdžiai:
+    python manage.py benchmark_order_list --page-size 1000
+    python manage.py benchmark_order_list --seed 1000 --repeat 5
+    python manage.py benchmark_order_list --fields id,order_number,status,client,payment_status_info
+
+--seed sukuria laikinus užsakymus transakcijoje, kuri pabaigoje atšaukiama.
+"""
+
+import statistics
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+DEFAULT_FIELDS = 'id,order_number,status,order_date,client,client_price_net,payment_status_info,carriers'
+
+
+class Command(BaseCommand):
+    help = 'Išmatuoti /orders/orders/ sąrašo atsakymo dydį, laiką ir užklausų skaičių skirtingais režimais'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=1000, help='Užsakymų skaičius viename puslapyje')
+        parser.add_argument('--repeat', type=int, default=3, help='Kiek kartų kartoti kiekvieną režimą')
+        parser.add_argument('--fields', default=DEFAULT_FIELDS, help='?fields= reikšmė sparse režimams')
+        parser.add_argument('--user', help='Vartotojo vardas (numatytasis - laikinas neišsaugotas vartotojas)')
+        parser.add_argument('--seed', type=int, default=0, help='Sukurti laikinų užsakymų (atšaukiama pabaigoje)')
+
+    def _get_user(self, username):
+        User = get_user_model()
+        if not username:
+            return User(username='benchmark', is_active=True)
+        try:
+            return User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f'Vartotojas {username} nerastas')
+
+    def _seed(self, count):
+        """Laikini užsakymai su dviem vežėjais ir dokumentu (bulk_create - be signal'ų)"""
+        from apps.orders.models import Order, OrderCarrier, OrderCarrierDocument
+        from apps.partners.models import Partner
+
+        client = Partner.objects.create(name='Benchmark klientas', code='BENCH-CLIENT', is_client=True)
+        carriers = [
+            Partner.objects.create(name=f'Benchmark vežėjas {i}', code=f'BENCH-CARRIER-{i}', is_supplier=True)
+            for i in range(2)
+        ]
+        now = timezone.now()
+        orders = Order.objects.bulk_create([
+            Order(
+                client=client, order_number=f'BENCH-{i:05d}', order_date=now - timedelta(days=i % 60),
+                client_price_net=Decimal('1000.00'), my_price_net=Decimal('100.00'),
+                route_from='Vilnius', route_to='Berlin', route_from_country='LT', route_to_country='DE',
+                other_costs=[{'description': 'Muitinė', 'amount': '25.00'}],
+            )
+            for i in range(count)
+        ], batch_size=500)
+        if not orders or orders[0].pk is None:
+            orders = list(Order.objects.filter(order_number__startswith='BENCH-'))
+        order_carriers = OrderCarrier.objects.bulk_create([
+            OrderCarrier(
+                order=order, partner=partner, sequence_order=index, price_net=Decimal('400.00'),
+                expedition_number=f'BE{order.pk}-{index}', due_date=(now + timedelta(days=30)).date(),
+            )
+            for order in orders
+            for index, partner in enumerate(carriers)
+        ], batch_size=500)
+        if order_carriers and order_carriers[0].pk is not None:
+            OrderCarrierDocument.objects.bulk_create([
+                OrderCarrierDocument(order_carrier=carrier, document_type='invoice', amount=Decimal('400.00'))
+                for carrier in order_carriers
+            ], batch_size=500)
+
+    def _measure(self, user, params, repeat):
+        from apps.orders.views import OrderViewSet
+
+        view = OrderViewSet.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+        timings = []
+        size = queries = rows = 0
+        for _ in range(repeat):
+            request = factory.get('/api/orders/orders/', params)
+            force_authenticate(request, user=user)
+            # queries_log ribotas (9000) - išvalyti, kad skaičiavimas būtų tikslus
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = view(request)
+                response.render()
+                timings.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                raise CommandError(f'{params}: HTTP {response.status_code} {response.content[:200]!r}')
+            size = len(response.content)
+            queries = len(captured.captured_queries)
+            rows = len(response.data.get('results', []))
+        return {
+            'rows': rows, 'bytes': size, 'queries': queries,
+            'median': statistics.median(timings), 'best': min(timings),
+        }
+
+    def handle(self, *args, **options):
+        user = self._get_user(options['user'])
+        repeat = max(1, options['repeat'])
+        base = {'page_size': options['page_size'], 'ordering': '-order_number'}
+        modes = [
+            ('pilnas (OrderSerializer)', dict(base)),
+            ('?view=list (OrderListSerializer)', dict(base, view='list')),
+            ('?view=list&fields=...', dict(base, view='list', fields=options['fields'])),
+            ('?fields=... (OrderSerializer)', dict(base, fields=options['fields'])),
+        ]
+
+        with transaction.atomic():
+            if options['seed']:
+                self.stdout.write(f"Kuriami laikini užsakymai: {options['seed']}...")
+                self._seed(options['seed'])
+
+            results = []
+            for label, params in modes:
+                results.append((label, self._measure(user, params, repeat)))
+            transaction.set_rollback(True)
+
+        self.stdout.write(f"\n{'Režimas':<36} {'Eil.':>5} {'KB':>9} {'Užkl.':>6} {'Mediana, s':>11} {'Geriausias, s':>14}")
+        full_bytes = results[0][1]['bytes'] or 1
+        full_time = results[0][1]['median'] or 1
+        for label, result in results:
+            self.stdout.write(
+                f"{label:<36} {result['rows']:>5} {result['bytes'] / 1024:>9.1f} {result['queries']:>6} "
+                f"{result['median']:>11.3f} {result['best']:>14.3f}"
+                f"   ({result['bytes'] / full_bytes:.0%} dydžio, {result['median'] / full_time:.0%} laiko)"
+            )
+        if options['seed']:
+            self.stdout.write(self.style.SUCCESS('Laikini užsakymai atšaukti'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from apps.orders.models import Order
+from apps.orders.search_index import prune_search_words, reindex_orders
+
+
+class Command(BaseCommand):
+    help = 'Perskaičiuoja užsakymų paieškos indeksą (OrderSearchToken, OrderSearchWord)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--order-id', type=int, action='append', help='Tik nurodyti užsakymai (galima kartoti)')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Užsakymų skaičius vienam paketui')
+
+    def handle(self, *args, **options):
+        queryset = Order.objects.order_by('pk')
+        if options['order_id']:
+            queryset = queryset.filter(pk__in=options['order_id'])
+        order_ids = list(queryset.values_list('pk', flat=True))
+        chunk_size = max(1, options['chunk_size'])
+
+        self.stdout.write(f'Indeksuojama {len(order_ids)} užsakymų...')
+        changed = 0
+        for start in range(0, len(order_ids), chunk_size):
+            changed += reindex_orders(order_ids[start:start + chunk_size], chunk_size=chunk_size)
+            self.stdout.write(f'  {min(start + chunk_size, len(order_ids))}/{len(order_ids)}')
+
+        removed = prune_search_words()
+        self.stdout.write(self.style.SUCCESS(f'Pakeista indekso įrašų: {changed}, pašalinta žodyno žodžių: {removed}'))
@@ -0,0 +1,62 @@
+"""
+Planuojami užsakymų statusų perėjimai pagal datas: cron (pvz. kartą per valandą) arba nuolatinis procesas
+(systemd / supervisor) su --loop, ne web workeriuose.
+
+Pavyzdžiai:
+    python manage.py run_scheduled_status_transitions
+    python manage.py run_scheduled_status_transitions --max-passes 1
+    python manage.py run_scheduled_status_transitions --loop --interval 600
+"""
+
+import signal
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.orders.status_rules import run_scheduled_status_transitions, run_status_transition_scheduler
+
+
+class Command(BaseCommand):
+    help = 'Pritaiko nuo datos priklausančias statusų taisykles užsakymams, kurių datos sąlygos pasikeitė'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-passes', type=int, default=None,
+            help='Kiek kartų iš eilės tikrinti ką tik perėjusius užsakymus (numatytai ORDER_STATUS_SCHEDULE_MAX_PASSES)'
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Veikti nuolat: perėjimai tikrinami kas --interval sekundžių'
+        )
+        parser.add_argument(
+            '--interval', type=int, default=None,
+            help='Tikrinimo intervalas sek. su --loop (numatytai ORDER_STATUS_SCHEDULE_INTERVAL)'
+        )
+
+    def handle(self, *args, **options):
+        if options['loop']:
+            self._run_loop(options['interval'])
+            return
+
+        started = time.perf_counter()
+        changed = run_scheduled_status_transitions(max_passes=options['max_passes'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Pakeista užsakymų: {changed} ({time.perf_counter() - started:.2f} s)'
+        ))
+
+    def _run_loop(self, interval):
+        interval = interval or getattr(settings, 'ORDER_STATUS_SCHEDULE_INTERVAL', 900)
+        if interval <= 0:
+            raise CommandError('Intervalas turi būti teigiamas (--interval arba ORDER_STATUS_SCHEDULE_INTERVAL)')
+        stop_event = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write('Gautas sustabdymo signalas – baigiama...')
+            stop_event.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        self.stdout.write(f'Statusų perėjimų planuoklis: kas {interval} s (Ctrl+C sustabdyti)...')
+        run_status_transition_scheduler(interval=interval, stop_event=stop_event)
@@ -0,0 +1,113 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:14
+
+from django.db import migrations, models
+
+
+SUMMARY_FIELDS = [
+    'sales_invoices_count',
+    'sales_invoices_paid_count',
+    'sales_invoices_partially_paid_count',
+    'sales_invoices_overdue_count',
+    'sales_invoices_earliest_due_date',
+    'sales_invoices_last_payment_date',
+]
+
+
+def compute_summaries(order_ids, SalesInvoice, SalesInvoiceOrder):
+    """Suvestinės skaičiavimas migracijos metu (istoriniai modeliai, be programos kodo importų)"""
+    invoices_by_order = {order_id: {} for order_id in order_ids}
+    for order_id, invoice_id, payment_status, due_date, payment_date in (
+        SalesInvoice.objects.filter(related_order_id__in=order_ids)
+        .values_list('related_order_id', 'id', 'payment_status', 'due_date', 'payment_date')
+    ):
+        invoices_by_order[order_id][invoice_id] = (payment_status, due_date, payment_date)
+    for order_id, invoice_id, payment_status, due_date, payment_date in (
+        SalesInvoiceOrder.objects.filter(order_id__in=order_ids)
+        .values_list('order_id', 'invoice_id', 'invoice__payment_status', 'invoice__due_date', 'invoice__payment_date')
+    ):
+        invoices_by_order[order_id][invoice_id] = (payment_status, due_date, payment_date)
+
+    summaries = {}
+    for order_id, invoices in invoices_by_order.items():
+        if not invoices:
+            continue
+        summary = {
+            'sales_invoices_count': len(invoices),
+            'sales_invoices_paid_count': 0,
+            'sales_invoices_partially_paid_count': 0,
+            'sales_invoices_overdue_count': 0,
+        }
+        unpaid_due_dates = []
+        paid_dates = []
+        for payment_status, due_date, payment_date in invoices.values():
+            if payment_status == 'paid':
+                summary['sales_invoices_paid_count'] += 1
+                if payment_date:
+                    paid_dates.append(payment_date)
+            elif payment_status == 'partially_paid':
+                summary['sales_invoices_partially_paid_count'] += 1
+            elif payment_status in ('unpaid', 'overdue'):
+                if payment_status == 'overdue':
+                    summary['sales_invoices_overdue_count'] += 1
+                if due_date:
+                    unpaid_due_dates.append(due_date)
+        summary['sales_invoices_earliest_due_date'] = min(unpaid_due_dates) if unpaid_due_dates else None
+        summary['sales_invoices_last_payment_date'] = max(paid_dates) if paid_dates else None
+        summaries[order_id] = summary
+    return summaries
+
+
+def fill_sales_invoices_summary(apps, schema_editor):
+    """Užpildo užsakymų pardavimo sąskaitų suvestinę (vėliau palaikoma signal'ais)"""
+    Order = apps.get_model('orders', 'Order')
+    SalesInvoice = apps.get_model('invoices', 'SalesInvoice')
+    SalesInvoiceOrder = apps.get_model('invoices', 'SalesInvoiceOrder')
+
+    order_ids = list(Order.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(order_ids), 1000):
+        chunk = order_ids[start:start + 1000]
+        summaries = compute_summaries(chunk, SalesInvoice, SalesInvoiceOrder)
+        changed = [Order(pk=order_id, **summary) for order_id, summary in summaries.items()]
+        Order.objects.bulk_update(changed, SUMMARY_FIELDS, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0067_ordercost_add_vat_columns_if_missing'),
+        ('invoices', '0023_add_back_display_options_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='sales_invoices_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Pardavimo sąskaitų skaičius'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='sales_invoices_earliest_due_date',
+            field=models.DateField(blank=True, null=True, verbose_name='Anksčiausias neapmokėtos sąskaitos terminas'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='sales_invoices_last_payment_date',
+            field=models.DateField(blank=True, null=True, verbose_name='Paskutinio apmokėjimo data'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='sales_invoices_overdue_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Vėluojančių sąskaitų skaičius'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='sales_invoices_paid_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Apmokėtų sąskaitų skaičius'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='sales_invoices_partially_paid_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Dalinai apmokėtų sąskaitų skaičius'),
+        ),
+        migrations.RunPython(fill_sales_invoices_summary, migrations.RunPython.noop),
+    ]
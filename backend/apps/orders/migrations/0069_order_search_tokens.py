@@ -0,0 +1,81 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:31
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Tokenizer'io ir dokumento laukų kopija (apps.orders.search_index tuo metu) - migracija nepriklauso nuo programos kodo
+TOKEN_MAX_LENGTH = 64
+TOKEN_RE = re.compile(r'[^\W_]+')
+ORDER_DOCUMENT_FIELDS = [
+    'order_number', 'client_order_number',
+    'client__name', 'client__code', 'manager__username', 'order_type',
+    'route_from', 'route_to',
+    'route_from_country', 'route_from_city', 'route_from_address',
+    'route_to_country', 'route_to_city', 'route_to_address',
+    'sender_route_from', 'receiver_route_to', 'vehicle_type', 'notes',
+]
+CARRIER_DOCUMENT_FIELDS = ['partner__name', 'partner__code', 'expedition_number']
+
+
+def tokenize(text):
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return [token[:TOKEN_MAX_LENGTH] for token in TOKEN_RE.findall(text)]
+
+
+def fill_order_search_tokens(apps, schema_editor):
+    """Užpildo užsakymų paieškos indeksą (vėliau palaikomas signal'ais)"""
+    Order = apps.get_model('orders', 'Order')
+    OrderCarrier = apps.get_model('orders', 'OrderCarrier')
+    OrderSearchToken = apps.get_model('orders', 'OrderSearchToken')
+
+    order_ids = list(Order.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(order_ids), 1000):
+        chunk = order_ids[start:start + 1000]
+        tokens_by_order = {}
+        for row in Order.objects.filter(pk__in=chunk).values_list('pk', *ORDER_DOCUMENT_FIELDS):
+            tokens_by_order[row[0]] = {token for value in row[1:] for token in tokenize(value)}
+        for row in OrderCarrier.objects.filter(order_id__in=chunk).values_list('order_id', *CARRIER_DOCUMENT_FIELDS):
+            if row[0] in tokens_by_order:
+                tokens_by_order[row[0]].update(token for value in row[1:] for token in tokenize(value))
+        OrderSearchToken.objects.bulk_create(
+            [
+                OrderSearchToken(order_id=order_id, token=token)
+                for order_id, tokens in tokens_by_order.items()
+                for token in tokens
+            ],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0068_order_sales_invoices_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64, verbose_name='Žodis')),
+                ('order', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='orders.order', verbose_name='Užsakymas')),
+            ],
+            options={
+                'verbose_name': 'Užsakymo paieškos žodis',
+                'verbose_name_plural': 'Užsakymų paieškos žodžiai',
+                'db_table': 'order_search_tokens',
+                'indexes': [models.Index(fields=['token', 'order'], name='order_search_token_idx')],
+                'unique_together': {('order', 'token')},
+            },
+        ),
+        migrations.RunPython(fill_order_search_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,118 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:52
+
+import re
+
+from django.db import migrations, models
+
+
+# Numerio skaidymo kopija (apps.core.numbering tuo metu) - migracija nepriklauso nuo programos kodo
+NUMBER_SEPARATORS = ' -/_.#'
+NUMBER_RE = re.compile(r'^(.*?)(\d+)$', re.S)
+
+
+def normalize_prefix(prefix):
+    return str(prefix or '').strip().rstrip(NUMBER_SEPARATORS).strip().upper()[:32]
+
+
+def numeric_part(digits):
+    if not digits.isascii() or not digits.isdigit() or len(digits.lstrip('0')) > 18:
+        return None
+    return int(digits)
+
+
+def split_number(number, prefixes):
+    value = str(number or '').strip()
+    for prefix in sorted({prefix.strip() for prefix in prefixes if prefix and prefix.strip()}, key=len, reverse=True):
+        if value[:len(prefix)].upper() == prefix.upper():
+            suffix = numeric_part(value[len(prefix):].lstrip(NUMBER_SEPARATORS))
+            if suffix is not None:
+                return normalize_prefix(prefix), suffix
+    match = NUMBER_RE.match(value)
+    if not match:
+        return normalize_prefix(value), None
+    return normalize_prefix(match.group(1)), numeric_part(match.group(2))
+
+
+def backfill(model, number_field, prefixes):
+    changed = []
+    rows = model.objects.order_by('pk').values_list('pk', number_field, 'number_prefix', 'number_suffix')
+    for pk, number, prefix, suffix in rows.iterator(chunk_size=1000):
+        parts = split_number(number, prefixes)
+        if parts != (prefix, suffix):
+            changed.append(model(pk=pk, number_prefix=parts[0], number_suffix=parts[1]))
+        if len(changed) >= 1000:
+            model.objects.bulk_update(changed, ['number_prefix', 'number_suffix'])
+            changed = []
+    if changed:
+        model.objects.bulk_update(changed, ['number_prefix', 'number_suffix'])
+
+
+def setting_value(apps, model_name, field, default=''):
+    instance = apps.get_model('settings', model_name).objects.order_by('pk').first()
+    return (getattr(instance, field, None) or default) if instance is not None else default
+
+
+def fill_number_parts(apps, schema_editor):
+    """Užpildo išskaidytus užsakymų / ekspedicijų / išlaidų numerius (vėliau nustatoma save() metu)"""
+    expedition_prefixes = [
+        setting_value(apps, 'ExpeditionSettings', 'expedition_prefix', 'E'),
+        setting_value(apps, 'WarehouseExpeditionSettings', 'expedition_prefix', 'WH-'),
+        setting_value(apps, 'CostExpeditionSettings', 'expedition_prefix', 'ISL-'),
+    ]
+    backfill(apps.get_model('orders', 'Order'), 'order_number', [setting_value(apps, 'OrderSettings', 'order_prefix')])
+    backfill(apps.get_model('orders', 'OrderCarrier'), 'expedition_number', expedition_prefixes)
+    backfill(apps.get_model('orders', 'OrderCost'), 'expedition_number', expedition_prefixes)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0069_order_search_tokens'),
+        ('settings', '0030_restore_expedition_settings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='number_prefix',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32, verbose_name='Numerio prefiksas'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='number_suffix',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='Numerio skaitinė dalis'),
+        ),
+        migrations.AddField(
+            model_name='ordercarrier',
+            name='number_prefix',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32, verbose_name='Numerio prefiksas'),
+        ),
+        migrations.AddField(
+            model_name='ordercarrier',
+            name='number_suffix',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='Numerio skaitinė dalis'),
+        ),
+        migrations.AddField(
+            model_name='ordercost',
+            name='number_prefix',
+            field=models.CharField(blank=True, default='', editable=False, max_length=32, verbose_name='Numerio prefiksas'),
+        ),
+        migrations.AddField(
+            model_name='ordercost',
+            name='number_suffix',
+            field=models.PositiveBigIntegerField(blank=True, editable=False, null=True, verbose_name='Numerio skaitinė dalis'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['number_prefix', 'number_suffix'], name='orders_number__b6405d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordercarrier',
+            index=models.Index(fields=['number_prefix', 'number_suffix'], name='order_carri_number__ac2ac1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordercost',
+            index=models.Index(fields=['number_prefix', 'number_suffix'], name='order_costs_number__42c60f_idx'),
+        ),
+        migrations.RunPython(fill_number_parts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0070_order_number_parts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutoStatusScheduleState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_run_at', models.DateTimeField(blank=True, null=True, verbose_name='Paskutinis vykdymas')),
+                ('last_changed', models.PositiveIntegerField(default=0, verbose_name='Pakeista užsakymų')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atnaujinta')),
+            ],
+            options={
+                'verbose_name': 'Planuojamų statusų perėjimų būsena',
+                'verbose_name_plural': 'Planuojamų statusų perėjimų būsena',
+                'db_table': 'order_auto_status_schedule',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'loading_date'], name='orders_status_loading_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['status', 'unloading_date'], name='orders_status_unloading_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-17 00:57
+
+from django.db import migrations, models
+
+
+def fill_order_search_words(apps, schema_editor):
+    """Žodynas iš jau suindeksuotų užsakymų žodžių"""
+    OrderSearchToken = apps.get_model('orders', 'OrderSearchToken')
+    OrderSearchWord = apps.get_model('orders', 'OrderSearchWord')
+
+    words = []
+    for token in OrderSearchToken.objects.order_by('token').values_list('token', flat=True).distinct().iterator():
+        words.append(OrderSearchWord(token=token))
+        if len(words) >= 1000:
+            OrderSearchWord.objects.bulk_create(words, ignore_conflicts=True)
+            words = []
+    if words:
+        OrderSearchWord.objects.bulk_create(words, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0071_auto_status_schedule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderSearchWord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64, unique=True, verbose_name='Žodis')),
+            ],
+            options={
+                'verbose_name': 'Paieškos žodyno žodis',
+                'verbose_name_plural': 'Paieškos žodynas',
+                'db_table': 'order_search_words',
+            },
+        ),
+        migrations.RunPython(fill_order_search_words, migrations.RunPython.noop),
+    ]
@@ -4,6 +4,7 @@ from django.core.validators import MinValueValidator, MaxValueValidator
 from decimal import Decimal
 from apps.partners.models import Partner
 from apps.auth.models import User
+from apps.core.numbering import NumberPartsQuerySet, set_number_parts
 
 
 class City(models.Model):
@@ -234,6 +235,23 @@ class AutocompleteSuggestion(models.Model):
         return f"{self.get_field_type_display()}: {self.value}"
 
 
+# Ekspedicijų numerių prefiksų šaltiniai (NUMBER_PREFIX_SOURCES, apps.core.numbering)
+EXPEDITION_NUMBER_PREFIX_SOURCES = (
+    'settings.ExpeditionSettings', 'settings.WarehouseExpeditionSettings', 'settings.CostExpeditionSettings',
+)
+
+
+def expedition_number_prefixes():
+    """Ekspedicijų (vežėjų, sandėlių, išlaidų) numerių prefiksai iš nustatymų"""
+    from apps.settings.models import CostExpeditionSettings, ExpeditionSettings, WarehouseExpeditionSettings
+
+    return [
+        ExpeditionSettings.load().expedition_prefix or 'E',
+        WarehouseExpeditionSettings.load().expedition_prefix or 'WH-',
+        CostExpeditionSettings.load().expedition_prefix or 'ISL-',
+    ]
+
+
 class Order(models.Model):
     """Užsakymų modelis"""
     
@@ -262,6 +280,13 @@ class Order(models.Model):
         db_index=True,
         verbose_name=_('Užsakymo numeris')
     )
+    # Išskaidytas numeris tarpų paieškai (apps.core.numbering, nustatoma save() metu)
+    number_prefix = models.CharField(
+        max_length=32, blank=True, default='', editable=False, verbose_name=_('Numerio prefiksas')
+    )
+    number_suffix = models.PositiveBigIntegerField(
+        null=True, blank=True, editable=False, verbose_name=_('Numerio skaitinė dalis')
+    )
     client_order_number = models.CharField(
         max_length=100,
         blank=True,
@@ -345,6 +370,26 @@ class Order(models.Model):
         verbose_name=_('Kliento mokėjimo būklė')
     )
     
+    # Pardavimo sąskaitų suvestinė (palaikoma apps.invoices.order_payment_summary signal'ais,
+    # perskaičiuojama komanda rebuild_order_payment_summary) - sąrašui nereikia papildomų užklausų
+    sales_invoices_count = models.PositiveIntegerField(default=0, verbose_name=_('Pardavimo sąskaitų skaičius'))
+    sales_invoices_paid_count = models.PositiveIntegerField(default=0, verbose_name=_('Apmokėtų sąskaitų skaičius'))
+    sales_invoices_partially_paid_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('Dalinai apmokėtų sąskaitų skaičius')
+    )
+    sales_invoices_overdue_count = models.PositiveIntegerField(default=0, verbose_name=_('Vėluojančių sąskaitų skaičius'))
+    sales_invoices_earliest_due_date = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name=_('Anksčiausias neapmokėtos sąskaitos terminas')
+    )
+    sales_invoices_last_payment_date = models.DateField(
+        null=True,
+        blank=True,
+        verbose_name=_('Paskutinio apmokėjimo data')
+    )
+    
     # Maršrutas (bendri laukai - paliekami palaikymui)
     route_from = models.CharField(max_length=500, blank=True, verbose_name=_('Maršrutas iš'))
     route_to = models.CharField(max_length=500, blank=True, verbose_name=_('Maršrutas į'))
@@ -469,7 +514,19 @@ class Order(models.Model):
         related_name='created_orders',
         verbose_name=_('Sukūrė')
     )
-    
+
+    NUMBER_FIELD = 'order_number'
+    NUMBER_PREFIX_SOURCES = ('settings.OrderSettings',)
+    # update() / bulk_* taip pat nustato number_prefix / number_suffix (apps.core.numbering)
+    objects = NumberPartsQuerySet.as_manager()
+
+    @classmethod
+    def number_prefixes(cls):
+        """Numerių prefiksai iš nustatymų - numeris skaidomas pagal juos (apps.core.numbering)"""
+        from apps.settings.models import OrderSettings
+
+        return [(OrderSettings.load().order_prefix or '').strip()]
+
     class Meta:
         db_table = 'orders'
         verbose_name = _('Užsakymas')
@@ -480,6 +537,10 @@ class Order(models.Model):
             models.Index(fields=['status']),
             models.Index(fields=['manager']),
             models.Index(fields=['created_at']),
+            models.Index(fields=['number_prefix', 'number_suffix']),
+            # Planuojami statusų perėjimai (apps.orders.status_rules) - datos intervalas statuse
+            models.Index(fields=['status', 'loading_date'], name='orders_status_loading_idx'),
+            models.Index(fields=['status', 'unloading_date'], name='orders_status_unloading_idx'),
         ]
     
     def __str__(self):
@@ -503,6 +564,7 @@ class Order(models.Model):
         
         # Order number generavimas dabar vyksta tik per OrderViewSet.perform_create()
         # Pašalinta automatinė generacija čia, kad išvengtume race conditions ir dublikatų
+        set_number_parts(self, 'order_number', kwargs)
         super().save(*args, **kwargs)
     
     @property
@@ -583,89 +645,71 @@ class Order(models.Model):
     
     @property
     def payment_status_info(self):
-        """Grąžina detalų mokėjimo būklės informaciją"""
-        try:
-            # Jei instance dar neturi PK, negalime pasiekti related objects
-            if self.pk is None:
-                return {
-                    'status': 'not_paid',
-                    'message': 'Nėra sąskaitų',
-                    'has_invoices': False,
-                    'invoice_issued': False
-                }
-            
-            from apps.invoices.models import SalesInvoice, SalesInvoiceOrder
-            
-            # VISADA tikrinti DB tiesiogiai, kad būtų tikri duomenys (ypač po trinimo)
-            invoice_ids = set()
-            # Tikrinti per ForeignKey
-            invoice_ids.update(SalesInvoice.objects.filter(related_order=self).values_list('id', flat=True))
-            # Tikrinti per ManyToMany
-            invoice_ids.update(SalesInvoiceOrder.objects.filter(order=self).values_list('invoice_id', flat=True))
-
-            if not invoice_ids:
-                return {
-                    'status': 'not_paid',
-                    'message': 'Nėra sąskaitų',
-                    'has_invoices': False,
-                    'invoice_issued': self.client_invoice_issued
-                }
-            
-            invoices = SalesInvoice.objects.filter(id__in=invoice_ids)
-            count = invoices.count()
-            paid_count = invoices.filter(payment_status='paid').count()
-            partially_count = invoices.filter(payment_status='partially_paid').count()
-            unpaid_count = invoices.filter(payment_status='unpaid').count()
-            overdue_count = invoices.filter(payment_status='overdue').count()
+        """
+        Grąžina detalų mokėjimo būklės informaciją iš TIKRŲ sąskaitų mokėjimo būsenų.
+        Skaičiuojama iš sales_invoices_* suvestinės laukų - be papildomų DB užklausų.
+        """
+        from django.utils import timezone
 
-            from django.utils import timezone
-            today = timezone.now().date()
-            overdue_invoices = invoices.filter(
-                payment_status__in=('unpaid', 'overdue'),
-                due_date__lt=today
-            )
-
-            # Statusas iš TIKRŲ sąskaitų mokėjimo būsenų, ne iš order.client_payment_status
-            if count > 0 and paid_count == count:
-                last_paid = invoices.filter(payment_status='paid').order_by('-payment_date').first()
-                payment_date_iso = last_paid.payment_date.isoformat() if getattr(last_paid, 'payment_date', None) else None
-                return {
-                    'status': 'paid',
-                    'message': 'Apmokėta',
-                    'has_invoices': True,
-                    'invoice_issued': self.client_invoice_issued,
-                    'payment_date': payment_date_iso
-                }
-            if paid_count > 0 or partially_count > 0:
-                return {
-                    'status': 'partially_paid',
-                    'message': 'Dalinai apmokėta',
-                    'has_invoices': True,
-                    'invoice_issued': self.client_invoice_issued
-                }
-            if overdue_invoices.exists():
-                max_overdue = overdue_invoices.order_by('due_date').first()
-                overdue_days = (today - max_overdue.due_date).days
-                return {
-                    'status': 'overdue',
-                    'message': f'Vėluoja apmokėti ({overdue_days} d.)',
-                    'has_invoices': True,
-                    'invoice_issued': self.client_invoice_issued,
-                    'overdue_days': overdue_days
-                }
+        client_invoice_issued = self.client_invoice_issued
+        if self.pk is None:
             return {
                 'status': 'not_paid',
-                'message': 'Neapmokėta',
-                'has_invoices': True,
-                'invoice_issued': self.client_invoice_issued
+                'message': 'Nėra sąskaitų',
+                'has_invoices': False,
+                'invoice_issued': False
             }
-        except Exception as e:
+        count = self.sales_invoices_count or 0
+        if not count:
             return {
                 'status': 'not_paid',
-                'message': 'Neapmokėta',
+                'message': 'Nėra sąskaitų',
                 'has_invoices': False,
-                'invoice_issued': False
+                'invoice_issued': client_invoice_issued
+            }
+        if self.sales_invoices_paid_count == count:
+            payment_date = self.sales_invoices_last_payment_date
+            return {
+                'status': 'paid',
+                'message': 'Apmokėta',
+                'has_invoices': True,
+                'invoice_issued': client_invoice_issued,
+                'payment_date': payment_date.isoformat() if payment_date else None
+            }
+        if self.sales_invoices_paid_count or self.sales_invoices_partially_paid_count:
+            return {
+                'status': 'partially_paid',
+                'message': 'Dalinai apmokėta',
+                'has_invoices': True,
+                'invoice_issued': client_invoice_issued
             }
+        today = timezone.now().date()
+        earliest_due_date = self.sales_invoices_earliest_due_date
+        if earliest_due_date and earliest_due_date < today:
+            overdue_days = (today - earliest_due_date).days
+            return {
+                'status': 'overdue',
+                'message': f'Vėluoja apmokėti ({overdue_days} d.)',
+                'has_invoices': True,
+                'invoice_issued': client_invoice_issued,
+                'overdue_days': overdue_days
+            }
+        return {
+            'status': 'not_paid',
+            'message': 'Neapmokėta',
+            'has_invoices': True,
+            'invoice_issued': client_invoice_issued
+        }
+
+    @property
+    def has_overdue_invoices(self):
+        """Ar yra neapmokėtų sąskaitų, kurių terminas praėjęs"""
+        from django.utils import timezone
+
+        if self.sales_invoices_overdue_count:
+            return True
+        earliest_due_date = self.sales_invoices_earliest_due_date
+        return bool(earliest_due_date and earliest_due_date < timezone.now().date())
 
     @property
     def mail_attachment_indicator(self):
@@ -711,6 +755,13 @@ class OrderCarrier(models.Model):
         verbose_name=_('Ekspedicijos numeris'),
         db_index=True,
     )
+    # Išskaidytas numeris tarpų paieškai (apps.core.numbering, nustatoma save() metu)
+    number_prefix = models.CharField(
+        max_length=32, blank=True, default='', editable=False, verbose_name=_('Numerio prefiksas')
+    )
+    number_suffix = models.PositiveBigIntegerField(
+        null=True, blank=True, editable=False, verbose_name=_('Numerio skaitinė dalis')
+    )
     carrier_type = models.CharField(
         max_length=20,
         choices=CarrierType.choices,
@@ -807,6 +858,16 @@ class OrderCarrier(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    NUMBER_FIELD = 'expedition_number'
+    NUMBER_PREFIX_SOURCES = EXPEDITION_NUMBER_PREFIX_SOURCES
+    # update() / bulk_* taip pat nustato number_prefix / number_suffix (apps.core.numbering)
+    objects = NumberPartsQuerySet.as_manager()
+
+    @classmethod
+    def number_prefixes(cls):
+        """Numerių prefiksai iš nustatymų - numeris skaidomas pagal juos (apps.core.numbering)"""
+        return expedition_number_prefixes()
+
     class Meta:
         db_table = 'order_carriers'
         verbose_name = _('Užsakymo vežėjas/Sandėlys')
@@ -814,6 +875,7 @@ class OrderCarrier(models.Model):
         ordering = ['sequence_order', 'id']
         indexes = [
             models.Index(fields=['expedition_number']),
+            models.Index(fields=['number_prefix', 'number_suffix']),
         ]
     
     def __str__(self):
@@ -944,6 +1006,7 @@ class OrderCarrier(models.Model):
             except OrderCarrier.DoesNotExist:
                 pass
         
+        set_number_parts(self, 'expedition_number', kwargs)
         super().save(*args, **kwargs)
         
         # Sinchronizuoti payment_status su susijusiais PurchaseInvoice
@@ -1246,6 +1309,13 @@ class OrderCost(models.Model):
         verbose_name=_('Išlaidų numeris'),
         db_index=True,
     )
+    # Išskaidytas numeris tarpų paieškai (apps.core.numbering, nustatoma save() metu)
+    number_prefix = models.CharField(
+        max_length=32, blank=True, default='', editable=False, verbose_name=_('Numerio prefiksas')
+    )
+    number_suffix = models.PositiveBigIntegerField(
+        null=True, blank=True, editable=False, verbose_name=_('Numerio skaitinė dalis')
+    )
 
     # Finansinė informacija
     amount_net = models.DecimalField(
@@ -1322,6 +1392,16 @@ class OrderCost(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    NUMBER_FIELD = 'expedition_number'
+    NUMBER_PREFIX_SOURCES = EXPEDITION_NUMBER_PREFIX_SOURCES
+    # update() / bulk_* taip pat nustato number_prefix / number_suffix (apps.core.numbering)
+    objects = NumberPartsQuerySet.as_manager()
+
+    @classmethod
+    def number_prefixes(cls):
+        """Numerių prefiksai iš nustatymų - numeris skaidomas pagal juos (apps.core.numbering)"""
+        return expedition_number_prefixes()
+
     class Meta:
         db_table = 'order_costs'
         verbose_name = _('Papildoma išlaida')
@@ -1331,6 +1411,7 @@ class OrderCost(models.Model):
             models.Index(fields=['order', 'cost_type']),
             models.Index(fields=['expedition_number']),
             models.Index(fields=['status', 'due_date']),
+            models.Index(fields=['number_prefix', 'number_suffix']),
         ]
 
     def __str__(self):
@@ -1370,6 +1451,7 @@ class OrderCost(models.Model):
             from datetime import timedelta
             self.due_date = self.invoice_date + timedelta(days=30)
 
+        set_number_parts(self, 'expedition_number', kwargs)
         super().save(*args, **kwargs)
 
     @property
@@ -1553,3 +1635,65 @@ class RouteStop(models.Model):
 
     def __str__(self):
         return f"{self.get_stop_type_display()} - {self.city or '?'}, {self.country or '?'}"
+
+
+class OrderSearchToken(models.Model):
+    """
+    Užsakymų paieškos indeksas (inverted index): vienas įrašas - užsakymas ir normalizuotas žodis
+    iš jo paieškos dokumento. Pildomas apps.orders.search_index.
+    """
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='search_tokens',
+        db_index=False,
+        verbose_name=_('Užsakymas')
+    )
+    token = models.CharField(max_length=64, verbose_name=_('Žodis'))
+
+    class Meta:
+        db_table = 'order_search_tokens'
+        verbose_name = _('Užsakymo paieškos žodis')
+        verbose_name_plural = _('Užsakymų paieškos žodžiai')
+        unique_together = [['order', 'token']]
+        indexes = [
+            # Žodžių paieška (token IN (...)) - order_id imamas iš indekso
+            models.Index(fields=['token', 'order'], name='order_search_token_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.order_id}: {self.token}"
+
+
+class OrderSearchWord(models.Model):
+    """
+    Užsakymų paieškos žodynas: unikalūs OrderSearchToken žodžiai. Dalies žodžio paieška (LIKE '%q%')
+    skenuoja tik žodyną, o užsakymai randami per OrderSearchToken (token, order) indeksą.
+    """
+    token = models.CharField(max_length=64, unique=True, verbose_name=_('Žodis'))
+
+    class Meta:
+        db_table = 'order_search_words'
+        verbose_name = _('Paieškos žodyno žodis')
+        verbose_name_plural = _('Paieškos žodynas')
+
+    def __str__(self):
+        return self.token
+
+
+class AutoStatusScheduleState(models.Model):
+    """
+    Planuojamų (nuo datos priklausančių) statusų perėjimų būsena: vienas įrašas (pk=1).
+    Eilutė užrakinama vykdymo metu, todėl keli procesai to paties intervalo neapdoroja dukart.
+    """
+    last_run_at = models.DateTimeField(null=True, blank=True, verbose_name=_('Paskutinis vykdymas'))
+    last_changed = models.PositiveIntegerField(default=0, verbose_name=_('Pakeista užsakymų'))
+    updated_at = models.DateTimeField(auto_now=True, verbose_name=_('Atnaujinta'))
+
+    class Meta:
+        db_table = 'order_auto_status_schedule'
+        verbose_name = _('Planuojamų statusų perėjimų būsena')
+        verbose_name_plural = _('Planuojamų statusų perėjimų būsena')
+
+    def __str__(self):
+        return f"{self.last_run_at}: {self.last_changed}"
@@ -25,7 +25,7 @@ def send_new_order_notification(sender, instance: Order, created: bool, **kwargs
         from apps.settings.models import NotificationSettings
 
         # Gauname nustatymus
-        notification_settings = NotificationSettings.objects.first()
+        notification_settings = NotificationSettings.load()
         if not notification_settings or not notification_settings.email_notify_new_order_enabled:
             return  # Pranešimai išjungti
 
@@ -0,0 +1,234 @@
+"""
+Užsakymų paieškos indeksas (OrderSearchToken + OrderSearchWord).
+
+Anksčiau paieška ėjo per DRF SearchFilter: 20 laukų (dalis per JOIN į partnerius, vadybininkus,
+vežėjus) LIKE '%q%' OR grandinė + distinct() - kiekvienas paieškos simbolis skenavo visą lentelę.
+
+Dabar kiekvienam užsakymui palaikomas paieškos dokumentas - normalizuotų žodžių aibė
+(be diakritikų, mažosiomis raidėmis), o OrderSearchWord - visų žodžių žodynas. Paieška:
+- kiekvienas užklausos žodis (>= MIN_INFIX_LENGTH simbolių) ieškomas žodyne kaip dalis žodžio
+  (LIKE '%q%' tik per unikalius žodžius), užsakymai randami per (token, order_id) indeksą,
+- užsakymas turi turėti visus užklausos žodžius (AND) - tai tik kandidatų aibė,
+- tarp kandidatų rezultatą nustato tas pats SearchFilter (icontains) ir datų / kainų sąlygos,
+  todėl rezultatai tokie patys kaip be indekso, tik LIKE tikrinamas keliems užsakymams.
+Per trumpi arba per dažni žodžiai kandidatų neriboja (tada tikrinama visa lentelė, kaip anksčiau).
+
+Indeksas atnaujinamas po transakcijos commit (Order, OrderCarrier, Partner, vadybininko User signal'ai),
+pilnas perskaičiavimas - manage.py rebuild_order_search_index.
+Migracija 0069 turi savo tokenizer'io kopiją - pakeitus normalize_text / tokenize, perskaičiuoti indeksą.
+"""
+
+import logging
+import re
+import threading
+import unicodedata
+from typing import Dict, Iterable, List, Set
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+TOKEN_MAX_LENGTH = 64
+# Daugiau žodžių kandidatams riboti nenaudojama (kiekvienas žodis - atskiras JOIN)
+MAX_QUERY_TOKENS = 8
+# Trumpesni užklausos žodžiai atitiktų didelę žodyno dalį - kandidatų neriboja
+MIN_INFIX_LENGTH = 3
+# Jei žodį turi daugiau žodyno įrašų - žodis per dažnas, kandidatų neriboja
+MAX_WORD_MATCHES = 2000
+
+# Order laukai, patenkantys į paieškos dokumentą (buvę OrderViewSet.search_fields)
+ORDER_DOCUMENT_FIELDS = [
+    'order_number', 'client_order_number',
+    'client__name', 'client__code', 'manager__username', 'order_type',
+    'route_from', 'route_to',
+    'route_from_country', 'route_from_city', 'route_from_address',
+    'route_to_country', 'route_to_city', 'route_to_address',
+    'sender_route_from', 'receiver_route_to', 'vehicle_type', 'notes',
+]
+CARRIER_DOCUMENT_FIELDS = ['partner__name', 'partner__code', 'expedition_number']
+
+_TOKEN_RE = re.compile(r'[^\W_]+')
+_pending = threading.local()
+
+
+def is_order_search_index_enabled() -> bool:
+    return getattr(settings, 'ORDER_SEARCH_INDEX_ENABLED', True)
+
+
+# Sąmoningai ne apps.core.text: žodžiai saugomi OrderSearchToken, todėl tokenizavimas čia keičiamas
+# tik kartu su indekso perskaičiavimu (rebuild_order_search_index)
+def normalize_text(text) -> str:
+    """Mažosios raidės be diakritikų (ą -> a, š -> s), kad 'siauliai' rastų 'Šiauliai'"""
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    return ''.join(char for char in text if not unicodedata.combining(char))
+
+
+def tokenize(text) -> List[str]:
+    if not text:
+        return []
+    return [token[:TOKEN_MAX_LENGTH] for token in _TOKEN_RE.findall(normalize_text(text))]
+
+
+def compute_order_tokens(order_ids: Iterable[int]) -> Dict[int, Set[str]]:
+    """Apskaičiuoti užsakymų paieškos žodžius (2 užklausos bet kokiam užsakymų kiekiui)"""
+    from apps.orders.models import Order, OrderCarrier
+
+    order_ids = list(order_ids)
+    tokens_by_order = {}
+
+    for row in Order.objects.filter(pk__in=order_ids).values_list('pk', *ORDER_DOCUMENT_FIELDS):
+        tokens = set()
+        for value in row[1:]:
+            tokens.update(tokenize(value))
+        tokens_by_order[row[0]] = tokens
+
+    for row in OrderCarrier.objects.filter(order_id__in=order_ids).values_list('order_id', *CARRIER_DOCUMENT_FIELDS):
+        tokens = tokens_by_order.get(row[0])
+        if tokens is None:
+            continue
+        for value in row[1:]:
+            tokens.update(tokenize(value))
+
+    return tokens_by_order
+
+
+def reindex_orders(order_ids: Iterable[int], chunk_size: int = 1000) -> int:
+    """
+    Atnaujinti užsakymų žodžius (paketais): įrašomi tik nauji, šalinami tik dingę.
+    Nauji žodžiai papildo žodyną (OrderSearchWord); nebenaudojami šalinami prune_search_words().
+
+    Returns:
+        Pakeistų (įterptų + ištrintų) įrašų skaičius
+    """
+    from apps.orders.models import OrderSearchToken, OrderSearchWord
+
+    order_ids = sorted({order_id for order_id in order_ids if order_id})
+    changed = 0
+
+    for start in range(0, len(order_ids), chunk_size):
+        chunk = order_ids[start:start + chunk_size]
+        wanted = compute_order_tokens(chunk)
+        existing = {}
+        for row_id, order_id, token in (
+            OrderSearchToken.objects.filter(order_id__in=chunk).values_list('id', 'order_id', 'token')
+        ):
+            existing.setdefault(order_id, {})[token] = row_id
+
+        to_delete = []
+        to_create = []
+        for order_id in chunk:
+            current = existing.get(order_id, {})
+            tokens = wanted.get(order_id, set())  # ištrintas užsakymas - žodžiai šalinami
+            to_delete.extend(row_id for token, row_id in current.items() if token not in tokens)
+            to_create.extend(
+                OrderSearchToken(order_id=order_id, token=token) for token in tokens if token not in current
+            )
+
+        if to_delete:
+            OrderSearchToken.objects.filter(id__in=to_delete).delete()
+        if to_create:
+            OrderSearchWord.objects.bulk_create(
+                [OrderSearchWord(token=token) for token in {row.token for row in to_create}],
+                batch_size=1000, ignore_conflicts=True,
+            )
+            OrderSearchToken.objects.bulk_create(to_create, batch_size=1000, ignore_conflicts=True)
+        changed += len(to_delete) + len(to_create)
+    return changed
+
+
+def prune_search_words() -> int:
+    """Pašalinti žodyno žodžius, kurių nebeturi nė vienas užsakymas (grąžina pašalintų skaičių)"""
+    from django.db.models import Exists, OuterRef
+    from apps.orders.models import OrderSearchToken, OrderSearchWord
+
+    unused = OrderSearchWord.objects.filter(
+        ~Exists(OrderSearchToken.objects.filter(token=OuterRef('token')))
+    ).values_list('id', flat=True)
+    removed = 0
+    while True:
+        ids = list(unused[:1000])
+        if not ids:
+            return removed
+        removed += OrderSearchWord.objects.filter(id__in=ids).delete()[0]
+
+
+def _flush_pending():
+    order_ids = getattr(_pending, 'order_ids', None)
+    _pending.order_ids = None
+    if not order_ids:
+        return
+    try:
+        reindex_orders(order_ids)
+    except Exception as e:
+        logger.error(f"Klaida atnaujinant užsakymų paieškos indeksą {sorted(order_ids)[:20]}: {e}", exc_info=True)
+
+
+def schedule_order_search_reindex(order_ids: Iterable[int]):
+    """Pažymėti užsakymus indekso atnaujinimui po transakcijos commit (sujungiama per transakciją)"""
+    if not is_order_search_index_enabled():
+        return
+    order_ids = {order_id for order_id in order_ids if order_id}
+    if not order_ids:
+        return
+    pending = getattr(_pending, 'order_ids', None)
+    if pending is None:
+        _pending.order_ids = pending = set()
+    pending.update(order_ids)
+    # Kaip ir mokėjimų suvestinėje - callback registruojamas kiekvieną kartą, įvykdomas tik pirmasis
+    transaction.on_commit(_flush_pending)
+
+
+def partner_order_ids(partner_id) -> Set[int]:
+    """Užsakymai, kurių dokumente yra partnerio pavadinimas/kodas (klientas arba vežėjas)"""
+    from apps.orders.models import Order, OrderCarrier
+
+    order_ids = set(Order.objects.filter(client_id=partner_id).values_list('pk', flat=True))
+    order_ids.update(OrderCarrier.objects.filter(partner_id=partner_id).values_list('order_id', flat=True))
+    return order_ids
+
+
+def manager_order_ids(user_id) -> Set[int]:
+    """Užsakymai, kurių dokumente yra vadybininko username"""
+    from apps.orders.models import Order
+
+    return set(Order.objects.filter(manager_id=user_id).values_list('pk', flat=True))
+
+
+def order_search_candidates(terms: Iterable[str]):
+    """
+    Subquery (order_id): užsakymai, kurių dokumente yra visi užklausos žodžiai (kaip žodžio dalis).
+
+    Tai SearchFilter rezultatų viršaibis: jei laukas turi 'q' (icontains), tai normalizuotas laukas
+    turi normalizuotą 'q', o kiekvienas 'q' žodis yra kurio nors lauko žodžio dalis.
+    Grąžina None, jei nė vienas žodis kandidatų neriboja (per trumpi / per dažni).
+    """
+    from apps.orders.models import OrderSearchToken, OrderSearchWord
+
+    word_sets = []
+    seen = set()
+    for term in terms:
+        for token in tokenize(term):
+            if token in seen or not MIN_INFIX_LENGTH <= len(token) < TOKEN_MAX_LENGTH:
+                continue
+            seen.add(token)
+            words = list(
+                OrderSearchWord.objects.filter(token__contains=token)
+                .values_list('token', flat=True)[:MAX_WORD_MATCHES + 1]
+            )
+            if len(words) > MAX_WORD_MATCHES:
+                continue
+            if not words:
+                return OrderSearchToken.objects.none().values('order_id')
+            word_sets.append(words)
+    if not word_sets:
+        return None
+
+    # Pirmas - rečiausias žodis (mažiausiai žodyno atitikmenų): jis skenuojamas indekse,
+    # kiti tikrinami per (order_id, token) unikalų indeksą tik jo rastiems užsakymams
+    word_sets = sorted(word_sets, key=len)[:MAX_QUERY_TOKENS]
+    matches = OrderSearchToken.objects.filter(token__in=word_sets[0])
+    for words in word_sets[1:]:
+        # Atskiras filter() - kiekvienam žodžiui atskiras JOIN (gali būti skirtingos eilutės)
+        matches = matches.filter(order__search_tokens__token__in=words)
+    return matches.values('order_id')
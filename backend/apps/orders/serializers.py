@@ -8,6 +8,7 @@ from .models import OrderCarrierDocument
 from apps.auth.serializers import UserSerializer
 from apps.invoices.models import SalesInvoice
 from apps.settings.models import ExpeditionSettings
+from apps.core.serializers import SparseFieldsMixin
 
 logger = logging.getLogger(__name__)
 
@@ -249,12 +250,16 @@ class OrderCarrierSerializer(serializers.ModelSerializer):
             # Jei klaida, grąžinti esamą status_display
             return getattr(obj, 'status_display', 'Naujas')
     
+    def _get_context_order(self, obj):
+        """Užsakymas su prefetch'intomis pirkimo sąskaitomis (perduodamas per context)"""
+        return self.context.get('order') if self.context else None
+
     def get_payment_status_info(self, obj):
         """
         Vežėjo apmokėjimo statusas iš TIKRŲ pirkimo sąskaitų (PurchaseInvoice), ne iš OrderCarrier.payment_status,
         kad sąraše būtų rodoma teisinga būsena (žalia tik kai sąskaita tikrai apmokėta).
         """
-        order = self.context.get('order') if self.context else None
+        order = self._get_context_order(obj)
         if order and getattr(obj, 'partner_id', None):
             invoices = []
             if hasattr(order, 'purchase_invoices'):
@@ -611,7 +616,7 @@ class RouteStopSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Užsakymo serializer"""
     client = PartnerSerializer(read_only=True)
     client_id = serializers.IntegerField(write_only=True)
@@ -635,72 +640,9 @@ class OrderSerializer(serializers.ModelSerializer):
             return getattr(obj, 'order_type', '') or ''
 
     def get_payment_status_info(self, obj):
-        """Optimizuotas: skaičiuoja iš prefetched sales_invoices pagal TIKRĄ sąskaitų payment_status, ne order.client_payment_status."""
+        """Iš užsakymo sales_invoices_* suvestinės (Order.payment_status_info) - be papildomų DB užklausų."""
         try:
-            if obj.pk is None:
-                return {
-                    'status': 'not_paid',
-                    'message': 'Nėra sąskaitų',
-                    'has_invoices': False,
-                    'invoice_issued': False
-                }
-            invoices = []
-            if hasattr(obj, 'sales_invoices'):
-                invoices.extend(obj.sales_invoices.all())
-            if hasattr(obj, 'order_sales_invoices'):
-                for link in obj.order_sales_invoices.all():
-                    inv = getattr(link, 'invoice', None)
-                    if inv and inv.id not in (i.id for i in invoices):
-                        invoices.append(inv)
-            client_invoice_issued = getattr(obj, 'client_invoice_issued', False)
-            if not invoices:
-                return {
-                    'status': 'not_paid',
-                    'message': 'Nėra sąskaitų',
-                    'has_invoices': False,
-                    'invoice_issued': client_invoice_issued
-                }
-            # Statusas iš TIKRŲ sąskaitų mokėjimo būsenų (kaip Order.payment_status_info modelyje)
-            count = len(invoices)
-            paid_count = sum(1 for i in invoices if getattr(i, 'payment_status', None) == 'paid')
-            partially_count = sum(1 for i in invoices if getattr(i, 'payment_status', None) == 'partially_paid')
-            from django.utils import timezone
-            today = timezone.now().date()
-            overdue_invoices = [i for i in invoices if getattr(i, 'payment_status', None) in ('unpaid', 'overdue') and getattr(i, 'due_date', None) and i.due_date < today]
-            if count > 0 and paid_count == count:
-                paid_list = [i for i in invoices if getattr(i, 'payment_status', None) == 'paid']
-                last_paid = max(paid_list, key=lambda i: (getattr(i, 'payment_date', None) or date.min, getattr(i, 'id', 0))) if paid_list else None
-                payment_date_iso = last_paid.payment_date.isoformat() if last_paid and getattr(last_paid, 'payment_date', None) else None
-                return {
-                    'status': 'paid',
-                    'message': 'Apmokėta',
-                    'has_invoices': True,
-                    'invoice_issued': client_invoice_issued,
-                    'payment_date': payment_date_iso
-                }
-            if paid_count > 0 or partially_count > 0:
-                return {
-                    'status': 'partially_paid',
-                    'message': 'Dalinai apmokėta',
-                    'has_invoices': True,
-                    'invoice_issued': client_invoice_issued
-                }
-            if overdue_invoices:
-                max_overdue = min(overdue_invoices, key=lambda i: i.due_date)
-                overdue_days = (today - max_overdue.due_date).days
-                return {
-                    'status': 'overdue',
-                    'message': f'Vėluoja apmokėti ({overdue_days} d.)',
-                    'has_invoices': True,
-                    'invoice_issued': client_invoice_issued,
-                    'overdue_days': overdue_days
-                }
-            return {
-                'status': 'not_paid',
-                'message': 'Neapmokėta',
-                'has_invoices': True,
-                'invoice_issued': client_invoice_issued
-            }
+            return obj.payment_status_info
         except (AttributeError, Exception):
             return {
                 'status': 'not_paid',
@@ -793,9 +735,8 @@ class OrderSerializer(serializers.ModelSerializer):
             traceback.print_exc()
             return []
 
-    # Sąskaitų informacija
+    # Sąskaitų informacija (sales_invoices_count - modelio suvestinės laukas)
     first_sales_invoice = serializers.SerializerMethodField()
-    sales_invoices_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Order
@@ -821,7 +762,7 @@ class OrderSerializer(serializers.ModelSerializer):
             'notes', 'created_at', 'updated_at', 'created_by', 'carriers', 'cargo_items', 'route_stops', 'costs',
             'first_sales_invoice', 'sales_invoices_count'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at', 'created_by']
+        read_only_fields = ['id', 'created_at', 'updated_at', 'created_by', 'sales_invoices_count']
     
     def validate_client_id(self, value):
         """Tikrina ar partneris yra klientas"""
@@ -1150,17 +1091,109 @@ class OrderSerializer(serializers.ModelSerializer):
             pass
         return None
 
-    def get_sales_invoices_count(self, obj):
-        """Optimizuotas: tik prefetched sales_invoices ir order_sales_invoices, be papildomų DB užklausų."""
-        try:
-            invoice_ids = set()
-            if hasattr(obj, 'sales_invoices'):
-                invoice_ids.update(inv.id for inv in obj.sales_invoices.all())
-            if hasattr(obj, 'order_sales_invoices'):
-                invoice_ids.update(link.invoice_id for link in obj.order_sales_invoices.all() if getattr(link, 'invoice_id', None))
-            return len(invoice_ids)
-        except (AttributeError, Exception):
-            return 0
+class OrderCarrierListSerializer(OrderCarrierSerializer):
+    """Supaprastintas vežėjų serializer užsakymų sąrašui (lentelės stulpeliai ir tooltip'ai)"""
+    partner = serializers.SerializerMethodField()
+
+    def get_partner(self, obj):
+        partner = obj.partner
+        if partner is None:
+            return None
+        return {'id': partner.id, 'name': partner.name, 'code': getattr(partner, 'code', '')}
+
+    def _get_context_order(self, obj):
+        # Vežėjai serializuojami vienu nested lauku (be context per užsakymą) - užsakymas imamas
+        # iš prefetch'o cache (carrier.order), kartu su jo purchase_invoices prefetch'ais
+        return obj._state.fields_cache.get('order')
+
+    class Meta(OrderCarrierSerializer.Meta):
+        fields = [
+            'id', 'partner', 'carrier_type', 'carrier_type_display', 'expedition_number', 'sequence_order',
+            'price_net', 'status', 'status_display',
+            'invoice_issued', 'invoice_received', 'due_date',
+            'payment_status', 'payment_status_display', 'payment_date', 'payment_status_info',
+            'documents',
+        ]
+
+
+# OrderCarrier stulpeliai, kurių reikia OrderCarrierListSerializer (įskaitant payment_status_info)
+ORDER_CARRIER_LIST_COLUMNS = [
+    'id', 'order_id', 'partner_id', 'carrier_type', 'expedition_number', 'sequence_order',
+    'price_net', 'status', 'invoice_issued', 'invoice_received', 'due_date',
+    'payment_status', 'payment_date',
+]
+
+
+class OrderListSerializer(OrderSerializer):
+    """Supaprastintas serializer užsakymų sąrašui - tik lentelėje rodomi stulpeliai"""
+    client = serializers.SerializerMethodField()
+    carriers = OrderCarrierListSerializer(many=True, read_only=True)
+
+    def get_client(self, obj):
+        client = obj.client
+        if client is None:
+            return None
+        return {'id': client.id, 'name': client.name, 'code': getattr(client, 'code', '')}
+
+    class Meta:
+        model = Order
+        fields = [
+            'id', 'order_number', 'client_order_number', 'client', 'order_type', 'status', 'status_display',
+            'order_date', 'loading_date', 'unloading_date', 'created_at',
+            'client_price_net', 'calculated_client_price_net', 'carrier_price_net_total', 'other_costs', 'vat_rate',
+            'client_invoice_issued', 'client_payment_status', 'client_payment_status_display',
+            'has_overdue_invoices', 'payment_status_info', 'first_sales_invoice', 'sales_invoices_count',
+            'route_from', 'route_to', 'route_from_country', 'route_from_postal_code', 'route_from_city', 'route_from_address',
+            'route_to_country', 'route_to_postal_code', 'route_to_city', 'route_to_address',
+            'sender_route_from', 'receiver_route_to',
+            'carriers',
+        ]
+
+
+# Serializer'io laukai, kurie nėra Order stulpeliai -> stulpeliai, kurių jiems reikia (sparse fieldset only())
+ORDER_COMPUTED_FIELD_COLUMNS = {
+    'status_display': ['status'],
+    'order_type_display': ['order_type'],
+    'route_type_display': ['route_type'],
+    'client_payment_status_display': ['client_payment_status'],
+    'price_with_vat': ['price_net', 'vat_rate'],
+    'vat_amount': ['price_net', 'vat_rate'],
+    'client_price_with_vat': ['client_price_net', 'vat_rate'],
+    'client_vat_amount': ['client_price_net', 'vat_rate'],
+    'calculated_client_price_net': ['my_price_net', 'other_costs'],
+    'has_overdue_invoices': ['sales_invoices_overdue_count', 'sales_invoices_earliest_due_date'],
+    'payment_status_info': [
+        'client_invoice_issued', 'sales_invoices_count', 'sales_invoices_paid_count',
+        'sales_invoices_partially_paid_count', 'sales_invoices_earliest_due_date', 'sales_invoices_last_payment_date',
+    ],
+    # Ryšiai - užkraunami prefetch'u
+    'carriers': [],
+    'carrier_price_net_total': [],
+    'cargo_items': [],
+    'route_stops': [],
+    'costs': [],
+    'first_sales_invoice': [],
+}
+
+
+def get_order_only_columns(field_names) -> Optional[set]:
+    """
+    Order stulpeliai only() pagal serializer'io laukus.
+    Grąžina None, jei bent vieno lauko stulpeliai nežinomi - tada only() netaikomas.
+    """
+    concrete = {}
+    for field in Order._meta.concrete_fields:
+        concrete[field.name] = field.name
+        concrete[field.attname] = field.name
+    columns = {'id'}
+    for name in field_names:
+        if name in concrete:
+            columns.add(concrete[name])
+        elif name in ORDER_COMPUTED_FIELD_COLUMNS:
+            columns.update(ORDER_COMPUTED_FIELD_COLUMNS[name])
+        else:
+            return None
+    return columns
 
 
 class OrderStatusChangeSerializer(serializers.Serializer):
@@ -0,0 +1,637 @@
+"""
+Automatinio užsakymų statusų keitimo taisyklės (OrderAutoStatusRule) - sukompiliuotos.
+
+Anksčiau pre_save kiekvienam Order išsaugojimui skaitė taisykles iš DB, o kiekviena JSON sąlyga
+(evaluate_condition) vykdė savo order.carriers užklausą. apply_status_rules kvietė order.save()
+kiekvienam užsakymui - N išsaugojimų ir N×M užklausų.
+
+Dabar:
+- taisyklės sukompiliuojamos vieną kartą į predikatus (get_compiled_rules) ir laikomos proceso
+  atmintyje kartu su versijos žyme (settings_versions, kaip singleton nustatymų cache); taisyklę
+  išsaugojus / ištrynus žymė pakeičiama, todėl kiti worker'iai perkompiliuoja nuo kitos užklausos;
+- kiekviena sąlyga turi dvi formas: Python predikatą vienam užsakymui (pre_save, vežėjai nuskaitomi
+  viena užklausa ir tik jei jų reikia) ir SQL filtrą (Q) visai užsakymų aibei;
+- apply_status_rules_batch() kiekvienai taisyklei parenka atitinkančius užsakymus viena SELECT užklausa
+  ir pakeičia statusą UPDATE užklausa kiekvienai taisyklei (be save() ir signal'ų - replica outbox,
+  dashboard snapshot papildomi rankiniu būdu);
+- datos sąlygos pasikeičia tik keičiantis dienai, todėl planuoklis (atskiras procesas
+  manage.py run_scheduled_status_transitions --loop, kas ORDER_STATUS_SCHEDULE_INTERVAL sek., arba cron) tikrina tik
+  užsakymus, kurių datos pateko tarp senos ir naujos sąlygos ribos (indeksai status + loading_date / unloading_date).
+
+Datos lyginamos kaip ir anksčiau: loading_date.date() (UTC) su timezone.now().date().
+Sąlygos, kurioms Order neturi laukų (total_amount, priority, cargo_type, international_transport)
+ar kurios dar neįgyvendintos (TODO) - niekada netenkinamos.
+"""
+
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+from typing import Dict, Iterable, List, Optional
+
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# test(order, carriers, now) -> bool; q(now) -> Q; needs_carriers - test naudoja vežėjų sąrašą;
+# flip(since, now) -> Q užsakymų, kurių reikšmė galėjo pasikeisti vien dėl laiko (None - nuo laiko nepriklauso)
+Condition = namedtuple('Condition', 'type test q needs_carriers flip', defaults=(None,))
+CompiledRule = namedtuple('CompiledRule', 'pk from_status to_status logic_operator conditions needs_carriers')
+StatusChange = namedtuple('StatusChange', 'order_id order_number from_status to_status rule_id')
+
+# Niekada / visada tenkinamos sąlygos SQL pavidalu (tuščias Q() sujungiant per | būtų ignoruojamas)
+MATCH_NONE = Q(pk__in=[])
+MATCH_ALL = ~Q(pk__in=[])
+
+_rules_cache = None  # (versijos žymė, {from_status: [CompiledRule, ...]})
+_rules_lock = threading.Lock()
+_pending = threading.local()
+
+
+def _as_date(value):
+    return value.date() if hasattr(value, 'date') else value
+
+
+def _day_start(day):
+    """Dienos pradžia UTC - datetime laukų palyginimas SQL'e atitinka value.date() (UTC) Python'e"""
+    return datetime.combine(day, dt_time.min, tzinfo=dt_timezone.utc)
+
+
+def _never(cond_type):
+    return Condition(cond_type, lambda order, carriers, now: False, lambda now: MATCH_NONE, False)
+
+
+def _carriers_query(**filters):
+    from .models import OrderCarrier
+
+    return OrderCarrier.objects.filter(order=OuterRef('pk'), **filters)
+
+
+def _window(field, start, end):
+    """Lauko reikšmės intervale [start, end) - indeksuotas intervalo skenavimas"""
+    if start >= end:
+        return MATCH_NONE
+    return Q(**{f'{field}__gte': start, f'{field}__lt': end})
+
+
+def _calendar_flip(key):
+    """Sąlyga, priklausanti tik nuo laiko (savaitės diena, valanda) - pasikeitus key, gali pasikeisti visiems"""
+    return lambda since, now: MATCH_ALL if key(since) != key(now) else MATCH_NONE
+
+
+def _date_condition(cond_type, field, compare, days=0):
+    """
+    Datos lauko palyginimas su šiandiena (minus days):
+    'lt' - data anksčiau, 'eq' - ta pati diena, 'gt' - vėliau.
+    """
+    def test(order, carriers, now):
+        value = getattr(order, field)
+        if not value:
+            return False
+        day = _as_date(value)
+        reference = now.date() - timedelta(days=days)
+        if compare == 'lt':
+            return day < reference
+        if compare == 'eq':
+            return day == reference
+        return day > reference
+
+    def q(now):
+        start = _day_start(now.date() - timedelta(days=days))
+        end = start + timedelta(days=1)
+        if compare == 'lt':
+            return Q(**{f'{field}__lt': start})
+        if compare == 'eq':
+            return Q(**{f'{field}__gte': start, f'{field}__lt': end})
+        return Q(**{f'{field}__gte': end})
+
+    def flip(since, now):
+        # Riba (šiandiena - days) pasislinko nuo since iki now - reikšmė pasikeitė tik tarp senos ir naujos ribos
+        old_start = _day_start(since.date() - timedelta(days=days))
+        new_start = _day_start(now.date() - timedelta(days=days))
+        one_day = timedelta(days=1)
+        if compare == 'lt':
+            return _window(field, old_start, new_start)
+        if compare == 'eq':
+            if old_start == new_start:
+                return MATCH_NONE
+            return _window(field, old_start, old_start + one_day) | _window(field, new_start, new_start + one_day)
+        return _window(field, old_start + one_day, new_start + one_day)
+
+    return Condition(cond_type, test, q, False, flip)
+
+
+def _field_condition(cond_type, field, value):
+    return Condition(
+        cond_type,
+        lambda order, carriers, now: getattr(order, field) == value,
+        lambda now: Q(**{field: value}),
+        False,
+    )
+
+
+def compile_condition(condition) -> Condition:
+    """JSON sąlyga {"type": "...", "params": {...}} -> Condition (ta pati logika kaip evaluate_condition)"""
+    cond_type = condition.get('type')
+    params = condition.get('params') or {}
+
+    # Vežėjo sąlygos
+    if cond_type == 'carrier_added':
+        return Condition(cond_type, lambda order, carriers, now: bool(carriers),
+                         lambda now: Q(Exists(_carriers_query())), True)
+
+    if cond_type == 'carrier_not_exists':
+        return Condition(cond_type, lambda order, carriers, now: not carriers,
+                         lambda now: ~Q(Exists(_carriers_query())), True)
+
+    if cond_type == 'carrier_in_list':
+        carrier_ids = params.get('ids', [])
+        if not carrier_ids:
+            return _never(cond_type)
+        id_set = {str(carrier_id) for carrier_id in carrier_ids}
+        return Condition(
+            cond_type,
+            lambda order, carriers, now: any(str(carrier.id) in id_set for carrier in carriers),
+            lambda now: Q(Exists(_carriers_query(id__in=carrier_ids))),
+            True,
+        )
+
+    # Datos sąlygos
+    if cond_type == 'dates_between':
+        def test(order, carriers, now):
+            if not order.loading_date or not order.unloading_date:
+                return False
+            return _as_date(order.loading_date) <= now.date() <= _as_date(order.unloading_date)
+
+        def q(now):
+            start = _day_start(now.date())
+            return Q(loading_date__lt=start + timedelta(days=1), unloading_date__gte=start)
+
+        def flip(since, now):
+            old_start, new_start = _day_start(since.date()), _day_start(now.date())
+            one_day = timedelta(days=1)
+            return (
+                _window('loading_date', old_start + one_day, new_start + one_day)
+                | _window('unloading_date', old_start, new_start)
+            )
+
+        return Condition(cond_type, test, q, False, flip)
+
+    if cond_type == 'unloading_passed':
+        return _date_condition(cond_type, 'unloading_date', 'lt', days=params.get('days_after_unloading', 0))
+
+    date_conditions = {
+        'loading_date_is_today': ('loading_date', 'eq'),
+        'loading_date_passed': ('loading_date', 'lt'),
+        'loading_date_upcoming': ('loading_date', 'gt'),
+        'unloading_date_is_today': ('unloading_date', 'eq'),
+        'unloading_date_passed': ('unloading_date', 'lt'),
+        'unloading_date_upcoming': ('unloading_date', 'gt'),
+    }
+    if cond_type in date_conditions:
+        return _date_condition(cond_type, *date_conditions[cond_type])
+
+    if cond_type == 'days_since_created':
+        days = params.get('days', 0)
+        if not days:
+            return _never(cond_type)
+        # (today - created_at.date()).days >= days  <=>  created_at.date() <= today - days
+        return Condition(
+            cond_type,
+            lambda order, carriers, now: bool(order.created_at) and (now.date() - order.created_at.date()).days >= days,
+            lambda now: Q(created_at__lt=_day_start(now.date() - timedelta(days=days - 1))),
+            False,
+            lambda since, now: _window(
+                'created_at',
+                _day_start(since.date() - timedelta(days=days - 1)),
+                _day_start(now.date() - timedelta(days=days - 1)),
+            ),
+        )
+
+    # Sąskaitų sąlygos
+    if cond_type == 'docs_received_and_invoice_sent':
+        return Condition(
+            cond_type,
+            lambda order, carriers, now: (
+                bool(carriers) and all(carrier.invoice_received for carrier in carriers)
+                and bool(order.client_invoice_issued)
+            ),
+            lambda now: (
+                Q(Exists(_carriers_query())) & ~Q(Exists(_carriers_query(invoice_received=False)))
+                & Q(client_invoice_issued=True)
+            ),
+            True,
+        )
+
+    if cond_type == 'invoice_issued':
+        return _field_condition(cond_type, 'client_invoice_issued', True)
+
+    if cond_type == 'invoice_not_issued':
+        return _field_condition(cond_type, 'client_invoice_issued', False)
+
+    if cond_type in ('invoice_paid', 'client_paid'):
+        return _field_condition(cond_type, 'client_payment_status', 'paid')
+
+    if cond_type == 'invoice_not_paid':
+        return Condition(cond_type, lambda order, carriers, now: order.client_payment_status != 'paid',
+                         lambda now: ~Q(client_payment_status='paid'), False)
+
+    if cond_type == 'carriers_paid':
+        return Condition(
+            cond_type,
+            lambda order, carriers, now: bool(carriers) and all(carrier.payment_status == 'paid' for carrier in carriers),
+            lambda now: Q(Exists(_carriers_query())) & ~Q(Exists(_carriers_query().exclude(payment_status='paid'))),
+            True,
+        )
+
+    # Kategorijų sąlygos
+    if cond_type == 'client_in_list':
+        client_ids = params.get('ids', [])
+        if not client_ids:
+            return _never(cond_type)
+        return Condition(cond_type, lambda order, carriers, now: order.client_id in client_ids,
+                         lambda now: Q(client_id__in=client_ids), False)
+
+    if cond_type == 'order_type':
+        order_type = params.get('order_type')
+        if not order_type:
+            return _never(cond_type)
+        return _field_condition(cond_type, 'order_type', order_type)
+
+    # Laiko sąlygos - priklauso tik nuo dabartinio laiko
+    if cond_type == 'day_of_week':
+        day = params.get('day')
+        if not day:
+            return _never(cond_type)
+        # Monday = 1, Sunday = 7
+        return Condition(
+            cond_type,
+            lambda order, carriers, now: str(now.weekday() + 1) == str(day),
+            lambda now: MATCH_ALL if str(now.weekday() + 1) == str(day) else MATCH_NONE,
+            False,
+            _calendar_flip(lambda moment: moment.date()),
+        )
+
+    if cond_type == 'business_hours':
+        if not params.get('enabled', False):
+            return _never(cond_type)
+        def in_hours(now):
+            # Monday-Friday, 9-18
+            return 9 <= now.hour <= 18 and now.weekday() < 5
+
+        return Condition(cond_type, lambda order, carriers, now: in_hours(now),
+                         lambda now: MATCH_ALL if in_hours(now) else MATCH_NONE, False,
+                         _calendar_flip(lambda moment: (moment.date(), moment.hour)))
+
+    if cond_type == 'weekend':
+        if not params.get('enabled', False):
+            return _never(cond_type)
+        return Condition(cond_type, lambda order, carriers, now: now.weekday() >= 5,
+                         lambda now: MATCH_ALL if now.weekday() >= 5 else MATCH_NONE, False,
+                         _calendar_flip(lambda moment: moment.date()))
+
+    # Kitos sąlygos
+    if cond_type == 'has_notes':
+        if not params.get('enabled', False):
+            return _never(cond_type)
+        return Condition(cond_type, lambda order, carriers, now: bool(order.notes),
+                         lambda now: ~Q(notes=''), False)
+
+    if cond_type == 'requires_special_equipment':
+        if not params.get('enabled', False):
+            return _never(cond_type)
+        return _field_condition(cond_type, 'requires_special_equipment', True)
+
+    # overdue_more_than_days, invoice_received, invoice_not_received, profit_margin_*, has_attachments - TODO;
+    # amount_*, order_priority, cargo_type, international_transport - Order tokių laukų neturi
+    return _never(cond_type)
+
+
+def compile_rule(rule) -> Optional[CompiledRule]:
+    """OrderAutoStatusRule -> CompiledRule (None - taisyklė be sąlygų, netaikoma)"""
+    if not rule.conditions:
+        return None
+    conditions = tuple(compile_condition(condition) for condition in rule.conditions)
+    return CompiledRule(
+        pk=rule.pk,
+        from_status=rule.from_status,
+        to_status=rule.to_status,
+        logic_operator=rule.logic_operator,
+        conditions=conditions,
+        needs_carriers=any(condition.needs_carriers for condition in conditions),
+    )
+
+
+def compile_rules(rules: Iterable) -> Dict[str, List[CompiledRule]]:
+    compiled = {}
+    for rule in rules:
+        compiled_rule = compile_rule(rule)
+        if compiled_rule is not None:
+            compiled.setdefault(rule.from_status, []).append(compiled_rule)
+    return compiled
+
+
+def _load_compiled_rules() -> Dict[str, List[CompiledRule]]:
+    from apps.settings.models import OrderAutoStatusRule
+
+    return compile_rules(OrderAutoStatusRule.objects.filter(enabled=True).order_by('-priority', 'pk'))
+
+
+def get_compiled_rules() -> Dict[str, List[CompiledRule]]:
+    """
+    Įjungtos taisyklės pagal from_status, prioriteto tvarka.
+    Perkompiliuojama tik pasikeitus OrderAutoStatusRule versijos žymei.
+    """
+    global _rules_cache
+
+    from apps.settings.cache import get_version_stamp, is_settings_cache_enabled
+    from apps.settings.models import OrderAutoStatusRule
+
+    if not is_settings_cache_enabled():
+        return _load_compiled_rules()
+    try:
+        stamp = get_version_stamp(OrderAutoStatusRule)
+    except DatabaseError as e:
+        logger.warning(f"Status rules cache unavailable, compiling rules from DB: {e}")
+        return _load_compiled_rules()
+
+    cached = _rules_cache
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+    with _rules_lock:
+        compiled = _load_compiled_rules()
+        _rules_cache = (stamp, compiled)
+    return compiled
+
+
+def invalidate_compiled_rules():
+    global _rules_cache
+    _rules_cache = None
+
+
+def rule_matches(rule: CompiledRule, order, carriers, now) -> bool:
+    results = (condition.test(order, carriers, now) for condition in rule.conditions)
+    if rule.logic_operator == 'AND':
+        return all(results)
+    return any(results)
+
+
+def rule_q(rule: CompiledRule, now) -> Q:
+    """Taisyklės sąlygos kaip vienas SQL filtras"""
+    combined = None
+    for condition in rule.conditions:
+        q = condition.q(now)
+        if combined is None:
+            combined = q
+        elif rule.logic_operator == 'AND':
+            combined &= q
+        else:
+            combined |= q
+    return combined
+
+
+def order_carriers(order) -> list:
+    if order.pk is None:
+        return []
+    return list(order.carriers.all())
+
+
+def match_order_rule(order, now=None) -> Optional[CompiledRule]:
+    """Pirmoji (didžiausio prioriteto) taisyklė, kurią tenkina užsakymas jo dabartiniame statuse"""
+    from .models import Order
+
+    if order.status == Order.OrderStatus.CANCELED:
+        return None
+    rules = get_compiled_rules().get(order.status)
+    if not rules:
+        return None
+    now = now or timezone.now()
+    carriers = order_carriers(order) if any(rule.needs_carriers for rule in rules) else None
+    for rule in rules:
+        if rule_matches(rule, order, carriers, now):
+            return rule
+    return None
+
+
+def plan_status_changes(queryset=None, now=None) -> Dict[int, tuple]:
+    """
+    Kuriems užsakymams kuri taisyklė būtų pritaikyta (kaip po vieną order.save(), remiantis esama būsena).
+
+    Kiekvienai taisyklei - viena SELECT užklausa; užsakymą gauna pirmoji (didžiausio prioriteto) taisyklė.
+
+    Returns:
+        {taisyklės pk: (CompiledRule, [užsakymų pk, ...])}
+    """
+    from .models import Order
+
+    now = now or timezone.now()
+    if queryset is None:
+        queryset = Order.objects.all()
+    queryset = queryset.exclude(status=Order.OrderStatus.CANCELED)
+
+    plan = {}
+    for from_status, rules in get_compiled_rules().items():
+        if from_status == Order.OrderStatus.CANCELED:
+            continue
+        claimed = set()
+        for rule in rules:
+            pks = [
+                pk for pk in queryset.filter(rule_q(rule, now), status=from_status).values_list('pk', flat=True)
+                if pk not in claimed
+            ]
+            claimed.update(pks)
+            if pks:
+                plan[rule.pk] = (rule, pks)
+    return plan
+
+
+def apply_status_rules_batch(queryset=None, dry_run=False, batch_size=1000, now=None):
+    """
+    Pritaikyti taisykles užsakymų aibei keliomis UPDATE užklausomis (po vieną taisyklei / paketui).
+
+    Returns:
+        (atitikusių užsakymų skaičius, [StatusChange, ...])
+    """
+    from apps.core.bulk_changes import send_bulk_changed
+    from .models import Order
+
+    now = now or timezone.now()
+    plan = plan_status_changes(queryset, now=now)
+    changes = []
+    numbers = dict(
+        Order.objects.filter(pk__in=[pk for _, pks in plan.values() for pk in pks]).values_list('pk', 'order_number')
+    ) if plan else {}
+    for rule, pks in plan.values():
+        changes.extend(StatusChange(pk, numbers.get(pk), rule.from_status, rule.to_status, rule.pk) for pk in pks)
+    if dry_run or not changes:
+        return len(changes), changes
+
+    with transaction.atomic():
+        for rule, pks in plan.values():
+            for start in range(0, len(pks), batch_size):
+                chunk = pks[start:start + batch_size]
+                # status sąlyga - užsakymas galėjo pasikeisti tarp SELECT ir UPDATE
+                Order.objects.filter(pk__in=chunk, status=rule.from_status).update(
+                    status=rule.to_status, updated_at=now
+                )
+        # UPDATE nesiunčia post_save
+        send_bulk_changed(Order, pks=[change.order_id for change in changes], fields=['status', 'updated_at'])
+    for change in changes:
+        logger.info(f"Order {change.order_id} ({change.order_number}): batch rule {change.from_status} -> {change.to_status}")
+    return len(changes), changes
+
+
+# --- Užsakymų perskaičiavimas pasikeitus vežėjams ---
+
+def recompute_order_statuses(order_ids: Iterable[int]) -> int:
+    """
+    Pritaikyti taisykles užsakymams (kaip order.save() pre_save), bet išsaugoti tik tuos, kurių statusas keičiasi:
+    save(update_fields=['status', 'updated_at']) - replica outbox, dashboard ir kiti post_save signal'ai.
+
+    Returns:
+        Pakeistų užsakymų skaičius
+    """
+    from .models import Order
+
+    order_ids = [order_id for order_id in set(order_ids) if order_id]
+    if not order_ids or not get_compiled_rules():
+        return 0
+
+    now = timezone.now()
+    changed = 0
+    for order in Order.objects.filter(pk__in=order_ids).exclude(status=Order.OrderStatus.CANCELED):
+        rule = match_order_rule(order, now=now)
+        if rule is None:
+            continue
+        old_status = order.status
+        order.status = rule.to_status
+        # Taisyklė jau pritaikyta - pre_save jos nebetikrina (viena taisyklė per vieną perskaičiavimą)
+        order._status_update_in_progress = True
+        order.save(update_fields=['status', 'updated_at'])
+        changed += 1
+        logger.info(f"Order {order.pk}: Dynamic rule triggered! {old_status} -> {order.status} (logic: {rule.logic_operator})")
+    return changed
+
+
+def _flush_pending():
+    order_ids = getattr(_pending, 'order_ids', None)
+    _pending.order_ids = None
+    if not order_ids:
+        return
+    try:
+        recompute_order_statuses(order_ids)
+    except Exception as e:
+        logger.error(f"Klaida perskaičiuojant užsakymų statusus {sorted(order_ids)[:20]}: {e}", exc_info=True)
+
+
+def schedule_order_status_recompute(order_ids: Iterable[int]):
+    """
+    Pažymėti užsakymus statuso perskaičiavimui po transakcijos commit.
+    Keli tos pačios transakcijos vežėjų pakeitimai - vienas perskaičiavimas užsakymui.
+    """
+    order_ids = {order_id for order_id in order_ids if order_id}
+    if not order_ids:
+        return
+    pending = getattr(_pending, 'order_ids', None)
+    if pending is None:
+        _pending.order_ids = pending = set()
+    pending.update(order_ids)
+    # Callback registruojamas kiekvieną kartą, įvykdomas tik pirmasis (jis apdoroja visus sukauptus)
+    transaction.on_commit(_flush_pending)
+
+
+# --- Planuojami (nuo laiko priklausantys) perėjimai ---
+
+def flipped_orders_q(rules: Iterable[CompiledRule], since, now) -> Optional[Q]:
+    """
+    Užsakymai, kuriems nuo since iki now galėjo pasikeisti bent vienos taisyklės sąlyga vien dėl laiko:
+    kiekvienai taisyklei - jos statusas ir datos sąlygų ribų poslinkio intervalai (indeksai status + data).
+    None - nė viena taisyklė nuo laiko nepriklauso.
+    """
+    combined = None
+    for rule in rules:
+        windows = [condition.flip(since, now) for condition in rule.conditions if condition.flip is not None]
+        if not windows:
+            continue
+        rule_window = windows[0]
+        for window in windows[1:]:
+            rule_window |= window
+        rule_window &= Q(status=rule.from_status)
+        combined = rule_window if combined is None else combined | rule_window
+    return combined
+
+
+def run_scheduled_status_transitions(now=None, max_passes=None) -> int:
+    """
+    Pritaikyti nuo datos priklausančias taisykles tik užsakymams, kurių datos sąlygos pasikeitė nuo
+    paskutinio vykdymo (AutoStatusScheduleState). Pirmą kartą - pasikeitusios per praėjusią parą
+    (visiems užsakymams taisykles pritaiko apply_status_rules).
+
+    Perėjimai pritaikomi aibei (apply_status_rules_batch) ir registruojami ActivityLogService.
+    Perėję užsakymai dar kartą tikrinami naujo statuso taisyklėmis (kaip kitas save()),
+    ne daugiau nei ORDER_STATUS_SCHEDULE_MAX_PASSES kartų.
+
+    Returns:
+        Pakeistų užsakymų skaičius
+    """
+    from django.conf import settings
+    from apps.core.services.activity_log_service import ActivityLogService
+    from .models import AutoStatusScheduleState, Order
+
+    now = now or timezone.now()
+    if max_passes is None:
+        max_passes = getattr(settings, 'ORDER_STATUS_SCHEDULE_MAX_PASSES', 3)
+
+    AutoStatusScheduleState.objects.get_or_create(pk=1)
+    with transaction.atomic():
+        # Eilutės užraktas - kiti procesai laukia ir po to mato naują last_run_at
+        state = AutoStatusScheduleState.objects.select_for_update().get(pk=1)
+        since = state.last_run_at or now - timedelta(days=1)
+        if since >= now:
+            return 0
+
+        rules = [rule for status_rules in get_compiled_rules().values() for rule in status_rules]
+        window = flipped_orders_q(rules, since, now)
+        candidates = Order.objects.filter(window) if window is not None else None
+
+        changes = []
+        passes = 0
+        while candidates is not None and passes < max_passes:
+            _, pass_changes = apply_status_rules_batch(candidates, now=now)
+            if not pass_changes:
+                break
+            changes.extend(pass_changes)
+            candidates = Order.objects.filter(pk__in=[change.order_id for change in pass_changes])
+            passes += 1
+
+        if changes:
+            ActivityLogService.log_order_status_changes(changes, reason='Automatinis statuso keitimas pagal datą')
+        state.last_run_at = now
+        state.last_changed = len(changes)
+        state.save(update_fields=['last_run_at', 'last_changed', 'updated_at'])
+    return len(changes)
+
+
+def run_status_transition_scheduler(interval: int = None, stop_event: Optional[threading.Event] = None):
+    """
+    Vykdyti planuojamus statusų perėjimus kas interval sekundžių, kol nustatomas stop_event (blokuoja).
+    Vykdoma atskirame procese (manage.py run_scheduled_status_transitions --loop), ne web workeriuose.
+    """
+    from django.conf import settings
+
+    interval = interval or getattr(settings, 'ORDER_STATUS_SCHEDULE_INTERVAL', 900)
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        try:
+            changed = run_scheduled_status_transitions()
+            if changed:
+                logger.info('Scheduled status transitions: %s orders changed', changed)
+        except DatabaseError as e:
+            logger.warning('Scheduled status transitions failed: %s', e)
+        except Exception as e:
+            logger.error(f'Klaida vykdant planuojamus statusų perėjimus: {e}', exc_info=True)
+        finally:
+            close_old_connections()
+        stop_event.wait(interval)
@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from types import SimpleNamespace
+
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase
+
+from apps.partners.models import Partner
+
+from .models import Order
+from .search_index import normalize_text, order_search_candidates, reindex_orders, tokenize
+from .status_rules import compile_condition, compile_rule, flipped_orders_q
+
+NOW = datetime(2025, 3, 10, 6, 0, tzinfo=dt_timezone.utc)
+SINCE = NOW - timedelta(days=2)
+
+
+class TokenizeTests(SimpleTestCase):
+    def test_lowercase_without_diacritics(self):
+        self.assertEqual(normalize_text('Šiaulių Ąžuolas'), 'siauliu azuolas')
+        self.assertEqual(
+            tokenize('UAB „Šiaulių krovinys“, LT-76001'), ['uab', 'siauliu', 'krovinys', 'lt', '76001']
+        )
+
+    def test_underscores_split_and_empty_values(self):
+        self.assertEqual(tokenize('ORD_2025/0012'), ['ord', '2025', '0012'])
+        self.assertEqual(tokenize(None), [])
+        self.assertEqual(tokenize(''), [])
+
+    def test_tokens_are_truncated(self):
+        self.assertEqual(tokenize('a' * 100), ['a' * 64])
+
+
+class OrderSearchCandidatesTests(TestCase):
+    def setUp(self):
+        self.siauliai = Order.objects.create(
+            client=Partner.objects.create(name='UAB Šiaulių krovinys', code='300'),
+            order_number='2025-001', route_to='Vilnius',
+        )
+        self.kaunas = Order.objects.create(
+            client=Partner.objects.create(name='Kauno transportas', code='301'),
+            order_number='2025-002', route_to='Riga',
+        )
+        # Indeksas atnaujinamas po commit - TestCase transakcija nebaigiama
+        reindex_orders([self.siauliai.pk, self.kaunas.pk])
+
+    def candidates(self, *terms):
+        subquery = order_search_candidates(terms)
+        if subquery is None:
+            return None
+        return set(Order.objects.filter(pk__in=subquery).values_list('pk', flat=True))
+
+    def test_infix_match_without_diacritics(self):
+        self.assertEqual(self.candidates('ŠIAUL'), {self.siauliai.pk})
+        self.assertEqual(self.candidates('iauli'), {self.siauliai.pk})
+        self.assertEqual(self.candidates('2025'), {self.siauliai.pk, self.kaunas.pk})
+
+    def test_all_terms_required(self):
+        self.assertEqual(self.candidates('kauno', 'rig'), {self.kaunas.pk})
+        self.assertEqual(self.candidates('kauno', 'vilnius'), set())
+
+    def test_unknown_and_too_short_terms(self):
+        self.assertEqual(self.candidates('nera'), set())
+        self.assertIsNone(self.candidates('ka'))
+        self.assertEqual(self.candidates('ka', 'riga'), {self.kaunas.pk})
+
+    def test_candidates_are_superset_of_icontains(self):
+        for query in ('Šiaulių krov', 'transportas', '-002', 'Vilni'):
+            with self.subTest(query=query):
+                expected = set(Order.objects.filter(
+                    Q(client__name__icontains=query) | Q(order_number__icontains=query) | Q(route_to__icontains=query)
+                ).values_list('pk', flat=True))
+                self.assertTrue(expected)
+                self.assertLessEqual(expected, self.candidates(*query.split()))
+
+
+class FlipWindowTests(TestCase):
+    """Planuoklis tikrina tik flip() langą - jame turi būti visi užsakymai, kurių sąlyga pasikeitė"""
+
+    def setUp(self):
+        client = Partner.objects.create(name='Klientas', code='200')
+        self.orders = []
+        for offset in range(-8, 6):
+            loading = datetime(2025, 3, 10, 12, 0, tzinfo=dt_timezone.utc) + timedelta(days=offset)
+            order = Order.objects.create(
+                client=client, order_number=f'F{offset + 10}', loading_date=loading,
+                unloading_date=loading + timedelta(days=2),
+            )
+            Order.objects.filter(pk=order.pk).update(created_at=loading)
+            self.orders.append(order)
+        self.orders = list(Order.objects.filter(pk__in=[order.pk for order in self.orders]))
+
+    def flipped(self, condition):
+        return {
+            order.pk for order in self.orders
+            if condition.test(order, None, SINCE) != condition.test(order, None, NOW)
+        }
+
+    def windowed(self, condition):
+        return set(Order.objects.filter(condition.flip(SINCE, NOW)).values_list('pk', flat=True))
+
+    def test_date_conditions_flip_exactly_in_window(self):
+        for cond_type in ('loading_date_is_today', 'loading_date_passed', 'loading_date_upcoming',
+                          'unloading_date_is_today', 'unloading_date_passed', 'unloading_date_upcoming'):
+            with self.subTest(cond_type=cond_type):
+                condition = compile_condition({'type': cond_type})
+                self.assertTrue(self.flipped(condition))
+                self.assertEqual(self.windowed(condition), self.flipped(condition))
+
+    def test_conditions_with_days_and_ranges_are_covered(self):
+        for spec in ({'type': 'unloading_passed', 'params': {'days_after_unloading': 3}},
+                     {'type': 'days_since_created', 'params': {'days': 4}},
+                     {'type': 'dates_between'}):
+            with self.subTest(cond_type=spec['type']):
+                condition = compile_condition(spec)
+                self.assertTrue(self.flipped(condition))
+                self.assertLessEqual(self.flipped(condition), self.windowed(condition))
+
+    def test_same_day_has_empty_window(self):
+        condition = compile_condition({'type': 'loading_date_is_today'})
+        window = condition.flip(NOW - timedelta(hours=1), NOW)
+        self.assertFalse(Order.objects.filter(window).exists())
+
+    def test_rule_window_is_limited_to_from_status(self):
+        rule = compile_rule(SimpleNamespace(
+            pk=1, from_status=Order.OrderStatus.NEW, to_status=Order.OrderStatus.EXECUTING, logic_operator='AND',
+            conditions=[{'type': 'loading_date_is_today'}, {'type': 'invoice_issued'}],
+        ))
+        window = flipped_orders_q([rule], SINCE, NOW)
+        expected = self.windowed(rule.conditions[0])
+        self.assertEqual(set(Order.objects.filter(window).values_list('pk', flat=True)), expected)
+
+        Order.objects.filter(pk__in=expected).update(status=Order.OrderStatus.FINISHED)
+        self.assertFalse(Order.objects.filter(window).exists())
+
+    def test_rules_without_time_conditions_have_no_window(self):
+        rule = compile_rule(SimpleNamespace(
+            pk=2, from_status=Order.OrderStatus.NEW, to_status=Order.OrderStatus.CLOSED, logic_operator='OR',
+            conditions=[{'type': 'invoice_paid'}, {'type': 'carrier_added'}],
+        ))
+        self.assertIsNone(flipped_orders_q([rule], SINCE, NOW))
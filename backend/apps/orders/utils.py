@@ -3,6 +3,13 @@ from django.db import transaction
 from .models import OrderNumberSequence, ExpeditionNumberSequence
 from apps.settings.models import ExpeditionSettings
 
+# Ekspedicijos tipas -> ExpeditionNumberSequence laukas
+EXPEDITION_SEQUENCE_FIELDS = {
+    'carrier': 'last_carrier_number',
+    'warehouse': 'last_warehouse_number',
+    'cost': 'last_cost_number',
+}
+
 
 def _get_expedition_format():
     """Atgalinio suderinamumo funkcija - naudoja carrier nustatymus"""
@@ -42,36 +49,89 @@ def generate_expedition_number(prefix: str = None, expedition_type: str = 'carri
             settings_obj = ExpeditionSettings.load()
         width = settings_obj.expedition_number_width or 5
 
-    # Generuojame numerį iš sekos pagal tipą
+    # Generuojame numerį iš sekos pagal tipą (vienas užrakintas padidinimas)
+    field = EXPEDITION_SEQUENCE_FIELDS.get(expedition_type, 'last_carrier_number')
     with transaction.atomic():
-        sequence, _ = ExpeditionNumberSequence.objects.select_for_update().get_or_create(
-            pk=1,
-            defaults={'last_carrier_number': 0, 'last_warehouse_number': 0, 'last_cost_number': 0}
-        )
-
-        if expedition_type == 'carrier':
-            sequence.last_carrier_number += 1
-            current_number = sequence.last_carrier_number
-            sequence.save(update_fields=['last_carrier_number'])
-        elif expedition_type == 'warehouse':
-            sequence.last_warehouse_number += 1
-            current_number = sequence.last_warehouse_number
-            sequence.save(update_fields=['last_warehouse_number'])
-        elif expedition_type == 'cost':
-            sequence.last_cost_number += 1
-            current_number = sequence.last_cost_number
-            sequence.save(update_fields=['last_cost_number'])
-        else:
-            # Fallback į carrier
-            sequence.last_carrier_number += 1
-            current_number = sequence.last_carrier_number
-            sequence.save(update_fields=['last_carrier_number'])
+        sequence = _lock_expedition_sequence()
+        current_number = getattr(sequence, field) + 1
+        setattr(sequence, field, current_number)
+        sequence.save(update_fields=[field])
 
     # Formatavimas
     formatted_number = f"{prefix}{current_number:0{width}d}"
     return formatted_number
 
 
+def _lock_expedition_sequence() -> ExpeditionNumberSequence:
+    """Užrakinta ekspedicijų seka (kviesti transaction.atomic() viduje)"""
+    sequence, _ = ExpeditionNumberSequence.objects.select_for_update().get_or_create(
+        pk=1,
+        defaults={'last_carrier_number': 0, 'last_warehouse_number': 0, 'last_cost_number': 0}
+    )
+    return sequence
+
+
+def _parse_expedition_suffix(expedition_number, prefix: str):
+    """Skaitinė dalis po prefikso arba None (ne šio prefikso / ne skaičius)"""
+    value = str(expedition_number or '').strip().upper()
+    if not value.startswith(prefix.upper()):
+        return None
+    numeric_str = value[len(prefix):].strip()
+    return int(numeric_str) if numeric_str.isdigit() else None
+
+
+def note_expedition_number_used(expedition_number: str, expedition_type: str = 'carrier') -> None:
+    """
+    Rankiniu būdu įvestas / importuotas numeris: jei jis didesnis už tipo seką, seka pakeliama,
+    kad generuojami numeriai jo nesikartotų (viena SELECT užklausa, lock - tik keičiant).
+    """
+    prefix, _ = _get_expedition_format_for_type(expedition_type)
+    number = _parse_expedition_suffix(expedition_number, prefix)
+    if not number:
+        return
+    field = EXPEDITION_SEQUENCE_FIELDS.get(expedition_type, 'last_carrier_number')
+    current = ExpeditionNumberSequence.objects.filter(pk=1).values_list(field, flat=True).first()
+    if current is not None and current >= number:
+        return
+    with transaction.atomic():
+        sequence = _lock_expedition_sequence()
+        if getattr(sequence, field) < number:
+            setattr(sequence, field, number)
+            sequence.save(update_fields=[field])
+
+
+def synchronize_expedition_sequence(expedition_type: str = 'carrier') -> int:
+    """
+    Taisymas: nustatyti tipo seką pagal didžiausią egzistuojantį numerį (skenuoja visus numerius).
+    Naudojama tik rankiniam taisymui (manage.py repair_number_sequences).
+
+    Returns:
+        Naujas paskutinis numeris
+    """
+    from .models import OrderCarrier, OrderCost
+
+    prefix, _ = _get_expedition_format_for_type(expedition_type)
+    if expedition_type == 'cost':
+        queryset = OrderCost.objects.all()
+    else:
+        queryset = OrderCarrier.objects.filter(carrier_type=expedition_type)
+    numbers = queryset.filter(expedition_number__istartswith=prefix).values_list('expedition_number', flat=True)
+
+    max_number = 0
+    for expedition_number in numbers.iterator(chunk_size=2000):
+        number = _parse_expedition_suffix(expedition_number, prefix)
+        if number and number > max_number:
+            max_number = number
+
+    field = EXPEDITION_SEQUENCE_FIELDS.get(expedition_type, 'last_carrier_number')
+    with transaction.atomic():
+        sequence = _lock_expedition_sequence()
+        if getattr(sequence, field) != max_number:
+            setattr(sequence, field, max_number)
+            sequence.save(update_fields=[field])
+    return max_number
+
+
 def generate_order_number(width: int = 3, using: str = 'default') -> str:
     """
     Sugeneruoja užsakymo numerį formatu PREFIX-NNN (pagal order_prefix arba metus).
@@ -197,6 +257,7 @@ def find_expedition_number_gaps_by_type(carrier_type: str = 'carrier', max_gaps:
     Returns:
         List of tuples: [(start_gap, end_gap), ...] - tarpų diapazonai
     """
+    from apps.core.numbering import find_number_gaps
     from .models import OrderCarrier, OrderCost
 
     # Gauti prefix ir width pagal tipą
@@ -216,73 +277,16 @@ def find_expedition_number_gaps_by_type(carrier_type: str = 'carrier', max_gaps:
         prefix = settings.expedition_prefix or 'E'
         width = settings.expedition_number_width or 5
 
-    # Gauti visus numerius pagal tipą
+    # Numeriai pagal tipą (vežėjų tipui - visi OrderCarrier, kaip ir anksčiau)
     if carrier_type == 'cost':
-        # Išlaidoms naudojame OrderCost modelį
-        all_numbers = OrderCost.objects.exclude(
-            expedition_number__isnull=True
-        ).exclude(
-            expedition_number__exact=''
-        ).values_list('expedition_number', flat=True)
+        queryset = OrderCost.objects.all()
     else:
-        # Vežėjams ir sandėliams naudojame OrderCarrier
-        queryset = OrderCarrier.objects.exclude(
-            expedition_number__isnull=True
-        ).exclude(
-            expedition_number__exact=''
-        )
-
+        queryset = OrderCarrier.objects.all()
         if carrier_type != 'carrier':
             queryset = queryset.filter(carrier_type=carrier_type)
 
-        all_numbers = queryset.values_list('expedition_number', flat=True)
-
-    # Išgauti skaitines dalis
-    numeric_parts = []
-    for number in all_numbers:
-        if not number:
-            continue
-        # Pašalinti prefix ir gauti skaitinę dalį
-        number_str = str(number).upper()
-        if number_str.startswith(prefix.upper()):
-            numeric_str = number_str[len(prefix):].strip()
-            try:
-                num = int(numeric_str)
-                numeric_parts.append(num)
-            except ValueError:
-                continue
-
-    if not numeric_parts:
-        return []
-
-    # Surūšiuoti numerius
-    numeric_parts.sort()
-
-    # Rasti tarpus
-    gaps = []
-    for i in range(len(numeric_parts) - 1):
-        current = numeric_parts[i]
-        next_num = numeric_parts[i + 1]
-
-        # Jei tarpas didesnis nei 1 (pvz. 3990, 4042 - tarpas nuo 3991 iki 4041)
-        if next_num - current > 1:
-            gap_start = current + 1
-            gap_end = next_num - 1
-
-            # Jei tarpas didelis, rodyti tik pirmą ir paskutinį
-            if gap_end - gap_start > 10:
-                gaps.append((gap_start, gap_end))
-            else:
-                # Jei tarpas mažas, rodyti visus numerius
-                for gap_num in range(gap_start, gap_end + 1):
-                    gaps.append((gap_num, gap_num))
-                    if len(gaps) >= max_gaps:
-                        break
-
-            if len(gaps) >= max_gaps:
-                break
-
-    return gaps[:max_gaps]
+    # Viena užklausa per (number_prefix, number_suffix) indeksą; maži tarpai - po vieną numerį
+    return find_number_gaps(queryset, prefix, max_gaps=max_gaps, expand_small=True)
 
 
 def find_expedition_number_gaps(prefix: str = None, width: int = None, max_gaps: int = 5) -> list:
@@ -293,53 +297,6 @@ def find_expedition_number_gaps(prefix: str = None, width: int = None, max_gaps:
     # Naudoti naują funkciją su 'carrier' tipu dėl atgalinio suderinamumo
     return find_expedition_number_gaps_by_type(carrier_type='carrier', max_gaps=max_gaps)
 
-    # Išgauti skaitines dalis
-    numeric_parts = []
-    for number in all_numbers:
-        if not number:
-            continue
-        # Pašalinti prefix ir gauti skaitinę dalį
-        number_str = str(number).upper()
-        if number_str.startswith(prefix_upper):
-            numeric_str = number_str[len(prefix_upper):].strip()
-            try:
-                num = int(numeric_str)
-                numeric_parts.append(num)
-            except ValueError:
-                continue
-
-    if not numeric_parts:
-        return []
-    
-    # Surūšiuoti numerius
-    numeric_parts.sort()
-    
-    # Rasti tarpus
-    gaps = []
-    for i in range(len(numeric_parts) - 1):
-        current = numeric_parts[i]
-        next_num = numeric_parts[i + 1]
-        
-        # Jei tarpas didesnis nei 1 (pvz. 3990, 4042 - tarpas nuo 3991 iki 4041)
-        if next_num - current > 1:
-            gap_start = current + 1
-            gap_end = next_num - 1
-            
-            # Jei tarpas didelis, rodyti tik pirmą ir paskutinį
-            if gap_end - gap_start > 10:
-                gaps.append((gap_start, gap_end))
-            else:
-                # Jei tarpas mažas, rodyti visus numerius
-                for gap_num in range(gap_start, gap_end + 1):
-                    gaps.append((gap_num, gap_num))
-                    if len(gaps) >= max_gaps:
-                        break
-            
-            if len(gaps) >= max_gaps:
-                break
-    
-    return gaps[:max_gaps]
-
 
 def get_first_available_expedition_gap_number(prefix: str = None, width: int = None):
     """
@@ -412,6 +369,7 @@ def find_order_number_gaps(prefix: str = None, width: int = None, max_gaps: int
     Returns:
         List of tuples: [(start_gap, end_gap), ...] - tarpų diapazonai
     """
+    from apps.core.numbering import find_number_gaps
     from .models import Order
     from apps.settings.models import OrderSettings
     
@@ -422,54 +380,8 @@ def find_order_number_gaps(prefix: str = None, width: int = None, max_gaps: int
         if width is None:
             width = settings.order_number_width or 3
     
-    prefix = str(prefix).strip()
-
-    # Gauti visus numerius su prefix
-    # Bandyti rasti numerius, kurie prasideda su prefix
-    all_orders = Order.objects.filter(
-        order_number__isnull=False
-    ).exclude(order_number='').values_list('order_number', flat=True)
-
-    # Išgauti skaitines dalis pagal prefix
-    numeric_parts = []
-    for number in all_orders:
-        if not number:
-            continue
-        parsed_prefix, numeric_part = _parse_order_number(number)
-        if parsed_prefix and parsed_prefix == prefix and numeric_part is not None:
-            numeric_parts.append(numeric_part)
-
-    if not numeric_parts:
-        return []
-    
-    # Surūšiuoti numerius
-    numeric_parts.sort()
-    
-    # Rasti tarpus
-    gaps = []
-    for i in range(len(numeric_parts) - 1):
-        current = numeric_parts[i]
-        next_num = numeric_parts[i + 1]
-        
-        # Jei tarpas didesnis nei 1 (pvz. 100, 105 - tarpas nuo 101 iki 104)
-        if next_num - current > 1:
-            gap_start = current + 1
-            gap_end = next_num - 1
-            
-            # Jei tarpas didelis, rodyti tik pirmą ir paskutinį
-            if gap_end - gap_start > 10:
-                gaps.append((gap_start, gap_end))
-            else:
-                # Jei tarpas mažas, rodyti visus numerius
-                for gap_num in range(gap_start, gap_end + 1):
-                    gaps.append((gap_num, gap_num))
-                    if len(gaps) >= max_gaps:
-                        break
-            
-            if len(gaps) >= max_gaps:
-                break
-    
-    return gaps[:max_gaps]
+    # Viena užklausa per (number_prefix, number_suffix) indeksą; maži tarpai - po vieną numerį
+    return find_number_gaps(Order.objects.all(), str(prefix).strip(), max_gaps=max_gaps, expand_small=True)
 
 
 def get_first_available_order_gap_number(prefix: str = None, width: int = None):
@@ -508,6 +420,7 @@ def get_suggested_order_number(prefix: str = None, width: int = None):
     if gap_number:
         return gap_number
     # 2. Tarpų nėra – siūlyti max + 1
+    from apps.core.numbering import max_number_suffix
     from .models import Order
     from apps.settings.models import OrderSettings
     if prefix is None or width is None:
@@ -517,17 +430,7 @@ def get_suggested_order_number(prefix: str = None, width: int = None):
         if width is None:
             width = settings.order_number_width or 3
     prefix = str(prefix).strip()
-    all_orders = Order.objects.filter(
-        order_number__isnull=False
-    ).exclude(order_number='').values_list('order_number', flat=True)
-    max_num = 0
-    for number in all_orders:
-        if not number:
-            continue
-        parsed_prefix, numeric_part = _parse_order_number(number)
-        if parsed_prefix and parsed_prefix == prefix and numeric_part is not None:
-            if numeric_part > max_num:
-                max_num = numeric_part
+    max_num = max_number_suffix(Order.objects.all(), prefix)
     next_num = max_num + 1
     return f"{prefix}-{next_num:0{width}d}"
 
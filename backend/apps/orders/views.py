@@ -2,7 +2,7 @@ from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.pagination import PageNumberPagination
+from apps.core.pagination import OptionalCursorPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
 from django.template.loader import render_to_string
@@ -11,6 +11,7 @@ from django.http import HttpResponse
 from django.conf import settings
 from django.core.mail import EmailMessage, get_connection
 from smtplib import SMTPException
+import re
 import socket
 from apps.mail.email_logger import send_email_message_with_logging
 from django.db import transaction, connections, IntegrityError
@@ -18,6 +19,9 @@ from django.db.models import Q, Count, Sum
 from decimal import Decimal
 from datetime import datetime
 import logging
+from apps.core.pdf_renderer import PdfRenderError
+from apps.core.pdf_cache import get_or_render_pdf, cache_tag
+from apps.core.pdf_batch import PdfJob, PdfResult, batch_pdf_response
 from .models import (
     Order,
     OrderCarrier,
@@ -43,11 +47,14 @@ from apps.settings.models import OrderSettings, CompanyInfo
 from apps.settings.email_utils import render_email_template
 from apps.invoices.utils import amount_to_words_lt
 from .serializers import (
-    OrderSerializer, OrderStatusChangeSerializer,
+    OrderSerializer, OrderListSerializer, OrderStatusChangeSerializer,
     OrderCarrierSerializer, OrderCostSerializer, CitySerializer, VehicleTypeSerializer, OtherCostTypeSerializer, CargoItemSerializer,
     AutocompleteSuggestionSerializer, RouteContactSerializer,
     OrderCarrierDocumentSerializer, RouteStopSerializer,
+    ORDER_CARRIER_LIST_COLUMNS, get_order_only_columns,
 )
+from apps.core.serializers import parse_fields_param
+from .search_index import is_order_search_index_enabled, order_search_candidates
 
 logger = logging.getLogger(__name__)
 
@@ -311,7 +318,7 @@ def get_contract_labels(lang):
         }
 
 
-class OrderPageNumberPagination(PageNumberPagination):
+class OrderPageNumberPagination(OptionalCursorPagination):
     """Paginacija užsakymams su page_size parametru"""
     page_size = 20
     page_size_query_param = 'page_size'
@@ -648,6 +655,30 @@ class OrderCarrierViewSet(viewsets.ModelViewSet):
         """Grąžina vertimus vežėjo sutarties šablonui"""
         return get_contract_labels(lang)
     
+    def _build_carrier_pdf_html(self, request, context):
+        """Sugeneruoti PDF skirtą vežėjo sutarties HTML (bendras pdf() ir send_email())"""
+        html_string = render(request, 'orders/carrier_contract.html', context).content.decode('utf-8')
+        
+        # Tik minimalus valymas - pašalinti tik script tag'us ir action buttons HTML
+        html_string = re.sub(r'<div[^>]*class=["\'][^"\']*action-buttons[^"\']*["\'][^>]*>.*?</div>\s*', '', html_string, flags=re.DOTALL)
+        html_string = re.sub(r'<script[^>]*>.*?</script>', '', html_string, flags=re.DOTALL | re.IGNORECASE)
+        return html_string
+    
+    def _render_carrier_pdf(self, carrier, request, context):
+        """
+        Grąžina vežėjo sutarties PDF baitus (iš PDF cache arba sugeneruotus WeasyPrint / xhtml2pdf).
+        
+        Raises:
+            PdfRenderError: jei PDF sugeneruoti nepavyko
+        """
+        html_string = self._build_carrier_pdf_html(request, context)
+        base_url = request.build_absolute_uri('/')
+        return get_or_render_pdf(
+            html_string, base_url,
+            tag=cache_tag('ordercarrier', carrier.pk),
+            engine='weasyprint', media_type='print',
+        )
+    
     @action(detail=True, methods=['get'])
     def preview(self, request, pk=None):
         """Grąžina HTML vežėjo sutarties peržiūrą"""
@@ -665,94 +696,12 @@ class OrderCarrierViewSet(viewsets.ModelViewSet):
         carrier = self.get_object()
         context = self._prepare_carrier_context(carrier, request)
         
-        # Generuoti HTML su visais duomenimis
-        html_string = render(request, 'orders/carrier_contract.html', context).content.decode('utf-8')
-        
-        # Tik minimalus valymas - pašalinti tik script tag'us ir action buttons HTML
-        import re
-        html_string = re.sub(r'<div[^>]*class=["\'][^"\']*action-buttons[^"\']*["\'][^>]*>.*?</div>\s*', '', html_string, flags=re.DOTALL)
-        html_string = re.sub(r'<script[^>]*>.*?</script>', '', html_string, flags=re.DOTALL | re.IGNORECASE)
-        
-        pdf_bytes = None
-        
-        # Bandyti naudoti WeasyPrint (geresnė kokybė)
+        # WeasyPrint -> xhtml2pdf (su PDF cache)
         try:
-            from weasyprint import HTML, CSS
-            base_url = request.build_absolute_uri('/')
-            html_doc = HTML(string=html_string, base_url=base_url)
-            
-            pdf_css_string = """
-                @page {
-                    size: A4;
-                    margin: 0;
-                }
-            """
-            css_doc = CSS(string=pdf_css_string)
-            
-            pdf_bytes = html_doc.write_pdf(stylesheets=[css_doc])
-            logger.info("WeasyPrint sėkmingai sugeneravo vežėjo PDF atsisiuntimui")
-            
-        except (ImportError, OSError) as e:
-            logger.warning(f"WeasyPrint nepasiekiamas: {e}, naudojamas xhtml2pdf fallback")
-        except Exception as e:
-            logger.error(f"WeasyPrint klaida: {e}, naudojamas xhtml2pdf fallback")
-        
-        # Fallback į xhtml2pdf
-        if not pdf_bytes:
-            try:
-                from io import BytesIO
-                from xhtml2pdf import pisa
-                
-                result = BytesIO()
-                
-                def link_callback(uri, rel):
-                    from urllib.parse import urlparse, urljoin
-                    from django.conf import settings
-                    import os
-                    
-                    if uri.startswith('data:'):
-                        return uri
-                    
-                    if uri.startswith('/'):
-                        if uri.startswith(settings.MEDIA_URL):
-                            file_path = uri.replace(settings.MEDIA_URL, '')
-                            full_path = os.path.join(settings.MEDIA_ROOT, file_path)
-                            if os.path.exists(full_path):
-                                return f"file://{full_path}"
-                        base_url = request.build_absolute_uri('/').rstrip('/')
-                        return urljoin(base_url, uri)
-                    
-                    return uri
-                
-                pdf = pisa.pisaDocument(
-                    BytesIO(html_string.encode("UTF-8")), 
-                    result,
-                    encoding='UTF-8',
-                    link_callback=link_callback,
-                    show_error_as_pdf=False
-                )
-                
-                if pdf.err:
-                    error_msg = str(pdf.err) if pdf.err else "Nežinoma PDF generavimo klaida"
-                    logger.error(f"xhtml2pdf klaida: {error_msg}")
-                    return HttpResponse(f"Klaida generuojant PDF: {error_msg}", status=500)
-                
-                pdf_bytes = result.getvalue()
-                
-                # Patikrinti, ar tikrai PDF (prasideda su %PDF)
-                if not pdf_bytes or not pdf_bytes.startswith(b'%PDF'):
-                    error_msg = "Generuotas failas nėra PDF formatas"
-                    logger.error(f"xhtml2pdf klaida: {error_msg}")
-                    if pdf_bytes:
-                        logger.error(f"Grąžintas turinys (pirmi 500 simbolių): {pdf_bytes[:500]}")
-                    return HttpResponse(f"Klaida generuojant PDF: {error_msg}", status=500)
-                
-            except ImportError:
-                logger.error("xhtml2pdf nepasiekiamas")
-                return HttpResponse("PDF generavimo biblioteka nepasiekiama. Prašome įdiegti WeasyPrint arba xhtml2pdf.", status=500)
-        
-        if not pdf_bytes:
-            return HttpResponse("Nepavyko generuoti PDF", status=500)
+            pdf_bytes = self._render_carrier_pdf(carrier, request, context)
+        except PdfRenderError as e:
+            logger.error(f"Klaida generuojant PDF: {e}")
+            return HttpResponse(f"Klaida generuojant PDF: {str(e)}", status=500)
         
         carrier_name = carrier.partner.name.replace(' ', '_') if carrier.partner.name else 'vezejas'
         response = HttpResponse(pdf_bytes, content_type='application/pdf')
@@ -800,103 +749,12 @@ class OrderCarrierViewSet(viewsets.ModelViewSet):
             
             # Generuoti PDF - naudoti TIKSLIAI tą patį metodą kaip pdf() endpoint'as
             context = self._prepare_carrier_context(carrier, request, lang=lang)
-            html_string = render(request, 'orders/carrier_contract.html', context).content.decode('utf-8')
-            
-            # Tik minimalus valymas - pašalinti tik script tag'us ir action buttons HTML
-            import re
-            html_string = re.sub(r'<div[^>]*class=["\'][^"\']*action-buttons[^"\']*["\'][^>]*>.*?</div>\s*', '', html_string, flags=re.DOTALL)
-            html_string = re.sub(r'<script[^>]*>.*?</script>', '', html_string, flags=re.DOTALL | re.IGNORECASE)
-            
-            pdf_bytes = None
-            
-            # Bandyti naudoti WeasyPrint (geresnė kokybė)
             try:
-                from weasyprint import HTML, CSS
-                base_url = request.build_absolute_uri('/')
-                html_doc = HTML(string=html_string, base_url=base_url)
-                
-                pdf_css_string = """
-                    @page {
-                        size: A4;
-                        margin: 0;
-                    }
-                """
-                css_doc = CSS(string=pdf_css_string)
-                
-                pdf_bytes = html_doc.write_pdf(stylesheets=[css_doc])
-                logger.info("WeasyPrint sėkmingai sugeneravo vežėjo PDF el. laiške")
-                
-            except (ImportError, OSError) as e:
-                logger.warning(f"WeasyPrint nepasiekiamas el. laiške: {e}, naudojamas xhtml2pdf fallback")
-            except Exception as e:
-                logger.error(f"WeasyPrint klaida el. laiške: {e}, naudojamas xhtml2pdf fallback")
-            
-            # Fallback į xhtml2pdf
-            if not pdf_bytes:
-                try:
-                    from io import BytesIO
-                    from xhtml2pdf import pisa
-                    
-                    result = BytesIO()
-                    
-                    def link_callback(uri, rel):
-                        from urllib.parse import urlparse, urljoin
-                        from django.conf import settings
-                        import os
-                        
-                        if uri.startswith('data:'):
-                            return uri
-                        
-                        if uri.startswith('/'):
-                            if uri.startswith(settings.MEDIA_URL):
-                                file_path = uri.replace(settings.MEDIA_URL, '')
-                                full_path = os.path.join(settings.MEDIA_ROOT, file_path)
-                                if os.path.exists(full_path):
-                                    return f"file://{full_path}"
-                            base_url = request.build_absolute_uri('/').rstrip('/')
-                            return urljoin(base_url, uri)
-                        
-                        return uri
-                    
-                    pdf = pisa.pisaDocument(
-                        BytesIO(html_string.encode("UTF-8")), 
-                        result,
-                        encoding='UTF-8',
-                        link_callback=link_callback,
-                        show_error_as_pdf=False
-                    )
-                    
-                    if pdf.err:
-                        error_msg = str(pdf.err) if pdf.err else "Nežinoma PDF generavimo klaida"
-                        logger.error(f"xhtml2pdf klaida el. laiške: {error_msg}")
-                        return Response(
-                            {'success': False, 'error': f'PDF generavimo klaida: {error_msg}'},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                        )
-                    
-                    pdf_bytes = result.getvalue()
-                    
-                    # Patikrinti, ar tikrai PDF (prasideda su %PDF)
-                    if not pdf_bytes or not pdf_bytes.startswith(b'%PDF'):
-                        error_msg = "Generuotas failas nėra PDF formatas"
-                        logger.error(f"xhtml2pdf klaida el. laiške: {error_msg}")
-                        if pdf_bytes:
-                            logger.error(f"Grąžintas turinys (pirmi 500 simbolių): {pdf_bytes[:500]}")
-                        return Response(
-                            {'success': False, 'error': f'PDF generavimo klaida: {error_msg}'},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                        )
-                    
-                except ImportError:
-                    logger.error("xhtml2pdf nepasiekiamas el. laiške")
-                    return Response(
-                        {'success': False, 'error': 'PDF generavimo biblioteka nepasiekiama'},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                    )
-            
-            if not pdf_bytes:
+                pdf_bytes = self._render_carrier_pdf(carrier, request, context)
+            except PdfRenderError as e:
+                logger.error(f"PDF generavimo klaida el. laiške: {e}")
                 return Response(
-                    {'success': False, 'error': 'Nepavyko generuoti PDF'},
+                    {'success': False, 'error': f'PDF generavimo klaida: {str(e)}'},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
             
@@ -1440,12 +1298,20 @@ class OrderViewSet(viewsets.ModelViewSet):
         from django.db.models import Q
         from datetime import datetime
         
-        # Pirmiausia pritaikyti standartinius filtrus (SearchFilter, DjangoFilterBackend, etc.)
-        queryset = super().filter_queryset(queryset)
-        
         # Gauti search parametrą
         query_params = getattr(self.request, 'query_params', {}) or {}
         search_query = query_params.get('search', '').strip()
+        use_search_index = bool(search_query) and is_order_search_index_enabled()
+        
+        if use_search_index:
+            # Kandidatai iš žodžių indekso (apps.orders.search_index) - SearchFilter LIKE '%q%' per 20 laukų
+            # tikrinamas tik jiems, rezultatai nesikeičia
+            candidates = order_search_candidates(filters.SearchFilter().get_search_terms(self.request))
+            if candidates is not None:
+                queryset = queryset.filter(pk__in=candidates)
+        
+        # Pritaikyti standartinius filtrus (SearchFilter, DjangoFilterBackend, etc.)
+        queryset = super().filter_queryset(queryset)
         
         if search_query:
             # Sukurti papildomus Q objektus paieškai pagal datas ir kainas
@@ -1765,6 +1631,101 @@ class OrderViewSet(viewsets.ModelViewSet):
         # Ištrinti užsakymą
         return super().destroy(request, *args, **kwargs)
     
+    def get_serializer_class(self):
+        """?view=list - supaprastintas serializer užsakymų lentelei, kiti klientai gauna pilną"""
+        request = getattr(self, 'request', None)
+        if self.action == 'list' and request is not None and request.query_params.get('view') == 'list':
+            return OrderListSerializer
+        return super().get_serializer_class()
+
+    def _get_sparse_fields(self):
+        """?fields=a,b,c (tik GET sąrašui ir detaliai); None - visi serializer'io laukai"""
+        if not hasattr(self, '_sparse_fields'):
+            self._sparse_fields = None
+            request = getattr(self, 'request', None)
+            if request is not None and request.method == 'GET' and self.action in ('list', 'retrieve'):
+                self._sparse_fields = parse_fields_param(
+                    request.query_params.get('fields'), self.get_serializer_class().Meta.fields
+                )
+        return self._sparse_fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self._get_sparse_fields()
+        return context
+
+    def _apply_field_prefetches(self, queryset):
+        """
+        select_related / prefetch / only() tik tiems ryšiams ir stulpeliams, kurių reikia grąžinamiems laukams
+        (OrderListSerializer arba ?fields=). Pilnam serializer'iui be ?fields= užkraunami visi ryšiai.
+        """
+        from django.db.models import Prefetch
+        from apps.invoices.models import SalesInvoice, PurchaseInvoice
+
+        serializer_class = self.get_serializer_class()
+        if not issubclass(serializer_class, OrderSerializer):
+            serializer_class = OrderSerializer
+        lean = issubclass(serializer_class, OrderListSerializer)
+        sparse_fields = self._get_sparse_fields()
+        fields = set(sparse_fields or serializer_class.Meta.fields)
+
+        queryset = queryset.select_related(None).prefetch_related(None)
+        # created_by grąžinamas tik kaip ID - join nereikalingas
+        select_related = [name for name in ('client', 'manager') if name in fields]
+        only_columns = get_order_only_columns(fields) if lean or sparse_fields else None
+        if not lean and 'carriers' in fields:
+            # Pilno vežėjų serializer'io effective_* laukai skaito užsakymo maršrutą/datas -
+            # atidėti stulpeliai būtų užkraunami atskira užklausa kiekvienam vežėjui
+            only_columns = None
+        prefetches = []
+
+        if fields & {'carriers', 'carrier_price_net_total', 'calculated_client_price_net'}:
+            if lean:
+                prefetches.append(Prefetch('carriers', queryset=OrderCarrier.objects.select_related('partner').only(
+                    *ORDER_CARRIER_LIST_COLUMNS, 'partner__id', 'partner__name', 'partner__code'
+                )))
+            else:
+                # PartnerSerializer grąžina ir kontaktus (contacts, contacts_count, contact_person)
+                prefetches += ['carriers__partner__contacts', 'carriers__partner__contact_person']
+            if 'carriers' in fields:
+                prefetches += [
+                    'carriers__documents',
+                    # Vežėjų payment_status_info skaičiuojamas iš pirkimo sąskaitų
+                    Prefetch('purchase_invoices', queryset=PurchaseInvoice.objects.only(
+                        'id', 'payment_status', 'payment_date', 'due_date', 'partner_id', 'related_order_id'
+                    )),
+                    Prefetch('purchase_invoices_m2m', queryset=PurchaseInvoice.objects.only(
+                        'id', 'payment_status', 'payment_date', 'due_date', 'partner_id'
+                    )),
+                ]
+        if 'client' in fields and not lean:
+            prefetches += ['client__contacts', 'client__contact_person']
+        if 'cargo_items' in fields:
+            prefetches += ['cargo_items', 'cargo_items__loading_stop', 'cargo_items__unloading_stop']
+        if 'route_stops' in fields:
+            prefetches.append('route_stops')
+        if 'costs' in fields:
+            prefetches.append('costs')
+        if 'first_sales_invoice' in fields:
+            prefetches += [
+                # Mokėjimų būsena imama iš Order.sales_invoices_* suvestinės - čia tik first_sales_invoice laukai
+                Prefetch('sales_invoices', queryset=SalesInvoice.objects.only(
+                    'id', 'invoice_number', 'invoice_type', 'amount_total', 'issue_date', 'due_date',
+                    'related_order_id', 'created_at'
+                ).order_by('created_at')),
+                'order_sales_invoices__invoice',
+            ]
+
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        if only_columns is not None:
+            if lean and 'client' in only_columns:
+                only_columns.update({'client__id', 'client__name', 'client__code'})
+            queryset = queryset.only(*only_columns)
+        return queryset
+
     def get_queryset(self):
         """Pritaikyti datų filtrus ir optimizuoti prefetch"""
         # Užtikrinti DB ryšį
@@ -1778,27 +1739,7 @@ class OrderViewSet(viewsets.ModelViewSet):
             except:
                 pass
         
-        queryset = super().get_queryset()
-        
-        # Optimizuotas prefetch sales_invoices ir purchase_invoices sąrašui
-        from django.db.models import Prefetch
-        from apps.invoices.models import SalesInvoice, PurchaseInvoice
-        try:
-            queryset = queryset.prefetch_related(
-                Prefetch('sales_invoices', queryset=SalesInvoice.objects.only(
-                    'id', 'invoice_number', 'invoice_type', 'amount_total', 'issue_date', 'due_date',
-                    'payment_status', 'payment_date', 'related_order_id', 'created_at'
-                ).order_by('created_at')),
-                Prefetch('purchase_invoices', queryset=PurchaseInvoice.objects.only(
-                    'id', 'payment_status', 'payment_date', 'due_date', 'partner_id', 'related_order_id'
-                )),
-                Prefetch('purchase_invoices_m2m', queryset=PurchaseInvoice.objects.only(
-                    'id', 'payment_status', 'payment_date', 'due_date', 'partner_id'
-                ))
-            )
-        except Exception as e:
-            logger.error(f"Error in prefetch_related: {e}")
-            # Jei prefetch nepavyko, grąžinti queryset be prefetch
+        queryset = self._apply_field_prefetches(super().get_queryset())
         
         # Datų filtrai
         query_params = getattr(self.request, 'query_params', {}) or {}
@@ -2418,6 +2359,78 @@ class OrderViewSet(viewsets.ModelViewSet):
             'lang': lang,
         }
     
+    def _build_order_pdf_html(self, request, context):
+        """Sugeneruoti PDF skirtą užsakymo sutarties HTML (bendras pdf() ir send_email())"""
+        html_string = render(request, 'orders/order_contract.html', context).content.decode('utf-8')
+        
+        # Tik minimalus valymas - pašalinti tik script tag'us ir action buttons HTML
+        html_string = re.sub(r'<div[^>]*class=["\'][^"\']*action-buttons[^"\']*["\'][^>]*>.*?</div>\s*', '', html_string, flags=re.DOTALL)
+        html_string = re.sub(r'<script[^>]*>.*?</script>', '', html_string, flags=re.DOTALL | re.IGNORECASE)
+        return html_string
+    
+    def _render_order_pdf(self, order, request, context):
+        """
+        Grąžina užsakymo sutarties PDF baitus (iš PDF cache arba sugeneruotus WeasyPrint / xhtml2pdf).
+        
+        Raises:
+            PdfRenderError: jei PDF sugeneruoti nepavyko
+        """
+        html_string = self._build_order_pdf_html(request, context)
+        base_url = request.build_absolute_uri('/')
+        return get_or_render_pdf(
+            html_string, base_url,
+            tag=cache_tag('order', order.pk),
+            engine='weasyprint', media_type='print',
+        )
+    
+    def _iter_order_pdf_jobs(self, orders, request, lang='lt'):
+        """PDF darbai masiniam eksportui - HTML ruošiamas čia, PDF generuojami procesų pool'e"""
+        base_url = request.build_absolute_uri('/')
+        for index, order in enumerate(orders):
+            filename = f"{order.order_number or order.id}.pdf"
+            try:
+                context = self._prepare_order_context(order, request, lang=lang)
+                html_string = self._build_order_pdf_html(request, context)
+            except Exception as e:
+                logger.warning(f"Užsakymo {order.id} HTML paruošimas masiniam eksportui nepavyko: {e}")
+                yield PdfResult(index, filename, None, str(e))
+                continue
+            yield PdfJob(index, filename, html_string, base_url, cache_tag('order', order.pk), 'weasyprint', 'print')
+    
+    @action(detail=False, methods=['post'])
+    def batch_pdf(self, request):
+        """
+        Masinis užsakymų sutarčių PDF eksportas.
+        Body: { "order_ids": [1, 2, 3], "format": "zip" | "pdf", "lang": "lt" }
+        Be order_ids naudojami tie patys filtrai kaip sąrašui (query parametrai).
+        """
+        from django.utils import timezone
+        
+        order_ids = request.data.get('order_ids', [])
+        output_format = request.data.get('format', 'zip')
+        lang = str(request.data.get('lang', 'lt')).lower()
+        if output_format not in ('zip', 'pdf'):
+            return Response({'error': 'format turi būti "zip" arba "pdf"'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        if order_ids:
+            queryset = queryset.filter(id__in=order_ids)
+        rows = list(queryset.order_by('order_number', 'id').values_list('id', 'order_number'))
+        
+        max_documents = getattr(settings, 'PDF_BATCH_MAX_DOCUMENTS', 500)
+        if not rows:
+            return Response({'error': 'Nerasta užsakymų'}, status=status.HTTP_404_NOT_FOUND)
+        if len(rows) > max_documents:
+            return Response(
+                {'error': f'Per daug užsakymų ({len(rows)}). Maksimalus kiekis: {max_documents}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # _prepare_order_context pats užkrauna užsakymą su visais susijusiais objektais
+        orders = (Order(pk=order_id, order_number=order_number) for order_id, order_number in rows)
+        jobs = self._iter_order_pdf_jobs(orders, request, lang=lang)
+        return batch_pdf_response(jobs, output_format, filename=f'uzsakymai_{timezone.now():%Y%m%d_%H%M}')
+    
     @action(detail=True, methods=['get'])
     def preview(self, request, pk=None):
         """Grąžina HTML užsakymo sutarties peržiūrą"""
@@ -2435,93 +2448,12 @@ class OrderViewSet(viewsets.ModelViewSet):
         order = self.get_object()
         context = self._prepare_order_context(order, request)
         
-        # Generuoti HTML su visais duomenimis
-        html_string = render(request, 'orders/order_contract.html', context).content.decode('utf-8')
-        
-        # Tik minimalus valymas - pašalinti tik script tag'us ir action buttons HTML
-        import re
-        html_string = re.sub(r'<div[^>]*class=["\'][^"\']*action-buttons[^"\']*["\'][^>]*>.*?</div>\s*', '', html_string, flags=re.DOTALL)
-        html_string = re.sub(r'<script[^>]*>.*?</script>', '', html_string, flags=re.DOTALL | re.IGNORECASE)
-        
-        pdf_bytes = None
-        
-        # Bandyti naudoti WeasyPrint (geresnė kokybė) - tą patį kaip send_email
+        # WeasyPrint -> xhtml2pdf (su PDF cache)
         try:
-            from weasyprint import HTML, CSS
-            base_url = request.build_absolute_uri('/')
-            html_doc = HTML(string=html_string, base_url=base_url)
-            
-            pdf_css_string = """
-                @page {
-                    size: A4;
-                    margin: 0;
-                }
-            """
-            css_doc = CSS(string=pdf_css_string)
-            
-            pdf_bytes = html_doc.write_pdf(stylesheets=[css_doc])
-            logger.info("WeasyPrint sėkmingai sugeneravo PDF atsisiuntimui")
-            
-        except (ImportError, OSError) as e:
-            logger.warning(f"WeasyPrint nepasiekiamas: {e}, naudojamas xhtml2pdf fallback")
-        except Exception as e:
-            logger.error(f"WeasyPrint klaida: {e}, naudojamas xhtml2pdf fallback")
-        
-        # Fallback į xhtml2pdf - tą patį kaip send_email
-        if not pdf_bytes:
-            try:
-                from io import BytesIO
-                from xhtml2pdf import pisa
-                
-                result = BytesIO()
-                
-                def link_callback(uri, rel):
-                    from urllib.parse import urlparse, urljoin
-                    from django.conf import settings
-                    import os
-                    
-                    if uri.startswith('data:'):
-                        return uri
-                    
-                    if uri.startswith('/'):
-                        if uri.startswith(settings.MEDIA_URL):
-                            file_path = uri.replace(settings.MEDIA_URL, '')
-                            full_path = os.path.join(settings.MEDIA_ROOT, file_path)
-                            if os.path.exists(full_path):
-                                return f"file://{full_path}"
-                        base_url = request.build_absolute_uri('/').rstrip('/')
-                        return urljoin(base_url, uri)
-                    
-                    return uri
-                
-                pdf = pisa.pisaDocument(
-                    BytesIO(html_string.encode("UTF-8")), 
-                    result,
-                    encoding='UTF-8',
-                    link_callback=link_callback,
-                    show_error_as_pdf=False
-                )
-                
-                if pdf.err:
-                    error_msg = str(pdf.err) if pdf.err else "Nežinoma PDF generavimo klaida"
-                    logger.error(f"xhtml2pdf klaida: {error_msg}")
-                    return HttpResponse(f"Klaida generuojant PDF: {error_msg}", status=500)
-                    
-                pdf_bytes = result.getvalue()
-                
-                # Patikrinti, ar tikrai PDF (prasideda su %PDF)
-                if not pdf_bytes or not pdf_bytes.startswith(b'%PDF'):
-                    error_msg = "Generuotas failas nėra PDF formatas"
-                    logger.error(f"xhtml2pdf klaida: {error_msg}")
-                    if pdf_bytes:
-                        logger.error(f"Grąžintas turinys (pirmi 500 simbolių): {pdf_bytes[:500]}")
-                    return HttpResponse(f"Klaida generuojant PDF: {error_msg}", status=500)
-            except ImportError:
-                logger.error("xhtml2pdf nepasiekiamas")
-                return HttpResponse("PDF generavimo biblioteka nepasiekiama. Prašome įdiegti WeasyPrint arba xhtml2pdf.", status=500)
-        
-        if not pdf_bytes:
-            return HttpResponse("Nepavyko generuoti PDF", status=500)
+            pdf_bytes = self._render_order_pdf(order, request, context)
+        except PdfRenderError as e:
+            logger.error(f"Klaida generuojant PDF: {e}")
+            return HttpResponse(f"Klaida generuojant PDF: {str(e)}", status=500)
         
         response = HttpResponse(pdf_bytes, content_type='application/pdf')
         response['Content-Disposition'] = f'inline; filename="{order.order_number or "uzsakymas"}.pdf"'
@@ -2565,103 +2497,12 @@ class OrderViewSet(viewsets.ModelViewSet):
         try:
             # Generuoti PDF - naudoti TIKSLIAI tą patį metodą kaip pdf() endpoint'as
             context = self._prepare_order_context(order, request)
-            html_string = render(request, 'orders/order_contract.html', context).content.decode('utf-8')
-            
-            # Tik minimalus valymas - pašalinti tik script tag'us ir action buttons HTML
-            import re
-            html_string = re.sub(r'<div[^>]*class=["\'][^"\']*action-buttons[^"\']*["\'][^>]*>.*?</div>\s*', '', html_string, flags=re.DOTALL)
-            html_string = re.sub(r'<script[^>]*>.*?</script>', '', html_string, flags=re.DOTALL | re.IGNORECASE)
-            
-            pdf_bytes = None
-            
-            # Bandyti naudoti WeasyPrint (geresnė kokybė)
             try:
-                from weasyprint import HTML, CSS
-                base_url = request.build_absolute_uri('/')
-                html_doc = HTML(string=html_string, base_url=base_url)
-                
-                pdf_css_string = """
-                    @page {
-                        size: A4;
-                        margin: 0;
-                    }
-                """
-                css_doc = CSS(string=pdf_css_string)
-                
-                pdf_bytes = html_doc.write_pdf(stylesheets=[css_doc])
-                logger.info("WeasyPrint sėkmingai sugeneravo PDF el. laiške")
-                
-            except (ImportError, OSError) as e:
-                logger.warning(f"WeasyPrint nepasiekiamas el. laiške: {e}, naudojamas xhtml2pdf fallback")
-            except Exception as e:
-                logger.error(f"WeasyPrint klaida el. laiške: {e}, naudojamas xhtml2pdf fallback")
-            
-            # Fallback į xhtml2pdf
-            if not pdf_bytes:
-                try:
-                    from io import BytesIO
-                    from xhtml2pdf import pisa
-                    
-                    result = BytesIO()
-                    
-                    def link_callback(uri, rel):
-                        from urllib.parse import urlparse, urljoin
-                        from django.conf import settings
-                        import os
-                        
-                        if uri.startswith('data:'):
-                            return uri
-                        
-                        if uri.startswith('/'):
-                            if uri.startswith(settings.MEDIA_URL):
-                                file_path = uri.replace(settings.MEDIA_URL, '')
-                                full_path = os.path.join(settings.MEDIA_ROOT, file_path)
-                                if os.path.exists(full_path):
-                                    return f"file://{full_path}"
-                            base_url = request.build_absolute_uri('/').rstrip('/')
-                            return urljoin(base_url, uri)
-                        
-                        return uri
-                    
-                    pdf = pisa.pisaDocument(
-                        BytesIO(html_string.encode("UTF-8")), 
-                        result,
-                        encoding='UTF-8',
-                        link_callback=link_callback,
-                        show_error_as_pdf=False
-                    )
-                    
-                    if pdf.err:
-                        error_msg = str(pdf.err) if pdf.err else "Nežinoma PDF generavimo klaida"
-                        logger.error(f"xhtml2pdf klaida el. laiške: {error_msg}")
-                        return Response(
-                            {'success': False, 'error': f'PDF generavimo klaida: {error_msg}'},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                        )
-                    
-                    pdf_bytes = result.getvalue()
-                    
-                    # Patikrinti, ar tikrai PDF (prasideda su %PDF)
-                    if not pdf_bytes or not pdf_bytes.startswith(b'%PDF'):
-                        error_msg = "Generuotas failas nėra PDF formatas"
-                        logger.error(f"xhtml2pdf klaida el. laiške: {error_msg}")
-                        if pdf_bytes:
-                            logger.error(f"Grąžintas turinys (pirmi 500 simbolių): {pdf_bytes[:500]}")
-                        return Response(
-                            {'success': False, 'error': f'PDF generavimo klaida: {error_msg}'},
-                            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                        )
-                    
-                except ImportError:
-                    logger.error("xhtml2pdf nepasiekiamas el. laiške")
-                    return Response(
-                        {'success': False, 'error': 'PDF generavimo biblioteka nepasiekiama'},
-                        status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                    )
-            
-            if not pdf_bytes:
+                pdf_bytes = self._render_order_pdf(order, request, context)
+            except PdfRenderError as e:
+                logger.error(f"PDF generavimo klaida el. laiške: {e}")
                 return Response(
-                    {'success': False, 'error': 'Nepavyko generuoti PDF'},
+                    {'success': False, 'error': f'PDF generavimo klaida: {str(e)}'},
                     status=status.HTTP_500_INTERNAL_SERVER_ERROR
                 )
             
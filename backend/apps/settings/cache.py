@@ -0,0 +1,177 @@
+"""
+Singleton nustatymų (OrderSettings, InvoiceSettings, CompanyInfo, NotificationSettings, ...) cache.
+
+X.load() anksčiau kiekvieną kartą vykdė get_or_create(pk=1): numeracijoje, PDF kontekste,
+el. laiškų siuntime ir mail scheduler cikle - dešimtys vienodų užklausų vienai HTTP užklausai.
+
+Dabar:
+- kiekvienas procesas laiko įrašo laukų reikšmes atmintyje kartu su versijos žyme,
+- žymė (lentelė settings_versions, viena eilutė modeliui) pakeičiama išsaugant / ištrinant įrašą
+  (post_save / post_delete) toje pačioje transakcijoje kaip ir pats pakeitimas,
+- visų modelių žymės nuskaitomos viena užklausa: HTTP užklausoje - vieną kartą (SettingsCacheMiddleware),
+  už užklausų ribų (scheduler'iai, komandos) - ne dažniau nei kas SETTINGS_CACHE_TTL sekundžių,
+- žymė atsitiktinė, todėl atšaukta transakcija niekada nesutaps su vėlesne žyme.
+
+Taigi kiti gunicorn worker'iai pakeitimą pamato nuo kitos HTTP užklausos.
+load() grąžina naują egzempliorių (JSON laukai nukopijuoti) - jį galima keisti ir išsaugoti.
+"""
+
+import copy
+import logging
+import threading
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models.fields.files import FieldFile
+from django.db.models.signals import post_delete, post_save
+
+logger = logging.getLogger(__name__)
+
+# model_label -> (žymė, laukų attname, reikšmės)
+_cache = {}
+_local = threading.local()
+
+
+def is_settings_cache_enabled() -> bool:
+    return getattr(settings, 'SETTINGS_CACHE_ENABLED', True)
+
+
+def begin_request():
+    """HTTP užklausos pradžia: žymės bus nuskaitytos iš naujo (vieną kartą šiai užklausai)"""
+    _local.stamps = None
+    _local.in_request = True
+
+
+def end_request():
+    _local.stamps = None
+    _local.in_request = False
+
+
+def _get_stamps() -> dict:
+    stamps = getattr(_local, 'stamps', None)
+    if stamps is not None:
+        if getattr(_local, 'in_request', False):
+            return stamps
+        if time.monotonic() - _local.loaded_at < getattr(settings, 'SETTINGS_CACHE_TTL', 5):
+            return stamps
+
+    from apps.settings.models import SettingsVersion
+
+    stamps = dict(SettingsVersion.objects.using('default').values_list('model_label', 'stamp'))
+    _local.stamps = stamps
+    _local.loaded_at = time.monotonic()
+    return stamps
+
+
+def _versions_table_missing() -> bool:
+    """True tik tada, kai DB pasiekiama, bet settings_versions lentelės nėra"""
+    from django.db import connections
+    from apps.settings.models import SettingsVersion
+
+    try:
+        return SettingsVersion._meta.db_table not in connections['default'].introspection.table_names()
+    except DatabaseError:
+        return False
+
+
+def _field_value(instance, field):
+    value = getattr(instance, field.attname)
+    if isinstance(value, FieldFile):
+        # Saugomas tik failo vardas (FieldFile turi nuorodą į visą egzempliorių)
+        return value.name
+    return value
+
+
+def cached_singleton(load):
+    """
+    load() dekoratorius: grąžina įrašą iš proceso cache, jei jo versijos žymė nepasikeitė.
+    Naudojamas po @classmethod, originalus load() kviečiamas tik cache neturint / pasenus.
+    """
+    @wraps(load)
+    def wrapper(cls):
+        if not is_settings_cache_enabled():
+            return load(cls)
+        label = cls._meta.label_lower
+        try:
+            stamp = _get_stamps().get(label)
+        except DatabaseError as e:
+            # Lentelė dar nesukurta (prieš migracijas, check / makemigrations) - tikėtina, ne klaida
+            log = logger.debug if _versions_table_missing() else logger.warning
+            log(f"Settings cache unavailable, loading {label} from DB: {e}")
+            return load(cls)
+
+        entry = _cache.get(label)
+        if entry is not None and entry[0] == stamp:
+            _, field_names, values = entry
+            return cls.from_db('default', field_names, copy.deepcopy(values))
+
+        obj = load(cls)
+        fields = cls._meta.concrete_fields
+        _cache[label] = (
+            stamp,
+            [field.attname for field in fields],
+            copy.deepcopy(tuple(_field_value(obj, field) for field in fields)),
+        )
+        return obj
+
+    wrapper.cached_singleton = True
+    return wrapper
+
+
+def _bump_settings_version(sender, **kwargs):
+    from apps.settings.models import SettingsVersion
+
+    label = sender._meta.label_lower
+    stamp = uuid.uuid4().hex
+    SettingsVersion.objects.using(kwargs.get('using') or 'default').update_or_create(
+        model_label=label, defaults={'stamp': stamp}
+    )
+    _cache.pop(label, None)
+    # Ta pati užklausa / gija iškart mato naują žymę
+    stamps = getattr(_local, 'stamps', None)
+    if stamps is not None:
+        stamps[label] = stamp
+
+
+def _bump_settings_version_safe(sender, **kwargs):
+    try:
+        _bump_settings_version(sender, **kwargs)
+    except Exception as e:
+        # Bent jau šis procesas neturi naudoti seno įrašo
+        _cache.pop(sender._meta.label_lower, None)
+        logger.error(f"Error bumping settings version for {sender._meta.label_lower}: {e}", exc_info=True)
+
+
+def get_version_stamp(model):
+    """Modelio versijos žymė - kitiems proceso cache (pvz. sukompiliuotoms taisyklėms) invaliduoti"""
+    return _get_stamps().get(model._meta.label_lower)
+
+
+def bump_version(model, using=None):
+    """Pakeisti modelio versijos žymę (kiti worker'iai cache atnaujins nuo kitos užklausos)"""
+    _bump_settings_version_safe(model, using=using)
+
+
+def get_cached_singleton_models():
+    from django.apps import apps
+
+    return [
+        model for model in apps.get_app_config('settings').get_models()
+        if getattr(getattr(model, 'load', None), 'cached_singleton', False)
+    ]
+
+
+def register_version_signals(model):
+    """Keisti modelio versijos žymę kiekvieną kartą išsaugant / ištrinant įrašą"""
+    uid = f'settings_cache_{model._meta.label_lower}'
+    post_save.connect(_bump_settings_version_safe, sender=model, dispatch_uid=f'{uid}_save', weak=False)
+    post_delete.connect(_bump_settings_version_safe, sender=model, dispatch_uid=f'{uid}_delete', weak=False)
+
+
+def register_settings_cache_signals():
+    """Registruoti versijos žymės keitimą visiems modeliams su @cached_singleton load()"""
+    for model in get_cached_singleton_models():
+        register_version_signals(model)
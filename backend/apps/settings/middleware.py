@@ -0,0 +1,15 @@
+from .cache import begin_request, end_request
+
+
+class SettingsCacheMiddleware:
+    """Singleton nustatymų versijos tikrinamos vieną kartą kiekvienai HTTP užklausai (žr. cache.py)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        begin_request()
+        try:
+            return self.get_response(request)
+        finally:
+            end_request()
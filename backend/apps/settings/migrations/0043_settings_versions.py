@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-16 23:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('settings', '0042_alter_emailtemplate_body_html_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SettingsVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('model_label', models.CharField(max_length=100, unique=True, verbose_name='Modelis')),
+                ('stamp', models.CharField(max_length=32, verbose_name='Versijos žymė')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Nustatymų versija',
+                'verbose_name_plural': 'Nustatymų versijos',
+                'db_table': 'settings_versions',
+            },
+        ),
+    ]
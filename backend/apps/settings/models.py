@@ -4,6 +4,8 @@ from django.utils.translation import gettext_lazy as _
 from decimal import Decimal
 import os
 
+from .cache import cached_singleton
+
 
 class OrderSettings(models.Model):
     """Užsakymų nustatymai (vienas įrašas visai sistemai)"""
@@ -80,6 +82,7 @@ class OrderSettings(models.Model):
         super().save(*args, **kwargs)
 
     @classmethod
+    @cached_singleton
     def load(cls):
         obj, _ = cls.objects.get_or_create(pk=1)
         return obj
@@ -135,6 +138,7 @@ class ExpeditionSettings(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     @classmethod
+    @cached_singleton
     def load(cls):
         """Grąžina vienintelį įrašą arba sukuria naują"""
         obj, created = cls.objects.get_or_create(pk=1)
@@ -163,6 +167,7 @@ class WarehouseExpeditionSettings(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     @classmethod
+    @cached_singleton
     def load(cls):
         """Grąžina vienintelį įrašą arba sukuria naują"""
         obj, created = cls.objects.get_or_create(pk=1)
@@ -183,6 +188,7 @@ class CostExpeditionSettings(models.Model):
     )
 
     @classmethod
+    @cached_singleton
     def load(cls):
         """Grąžina vienintelį įrašą arba sukuria naują"""
         obj, created = cls.objects.get_or_create(pk=1)
@@ -201,6 +207,7 @@ class CostExpeditionSettings(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     @classmethod
+    @cached_singleton
     def load(cls):
         """Grąžina vienintelį įrašą arba sukuria naują"""
         obj, created = cls.objects.get_or_create(pk=1)
@@ -255,6 +262,7 @@ class CostExpeditionSettings(models.Model):
         super().save(*args, **kwargs)
 
     @classmethod
+    @cached_singleton
     def load(cls):
         obj, _ = cls.objects.get_or_create(pk=1)
         return obj
@@ -329,6 +337,7 @@ class CompanyInfo(models.Model):
         super().save(*args, **kwargs)
     
     @classmethod
+    @cached_singleton
     def load(cls):
         """Grąžina vienintelį įrašą arba sukuria naują (visada naudojame default DB)."""
         obj, created = cls.objects.using('default').get_or_create(pk=1)
@@ -493,6 +502,7 @@ class InvoiceSettings(models.Model):
         super().save(*args, **kwargs)
     
     @classmethod
+    @cached_singleton
     def load(cls):
         """Grąžina vienintelį įrašą arba sukuria naują"""
         obj, created = cls.objects.get_or_create(pk=1)
@@ -531,6 +541,7 @@ class UISettings(models.Model):
         super().save(*args, **kwargs)
     
     @classmethod
+    @cached_singleton
     def load(cls):
         """Grąžina vienintelį įrašą arba sukuria naują su default reikšmėmis"""
         obj, created = cls.objects.get_or_create(
@@ -1072,6 +1083,7 @@ class NotificationSettings(models.Model):
         super().save(*args, **kwargs)
     
     @classmethod
+    @cached_singleton
     def load(cls):
         """Grąžina vienintelį įrašą arba sukuria naują"""
         obj, created = cls.objects.get_or_create(pk=1)
@@ -1334,6 +1346,7 @@ class OrderAutoStatusSettings(models.Model):
         verbose_name_plural = _('Užsakymų automatinio statusų keitimo nustatymai')
     
     @classmethod
+    @cached_singleton
     def load(cls):
         """Gauti arba sukurti nustatymus (singleton pattern)"""
         obj, created = cls.objects.get_or_create(pk=1)
@@ -1400,3 +1413,22 @@ class OrderAutoStatusRule(models.Model):
     
     def __str__(self):
         return f"{self.from_status} → {self.to_status} ({len(self.conditions)} sąlygos, {self.logic_operator})"
+
+
+class SettingsVersion(models.Model):
+    """
+    Singleton nustatymų versijos žymė (viena eilutė modeliui).
+    Keičiama kiekvieną kartą išsaugant nustatymus - pagal ją kiti procesai atnaujina cache (žr. cache.py).
+    """
+
+    model_label = models.CharField(max_length=100, unique=True, verbose_name=_('Modelis'))
+    stamp = models.CharField(max_length=32, verbose_name=_('Versijos žymė'))
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'settings_versions'
+        verbose_name = _('Nustatymų versija')
+        verbose_name_plural = _('Nustatymų versijos')
+
+    def __str__(self):
+        return f"{self.model_label}: {self.stamp}"
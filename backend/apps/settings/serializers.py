@@ -18,7 +18,7 @@ from .models import (
     EmailTemplate,
 )
 from apps.orders.models import OrderNumberSequence, ExpeditionNumberSequence, Order, OrderCarrier, OrderCost
-from apps.invoices.models import InvoiceNumberSequence, SalesInvoice
+from apps.invoices.models import SalesInvoice
 
 
 class CompanyInfoSerializer(serializers.ModelSerializer):
@@ -205,26 +205,22 @@ class InvoiceSettingsSerializer(serializers.ModelSerializer):
         """Išsaugoti nustatymus ir atnaujinti skaitliuką, jei nurodytas next_invoice_number_edit"""
         instance = super().save(**kwargs)
         
-        # Jei nurodytas next_invoice_number_edit, atnaujinti InvoiceNumberSequence
+        # Jei nurodytas next_invoice_number_edit, atnaujinti prefikso seką (InvoicePrefixSequence)
         # Saugiai patikrinti ar validated_data yra prieinamas (jis meta AssertionError jei nėra is_valid())
         try:
             next_invoice_number = self.validated_data.get('next_invoice_number_edit')
             if next_invoice_number and next_invoice_number.strip():
-                current_year = datetime.now().year
+                from apps.invoices.utils import set_invoice_sequence_last_number
+
                 prefix = instance.invoice_prefix_sales or 'LOG'
+                width = instance.invoice_number_width or 7
                 
                 # Ištraukti skaičių iš numerio
                 number_str = next_invoice_number.strip().upper()[len(prefix):]
                 try:
                     next_number = int(number_str)
-                    # Atnaujinti skaitliuką (last_number turi būti next_number - 1, nes kai kuriama sąskaita, jis padidinamas +1)
-                    sequence, _ = InvoiceNumberSequence.objects.get_or_create(
-                        year=current_year,
-                        defaults={'last_number': max(0, next_number - 1)}
-                    )
-                    if sequence.last_number != next_number - 1:
-                        sequence.last_number = max(0, next_number - 1)
-                        sequence.save()
+                    # last_number = next_number - 1, nes kuriant sąskaitą jis padidinamas +1
+                    set_invoice_sequence_last_number(next_number - 1, prefix=prefix, width=width)
                 except (ValueError, IndexError):
                     pass  # Jei klaida, ignoruoti
         except (AttributeError, AssertionError):
@@ -234,49 +230,28 @@ class InvoiceSettingsSerializer(serializers.ModelSerializer):
         return instance
     
     def get_last_invoice_number(self, obj):
-        """Grąžina paskutinės išrašytos sąskaitos numerį - pagal skaitinę vertę, ne datą"""
-        from apps.invoices.utils import get_max_existing_invoice_number
+        """Grąžina paskutinės išrašytos sąskaitos numerį - pagal prefikso seką (ne datą)"""
+        from apps.invoices.utils import get_invoice_sequence_state
         
         prefix = obj.invoice_prefix_sales or 'LOG'
         width = obj.invoice_number_width or 7
         
-        # Rasti maksimalų sąskaitos numerį su tuo pačiu prefix'u (pagal skaitinę vertę)
-        # Naudoti optimizuotą funkciją, kuri naudoja _extract_numeric_suffix
-        max_number = get_max_existing_invoice_number(prefix=prefix, width=width)
+        # Seka visada lygi didžiausiam panaudotam numeriui (atnaujinama signal'ais)
+        max_number, _ = get_invoice_sequence_state(prefix=prefix, width=width)
         
         if max_number > 0:
             return f"{prefix}{max_number:0{width}d}"
         return None
     
     def get_next_invoice_number(self, obj):
-        """Apskaičiuoja sekantį sąskaitos numerį. Jei skaitliukas atsilieka nuo paskutinės sąskaitos, sinchronizuoja."""
-        from apps.invoices.utils import get_max_existing_invoice_number
-        
-        current_year = datetime.now().year
-        sequence, _ = InvoiceNumberSequence.objects.get_or_create(
-            year=current_year,
-            defaults={'last_number': 0}
-        )
+        """Apskaičiuoja sekantį sąskaitos numerį pagal prefikso seką"""
+        from apps.invoices.utils import get_invoice_sequence_state
 
         prefix = obj.invoice_prefix_sales or 'LOG'
         width = obj.invoice_number_width or 7
 
-        # Rasti maksimalų sąskaitos numerį su tuo pačiu prefix'u (pagal skaitinę vertę)
-        # Naudoti optimizuotą funkciją, kuri naudoja _extract_numeric_suffix
-        max_number = get_max_existing_invoice_number(prefix=prefix, width=width)
-
-        # Sinchronizuoti skaitliuką su maksimaliu numeriu
-        if max_number > sequence.last_number:
-            sequence.last_number = max_number
-            sequence.save(update_fields=['last_number'])
-
-        # Jei yra maksimalus numeris, naudoti jį, kitu atveju - sekos numerį
-        if max_number > 0:
-            next_number = max_number + 1
-        else:
-            next_number = sequence.last_number + 1
-            
-        return f"{prefix}{next_number:0{width}d}"
+        last_number, _ = get_invoice_sequence_state(prefix=prefix, width=width)
+        return f"{prefix}{(last_number + 1):0{width}d}"
 
 
 class OrderSettingsSerializer(serializers.ModelSerializer):
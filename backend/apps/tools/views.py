@@ -7,7 +7,8 @@ import subprocess
 import sys
 import tarfile
 import tempfile
-from io import StringIO
+from collections import deque
+from itertools import islice
 from pathlib import Path
 from datetime import datetime
 from decimal import Decimal
@@ -24,6 +25,7 @@ from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser
 
 from apps.orders.models import Order, OrderCarrier
+from apps.invoices.bank_statement_import import open_text
 from apps.invoices.models import SalesInvoice, PurchaseInvoice
 from apps.partners.models import Partner
 
@@ -480,6 +482,17 @@ class InfotransOrdersDeleteView(APIView):
                 logger.warning('Nepavyko pašalinti laikino katalogo po trynimo: %s', temp_dir, exc_info=True)
 
 
+def _legacy_column_name(name):
+    """
+    Stulpelių pavadinimai importe užrašyti taip, kaip Windows-1257 eksportą mato latin-1
+    ('Sàskaitos Nr.' = 'Sąskaitos Nr.') - teisingai dekoduotas pavadinimas verčiamas į tą formą.
+    """
+    try:
+        return (name or '').encode('cp1257').decode('latin-1')
+    except UnicodeError:
+        return name
+
+
 class PaymentImportView(APIView):
     """Importuoja mokėjimus iš CSV failo ir pažymi apmokėtas sąskaitas."""
 
@@ -528,491 +541,221 @@ class PaymentImportView(APIView):
 
             # Skaityti CSV failą
             try:
-                # Jei from_end=True, imti paskutines N eilučių
-                if from_end and limit:
-                    with temp_path.open('r', encoding='latin-1') as csv_file:
-                        lines = csv_file.readlines()
-                        # Pirmoji eilutė yra header
-                        header_line = lines[0]
-                        data_lines = lines[1:]
-                        # Imti paskutines N eilučių
-                        selected_lines = data_lines[-limit:] if len(data_lines) > limit else data_lines
-                        # Rekonstruoti CSV su header kaip string
-                        csv_content = header_line + ''.join(selected_lines)
-                        csv_file_obj = StringIO(csv_content)
-                        reader = csv.DictReader(csv_file_obj, delimiter=';')
-                        
-                        for row in reader:
-                            stats['total_rows'] += 1
+                # Koduotė nustatoma pagal turinį (UTF-8 arba Windows-1257 eksportas), failas skaitomas srautu
+                csv_file, _ = open_text(temp_path)
+                with csv_file:
+                    reader = csv.DictReader(csv_file, delimiter=';')
+                    reader.fieldnames = [_legacy_column_name(name) for name in (reader.fieldnames or [])]
+                    rows = reader
+                    if limit is not None:
+                        # Paskutinės N eilučių - atmintyje laikomos tik N eilučių
+                        rows = deque(reader, maxlen=limit) if from_end else islice(reader, limit)
+
+                    for row in rows:
+                        stats['total_rows'] += 1
+
+                        try:
+                            # Gauti duomenis iš CSV (palaikyti abu formatus: purchase ir sales)
+                            invoice_number = (row.get('Sàskaitos Nr.') or '').strip()
                             
-                            try:
-                                # Gauti duomenis iš CSV (palaikyti abu formatus: purchase ir sales)
-                                invoice_number = (row.get('Sàskaitos Nr.') or '').strip()
-                                
-                                # Partner name - skirtingi stulpeliai purchase ir sales
-                                partner_name = (row.get('Kas iðraðë') or row.get('Mokëtojas / kam iðraðë') or '').strip()
-                                
-                                # Payment date - skirtingi formatai
-                                payment_date_str = (row.get('Apmokëjimo data') or '').strip()
-                                # Jei nėra tiesioginio payment_date, bandyti ištraukti iš "Apmokëjimøinfo" (sales formatas)
-                                if not payment_date_str:
-                                    payment_info = (row.get('Apmokëjimøinfo') or '').strip()
-                                    if payment_info:
-                                        # Ieškoti datos formato YYYY-MM-DD
-                                        date_match = re.search(r'(\d{4}-\d{2}-\d{2})', payment_info)
-                                        if date_match:
-                                            payment_date_str = date_match.group(1)
-                                
-                                # Paid amount - skirtingi stulpeliai
-                                paid_amount_str = (row.get('Apmokëtaviso EUR') or row.get('Apmokëtaviso eur') or '').strip().replace(',', '.')
-                                
-                                # Expedition number - tik purchase
-                                expedition_number = (row.get('Eksp. nr') or '').strip()
-                                
-                                # Order numbers - skirtingi stulpeliai
-                                order_numbers_str = (row.get('Susijæ uþsakymai') or row.get('Uþsakymas(-ai)') or '').strip()
-
-                                if not invoice_number:
-                                    stats['not_found'] += 1
-                                    stats['details'].append({
-                                        'row': stats['total_rows'],
-                                        'invoice_number': invoice_number or '(nera)',
-                                        'status': 'error',
-                                        'message': 'Nėra sąskaitos numerio'
-                                    })
-                                    continue
-
-                                # Konvertuoti datas ir sumas
-                                payment_date = None
-                                if payment_date_str:
-                                    try:
-                                        # Bandyti skirtingus formatus
-                                        for fmt in ['%Y-%m-%d', '%Y.%m.%d', '%d.%m.%Y', '%d/%m/%Y']:
-                                            try:
-                                                payment_date = datetime.strptime(payment_date_str, fmt).date()
-                                                break
-                                            except ValueError:
-                                                continue
-                                    except Exception:
-                                        pass
-
-                                paid_amount = None
-                                if paid_amount_str:
-                                    try:
-                                        paid_amount = Decimal(paid_amount_str)
-                                    except Exception:
-                                        pass
-
-                                # Rasti sąskaitą (naudoti tą pačią logiką kaip žemiau)
-                                invoice = None
-                                
-                                if invoice_type == 'purchase':
-                                    # 1. Rasti PurchaseInvoice pagal received_invoice_number (tikslus atitikimas)
-                                    invoice = PurchaseInvoice.objects.filter(
-                                        received_invoice_number__iexact=invoice_number
-                                    ).first()
-                                    
-                                    # 2. Jei nerasta, bandyti pagal invoice_number
-                                    if not invoice:
-                                        invoice = PurchaseInvoice.objects.filter(
-                                            invoice_number__iexact=invoice_number
-                                        ).first()
-                                    
-                                    # 3. Jei nerasta, bandyti fuzzy matching (be tarpų, be specialių simbolių)
-                                    if not invoice:
-                                        clean_invoice_number = invoice_number.replace(' ', '').replace('/', '').replace('-', '').replace('.', '')
-                                        all_purchase = PurchaseInvoice.objects.all()
-                                        for inv in all_purchase:
-                                            clean_received = (inv.received_invoice_number or '').replace(' ', '').replace('/', '').replace('-', '').replace('.', '')
-                                            if clean_invoice_number and clean_received and (clean_invoice_number in clean_received or clean_received in clean_invoice_number):
-                                                invoice = inv
-                                                break
-                                    
-                                    # 4. Jei nerasta, bandyti pagal partner ir sumą (su tolerancija ±0.01)
-                                    if not invoice and partner_name and paid_amount:
-                                        invoices = PurchaseInvoice.objects.filter(
-                                            partner__name__icontains=partner_name
-                                        )
-                                        for inv in invoices:
-                                            if abs(float(inv.amount_total) - float(paid_amount)) < 0.01:
-                                                invoice = inv
-                                                break
-                                    
-                                    # 5. Jei nerasta, bandyti pagal ekspedicijos numerį
-                                    if not invoice and expedition_number:
-                                        carriers = OrderCarrier.objects.filter(
-                                            expedition_number=expedition_number
-                                        )
-                                        for carrier in carriers:
-                                            if carrier.order:
-                                                invoices = PurchaseInvoice.objects.filter(
-                                                    related_orders=carrier.order
-                                                )
-                                                if invoices.count() == 1:
-                                                    invoice = invoices.first()
-                                                    break
-                                    
-                                    # 6. Jei nerasta, bandyti pagal užsakymo numerį
-                                    if not invoice and order_numbers_str:
-                                        # Ištraukti užsakymo numerius (gali būti kelios, atskirtos tarpais)
-                                        order_nums = []
-                                        # Bandyti ištraukti numerius (pvz., "2019-194 UAB Ergolain" -> "2019-194")
-                                        parts = order_numbers_str.split()
-                                        for part in parts:
-                                            if part and part[0].isdigit():
-                                                order_nums.append(part.strip())
-                                        
-                                        for order_num in order_nums:
-                                            try:
-                                                order = Order.objects.get(order_number=order_num)
-                                                invoices = PurchaseInvoice.objects.filter(
-                                                    related_orders=order
-                                                )
-                                                if invoices.count() == 1:
-                                                    invoice = invoices.first()
-                                                    break
-                                            except Order.DoesNotExist:
-                                                continue
-                                
-                                else:  # sales
-                                    # Rasti SalesInvoice pagal invoice_number
-                                    invoice = SalesInvoice.objects.filter(
-                                        invoice_number__iexact=invoice_number
-                                    ).first()
-                                    
-                                    # Jei nerasta, bandyti pagal partner ir sumą
-                                    if not invoice and partner_name and paid_amount:
-                                        invoices = SalesInvoice.objects.filter(
-                                            partner__name__icontains=partner_name,
-                                            amount_total=paid_amount
-                                        )
-                                        if invoices.count() == 1:
-                                            invoice = invoices.first()
-                                    
-                                    # Jei nerasta, bandyti pagal užsakymo numerį
-                                    if not invoice and order_numbers_str:
-                                        # Ištraukti užsakymo numerius (gali būti vienas arba keli)
-                                        order_nums = []
-                                        # Bandyti ištraukti numerius (pvz., "2024-339" arba "2024-339 UAB Transekspedicija")
-                                        parts = order_numbers_str.split()
-                                        for part in parts:
-                                            if part and part[0].isdigit() and '-' in part:
-                                                order_nums.append(part.strip())
-                                        
-                                        for order_num in order_nums:
-                                            try:
-                                                order = Order.objects.get(order_number=order_num)
-                                                invoice = SalesInvoice.objects.filter(
-                                                    related_order=order
-                                                ).first()
-                                                if invoice:
-                                                    break
-                                            except Order.DoesNotExist:
-                                                continue
-
-                                if invoice:
-                                    stats['matched'] += 1
-                                    
-                                    # Validuoti payment_date - negali būti senesnė nei issue_date arba užsakymo data
-                                    original_payment_date = payment_date
-                                    if payment_date and invoice.issue_date:
-                                        # Konvertuoti issue_date į date, jei reikia
-                                        issue_date = invoice.issue_date
-                                        if isinstance(issue_date, datetime):
-                                            issue_date = issue_date.date()
-                                        elif hasattr(issue_date, 'date'):
-                                            issue_date = issue_date.date()
-                                        
-                                        if payment_date < issue_date:
-                                            # Jei payment_date senesnė nei issue_date, naudoti issue_date
-                                            payment_date = issue_date
-                                    
-                                    # Taip pat patikrinti susijusius užsakymus
-                                    if payment_date:
-                                        # SalesInvoice turi related_order (singular), ne related_orders
-                                        if invoice_type == 'sales' and invoice.related_order:
-                                            order = invoice.related_order
-                                            if order.order_date:
-                                                order_date = order.order_date.date() if isinstance(order.order_date, datetime) else order.order_date
-                                                if payment_date < order_date:
-                                                    payment_date = order_date
-                                            if order.loading_date:
-                                                loading_date = order.loading_date.date() if isinstance(order.loading_date, datetime) else order.loading_date
-                                                if payment_date < loading_date:
-                                                    payment_date = loading_date
-                                            if order.unloading_date:
-                                                unloading_date = order.unloading_date.date() if isinstance(order.unloading_date, datetime) else order.unloading_date
-                                                if payment_date < unloading_date:
-                                                    payment_date = unloading_date
-                                        elif invoice_type == 'purchase':
-                                            related_orders = invoice.related_orders.all()
-                                            for order in related_orders:
-                                                if order.order_date:
-                                                    order_date = order.order_date.date() if isinstance(order.order_date, datetime) else order.order_date
-                                                    if payment_date < order_date:
-                                                        payment_date = order_date
-                                                if order.loading_date:
-                                                    loading_date = order.loading_date.date() if isinstance(order.loading_date, datetime) else order.loading_date
-                                                    if payment_date < loading_date:
-                                                        payment_date = loading_date
-                                                if order.unloading_date:
-                                                    unloading_date = order.unloading_date.date() if isinstance(order.unloading_date, datetime) else order.unloading_date
-                                                    if payment_date < unloading_date:
-                                                        payment_date = unloading_date
-                                    
-                                    if not dry_run:
-                                        # Atnaujinti sąskaitą
-                                        invoice.payment_status = 'paid'
-                                        if payment_date:
-                                            invoice.payment_date = payment_date
-                                        invoice.save()
-                                        stats['updated'] += 1
-                                    
-                                    # Nustatyti, kaip rasta
-                                    match_method = 'sąskaitos numeris'
-                                    if invoice_type == 'purchase':
-                                        if invoice.received_invoice_number and invoice.received_invoice_number.lower() != invoice_number.lower():
-                                            match_method = 'fuzzy matching'
-                                    elif invoice_type == 'sales':
-                                        if invoice.invoice_number and invoice.invoice_number.lower() != invoice_number.lower():
-                                            match_method = 'fuzzy matching'
-                                    
-                                    if partner_name and paid_amount:
-                                        match_method = 'klientas/vežėjas + suma'
-                                    elif expedition_number:
-                                        match_method = 'ekspedicijos numeris'
-                                    elif order_numbers_str:
-                                        match_method = 'užsakymo numeris'
-                                    
-                                    # Pridėti informaciją apie datos koregavimą
-                                    date_adjusted = False
-                                    if original_payment_date and payment_date and original_payment_date != payment_date:
-                                        date_adjusted = True
-                                    
-                                    message = f'Rasta ({match_method}) ir {"atnaujinta" if not dry_run else "būtų atnaujinta"}'
-                                    if date_adjusted:
-                                        message += f' (data pakoreguota iš {original_payment_date} į {payment_date})'
-                                    
-                                    stats['details'].append({
-                                        'row': stats['total_rows'],
-                                        'invoice_number': invoice_number,
-                                        'invoice_id': invoice.id,
-                                        'status': 'matched',
-                                        'message': message
-                                    })
-                                else:
-                                    # Nerasta sąskaita - tiesiog praleisti, ne rodyti kaip klaidą
-                                    stats['not_found'] += 1
-                                    # Nerastos sąskaitos nepridedamos į detalių sąrašą, kad nebūtų užkrautas rezultatas
+                            # Partner name - skirtingi stulpeliai purchase ir sales
+                            partner_name = (row.get('Kas iðraðë') or row.get('Mokëtojas / kam iðraðë') or '').strip()
+                            
+                            # Payment date - skirtingi formatai
+                            payment_date_str = (row.get('Apmokëjimo data') or '').strip()
+                            # Jei nėra tiesioginio payment_date, bandyti ištraukti iš "Apmokëjimøinfo" (sales formatas)
+                            if not payment_date_str:
+                                payment_info = (row.get('Apmokëjimøinfo') or '').strip()
+                                if payment_info:
+                                    # Ieškoti datos formato YYYY-MM-DD
+                                    date_match = re.search(r'(\d{4}-\d{2}-\d{2})', payment_info)
+                                    if date_match:
+                                        payment_date_str = date_match.group(1)
                             
-                            except Exception as e:
-                                stats['errors'] += 1
+                            # Paid amount - skirtingi stulpeliai
+                            paid_amount_str = (row.get('Apmokëtaviso EUR') or row.get('Apmokëtaviso eur') or '').strip().replace(',', '.')
+                            
+                            # Expedition number - tik purchase
+                            expedition_number = (row.get('Eksp. nr') or '').strip()
+                            
+                            # Order numbers - skirtingi stulpeliai
+                            order_numbers_str = (row.get('Susijæ uþsakymai') or row.get('Uþsakymas(-ai)') or '').strip()
+
+                            if not invoice_number:
+                                stats['not_found'] += 1
                                 stats['details'].append({
                                     'row': stats['total_rows'],
-                                    'invoice_number': invoice_number if 'invoice_number' in locals() else '(nera)',
+                                    'invoice_number': invoice_number or '(nera)',
                                     'status': 'error',
-                                    'message': str(e)
+                                    'message': 'Nėra sąskaitos numerio'
                                 })
-                                logger.error(f'Klaida apdorojant eilutę {stats["total_rows"]}: {e}', exc_info=True)
-                else:
-                    # Normalus skaitymas nuo pradžios
-                    with temp_path.open('r', encoding='latin-1') as csv_file:
-                        reader = csv.DictReader(csv_file, delimiter=';')
-                    
-                        for row in reader:
-                            # Patikrinti ar pasiektas limitas (prieš apdorojant eilutę)
-                            if limit is not None and not from_end and stats['total_rows'] >= limit:
-                                break
-                            
-                            stats['total_rows'] += 1
+                                continue
+
+                            # Konvertuoti datas ir sumas
+                            payment_date = None
+                            if payment_date_str:
+                                try:
+                                    # Bandyti skirtingus formatus
+                                    for fmt in ['%Y-%m-%d', '%Y.%m.%d', '%d.%m.%Y', '%d/%m/%Y']:
+                                        try:
+                                            payment_date = datetime.strptime(payment_date_str, fmt).date()
+                                            break
+                                        except ValueError:
+                                            continue
+                                except Exception:
+                                    pass
+
+                            paid_amount = None
+                            if paid_amount_str:
+                                try:
+                                    paid_amount = Decimal(paid_amount_str)
+                                except Exception:
+                                    pass
+
+                            # Rasti sąskaitą
+                            invoice = None
                             
-                            try:
-                                # Gauti duomenis iš CSV (palaikyti abu formatus: purchase ir sales)
-                                invoice_number = (row.get('Sàskaitos Nr.') or '').strip()
-                                
-                                # Partner name - skirtingi stulpeliai purchase ir sales
-                                partner_name = (row.get('Kas iðraðë') or row.get('Mokëtojas / kam iðraðë') or '').strip()
+                            if invoice_type == 'purchase':
+                                # 1. Rasti PurchaseInvoice pagal received_invoice_number (tikslus atitikimas)
+                                invoice = PurchaseInvoice.objects.filter(
+                                    received_invoice_number__iexact=invoice_number
+                                ).first()
                                 
-                                # Payment date - skirtingi formatai
-                                payment_date_str = (row.get('Apmokëjimo data') or '').strip()
-                                # Jei nėra tiesioginio payment_date, bandyti ištraukti iš "Apmokëjimøinfo" (sales formatas)
-                                if not payment_date_str:
-                                    payment_info = (row.get('Apmokëjimøinfo') or '').strip()
-                                    if payment_info:
-                                        # Ieškoti datos formato YYYY-MM-DD
-                                        date_match = re.search(r'(\d{4}-\d{2}-\d{2})', payment_info)
-                                        if date_match:
-                                            payment_date_str = date_match.group(1)
+                                # 2. Jei nerasta, bandyti pagal invoice_number
+                                if not invoice:
+                                    invoice = PurchaseInvoice.objects.filter(
+                                        invoice_number__iexact=invoice_number
+                                    ).first()
                                 
-                                # Paid amount - skirtingi stulpeliai
-                                paid_amount_str = (row.get('Apmokëtaviso EUR') or row.get('Apmokëtaviso eur') or '').strip().replace(',', '.')
+                                # 3. Jei nerasta, bandyti fuzzy matching (be tarpų, be specialių simbolių)
+                                if not invoice:
+                                    clean_invoice_number = invoice_number.replace(' ', '').replace('/', '').replace('-', '').replace('.', '')
+                                    all_purchase = PurchaseInvoice.objects.all()
+                                    for inv in all_purchase:
+                                        clean_received = (inv.received_invoice_number or '').replace(' ', '').replace('/', '').replace('-', '').replace('.', '')
+                                        if clean_invoice_number and clean_received and (clean_invoice_number in clean_received or clean_received in clean_invoice_number):
+                                            invoice = inv
+                                            break
                                 
-                                # Expedition number - tik purchase
-                                expedition_number = (row.get('Eksp. nr') or '').strip()
+                                # 4. Jei nerasta, bandyti pagal partner ir sumą (su tolerancija ±0.01)
+                                if not invoice and partner_name and paid_amount:
+                                    invoices = PurchaseInvoice.objects.filter(
+                                        partner__name__icontains=partner_name
+                                    )
+                                    for inv in invoices:
+                                        if abs(float(inv.amount_total) - float(paid_amount)) < 0.01:
+                                            invoice = inv
+                                            break
                                 
-                                # Order numbers - skirtingi stulpeliai
-                                order_numbers_str = (row.get('Susijæ uþsakymai') or row.get('Uþsakymas(-ai)') or '').strip()
-
-                                if not invoice_number:
-                                    stats['not_found'] += 1
-                                    stats['details'].append({
-                                        'row': stats['total_rows'],
-                                        'invoice_number': invoice_number or '(nera)',
-                                        'status': 'error',
-                                        'message': 'Nėra sąskaitos numerio'
-                                    })
-                                    continue
-
-                                # Konvertuoti datas ir sumas
-                                payment_date = None
-                                if payment_date_str:
-                                    try:
-                                        # Bandyti skirtingus formatus
-                                        for fmt in ['%Y-%m-%d', '%Y.%m.%d', '%d.%m.%Y', '%d/%m/%Y']:
-                                            try:
-                                                payment_date = datetime.strptime(payment_date_str, fmt).date()
+                                # 5. Jei nerasta, bandyti pagal ekspedicijos numerį
+                                if not invoice and expedition_number:
+                                    carriers = OrderCarrier.objects.filter(
+                                        expedition_number=expedition_number
+                                    )
+                                    for carrier in carriers:
+                                        if carrier.order:
+                                            invoices = PurchaseInvoice.objects.filter(
+                                                related_orders=carrier.order
+                                            )
+                                            if invoices.count() == 1:
+                                                invoice = invoices.first()
                                                 break
-                                            except ValueError:
-                                                continue
-                                    except Exception:
-                                        pass
-
-                                paid_amount = None
-                                if paid_amount_str:
-                                    try:
-                                        paid_amount = Decimal(paid_amount_str)
-                                    except Exception:
-                                        pass
-
-                                # Rasti sąskaitą
-                                invoice = None
                                 
-                                if invoice_type == 'purchase':
-                                    # 1. Rasti PurchaseInvoice pagal received_invoice_number (tikslus atitikimas)
-                                    invoice = PurchaseInvoice.objects.filter(
-                                        received_invoice_number__iexact=invoice_number
-                                    ).first()
+                                # 6. Jei nerasta, bandyti pagal užsakymo numerį
+                                if not invoice and order_numbers_str:
+                                    # Ištraukti užsakymo numerius (gali būti kelios, atskirtos tarpais)
+                                    order_nums = []
+                                    # Bandyti ištraukti numerius (pvz., "2019-194 UAB Ergolain" -> "2019-194")
+                                    parts = order_numbers_str.split()
+                                    for part in parts:
+                                        if part and part[0].isdigit():
+                                            order_nums.append(part.strip())
                                     
-                                    # 2. Jei nerasta, bandyti pagal invoice_number
-                                    if not invoice:
-                                        invoice = PurchaseInvoice.objects.filter(
-                                            invoice_number__iexact=invoice_number
-                                        ).first()
-                                    
-                                    # 3. Jei nerasta, bandyti fuzzy matching (be tarpų, be specialių simbolių)
-                                    if not invoice:
-                                        clean_invoice_number = invoice_number.replace(' ', '').replace('/', '').replace('-', '').replace('.', '')
-                                        all_purchase = PurchaseInvoice.objects.all()
-                                        for inv in all_purchase:
-                                            clean_received = (inv.received_invoice_number or '').replace(' ', '').replace('/', '').replace('-', '').replace('.', '')
-                                            if clean_invoice_number and clean_received and (clean_invoice_number in clean_received or clean_received in clean_invoice_number):
-                                                invoice = inv
+                                    for order_num in order_nums:
+                                        try:
+                                            order = Order.objects.get(order_number=order_num)
+                                            invoices = PurchaseInvoice.objects.filter(
+                                                related_orders=order
+                                            )
+                                            if invoices.count() == 1:
+                                                invoice = invoices.first()
                                                 break
+                                        except Order.DoesNotExist:
+                                            continue
+                            
+                            else:  # sales
+                                # Rasti SalesInvoice pagal invoice_number
+                                invoice = SalesInvoice.objects.filter(
+                                    invoice_number__iexact=invoice_number
+                                ).first()
+                                
+                                # Jei nerasta, bandyti pagal partner ir sumą
+                                if not invoice and partner_name and paid_amount:
+                                    invoices = SalesInvoice.objects.filter(
+                                        partner__name__icontains=partner_name,
+                                        amount_total=paid_amount
+                                    )
+                                    if invoices.count() == 1:
+                                        invoice = invoices.first()
+                                
+                                # Jei nerasta, bandyti pagal užsakymo numerį
+                                if not invoice and order_numbers_str:
+                                    # Ištraukti užsakymo numerius (gali būti vienas arba keli)
+                                    order_nums = []
+                                    # Bandyti ištraukti numerius (pvz., "2024-339" arba "2024-339 UAB Transekspedicija")
+                                    parts = order_numbers_str.split()
+                                    for part in parts:
+                                        if part and part[0].isdigit() and '-' in part:
+                                            order_nums.append(part.strip())
                                     
-                                    # 4. Jei nerasta, bandyti pagal partner ir sumą (su tolerancija ±0.01)
-                                    if not invoice and partner_name and paid_amount:
-                                        invoices = PurchaseInvoice.objects.filter(
-                                            partner__name__icontains=partner_name
-                                        )
-                                        for inv in invoices:
-                                            if abs(float(inv.amount_total) - float(paid_amount)) < 0.01:
-                                                invoice = inv
+                                    for order_num in order_nums:
+                                        try:
+                                            order = Order.objects.get(order_number=order_num)
+                                            invoice = SalesInvoice.objects.filter(
+                                                related_order=order
+                                            ).first()
+                                            if invoice:
                                                 break
-                                    
-                                    # 5. Jei nerasta, bandyti pagal ekspedicijos numerį
-                                    if not invoice and expedition_number:
-                                        carriers = OrderCarrier.objects.filter(
-                                            expedition_number=expedition_number
-                                        )
-                                        for carrier in carriers:
-                                            if carrier.order:
-                                                invoices = PurchaseInvoice.objects.filter(
-                                                    related_orders=carrier.order
-                                                )
-                                                if invoices.count() == 1:
-                                                    invoice = invoices.first()
-                                                    break
-                                    
-                                    # 6. Jei nerasta, bandyti pagal užsakymo numerį
-                                    if not invoice and order_numbers_str:
-                                        # Ištraukti užsakymo numerius (gali būti kelios, atskirtos tarpais)
-                                        order_nums = []
-                                        # Bandyti ištraukti numerius (pvz., "2019-194 UAB Ergolain" -> "2019-194")
-                                        parts = order_numbers_str.split()
-                                        for part in parts:
-                                            if part and part[0].isdigit():
-                                                order_nums.append(part.strip())
-                                        
-                                        for order_num in order_nums:
-                                            try:
-                                                order = Order.objects.get(order_number=order_num)
-                                                invoices = PurchaseInvoice.objects.filter(
-                                                    related_orders=order
-                                                )
-                                                if invoices.count() == 1:
-                                                    invoice = invoices.first()
-                                                    break
-                                            except Order.DoesNotExist:
-                                                continue
+                                        except Order.DoesNotExist:
+                                            continue
+
+                            if invoice:
+                                stats['matched'] += 1
                                 
-                                else:  # sales
-                                    # Rasti SalesInvoice pagal invoice_number
-                                    invoice = SalesInvoice.objects.filter(
-                                        invoice_number__iexact=invoice_number
-                                    ).first()
-                                    
-                                    # Jei nerasta, bandyti pagal partner ir sumą
-                                    if not invoice and partner_name and paid_amount:
-                                        invoices = SalesInvoice.objects.filter(
-                                            partner__name__icontains=partner_name,
-                                            amount_total=paid_amount
-                                        )
-                                        if invoices.count() == 1:
-                                            invoice = invoices.first()
-                                    
-                                    # Jei nerasta, bandyti pagal užsakymo numerį
-                                    if not invoice and order_numbers_str:
-                                        # Ištraukti užsakymo numerius (gali būti vienas arba keli)
-                                        order_nums = []
-                                        # Bandyti ištraukti numerius (pvz., "2024-339" arba "2024-339 UAB Transekspedicija")
-                                        parts = order_numbers_str.split()
-                                        for part in parts:
-                                            if part and part[0].isdigit() and '-' in part:
-                                                order_nums.append(part.strip())
-                                        
-                                        for order_num in order_nums:
-                                            try:
-                                                order = Order.objects.get(order_number=order_num)
-                                                invoice = SalesInvoice.objects.filter(
-                                                    related_order=order
-                                                ).first()
-                                                if invoice:
-                                                    break
-                                            except Order.DoesNotExist:
-                                                continue
-
-                                if invoice:
-                                    stats['matched'] += 1
+                                # Validuoti payment_date - negali būti senesnė nei issue_date arba užsakymo data
+                                original_payment_date = payment_date
+                                if payment_date and invoice.issue_date:
+                                    # Konvertuoti issue_date į date, jei reikia
+                                    issue_date = invoice.issue_date
+                                    if isinstance(issue_date, datetime):
+                                        issue_date = issue_date.date()
+                                    elif hasattr(issue_date, 'date'):
+                                        issue_date = issue_date.date()
                                     
-                                    # Validuoti payment_date - negali būti senesnė nei issue_date arba užsakymo data
-                                    original_payment_date = payment_date
-                                    if payment_date and invoice.issue_date:
-                                        # Konvertuoti issue_date į date, jei reikia
-                                        issue_date = invoice.issue_date
-                                        if isinstance(issue_date, datetime):
-                                            issue_date = issue_date.date()
-                                        elif hasattr(issue_date, 'date'):
-                                            issue_date = issue_date.date()
-                                        
-                                        if payment_date < issue_date:
-                                            # Jei payment_date senesnė nei issue_date, naudoti issue_date
-                                            payment_date = issue_date
-                                    
-                                    # Taip pat patikrinti susijusius užsakymus
-                                    if payment_date:
-                                        # SalesInvoice turi related_order (singular), ne related_orders
-                                        if invoice_type == 'sales' and invoice.related_order:
-                                            order = invoice.related_order
+                                    if payment_date < issue_date:
+                                        # Jei payment_date senesnė nei issue_date, naudoti issue_date
+                                        payment_date = issue_date
+                                
+                                # Taip pat patikrinti susijusius užsakymus
+                                if payment_date:
+                                    # SalesInvoice turi related_order (singular), ne related_orders
+                                    if invoice_type == 'sales' and invoice.related_order:
+                                        order = invoice.related_order
+                                        if order.order_date:
+                                            order_date = order.order_date.date() if isinstance(order.order_date, datetime) else order.order_date
+                                            if payment_date < order_date:
+                                                payment_date = order_date
+                                        if order.loading_date:
+                                            loading_date = order.loading_date.date() if isinstance(order.loading_date, datetime) else order.loading_date
+                                            if payment_date < loading_date:
+                                                payment_date = loading_date
+                                        if order.unloading_date:
+                                            unloading_date = order.unloading_date.date() if isinstance(order.unloading_date, datetime) else order.unloading_date
+                                            if payment_date < unloading_date:
+                                                payment_date = unloading_date
+                                    elif invoice_type == 'purchase':
+                                        related_orders = invoice.related_orders.all()
+                                        for order in related_orders:
                                             if order.order_date:
                                                 order_date = order.order_date.date() if isinstance(order.order_date, datetime) else order.order_date
                                                 if payment_date < order_date:
@@ -1025,76 +768,61 @@ class PaymentImportView(APIView):
                                                 unloading_date = order.unloading_date.date() if isinstance(order.unloading_date, datetime) else order.unloading_date
                                                 if payment_date < unloading_date:
                                                     payment_date = unloading_date
-                                        elif invoice_type == 'purchase':
-                                            related_orders = invoice.related_orders.all()
-                                            for order in related_orders:
-                                                if order.order_date:
-                                                    order_date = order.order_date.date() if isinstance(order.order_date, datetime) else order.order_date
-                                                    if payment_date < order_date:
-                                                        payment_date = order_date
-                                                if order.loading_date:
-                                                    loading_date = order.loading_date.date() if isinstance(order.loading_date, datetime) else order.loading_date
-                                                    if payment_date < loading_date:
-                                                        payment_date = loading_date
-                                                if order.unloading_date:
-                                                    unloading_date = order.unloading_date.date() if isinstance(order.unloading_date, datetime) else order.unloading_date
-                                                    if payment_date < unloading_date:
-                                                        payment_date = unloading_date
-                                    
-                                    if not dry_run:
-                                        # Atnaujinti sąskaitą
-                                        invoice.payment_status = 'paid'
-                                        if payment_date:
-                                            invoice.payment_date = payment_date
-                                        invoice.save()
-                                        stats['updated'] += 1
-                                    
-                                    # Nustatyti, kaip rasta
-                                    match_method = 'sąskaitos numeris'
-                                    if invoice_type == 'purchase':
-                                        if invoice.received_invoice_number and invoice.received_invoice_number.lower() != invoice_number.lower():
-                                            match_method = 'fuzzy matching'
-                                    elif invoice_type == 'sales':
-                                        if invoice.invoice_number and invoice.invoice_number.lower() != invoice_number.lower():
-                                            match_method = 'fuzzy matching'
-                                    
-                                    if partner_name and paid_amount:
-                                        match_method = 'klientas/vežėjas + suma'
-                                    elif expedition_number:
-                                        match_method = 'ekspedicijos numeris'
-                                    elif order_numbers_str:
-                                        match_method = 'užsakymo numeris'
-                                    
-                                    # Pridėti informaciją apie datos koregavimą
-                                    date_adjusted = False
-                                    if original_payment_date and payment_date and original_payment_date != payment_date:
-                                        date_adjusted = True
-                                    
-                                    message = f'Rasta ({match_method}) ir {"atnaujinta" if not dry_run else "būtų atnaujinta"}'
-                                    if date_adjusted:
-                                        message += f' (data pakoreguota iš {original_payment_date} į {payment_date})'
-                                    
-                                    stats['details'].append({
-                                        'row': stats['total_rows'],
-                                        'invoice_number': invoice_number,
-                                        'invoice_id': invoice.id,
-                                        'status': 'matched',
-                                        'message': message
-                                    })
-                                else:
-                                    # Nerasta sąskaita - tiesiog praleisti, ne rodyti kaip klaidą
-                                    stats['not_found'] += 1
-                                    # Nerastos sąskaitos nepridedamos į detalių sąrašą, kad nebūtų užkrautas rezultatas
-                            
-                            except Exception as e:
-                                stats['errors'] += 1
+                                
+                                if not dry_run:
+                                    # Atnaujinti sąskaitą
+                                    invoice.payment_status = 'paid'
+                                    if payment_date:
+                                        invoice.payment_date = payment_date
+                                    invoice.save()
+                                    stats['updated'] += 1
+                                
+                                # Nustatyti, kaip rasta
+                                match_method = 'sąskaitos numeris'
+                                if invoice_type == 'purchase':
+                                    if invoice.received_invoice_number and invoice.received_invoice_number.lower() != invoice_number.lower():
+                                        match_method = 'fuzzy matching'
+                                elif invoice_type == 'sales':
+                                    if invoice.invoice_number and invoice.invoice_number.lower() != invoice_number.lower():
+                                        match_method = 'fuzzy matching'
+                                
+                                if partner_name and paid_amount:
+                                    match_method = 'klientas/vežėjas + suma'
+                                elif expedition_number:
+                                    match_method = 'ekspedicijos numeris'
+                                elif order_numbers_str:
+                                    match_method = 'užsakymo numeris'
+                                
+                                # Pridėti informaciją apie datos koregavimą
+                                date_adjusted = False
+                                if original_payment_date and payment_date and original_payment_date != payment_date:
+                                    date_adjusted = True
+                                
+                                message = f'Rasta ({match_method}) ir {"atnaujinta" if not dry_run else "būtų atnaujinta"}'
+                                if date_adjusted:
+                                    message += f' (data pakoreguota iš {original_payment_date} į {payment_date})'
+                                
                                 stats['details'].append({
                                     'row': stats['total_rows'],
-                                    'invoice_number': invoice_number if 'invoice_number' in locals() else '(nera)',
-                                    'status': 'error',
-                                    'message': str(e)
+                                    'invoice_number': invoice_number,
+                                    'invoice_id': invoice.id,
+                                    'status': 'matched',
+                                    'message': message
                                 })
-                                logger.error(f'Klaida apdorojant eilutę {stats["total_rows"]}: {e}', exc_info=True)
+                            else:
+                                # Nerasta sąskaita - tiesiog praleisti, ne rodyti kaip klaidą
+                                stats['not_found'] += 1
+                                # Nerastos sąskaitos nepridedamos į detalių sąrašą, kad nebūtų užkrautas rezultatas
+                        
+                        except Exception as e:
+                            stats['errors'] += 1
+                            stats['details'].append({
+                                'row': stats['total_rows'],
+                                'invoice_number': invoice_number if 'invoice_number' in locals() else '(nera)',
+                                'status': 'error',
+                                'message': str(e)
+                            })
+                            logger.error(f'Klaida apdorojant eilutę {stats["total_rows"]}: {e}', exc_info=True)
 
             except Exception as e:
                 logger.error(f'Klaida skaitant CSV failą: {e}', exc_info=True)
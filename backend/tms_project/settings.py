@@ -65,6 +65,7 @@ MIDDLEWARE = [
     'django.middleware.locale.LocaleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'apps.settings.middleware.SettingsCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'tms_project.urls'
@@ -123,6 +124,15 @@ DATABASES = {
 # Database router - nukreipia rašymą į default, sinchronizacija vyksta per signals
 DATABASE_ROUTERS = ['apps.core.db_sync.DatabaseSyncRouter']
 
+# Replica sinchronizacijos outbox (apps.core.replica_outbox)
+# Pakeitimai kaupiami lokalioje DB ir atskiru procesu (manage.py drain_replica_outbox --loop)
+# paketais perkeliami į replica DB
+REPLICA_OUTBOX_BATCH_SIZE = int(os.getenv('REPLICA_OUTBOX_BATCH_SIZE', '500'))
+REPLICA_OUTBOX_CHUNK_SIZE = int(os.getenv('REPLICA_OUTBOX_CHUNK_SIZE', '500'))
+REPLICA_OUTBOX_POLL_SECONDS = int(os.getenv('REPLICA_OUTBOX_POLL_SECONDS', '2'))
+REPLICA_OUTBOX_MAX_ATTEMPTS = int(os.getenv('REPLICA_OUTBOX_MAX_ATTEMPTS', '20'))  # po to įrašas nebeimamas (--reset-failed)
+REPLICA_OUTBOX_RETRY_BASE_SECONDS = int(os.getenv('REPLICA_OUTBOX_RETRY_BASE_SECONDS', '10'))  # nepavykusio įrašo atidėjimas, dvigubėja
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#password-validation
@@ -189,6 +199,82 @@ SERVER_SSH_PATH = os.environ.get('SERVER_SSH_PATH', None)  # SSH kelias, pvz.: '
 # External URLs
 FRONTEND_BASE_URL = os.environ.get('FRONTEND_BASE_URL', '')
 
+# PDF generavimas (apps.core.pdf_renderer) - šiltų Chromium naršyklių pool'as kiekviename procese
+PDF_BROWSER_POOL_ENABLED = os.getenv('PDF_BROWSER_POOL_ENABLED', 'True') == 'True'
+PDF_BROWSER_POOL_SIZE = int(os.getenv('PDF_BROWSER_POOL_SIZE', '2'))
+PDF_BROWSER_MAX_RENDERS = int(os.getenv('PDF_BROWSER_MAX_RENDERS', '200'))  # perkrauti naršyklę po N PDF
+PDF_BROWSER_MAX_RSS_MB = int(os.getenv('PDF_BROWSER_MAX_RSS_MB', '1024'))  # perkrauti viršijus atminties ribą
+PDF_BROWSER_ACQUIRE_TIMEOUT = float(os.getenv('PDF_BROWSER_ACQUIRE_TIMEOUT', '5'))  # po to - WeasyPrint
+PDF_BROWSER_RENDER_TIMEOUT = float(os.getenv('PDF_BROWSER_RENDER_TIMEOUT', '60'))
+
+# PDF cache (MEDIA_ROOT/pdf_cache) - raktas pagal sugeneruotą HTML, todėl pakartotinai negeneruojama
+PDF_CACHE_ENABLED = os.getenv('PDF_CACHE_ENABLED', 'True') == 'True'
+PDF_CACHE_DIR = os.getenv('PDF_CACHE_DIR', None)  # None -> MEDIA_ROOT/pdf_cache
+PDF_CACHE_MAX_BYTES = int(os.getenv('PDF_CACHE_MAX_MB', '512')) * 1024 * 1024  # LRU riba
+PDF_CACHE_EVICT_EVERY = int(os.getenv('PDF_CACHE_EVICT_EVERY', '20'))  # dydžio patikra kas N įrašymų
+
+# Masinis PDF eksportas (apps.core.pdf_batch) - procesų pool'as
+# Pool'as kuriamas kiekviename gunicorn worker'yje (tik pirmo masinio eksporto metu) - numatytai nedidelis;
+# 0 -> pagal prieinamus CPU branduolius
+PDF_BATCH_WORKERS = int(os.getenv('PDF_BATCH_WORKERS', '2'))
+PDF_BATCH_MAX_DOCUMENTS = int(os.getenv('PDF_BATCH_MAX_DOCUMENTS', '500'))
+
+# Užsakymų paieška per žodžių indeksą (apps.orders.search_index); False - senoji SearchFilter LIKE paieška
+ORDER_SEARCH_INDEX_ENABLED = os.getenv('ORDER_SEARCH_INDEX_ENABLED', 'True') == 'True'
+
+# Singleton nustatymų (X.load()) cache su versijos žyme DB (apps.settings.cache)
+SETTINGS_CACHE_ENABLED = os.getenv('SETTINGS_CACHE_ENABLED', 'True') == 'True'
+SETTINGS_CACHE_TTL = float(os.getenv('SETTINGS_CACHE_TTL', '5'))  # sek., versijų tikrinimas už HTTP užklausų ribų
+
+# Banko išrašo importas (apps.invoices.bank_statement_import) - operacijos suderinamos paketais
+BANK_IMPORT_CHUNK_SIZE = int(os.getenv('BANK_IMPORT_CHUNK_SIZE', '500'))
+BANK_IMPORT_MAX_ERRORS = int(os.getenv('BANK_IMPORT_MAX_ERRORS', '100'))  # klaidingų eilučių detalės atsakyme
+BANK_IMPORT_MAX_RESULTS = int(os.getenv('BANK_IMPORT_MAX_RESULTS', '500'))  # operacijų detalės atsakyme
+
+# Dashboard snapshot (apps.dashboard.snapshot) - apskaičiuotos sekcijos DB, invaliduojamos signal'ais
+DASHBOARD_SNAPSHOT_ENABLED = os.getenv('DASHBOARD_SNAPSHOT_ENABLED', 'True') == 'True'
+DASHBOARD_SNAPSHOT_MAX_AGE = int(os.getenv('DASHBOARD_SNAPSHOT_MAX_AGE', '900'))  # sek., po to perskaičiuojama
+DASHBOARD_SNAPSHOT_REBUILD_INTERVAL = int(os.getenv('DASHBOARD_SNAPSHOT_REBUILD_INTERVAL', '1800'))  # sek., rebuild_dashboard_snapshot --loop
+# Sekcijų galiojimo laikas: DASHBOARD_SECTION_TTLS="gaps=1800,finance=600" (sek.)
+DASHBOARD_SECTION_TTLS = {
+    name.strip(): int(ttl)
+    for name, ttl in (item.split('=', 1) for item in os.getenv('DASHBOARD_SECTION_TTLS', '').split(',') if '=' in item)
+}
+DASHBOARD_SECTION_WORKERS = int(os.getenv('DASHBOARD_SECTION_WORKERS', '4'))  # lygiagrečiai skaičiuojamos sekcijos, 1 - nuosekliai
+DASHBOARD_SECTION_TIMEOUT = float(os.getenv('DASHBOARD_SECTION_TIMEOUT', '10'))  # sek., po to grąžinamas ankstesnis rezultatas
+DASHBOARD_SECTION_SLOW_MS = int(os.getenv('DASHBOARD_SECTION_SLOW_MS', '1000'))  # lėtesnės sekcijos registruojamos žurnale
+
+# Planuojami užsakymų statusų perėjimai pagal datas (apps.orders.status_rules)
+ORDER_STATUS_SCHEDULE_INTERVAL = int(os.getenv('ORDER_STATUS_SCHEDULE_INTERVAL', '900'))  # sek., run_scheduled_status_transitions --loop
+ORDER_STATUS_SCHEDULE_MAX_PASSES = int(os.getenv('ORDER_STATUS_SCHEDULE_MAX_PASSES', '3'))  # perėjimų grandinė per vieną vykdymą
+
+# Laiškų numerių indeksas (apps.mail.match_index); False - match-summary skenuoja visus laiškus
+MAIL_MATCH_INDEX_ENABLED = os.getenv('MAIL_MATCH_INDEX_ENABLED', 'True') == 'True'
+
+# IMAP sinchronizacija (apps.mail.services.sync_imap): paketinis UID FETCH (BODYSTRUCTURE + tik reikalingos dalys)
+MAIL_SYNC_BATCHED = os.getenv('MAIL_SYNC_BATCHED', 'False') == 'True'  # True - paketinė FETCH sinchronizacija, False - po vieną laišką (RFC822)
+MAIL_SYNC_BATCH_LIMIT = int(os.getenv('MAIL_SYNC_BATCH_LIMIT', '2000'))  # laiškų per vieną sinchronizaciją
+MAIL_SYNC_FETCH_CHUNK = int(os.getenv('MAIL_SYNC_FETCH_CHUNK', '100'))  # UID vienai FETCH komandai / transakcijai
+MAIL_SYNC_FETCH_MAX_BYTES = int(os.getenv('MAIL_SYNC_FETCH_MAX_MB', '20')) * 1024 * 1024  # turinio vienam atsakymui
+MAIL_SYNC_WORKERS = int(os.getenv('MAIL_SYNC_WORKERS', '4'))  # priedų / atitikčių gijos; 1 - nuosekliai
+
+# Pašto sinchronizacijos servisas (manage.py run_mail_sync_service, apps.mail.sync_service)
+MAIL_SYNC_FOLDERS = [f for f in os.getenv('MAIL_SYNC_FOLDERS', '').split(',') if f.strip()]  # tuščia - imap_folder
+MAIL_SYNC_IDLE_ENABLED = os.getenv('MAIL_SYNC_IDLE_ENABLED', 'True') == 'True'  # False - periodinė apklausa
+MAIL_SYNC_IDLE_TIMEOUT = int(os.getenv('MAIL_SYNC_IDLE_TIMEOUT', '300'))  # sek., IDLE atnaujinamas (RFC 2177 - iki 29 min.)
+MAIL_SYNC_POLL_INTERVAL = int(os.getenv('MAIL_SYNC_POLL_INTERVAL', '60'))  # sek., kai serveris nepalaiko IDLE
+MAIL_SYNC_BACKOFF_BASE = int(os.getenv('MAIL_SYNC_BACKOFF_BASE', '15'))  # sek., pirmas atidėjimas po klaidos
+MAIL_SYNC_BACKOFF_MAX = int(os.getenv('MAIL_SYNC_BACKOFF_MAX', '900'))  # sek., didžiausias atidėjimas
+MAIL_SYNC_HOUSEKEEPING_INTERVAL = int(os.getenv('MAIL_SYNC_HOUSEKEEPING_INTERVAL', '300'))  # sek., bounce ir priedai
+
+# PDF priedų OCR eilė (apps.mail.ocr_queue, manage.py run_ocr_workers)
+MAIL_OCR_QUEUE_ENABLED = os.getenv('MAIL_OCR_QUEUE_ENABLED', 'True') == 'True'  # False - OCR atskira gija web procese
+MAIL_OCR_WORKERS = int(os.getenv('MAIL_OCR_WORKERS', '0'))  # procesų skaičius; 0 - pusė branduolių
+MAIL_OCR_MAX_ATTEMPTS = int(os.getenv('MAIL_OCR_MAX_ATTEMPTS', '3'))
+MAIL_OCR_RETRY_BASE = int(os.getenv('MAIL_OCR_RETRY_BASE', '60'))  # sek., atidėjimas dvigubėja po kiekvienos klaidos
+MAIL_OCR_JOB_TIMEOUT = int(os.getenv('MAIL_OCR_JOB_TIMEOUT', '300'))  # sek., ilgesnis darbas nutraukiamas
+MAIL_OCR_POLL_INTERVAL = int(os.getenv('MAIL_OCR_POLL_INTERVAL', '5'))  # sek., tuščios eilės tikrinimas
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -205,7 +291,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # ?page= kaip anksčiau; ?pagination=cursor - keyset režimas (apps/core/pagination.py)
+    'DEFAULT_PAGINATION_CLASS': 'apps.core.pagination.OptionalCursorPagination',
     'PAGE_SIZE': 1000,
     'DEFAULT_FILTER_BACKENDS': [
         'rest_framework.filters.SearchFilter',
@@ -92,6 +92,7 @@ ARCHIVE_PATH="/tmp/$ARCHIVE_NAME"
 
 # Sustabdyti servisus
 sudo pkill -f gunicorn 2>/dev/null || true
+sudo pkill -f drain_replica_outbox 2>/dev/null || true
 sudo pkill -f "python3 -m http.server 3000" 2>/dev/null || true
 sleep 2
 
@@ -149,6 +150,11 @@ nohup sudo -u www-data "$TMS_DIR/backend/venv/bin/python" "$TMS_DIR/backend/venv
   tms_project.wsgi:application </dev/null >>"$TMS_DIR/logs/gunicorn_nohup.log" 2>&1 &
 sleep 2
 
+# Replica outbox - atskiras procesas (ne gunicorn workeriuose)
+echo "     [remote] Starting replica outbox drainer..."
+nohup sudo -u www-data "$TMS_DIR/backend/venv/bin/python" manage.py drain_replica_outbox --loop \
+  </dev/null >>"$TMS_DIR/logs/replica_outbox.log" 2>&1 &
+
 # Frontend statika (nohup kad išliktų po SSH atsijungimo)
 echo "     [remote] Starting frontend HTTP server..."
 cd "$TMS_DIR/frontend/build"
@@ -6,12 +6,15 @@ interface ImportResult {
   total_transactions?: number;
   matched_count?: number;
   unmatched_count?: number;
+  failed_count?: number;
+  results_truncated?: number;
   results?: Array<{
     date: string;
     amount: string;
     description: string;
     matched: boolean;
     invoice_number?: string;
+    error?: string;
   }>;
   success?: boolean;
   error?: string;
@@ -102,6 +105,12 @@ const BankImportPage: React.FC = () => {
             <p><strong>Iš viso operacijų:</strong> {result.total_transactions}</p>
             <p><strong>Suderinta:</strong> {result.matched_count}</p>
             <p><strong>Nesuderinta:</strong> {result.unmatched_count}</p>
+            {!!result.failed_count && (
+              <p><strong>Nepavyko pažymėti apmokėtomis:</strong> {result.failed_count}</p>
+            )}
+            {!!result.results_truncated && (
+              <p>Rodomos pirmos {result.results?.length ?? 0} operacijos, nerodoma: {result.results_truncated}</p>
+            )}
 
             {result.results && result.results.length > 0 && (
               <table className="table">
@@ -121,8 +130,8 @@ const BankImportPage: React.FC = () => {
                       <td>{item.amount}</td>
                       <td>{item.description}</td>
                       <td>
-                        <span className={`badge ${item.matched ? 'badge-success' : 'badge-warning'}`}>
-                          {item.matched ? 'Suderinta' : 'Nesuderinta'}
+                        <span className={`badge ${item.matched ? 'badge-success' : 'badge-warning'}`} title={item.error}>
+                          {item.matched ? 'Suderinta' : item.error ? 'Klaida' : 'Nesuderinta'}
                         </span>
                       </td>
                       <td>{item.invoice_number || '-'}</td>
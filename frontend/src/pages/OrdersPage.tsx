@@ -1483,6 +1483,8 @@ const OrdersPage: React.FC = () => {
       }
 
       params.ordering = '-order_number';
+      // Supaprastintas sąrašo serializer'is - tik lentelėje rodomi laukai (pilni duomenys - /orders/orders/{id}/)
+      params.view = 'list';
       
       const response = await api.get('/orders/orders/', { params });
       
@@ -1628,7 +1630,15 @@ const OrdersPage: React.FC = () => {
   };
 
   const handleEditOrderNew = async (order: OrdersPageOrder) => {
-    setEditingOrder(order);
+    // Sąraše tik lentelės laukai (view=list) - redagavimui užkrauti pilną užsakymą
+    let fullOrder = order;
+    try {
+      const response = await api.get(`/orders/orders/${order.id}/`);
+      fullOrder = normalizeOrderData(response.data);
+    } catch (error) {
+      // Jei nepavyko - atidaryti su sąrašo duomenimis
+    }
+    setEditingOrder(fullOrder);
     setShowNewEditModal(true);
     
     // Užkrauti pasiūlymus, jei dar nėra užkrauti (filtrams)